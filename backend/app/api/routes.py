@@ -3,7 +3,7 @@ from fastapi import FastAPI
 # 说明：集中注册各业务模块的路由
 
 def register_routes(app: FastAPI) -> None:
-    from .v1 import data, predict, process, orders, auth, work_reports, pricing, batch_pricing
+    from .v1 import data, predict, process, orders, auth, work_reports, pricing, batch_pricing, llm, metrics
 
     app.include_router(data.router, prefix="/api/data", tags=["data"])
     app.include_router(predict.router, prefix="/api/predict", tags=["predict"])
@@ -13,5 +13,7 @@ def register_routes(app: FastAPI) -> None:
     app.include_router(work_reports.router, prefix="/api", tags=["work_reports"])
     app.include_router(pricing.router, prefix="/api/pricing", tags=["pricing"])
     app.include_router(batch_pricing.router, prefix="/api", tags=["pricing_batch"])
+    app.include_router(llm.router, prefix="/api/llm", tags=["llm"])
+    app.include_router(metrics.router, tags=["metrics"])
 
 
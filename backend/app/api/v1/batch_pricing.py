@@ -2,8 +2,8 @@
 # -*- coding: utf-8 -*-
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse
-from typing import Optional, List, Dict
+from fastapi.responses import StreamingResponse
+from typing import Optional
 import uuid
 import io
 import csv
@@ -11,6 +11,8 @@ from datetime import datetime
 import logging
 
 from app.repository.batch_pricing_repo import BatchPricingRepository
+from app.utils.pricing.price_cache import get_price_cache, normalize_material, signature_of, PriceCacheRunStats
+from app.utils.fast_json import FastJSONResponse
 import os
 
 try:
@@ -21,6 +23,10 @@ except Exception:  # pragma: no cover
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# 核价规则版本：调整估价逻辑时递增，旧版本的价格缓存随之失效
+# v1.1：估价改为基于规范化字段（与缓存签名一致）
+PRICING_RULE_VERSION = os.getenv("PRICING_RULE_VERSION", "v1.1")
+
 
 def _normalize_header(header: str) -> str:
     h = (header or '').strip().lower()
@@ -34,6 +40,16 @@ def _normalize_header(header: str) -> str:
     return mapping.get(h, h)
 
 
+def _estimate_unit_price(mc: str, mn: str, spec: str, proc: str) -> float:
+    """简化估价：基于字段长度的启发式单价（占位，可替换为真实核价逻辑）。
+    入参为 normalize_material 的规范化结果，与价格缓存签名使用同一组字段"""
+    base = 100.0
+    name_factor = len(mn or mc) * 0.5
+    spec_factor = len(spec) * 0.2
+    proc_factor = len(proc) * 0.1
+    return base + name_factor + spec_factor + proc_factor
+
+
 @router.post("/pricing/batch/upload")
 async def upload_batch_pricing(
     file: UploadFile = File(...),
@@ -95,6 +111,10 @@ async def get_preview(trace_id: str):
 
 @router.post("/pricing/batch/{trace_id}/run")
 async def run_batch_pricing(trace_id: str):
+    repo = BatchPricingRepository()
+    task = repo.get_task(trace_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="trace_id 不存在")
     try:
         # 读取保存的Excel，进行字段映射与简化的价格估算
         saved_path = task.get('source_file_path')
@@ -115,21 +135,51 @@ async def run_batch_pricing(trace_id: str):
                 return None
             return row[idx] if idx < len(row) else None
 
-        results: List[Dict] = []
-        success_count = 0
-        failed_count = 0
-        row_index = 0
-        for row_index, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=1):
-            mc = get_val(row, 'material_code') or get_val(row, '核算物料') or get_val(row, '编码')
-            mn = get_val(row, 'material_name') or get_val(row, '核算物料描述') or get_val(row, '名称')
-            spec = get_val(row, 'specification') or get_val(row, '规格型号') or get_val(row, '规格')
-            proc = get_val(row, 'process_requirements') or get_val(row, '工艺要求') or get_val(row, '工艺')
-            qty = get_val(row, 'quantity') or 1
-            uom = get_val(row, 'uom') or 'EA'
-
-            if not (mc or mn):
-                failed_count += 1
-                results.append({
+        # 价格缓存：同一物料签名在文件内、跨文件只计算一次
+        price_cache = get_price_cache(PRICING_RULE_VERSION)
+        cache_stats = PriceCacheRunStats()
+
+        counts = {'success': 0, 'failed': 0, 'rows': 0}
+
+        def priced_rows():
+            for row_index, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=1):
+                counts['rows'] = row_index
+                mc = get_val(row, 'material_code') or get_val(row, '核算物料') or get_val(row, '编码')
+                mn = get_val(row, 'material_name') or get_val(row, '核算物料描述') or get_val(row, '名称')
+                spec = get_val(row, 'specification') or get_val(row, '规格型号') or get_val(row, '规格')
+                proc = get_val(row, 'process_requirements') or get_val(row, '工艺要求') or get_val(row, '工艺')
+                qty = get_val(row, 'quantity') or 1
+                uom = get_val(row, 'uom') or 'EA'
+
+                if not (mc or mn):
+                    counts['failed'] += 1
+                    yield {
+                        'row_index': row_index,
+                        'material_code': mc or '',
+                        'material_name': mn or '',
+                        'specification': spec or '',
+                        'process_requirements': proc or '',
+                        'quantity': qty or 1,
+                        'uom': uom,
+                        'estimated_price': None,
+                        'currency': 'CNY',
+                        'status': 'failed',
+                        'reason_or_notes': '缺少物料编码或名称',
+                        'rule_version': PRICING_RULE_VERSION
+                    }
+                    continue
+
+                normalized = normalize_material(mc, mn, spec, proc)
+                signature = signature_of(normalized)
+                unit_price, source = price_cache.lookup(signature)
+                cache_stats.record(source)
+                if unit_price is None:
+                    unit_price = _estimate_unit_price(*normalized)
+                    price_cache.store(signature, unit_price)
+                price = round(unit_price * float(qty or 1), 2)
+
+                counts['success'] += 1
+                yield {
                     'row_index': row_index,
                     'material_code': mc or '',
                     'material_name': mn or '',
@@ -137,51 +187,30 @@ async def run_batch_pricing(trace_id: str):
                     'process_requirements': proc or '',
                     'quantity': qty or 1,
                     'uom': uom,
-                    'estimated_price': None,
+                    'estimated_price': price,
                     'currency': 'CNY',
-                    'status': 'failed',
-                    'reason_or_notes': '缺少物料编码或名称',
-                    'rule_version': 'v1.0'
-                })
-                continue
-
-            # 简化估价：基于字段长度/数量的启发式（占位，可替换为真实核价逻辑）
-            base = 100.0
-            name_factor = len(str(mn or mc)) * 0.5
-            spec_factor = len(str(spec or '')) * 0.2
-            proc_factor = len(str(proc or '')) * 0.1
-            price = round((base + name_factor + spec_factor + proc_factor) * float(qty or 1), 2)
-
-            success_count += 1
-            results.append({
-                'row_index': row_index,
-                'material_code': mc or '',
-                'material_name': mn or '',
-                'specification': spec or '',
-                'process_requirements': proc or '',
-                'quantity': qty or 1,
-                'uom': uom,
-                'estimated_price': price,
-                'currency': 'CNY',
-                'status': 'success',
-                'reason_or_notes': '',
-                'rule_version': 'v1.0'
-            })
-
-            if len(results) % 500 == 0:
-                repo.insert_results(trace_id, results)
-                results = []
-
-        if results:
-            repo.insert_results(trace_id, results)
-
-        repo.update_task_status(trace_id, 'completed', stats={
+                    'status': 'success',
+                    'reason_or_notes': '' if source == 'miss' else '命中价格缓存',
+                    'rule_version': PRICING_RULE_VERSION
+                }
+
+        # 边计算边写入：整批结果在同一事务内提交，失败时整批回滚，不留半批数据
+        write_stats = repo.insert_results(trace_id, priced_rows())
+        price_cache.flush()
+        success_count, failed_count = counts['success'], counts['failed']
+
+        stats = {
             'success_count': success_count,
             'failed_count': failed_count,
-            'total_processed': row_index
-        })
-
-        return {"success": True, "success_count": success_count, "failed_count": failed_count}
+            'total_processed': counts['rows'],
+            'rule_version': PRICING_RULE_VERSION,
+            'insert_seconds': write_stats['seconds'],
+            'insert_rows_per_sec': write_stats['rows_per_sec']
+        }
+        stats.update(cache_stats.as_dict())
+        repo.update_task_status(trace_id, 'completed', stats=stats)
+
+        return {"success": True, "success_count": success_count, "failed_count": failed_count, "cache": cache_stats.as_dict()}
     except HTTPException as he:
         logger.exception(f"[batch-run] HTTP错误: {he.detail}")
         repo.update_task_status(trace_id, 'failed', stats={"error": str(he.detail)})
@@ -199,7 +228,7 @@ async def run_batch_pricing(trace_id: str):
 @router.get("/pricing/batch/{trace_id}/results")
 async def list_results(trace_id: str, status: Optional[str] = 'all', pn: int = 1, ps: int = 50):
     repo = BatchPricingRepository()
-    return repo.list_results(trace_id, status, pn, ps)
+    return FastJSONResponse(repo.list_results(trace_id, status, pn, ps))
 
 
 @router.get("/pricing/batch/{trace_id}/export")
@@ -219,7 +248,7 @@ async def export_results(trace_id: str, format: str = 'csv'):
             'Content-Disposition': f'attachment; filename="{trace_id}.csv"'
         })
     else:
-        return JSONResponse(content=data)
+        return FastJSONResponse(content=data)
 
 
 @router.post("/pricing/batch/{trace_id}/approve")
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Any, Dict, List, Optional
 from ...utils.snowflake_client import execute_query, execute_many
@@ -215,7 +216,7 @@ async def generate_field_mapping(
     """生成字段映射规则"""
     try:
         generator = FieldMappingGenerator()
-        result = generator.generate_field_mapping(
+        result = await generator.agenerate_field_mapping(
             source_fields=source_fields,
             target_fields=target_fields,
             source_system=source_system,
@@ -289,7 +290,8 @@ async def parse_unstructured(file: UploadFile = File(...)) -> Dict[str, Any]:
     filename = file.filename
     content = await file.read()
     ftype, text = detect_and_parse(filename, content)
-    llm = extract_from_unstructured(text.encode("utf-8"), ftype)
+    # 同步 LLM 调用放到线程池执行，避免阻塞事件循环
+    llm = await run_in_threadpool(extract_from_unstructured, text.encode("utf-8"), ftype)
     return {"filename": filename, "type": ftype, "preview": text[:500], "llm": llm}
 
 
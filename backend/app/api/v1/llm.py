@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends
+from typing import Any, Dict
+
+from .auth import require_role
+from ...utils.llm.response_cache import get_llm_response_cache
+from ...utils.llm.token_accounting import get_token_ledger
+from ...utils.llm.transport import get_llm_transport
+
+# 说明：LLM 调用用量（按接口/用户的 token 与费用、预算窗口）、响应缓存与传输层状态
+
+router = APIRouter()
+
+
+@router.get("/usage")
+async def llm_usage(top: int = 20, _user=Depends(require_role("admin"))) -> Dict[str, Any]:
+    """含按用户（API Key 前缀、客户端 IP）的用量明细，仅管理员可见"""
+    cache = get_llm_response_cache()
+    return {
+        "usage": get_token_ledger().snapshot(top=top),
+        "response_cache": cache.stats() if cache is not None else {"enabled": False},
+        "transport": get_llm_transport().stats(),
+    }
+
+
+@router.post("/usage/reset")
+async def reset_llm_usage(_user=Depends(require_role("admin"))) -> Dict[str, Any]:
+    get_token_ledger().reset()
+    return {"reset": True}
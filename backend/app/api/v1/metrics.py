@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ...utils.logs.structured import logging_stats
+from ...utils.metrics.request_metrics import get_request_metrics
+
+# 说明：Prometheus 抓取接口（按路由的延迟直方图、状态码、在途请求数、db/llm/parse 耗时累计、日志队列丢弃数）
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    text = get_request_metrics().render_prometheus()
+    log_stats = logging_stats()
+    if log_stats["enabled"]:
+        text += (
+            "# HELP log_records_dropped_total Log records dropped because the log queue was full.\n"
+            "# TYPE log_records_dropped_total counter\n"
+            f"log_records_dropped_total {log_stats['dropped']}\n"
+        )
+    return PlainTextResponse(text, media_type=PROMETHEUS_CONTENT_TYPE)
@@ -5,23 +5,33 @@
 """
 
 from fastapi import APIRouter, HTTPException, status, Depends, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 from ...models.train.llm_predictor import (
-    predict_with_llm, train_llm_model, get_llm_model_status
+    apredict_with_llm, iter_llm_predict_batch, train_llm_model, get_llm_model_status
 )
 from ...models.train.simple_predictor import (
-    predict_simple, train_simple_model, evaluate_simple_model, get_simple_model_status
+    predict_simple, train_simple_model, evaluate_simple_model, get_simple_model_status,
+    forecast_holt_winters, apply_training_result
 )
-from ...utils.llm.predict_correction import correct_forecast
+from ...models.train.forecast_executor import ForecastTask, get_forecast_executor
+from ...models.train import train_jobs
+from ...utils.llm.predict_correction import acorrect_forecast
 from ...middleware.rate_limit import rate_limit
+import asyncio
+import json
 import logging
+import os
 import time
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# 批量预测上限（简单模型在进程池中并行拟合，可支持数千个SKU序列）
+BATCH_PREDICT_MAX_SERIES = int(os.getenv("BATCH_PREDICT_MAX_SERIES", "5000"))
+
 
 class IndicatorsPredictRequest(BaseModel):
     series: List[float] = Field(..., description="历史营收/利润率序列", min_items=6)
@@ -64,7 +74,7 @@ async def indicators_predict(payload: IndicatorsPredictRequest) -> Dict[str, Any
         start_time = time.time()
         if payload.use_llm:
             # 使用LLM预测
-            result = predict_with_llm(
+            result = await apredict_with_llm(
                 series=payload.series,
                 horizon_months=horizon_months,
                 context="企业指标预测",
@@ -104,7 +114,7 @@ async def predict_with_factors(payload: WithFactorsRequest) -> Dict[str, Any]:
             raise HTTPException(status_code=400, detail="基础预测结果不能为空")
         
         # 使用LLM进行预测修正
-        correction_result = correct_forecast(payload.base_forecast, payload.text_factors)
+        correction_result = await acorrect_forecast(payload.base_forecast, payload.text_factors)
         
         # 解析LLM结果
         if isinstance(correction_result, dict) and "raw" in correction_result:
@@ -156,7 +166,7 @@ async def llm_predict(payload: LLMPredictRequest) -> Dict[str, Any]:
         
         # 使用LLM进行预测
         start_time = time.time()
-        result = predict_with_llm(
+        result = await apredict_with_llm(
             series=payload.series,
             horizon_months=horizon_months,
             context=payload.context,
@@ -194,15 +204,9 @@ async def llm_simple_predict(payload: IndicatorsPredictRequest) -> Dict[str, Any
         horizon_months = min(3, payload.horizon_months)
         
         # 使用指数平滑进行基础预测
-        from statsmodels.tsa.holtwinters import ExponentialSmoothing
-        model = ExponentialSmoothing(
-            payload.series, 
-            trend='add', 
-            seasonal='add', 
-            seasonal_periods=min(6, len(payload.series) // 2)
+        base_forecast, _ = forecast_holt_winters(
+            payload.series, horizon_months, min(6, len(payload.series) // 2)
         )
-        fitted_model = model.fit()
-        base_forecast = fitted_model.forecast(horizon_months).tolist()
         
         return {
             "forecast": base_forecast,
@@ -218,20 +222,43 @@ async def llm_simple_predict(payload: IndicatorsPredictRequest) -> Dict[str, Any
 
 @router.post("/train")
 async def train_model_api(payload: ModelEvaluationRequest, background_tasks: BackgroundTasks) -> Dict[str, Any]:
-    """模型训练/评估接口"""
+    """模型训练/评估接口：提交后台训练任务，立即返回 job_id，通过 GET /train/{job_id} 轮询结果"""
+    if len(payload.series) < 6:
+        raise HTTPException(status_code=400, detail="训练数据不足，至少需要6个数据点")
+    
+    job = train_jobs.create_job("train", {"data_points": len(payload.series), "test_size": payload.test_size})
+    background_tasks.add_task(_run_training_job, job["job_id"], list(payload.series), payload.test_size)
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "status_url": f"/api/predict/train/{job['job_id']}"
+    }
+
+
+@router.get("/train/{job_id}")
+async def get_train_job_api(job_id: str) -> Dict[str, Any]:
+    """查询训练任务状态，完成后 result 为训练结果"""
+    job = train_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="训练任务不存在或已过期")
+    return job
+
+
+async def _run_training_job(job_id: str, series: List[float], test_size: float) -> None:
+    """在预测进程池中并行执行训练与回测评估，结果写回任务登记表"""
+    train_jobs.update_job(job_id, status=train_jobs.RUNNING)
+    executor = get_forecast_executor()
     try:
-        if len(payload.series) < 6:
-            raise HTTPException(status_code=400, detail="训练数据不足，至少需要6个数据点")
-        
-        # 训练简单模型
         start_time = time.time()
-        training_result = train_simple_model(payload.series, payload.test_size)
+        training_result, eval_result = await asyncio.gather(
+            executor.run(train_simple_model, series, test_size),
+            executor.run(evaluate_simple_model, series, test_size),
+        )
         training_time = time.time() - start_time
+        # 训练在子进程中完成，将参数同步到本进程的全局预测器，供 /model-status 查询
+        apply_training_result(training_result)
         
-        # 评估模型
-        eval_result = evaluate_simple_model(payload.series, payload.test_size)
-        
-        return {
+        result = {
             "status": "trained" if training_result.get("is_trained", False) else "failed",
             "training_time_seconds": int(training_time),
             "model_params": training_result,
@@ -240,25 +267,31 @@ async def train_model_api(payload: ModelEvaluationRequest, background_tasks: Bac
                 "mape": eval_result.get("mape", 0.0),
                 "is_accurate": eval_result.get("is_accurate", False)
             },
-            "data_points": len(payload.series),
-            "test_size": payload.test_size,
+            "backtest": eval_result.get("backtest"),
+            "predictions": eval_result.get("predictions", []),
+            "actuals": eval_result.get("actuals", []),
+            "data_points": len(series),
+            "test_size": test_size,
             "model_type": "Simple"
         }
+        train_jobs.update_job(job_id, status=train_jobs.COMPLETED, result=result)
         
     except Exception as e:
         logger.error(f"模型训练失败: {e}")
-        raise HTTPException(status_code=500, detail=f"训练失败: {str(e)}")
+        train_jobs.update_job(job_id, status=train_jobs.FAILED, error=f"训练失败: {str(e)}")
 
 
 @router.post("/evaluate")
 async def evaluate_model_api(payload: ModelEvaluationRequest) -> Dict[str, Any]:
-    """模型评估接口"""
+    """模型评估接口：滚动原点回测，在预测进程池中执行"""
     try:
         if len(payload.series) < 6:
             raise HTTPException(status_code=400, detail="评估数据不足，至少需要6个数据点")
         
         # 使用简单预测器进行评估
-        eval_result = evaluate_simple_model(payload.series, payload.test_size)
+        eval_result = await get_forecast_executor().run(
+            evaluate_simple_model, list(payload.series), payload.test_size
+        )
         
         return {
             "metrics": {
@@ -268,11 +301,14 @@ async def evaluate_model_api(payload: ModelEvaluationRequest) -> Dict[str, Any]:
             },
             "predictions": eval_result.get("predictions", []),
             "actuals": eval_result.get("actuals", []),
+            "backtest": eval_result.get("backtest"),
             "test_size": int(len(payload.series) * payload.test_size),
             "train_size": int(len(payload.series) * (1 - payload.test_size)),
             "model_type": "Simple"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"模型评估失败: {e}")
         raise HTTPException(status_code=500, detail=f"评估失败: {str(e)}")
@@ -322,57 +358,113 @@ async def train_llm_model_api(payload: ModelEvaluationRequest) -> Dict[str, Any]
         raise HTTPException(status_code=500, detail=f"LLM训练失败: {str(e)}")
 
 
+async def _iter_batch_predictions(payload: List[IndicatorsPredictRequest]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    批量预测，按完成顺序产出每条结果
+    - 简单模型：提交到预测进程池按块并行拟合
+    - LLM：受全局并发上限约束的异步调用，相同提示词去重并缓存，超出时间预算的序列回退到简单模型
+    """
+    simple_tasks: List[ForecastTask] = []
+    llm_indexes: List[int] = []
+    for i, req in enumerate(payload):
+        if len(req.series) < 6:
+            yield {"index": i, "error": "数据不足", "forecast": []}
+        elif req.use_llm:
+            llm_indexes.append(i)
+        else:
+            simple_tasks.append((i, req.series, req.horizon_months))
+
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def _simple_producer():
+        try:
+            async for item in get_forecast_executor().iter_forecasts(simple_tasks):
+                item["model_type"] = "Simple"
+                await queue.put(item)
+        except Exception as e:
+            logger.error(f"批量预测进程池执行失败: {e}")
+            for index, _, _ in simple_tasks:
+                await queue.put({"index": index, "error": str(e), "model_type": "Simple"})
+        finally:
+            await queue.put(done)
+
+    async def _llm_producer():
+        started = time.perf_counter()
+        items = [
+            {"series": payload[i].series, "horizon_months": payload[i].horizon_months, "context": "批量预测", "factors": []}
+            for i in llm_indexes
+        ]
+        try:
+            async for position, result in iter_llm_predict_batch(items):
+                await queue.put({
+                    "index": llm_indexes[position],
+                    "forecast": result.get("predictions", []),
+                    "source": result.get("source"),
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "model_type": "LLM"
+                })
+        finally:
+            await queue.put(done)
+
+    producers = [asyncio.create_task(_simple_producer()), asyncio.create_task(_llm_producer())]
+    try:
+        remaining = len(producers)
+        while remaining:
+            item = await queue.get()
+            if item is done:
+                remaining -= 1
+                continue
+            req = payload[item["index"]]
+            if "error" in item:
+                item["forecast"] = []
+            else:
+                item["horizon_months"] = req.horizon_months
+                item["data_points"] = len(req.series)
+            yield item
+    finally:
+        for task in producers:
+            task.cancel()
+
+
 @router.post("/batch-predict")
-async def batch_predict(payload: List[IndicatorsPredictRequest]) -> Dict[str, Any]:
-    """批量预测接口"""
+async def batch_predict(payload: List[IndicatorsPredictRequest], stream: bool = False):
+    """
+    批量预测接口
+    - stream=false：全部完成后按输入顺序返回
+    - stream=true：NDJSON 流式返回，每完成一条输出一行 {"type": "item", ...}，最后一行 {"type": "summary", ...}
+    """
+    if len(payload) > BATCH_PREDICT_MAX_SERIES:
+        raise HTTPException(status_code=400, detail=f"批量预测最多支持{BATCH_PREDICT_MAX_SERIES}个序列")
+
+    if stream:
+        async def _lines():
+            start_time = time.perf_counter()
+            failed = 0
+            async for item in _iter_batch_predictions(payload):
+                failed += "error" in item
+                yield json.dumps({"type": "item", **item}, ensure_ascii=False) + "\n"
+            summary = {
+                "type": "summary",
+                "total_processed": len(payload),
+                "successful": len(payload) - failed,
+                "processing_time_ms": int((time.perf_counter() - start_time) * 1000)
+            }
+            yield json.dumps(summary, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
     try:
-        if len(payload) > 10:
-            raise HTTPException(status_code=400, detail="批量预测最多支持10个序列")
-        
-        results = []
-        for i, req in enumerate(payload):
-            try:
-                if len(req.series) < 6:
-                    results.append({
-                        "index": i,
-                        "error": "数据不足",
-                        "forecast": []
-                    })
-                    continue
-                
-                # 根据用户选择使用LLM或简单预测
-                if req.use_llm:
-                    result = predict_with_llm(
-                        series=req.series,
-                        horizon_months=req.horizon_months,
-                        context="批量预测",
-                        factors=[]
-                    )
-                    forecast = result.get("predictions", [])
-                    model_type = "LLM"
-                else:
-                    forecast = predict_simple(req.series, req.horizon_months)
-                    model_type = "Simple"
-                
-                results.append({
-                    "index": i,
-                    "forecast": forecast,
-                    "horizon_months": req.horizon_months,
-                    "data_points": len(req.series),
-                    "model_type": model_type
-                })
-                
-            except Exception as e:
-                results.append({
-                    "index": i,
-                    "error": str(e),
-                    "forecast": []
-                })
+        start_time = time.perf_counter()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(payload)
+        async for item in _iter_batch_predictions(payload):
+            results[item["index"]] = item
         
         return {
             "batch_results": results,
             "total_processed": len(payload),
-            "successful": len([r for r in results if "error" not in r])
+            "successful": len([r for r in results if "error" not in r]),
+            "processing_time_ms": int((time.perf_counter() - start_time) * 1000)
         }
         
     except Exception as e:
@@ -1,15 +1,17 @@
 """
 核价相关API端点
 """
+import asyncio
+import json
 import logging
 import time
 import random
 import re
 import os
 from datetime import date, datetime, timedelta
-from typing import List, Dict, Any
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 import pandas as pd
 import io
 
@@ -19,11 +21,23 @@ from ...schemas.pricing import (
     ComplexityLevel, PricingStatus
 )
 from ...repository.pricing_repo import PricingRepository
+from ...utils.pricing.excel_parser import (
+    materials_from_dataframe, missing_columns, REQUIRED_COLUMNS, OPTIONAL_COLUMNS
+)
+from ...utils.pricing.upload_store import save_parsed_materials, get_parsed_materials
+from ...utils.llm.base_client import LLMClient
+from ...utils.llm.transport import first_message_content
+from ...utils.llm.sse import SSE_HEADERS, sse_event
+from ...utils.cache.response_cache import PRICING_RESULTS, cached_json_response
+from ...utils.metrics.timing import PARSE, timed
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# 批量核价默认并发数（核价接入真实成本模型/LLM后为I/O密集）
+PRICING_CONCURRENCY = int(os.getenv("PRICING_BATCH_CONCURRENCY", "16"))
+
 # 依赖注入
 def get_pricing_repository() -> PricingRepository:
     return PricingRepository()
@@ -43,60 +57,33 @@ async def parse_excel_file(
         # 读取文件内容
         contents = await file.read()
         
-        # 使用pandas解析Excel
+        # 使用pandas解析Excel（仅读取需要的列）
+        wanted = set(REQUIRED_COLUMNS + OPTIONAL_COLUMNS)
         try:
-            df = pd.read_excel(io.BytesIO(contents))
+            with timed(PARSE):
+                df = pd.read_excel(io.BytesIO(contents), usecols=lambda col: col in wanted)
         except Exception as e:
             logger.error(f"Excel解析失败: {e}")
             raise HTTPException(status_code=400, detail=f"Excel文件解析失败: {str(e)}")
         
         # 验证必要的列
-        required_columns = ['物料编码', '物料名称', '规格型号', '数量', '单位', '复杂度']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
+        missing = missing_columns(df)
+        if missing:
             raise HTTPException(
                 status_code=400, 
-                detail=f"Excel文件缺少必要列: {', '.join(missing_columns)}"
+                detail=f"Excel文件缺少必要列: {', '.join(missing)}"
             )
         
-        # 转换为MaterialData对象
-        materials = []
-        error_rows = []
-        
-        for index, row in df.iterrows():
-            try:
-                # 处理工艺要求列（可能不存在）
-                process_requirements = []
-                if '工艺要求' in df.columns:
-                    process_str = str(row.get('工艺要求', ''))
-                    if process_str and process_str != 'nan':
-                        process_requirements = [req.strip() for req in process_str.split(',')]
-                
-                # 验证复杂度等级
-                complexity_str = str(row.get('复杂度', '中等')).strip()
-                if complexity_str not in ['简单', '中等', '复杂']:
-                    complexity_str = '中等'
-                
-                material = MaterialData(
-                    material_code=str(row['物料编码']).strip(),
-                    material_name=str(row['物料名称']).strip(),
-                    specification=str(row['规格型号']).strip(),
-                    quantity=int(row['数量']),
-                    unit=str(row['单位']).strip(),
-                    complexity=ComplexityLevel(complexity_str),
-                    process_requirements=process_requirements
-                )
-                materials.append(material)
-                
-            except Exception as e:
-                logger.warning(f"第{index+1}行数据解析失败: {e}")
-                error_rows.append(index + 1)
+        # 按列批量转换为MaterialData对象
+        with timed(PARSE):
+            materials, error_rows = materials_from_dataframe(df)
         
         return ExcelUploadResponse(
             success=True,
             message=f"成功解析 {len(materials)} 条物料数据",
             data=materials,
-            error_rows=error_rows if error_rows else None
+            error_rows=error_rows if error_rows else None,
+            upload_id=save_parsed_materials(materials) if materials else None
         )
         
     except HTTPException:
@@ -106,6 +93,43 @@ async def parse_excel_file(
         raise HTTPException(status_code=500, detail=f"文件处理失败: {str(e)}")
 
 
+def _resolve_materials(request: BatchPricingRequest) -> List[MaterialData]:
+    """取请求中的物料列表，或按 upload_id 取回 parse-excel 的解析结果；两者都为空时返回空列表（空结果）"""
+    if request.materials or not request.upload_id:
+        return request.materials
+    materials = get_parsed_materials(request.upload_id)
+    if materials is None:
+        raise HTTPException(status_code=404, detail="upload_id 不存在或已过期，请重新上传Excel")
+    return materials
+
+
+async def _price_materials_concurrently(
+    materials: List[MaterialData], concurrency: int
+) -> AsyncIterator[Tuple[int, Optional[PricingResult], float, Optional[str]]]:
+    """
+    并发核价，按完成顺序产出 (序号, 结果, 耗时ms, 错误信息)
+    并发度由信号量限制，避免核价依赖的成本模型/LLM被瞬时打满
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _run(index: int, material: MaterialData):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await calculate_pricing_for_material(material)
+                return index, result, (time.perf_counter() - started) * 1000, None
+            except Exception as e:
+                return index, None, (time.perf_counter() - started) * 1000, str(e)
+
+    tasks = [asyncio.create_task(_run(i, m)) for i, m in enumerate(materials)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
 @router.post("/pricing/batch-calculate", response_model=BatchPricingResponse)
 async def batch_calculate_pricing(
     request: BatchPricingRequest,
@@ -113,14 +137,18 @@ async def batch_calculate_pricing(
 ):
     """批量核价计算"""
     start_time = time.time()
+    materials = _resolve_materials(request)
+    concurrency = request.concurrency or PRICING_CONCURRENCY
     
     try:
-        results = []
+        results: List[Optional[PricingResult]] = [None] * len(materials)
+        latencies: List[float] = [0.0] * len(materials)
         
-        for material in request.materials:
-            # 模拟核价计算逻辑
-            result = await calculate_pricing_for_material(material)
-            results.append(result)
+        async for index, result, latency_ms, error in _price_materials_concurrently(materials, concurrency):
+            if error:
+                raise RuntimeError(f"物料 {materials[index].material_code} 核价失败: {error}")
+            results[index] = result
+            latencies[index] = round(latency_ms, 2)
         
         # 保存核价结果到数据库
         saved_results = await repo.batch_create_pricing_results(results)
@@ -132,7 +160,8 @@ async def batch_calculate_pricing(
             message=f"成功完成 {len(results)} 项核价分析",
             data=saved_results,
             total_count=len(results),
-            processing_time=processing_time
+            processing_time=processing_time,
+            item_latency_ms=latencies
         )
         
     except Exception as e:
@@ -140,6 +169,51 @@ async def batch_calculate_pricing(
         raise HTTPException(status_code=500, detail=f"核价计算失败: {str(e)}")
 
 
+@router.post("/pricing/batch-calculate/stream")
+async def batch_calculate_pricing_stream(
+    request: BatchPricingRequest,
+    repo: PricingRepository = Depends(get_pricing_repository)
+):
+    """
+    批量核价（NDJSON流式返回）：每完成一项即输出一行
+    - {"type": "item", "index", "latency_ms", "result"} 或 {"type": "item", "index", "error"}
+    - 最后一行 {"type": "summary", ...}，包含按序号对齐的入库ID
+    """
+    materials = _resolve_materials(request)
+    concurrency = request.concurrency or PRICING_CONCURRENCY
+
+    async def _lines():
+        start_time = time.time()
+        results: List[Optional[PricingResult]] = [None] * len(materials)
+        failed = 0
+        async for index, result, latency_ms, error in _price_materials_concurrently(materials, concurrency):
+            item: Dict[str, Any] = {"type": "item", "index": index, "latency_ms": round(latency_ms, 2)}
+            if error:
+                failed += 1
+                item["material_code"] = materials[index].material_code
+                item["error"] = error
+            else:
+                results[index] = result
+                item["result"] = result.model_dump(mode="json")
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+        summary: Dict[str, Any] = {"type": "summary", "total_count": len(materials), "failed_count": failed}
+        try:
+            succeeded = [(i, r) for i, r in enumerate(results) if r is not None]
+            saved = await repo.batch_create_pricing_results([r for _, r in succeeded])
+            result_ids: List[Optional[str]] = [None] * len(materials)
+            for (i, _), saved_result in zip(succeeded, saved):
+                result_ids[i] = saved_result.id
+            summary["result_ids"] = result_ids
+        except Exception as e:
+            logger.error(f"流式核价结果保存失败: {e}")
+            summary["save_error"] = str(e)
+        summary["processing_time"] = time.time() - start_time
+        yield json.dumps(summary, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
+
 async def calculate_pricing_for_material(material: MaterialData) -> PricingResult:
     """为单个物料计算核价"""
     try:
@@ -197,12 +271,12 @@ def generate_pricing_recommendation(cost_difference: float, material: MaterialDa
 
 @router.get("/pricing/statistics", response_model=PricingStatistics)
 async def get_pricing_statistics(
+    request: Request,
     repo: PricingRepository = Depends(get_pricing_repository)
 ):
-    """获取核价统计信息"""
+    """获取核价统计信息（按核价结果表版本缓存，支持 ETag/304）"""
     try:
-        statistics = await repo.get_pricing_statistics()
-        return statistics
+        return await cached_json_response(request, (PRICING_RESULTS,), repo.get_pricing_statistics)
     except Exception as e:
         logger.error(f"获取核价统计失败: {e}")
         raise HTTPException(status_code=500, detail=f"获取统计信息失败: {str(e)}")
@@ -225,18 +299,18 @@ async def save_pricing_results(
                 saved_count=0
             )
         
-        # 更新结果状态（如果还未保存）
-        for result in approved_results:
-            await repo.update_pricing_result_status(
-                result.id, 
-                PricingStatus.APPROVED, 
-                "系统保存"
-            )
+        # 更新结果状态（如果还未保存）：单条 $in 批量更新
+        result_ids = [result.id for result in approved_results if result.id]
+        await repo.batch_update_pricing_status(
+            result_ids, 
+            PricingStatus.APPROVED, 
+            "系统保存"
+        )
         
-        # 保存到历史记录
+        # 保存到历史记录：insert_many 一次写入
         batch_id = f"batch_{int(time.time())}"
-        for result in approved_results:
-            history = PricingHistory(
+        histories = [
+            PricingHistory(
                 batch_id=batch_id,
                 material_code=result.material_code,
                 material_name=result.material_name,
@@ -245,7 +319,9 @@ async def save_pricing_results(
                 final_decision="approved" if result.status == PricingStatus.APPROVED else "pending",
                 decision_reason=result.recommendation
             )
-            await repo.save_pricing_history(history)
+            for result in approved_results
+        ]
+        await repo.batch_save_pricing_history(histories)
         
         return PricingSaveResponse(
             success=True,
@@ -347,6 +423,43 @@ async def get_materials(
         raise HTTPException(status_code=500, detail=f"获取物料失败: {str(e)}")
 
 
+@router.put("/pricing/materials/{material_id}")
+async def update_material(
+    material_id: str,
+    material: MaterialData,
+    repo: PricingRepository = Depends(get_pricing_repository)
+):
+    """更新物料（同步更新物料检索索引）"""
+    try:
+        if not await repo.update_material(material_id, material):
+            raise HTTPException(status_code=404, detail="物料不存在")
+        return {"success": True, "message": "更新成功"}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"更新物料失败: {e}")
+        raise HTTPException(status_code=500, detail=f"更新物料失败: {str(e)}")
+
+
+@router.delete("/pricing/materials/{material_id}")
+async def delete_material(
+    material_id: str,
+    repo: PricingRepository = Depends(get_pricing_repository)
+):
+    """删除物料（同步移出物料检索索引）"""
+    try:
+        if not await repo.delete_material(material_id):
+            raise HTTPException(status_code=404, detail="物料不存在")
+        return {"success": True, "message": "删除成功"}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"删除物料失败: {e}")
+        raise HTTPException(status_code=500, detail=f"删除物料失败: {str(e)}")
+
+
 @router.post("/pricing/demo-data")
 async def create_demo_data(
     repo: PricingRepository = Depends(get_pricing_repository)
@@ -423,15 +536,115 @@ async def create_demo_data(
 from ...schemas.pricing import PricingHistory
 
 # === AI对话式查询接口 ===
+# 提示词与兜底文案（流式与非流式共用，两种模式可命中同一条 LLM 响应缓存）
+AI_QUERY_SMALLTALK_SYSTEM = (
+    "你是企业核价助手。用简洁中文回答用户的问候或问题，"
+    "可提示使用方式与示例问法（如：查询纺机主轴价格/帮我核价齿轮），"
+    "不要编造具体数据或表格。"
+)
+AI_QUERY_SMALLTALK_FALLBACK = (
+    "你好，我是核价智能体。你可以这样问我：1) 查询纺机主轴价格；"
+    "2) 帮我核价齿轮；3) 规格Φ50×200mm的物料价格。"
+)
+AI_QUERY_EXPLAIN_SYSTEM = (
+    "你是企业核价助手。根据查询结果生成简洁的中文解释，"
+    "说明找到了什么物料、价格情况等，不要编造数据。"
+)
+
+
+def _ai_query_explain_messages(text: str, row_count: int) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": AI_QUERY_EXPLAIN_SYSTEM},
+        {"role": "user", "content": f"查询：{text}\n结果：找到{row_count}条物料记录"},
+        {"role": "assistant", "content": "请生成简洁的解释说明"}
+    ]
+
+
+def _ai_query_fallback(row_count: int) -> str:
+    if row_count:
+        return f"找到 {row_count} 条相关物料记录，包括价格和规格信息。"
+    return "未找到相关物料数据，请尝试其他关键词或检查物料名称。"
+
+
+def _material_rows(ranked: List[Tuple[MaterialData, float]]) -> List[Dict[str, Any]]:
+    """检索结果转换为表格行"""
+    rows = []
+    for material, score in ranked:
+        rows.append({
+            "id": material.id,
+            "material_code": material.material_code,
+            "material_name": material.material_name,
+            "specification": material.specification,
+            "quantity": material.quantity,
+            "unit": material.unit,
+            "complexity": material.complexity.value if hasattr(material.complexity, 'value') else str(material.complexity),
+            "process_requirements": ", ".join(material.process_requirements) if material.process_requirements else "",
+            "estimated_price": getattr(material, 'estimated_price', 0),
+            "status": "已核价" if getattr(material, 'estimated_price', 0) > 0 else "待核价",
+            "score": score
+        })
+    return rows
+
+
+async def _ai_query_events(
+    text: str,
+    parsed: Dict[str, Any],
+    smalltalk: bool,
+    repo: PricingRepository,
+    llm: Optional[LLMClient],
+) -> AsyncIterator[str]:
+    """流式模式：先推送规则解析结果与检索结果，再逐段推送 LLM 说明"""
+    start = time.perf_counter()
+    yield sse_event("parsed", {"query": text, "parsed": parsed})
+
+    rows: List[Dict[str, Any]] = []
+    llm_params: Dict[str, Any] = {}
+    if smalltalk:
+        messages = [{"role": "system", "content": AI_QUERY_SMALLTALK_SYSTEM}, {"role": "user", "content": text}]
+        fallback = AI_QUERY_SMALLTALK_FALLBACK
+        llm_params.update(max_tokens=200, temperature=0.7, semantic=True)
+    else:
+        try:
+            ranked = await repo.search_materials_ranked(limit=20, **parsed)
+        except Exception as e:
+            logger.error(f"AI查询失败: {e}")
+            yield sse_event("error", {"detail": str(e)})
+            return
+        rows = _material_rows(ranked)
+        yield sse_event("rows", {"rows": rows, "total": len(rows)})
+        messages = _ai_query_explain_messages(text, len(rows))
+        fallback = _ai_query_fallback(len(rows))
+        llm_params.update(max_tokens=150, temperature=0.5)
+
+    explanation = ""
+    if llm is not None:
+        try:
+            async for delta in llm.astream(messages, timeout=10, **llm_params):
+                explanation += delta
+                yield sse_event("delta", {"text": delta})
+        except Exception as _e:
+            logger.warning(f"LLM流式说明失败: {_e}")
+    if not explanation:
+        explanation = fallback
+        yield sse_event("delta", {"text": explanation})
+    yield sse_event("done", {
+        "explanation": explanation,
+        "total": len(rows),
+        "elapsed_ms": int((time.perf_counter() - start) * 1000),
+    })
+
+
 @router.post("/ai-query")
 async def ai_query(
     payload: Dict[str, Any],
+    stream: bool = False,
     repo: PricingRepository = Depends(get_pricing_repository)
 ):
     """
     对话式文本查询核价：
     - 输入自然语言，如："查询纺机主轴的价格"、"帮我核价齿轮"
     - 输出检索命中的物料表格数据
+    - stream=true：SSE 流式返回，事件依次为 parsed、rows、delta（说明文本增量）、done
     """
     try:
         text = str(payload.get("query", "")).strip()
@@ -453,10 +666,19 @@ async def ai_query(
         if m:
             material_name = m.group(1) or m.group(2)
 
-        # 提取"规格/型号"关键词
-        m = re.findall(r"(规格\S+|型号\S+|Φ\S+|模数\S+)", text)
+        # 提取"规格/型号"关键词（去掉"规格/型号"前缀，只保留规格本身供检索）
+        m = re.findall(r"(?:规格|型号)([^\s的，,]+)|([Φφ][^\s的，,]+|模数[^\s的，,]+)", text)
         if m:
-            specification = " ".join(m)
+            specification = " ".join(a or b for a, b in m)
+
+        stop = ["查询", "价格", "核价", "的", "一下", "下", "请", "帮我", "物料"]
+
+        # 物料名称作为必须满足的检索条件：去掉停用词，且不与规格重复
+        if material_name:
+            for s in stop:
+                material_name = material_name.replace(s, "")
+            if not material_name or (specification and material_name in specification):
+                material_name = None
 
         # 提取通用关键词
         m = re.findall(r"(主轴|齿轮|轴承|螺栓|螺母|垫圈)", text)
@@ -464,7 +686,6 @@ async def ai_query(
             keyword = " ".join(m)
         else:
             # 回退：去除停用词后的剩余词作为keyword
-            stop = ["查询", "价格", "核价", "的", "一下", "下", "请", "帮我", "物料"]
             tmp = text
             for s in stop:
                 tmp = tmp.replace(s, "")
@@ -489,45 +710,36 @@ async def ai_query(
         openai_api_key = os.getenv("OPENAI_API_KEY")
         openai_base_url = os.getenv("OPENAI_BASE_URL")
         openai_model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+        llm = LLMClient.openai_compatible(openai_base_url, openai_api_key, openai_model) if openai_api_key and openai_base_url else None
+
+        if stream:
+            parsed = {"material_name": material_name, "specification": specification, "keyword": keyword}
+            return StreamingResponse(
+                _ai_query_events(text, parsed, _is_smalltalk(text), repo, llm if use_llm else None),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS
+            )
 
         if _is_smalltalk(text):
             explanation = None
             if use_llm and openai_api_key and openai_base_url:
                 try:
-                    import requests
-                    conv_system = (
-                        "你是企业核价助手。用简洁中文回答用户的问候或问题，"
-                        "可提示使用方式与示例问法（如：查询纺机主轴价格/帮我核价齿轮），"
-                        "不要编造具体数据或表格。"
-                    )
-                    resp_chat = requests.post(
-                        f"{openai_base_url}/chat/completions",
-                        headers={"Authorization": f"Bearer {openai_api_key}", "Content-Type": "application/json"},
-                        json={
-                            "model": openai_model,
-                            "messages": [
-                                {"role": "system", "content": conv_system},
-                                {"role": "user", "content": text}
-                            ],
-                            "max_tokens": 200,
-                            "temperature": 0.7
-                        },
+                    data_chat = await llm.acomplete(
+                        [
+                            {"role": "system", "content": AI_QUERY_SMALLTALK_SYSTEM},
+                            {"role": "user", "content": text}
+                        ],
+                        max_tokens=200,
+                        temperature=0.7,
+                        semantic=True,
                         timeout=10
                     )
-                    data_chat = resp_chat.json()
-                    explanation = (
-                        data_chat.get("choices", [{}])[0]
-                        .get("message", {})
-                        .get("content")
-                    )
+                    explanation = first_message_content(data_chat)
                 except Exception as _e:
                     logger.warning(f"LLM聊天回答失败: {_e}")
             # 无LLM或失败，给默认说明
             if not explanation:
-                explanation = (
-                    "你好，我是核价智能体。你可以这样问我：1) 查询纺机主轴价格；"
-                    "2) 帮我核价齿轮；3) 规格Φ50×200mm的物料价格。"
-                )
+                explanation = AI_QUERY_SMALLTALK_FALLBACK
             return {
                 "success": True,
                 "query": text,
@@ -539,8 +751,8 @@ async def ai_query(
                 "data": {"rows": [], "total": 0, "explanation": explanation}
             }
 
-        # 执行查询
-        materials = await repo.search_materials(
+        # 执行查询（物料检索索引，按相关度排序）
+        ranked = await repo.search_materials_ranked(
             material_name=material_name,
             specification=specification,
             keyword=keyword,
@@ -548,60 +760,25 @@ async def ai_query(
         )
 
         # 转换为表格格式
-        rows = []
-        for material in materials:
-            rows.append({
-                "id": material.id,
-                "material_code": material.material_code,
-                "material_name": material.material_name,
-                "specification": material.specification,
-                "quantity": material.quantity,
-                "unit": material.unit,
-                "complexity": material.complexity.value if hasattr(material.complexity, 'value') else str(material.complexity),
-                "process_requirements": ", ".join(material.process_requirements) if material.process_requirements else "",
-                "estimated_price": getattr(material, 'estimated_price', 0),
-                "status": "已核价" if getattr(material, 'estimated_price', 0) > 0 else "待核价"
-            })
+        rows = _material_rows(ranked)
 
         # 生成解释说明
         explanation = None
         if use_llm and openai_api_key and openai_base_url:
             try:
-                import requests
-                query_system = (
-                    "你是企业核价助手。根据查询结果生成简洁的中文解释，"
-                    "说明找到了什么物料、价格情况等，不要编造数据。"
-                )
-                resp_query = requests.post(
-                    f"{openai_base_url}/chat/completions",
-                    headers={"Authorization": f"Bearer {openai_api_key}", "Content-Type": "application/json"},
-                    json={
-                        "model": openai_model,
-                        "messages": [
-                            {"role": "system", "content": query_system},
-                            {"role": "user", "content": f"查询：{text}\n结果：找到{len(rows)}条物料记录"},
-                            {"role": "assistant", "content": "请生成简洁的解释说明"}
-                        ],
-                        "max_tokens": 150,
-                        "temperature": 0.5
-                    },
+                data_query = await llm.acomplete(
+                    _ai_query_explain_messages(text, len(rows)),
+                    max_tokens=150,
+                    temperature=0.5,
                     timeout=10
                 )
-                data_query = resp_query.json()
-                explanation = (
-                    data_query.get("choices", [{}])[0]
-                    .get("message", {})
-                    .get("content")
-                )
+                explanation = first_message_content(data_query)
             except Exception as _e:
                 logger.warning(f"LLM查询解释失败: {_e}")
 
         # 如果没有LLM解释，提供默认说明
         if not explanation:
-            if rows:
-                explanation = f"找到 {len(rows)} 条相关物料记录，包括价格和规格信息。"
-            else:
-                explanation = "未找到相关物料数据，请尝试其他关键词或检查物料名称。"
+            explanation = _ai_query_fallback(len(rows))
 
         return {
             "success": True,
@@ -1,4 +1,5 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
 from typing import Any, Dict, List
 from ...repository.process_repo import list_alerts, insert_alert
 from ...repository.rule_repo import list_rules, create_rule, update_rule, delete_rule
@@ -8,6 +9,7 @@ from ...utils.rules.drools_engine import drools_engine
 from ...utils.rules.ai_rule_learning import ai_rule_learner
 from ...utils.rules.alert_classifier import alert_classifier
 from ...utils.rules.rule_analytics import rule_analytics
+from ...utils.cache.response_cache import PROCESS_RULES, cached_json_response
 import time
 import logging
 
@@ -34,8 +36,8 @@ async def create_alert(alert: ProcessAlert) -> Dict[str, Any]:
 
 
 @router.get("/rules")
-async def get_rules() -> Dict[str, Any]:
-    return {"items": list_rules()}
+async def get_rules(request: Request):
+    return await cached_json_response(request, (PROCESS_RULES,), lambda: {"items": list_rules()})
 
 
 @router.post("/rules")
@@ -222,7 +224,8 @@ async def analyze_rule_performance(rule_id: str, days: int = 30) -> Dict[str, An
 async def learn_from_feedback(rule_id: str, feedback_data: List[Dict[str, Any]]) -> Dict[str, Any]:
     """从反馈中学习规则优化"""
     try:
-        result = ai_rule_learner.learn_from_feedback(rule_id, feedback_data)
+        # 内部同步调用 LLM，放到线程池执行，避免阻塞事件循环
+        result = await run_in_threadpool(ai_rule_learner.learn_from_feedback, rule_id, feedback_data)
         return result
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -270,25 +273,25 @@ async def get_alert_statistics(days: int = 7) -> Dict[str, Any]:
 
 
 @router.get("/alerts/levels")
-async def get_alert_levels() -> Dict[str, Any]:
-    """获取告警级别定义"""
+async def get_alert_levels(request: Request):
+    """获取告警级别定义（静态数据，缓存并支持 ETag/304）"""
     from ...utils.rules.alert_classifier import AlertLevel, AlertCategory
-    
-    return {
+
+    return await cached_json_response(request, (), lambda: {
         "levels": [{"value": level.value, "name": level.name} for level in AlertLevel],
         "categories": [{"value": cat.value, "name": cat.name} for cat in AlertCategory]
-    }
+    })
 
 
 @router.get("/alerts/escalation-policies")
-async def get_escalation_policies() -> Dict[str, Any]:
-    """获取升级策略"""
+async def get_escalation_policies(request: Request):
+    """获取升级策略（进程内配置，缓存并支持 ETag/304）"""
     try:
-        return {
+        return await cached_json_response(request, (), lambda: {
             "success": True,
             "policies": alert_classifier.escalation_policies,
             "notification_channels": alert_classifier.notification_channels
-        }
+        })
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -1,12 +1,14 @@
 # backend/app/api/v1/work_reports.py
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, status
-from typing import Optional, List, Dict, Any
-from datetime import date, datetime, timedelta
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional, List, Dict, Any, AsyncIterator
+from datetime import date, datetime
+from fastapi.responses import StreamingResponse
 import logging
-import pandas as pd
-import io
-import re
+import time
 import os
+import shutil
+import tempfile
 
 from ...schemas.work_report import (
     WorkReportResponse, 
@@ -18,11 +20,45 @@ from ...schemas.work_report import (
     DepartmentCreate
 )
 from ...repository.work_report_repo import WorkReportRepository
+from ...repository.work_report_import import import_excel_file
+from ...models.train import train_jobs
+from ...utils.parsers.excel_stream import excel_total_rows
 from ...db.mongo import get_db
+from ...utils.llm.base_client import LLMClient
+from ...utils.llm.transport import first_message_content
+from ...utils.llm.sse import SSE_HEADERS, sse_event
+from ...utils.nlp.work_report_query_parser import parse_work_report_query
+from ...utils.fast_json import FastJSONResponse
+from ...utils.cache.response_cache import WORK_REPORTS, cached_json_response
 
 router = APIRouter(prefix="/work-reports", tags=["报工管理"])
 logger = logging.getLogger(__name__)
 
+# 对话式查询的提示词与兜底文案（流式与非流式共用，两种模式可命中同一条 LLM 响应缓存）
+AI_QUERY_SMALLTALK_SYSTEM = (
+    "你是企业报工助手。用简洁中文回答用户的问候或问题，"
+    "可提示使用方式与示例问法（如：查询王五9月报工/AI智能助手项目上周记录），"
+    "不要编造具体数据或表格。"
+)
+AI_QUERY_SMALLTALK_FALLBACK = (
+    "你好，我是报工智能体。你可以这样问我：1) 查询王五9月报工；"
+    "2) AI智能助手项目上周通过的记录；3) 研发部本月报工汇总。"
+)
+AI_QUERY_NO_DATA_SYSTEM = (
+    "你现在扮演企业报工助手。如果没有检索到符合条件的报工数据，"
+    "请根据用户的问题给出友好的说明、可尝试的查询建议（如补充员工/项目/时间），"
+    "并提供1-2条可能有帮助的示例问法。不要捏造数据表格。"
+)
+AI_QUERY_NO_DATA_FALLBACK = (
+    "未检索到相关报工记录。建议：1) 指定员工姓名（如：查询王五9月报工）；"
+    "2) 指定项目名称（如：AI智能助手项目上周记录）；3) 指定时间范围（如：2025-09、上周、本月）。"
+)
+AI_QUERY_SUMMARY_SYSTEM = (
+    "你是企业报工助手，请用简洁中文确认你对用户问题的理解，"
+    "如果可能，点明你将依据的筛选条件（员工/项目/时间/状态），"
+    "并提示‘下方表格为匹配结果’。不要编造数据。"
+)
+
 @router.get("/search")
 async def search_work_reports(
     keyword: Optional[str] = Query(None, description="搜索关键字"),
@@ -50,23 +86,25 @@ async def search_work_reports(
             page=page,
             size=size
         )
-        return {
+        # 直接返回响应对象，跳过 jsonable_encoder 的逐字段递归
+        return FastJSONResponse({
             "success": True,
             "data": result
-        }
+        })
     except Exception as e:
-        logger.error(f"搜索报工记录失败: {e}")
+        logger.error("搜索报工记录失败: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/import")
 async def import_excel_data(
     data: List[Dict[str, Any]],
+    mode: str = Query("skip", pattern="^(skip|update)$", description="重复行处理：skip 跳过，update 更新"),
     db = Depends(get_db)
 ):
     """导入Excel数据"""
     try:
         repo = WorkReportRepository(db)
-        count = await repo.import_excel_data(data)
+        count = await repo.import_excel_data(data, mode=mode)
         return {
             "success": True,
             "message": f"成功导入 {count} 条记录",
@@ -76,45 +114,98 @@ async def import_excel_data(
         logger.error(f"导入Excel数据失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _spool_upload(src, suffix: str) -> str:
+    """上传内容分段落盘，不在内存中保留整个文件"""
+    fd, path = tempfile.mkstemp(prefix="work-report-import-", suffix=suffix)
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(src, out, 1024 * 1024)
+    return path
+
+
+def _import_summary(result: Dict[str, Any]) -> str:
+    message = f"成功导入 {result['inserted']} 条记录"
+    if result["updated"]:
+        message += f"，更新 {result['updated']} 条"
+    if result["skipped"]:
+        message += f"，{result['skipped']} 条已存在未重复导入"
+    if result["failed"]:
+        message += f"，{result['failed']} 行未通过校验"
+    return message
+
+
+async def _run_import_job(job_id: str, path: str, mode: str) -> None:
+    """后台分块导入，每块提交后刷新任务进度"""
+    train_jobs.update_job(job_id, status=train_jobs.RUNNING)
+    try:
+        total_rows = await run_in_threadpool(excel_total_rows, path)
+
+        def _progress(stats: Dict[str, Any]) -> None:
+            percent = min(100.0, round(stats["rows"] * 100.0 / total_rows, 1)) if total_rows else None
+            train_jobs.update_job(job_id, progress=dict(stats, total_rows=total_rows, percent=percent))
+
+        result = await run_in_threadpool(import_excel_file, path, _progress, mode)
+        progress = {
+            key: result[key] for key in ("rows", "inserted", "updated", "skipped", "failed", "chunks", "error_count")
+        }
+        train_jobs.update_job(
+            job_id,
+            status=train_jobs.COMPLETED,
+            progress=dict(progress, total_rows=total_rows, percent=100.0),
+            result=dict(result, message=_import_summary(result))
+        )
+    except Exception as e:
+        logger.error(f"报工导入任务失败: {e}")
+        train_jobs.update_job(job_id, status=train_jobs.FAILED, error=f"导入失败: {str(e)}")
+    finally:
+        os.remove(path)
+
+
 @router.post("/upload-excel")
 async def upload_excel_file(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    db = Depends(get_db)
+    background: bool = False,
+    mode: str = Query("skip", pattern="^(skip|update)$", description="重复行处理：skip 跳过，update 更新")
 ):
-    """上传Excel文件并解析导入"""
+    """
+    上传Excel文件并分块导入
+    - 流式读取、每块向量化校验并在一个事务内批量写入，内存占用与文件行数无关
+    - 默认同步返回导入统计与行级错误报告（errors：行号/列/值/原因）
+    - background=true：立即返回 job_id，通过 GET /work-reports/import-jobs/{job_id} 轮询进度与结果
+    - 按 (员工, 项目, 日期, 工时, 内容) 自然键去重，重复上传同一文件不会重复入库；
+      mode=skip 跳过已存在的行，mode=update 更新其部门/地点/状态
+    """
     try:
         # 检查文件类型
         if not file.filename.endswith(('.xlsx', '.xls')):
             raise HTTPException(status_code=400, detail="只支持Excel文件格式")
         
-        # 读取文件内容
-        content = await file.read()
-        
-        # 使用pandas读取Excel
+        path = await run_in_threadpool(_spool_upload, file.file, os.path.splitext(file.filename)[1].lower())
+
+        if background:
+            job = train_jobs.create_job("work-report-import", {"filename": file.filename, "mode": mode})
+            background_tasks.add_task(_run_import_job, job["job_id"], path, mode)
+            return {
+                "success": True,
+                "job_id": job["job_id"],
+                "status": job["status"],
+                "status_url": f"/api/work-reports/import-jobs/{job['job_id']}",
+                "filename": file.filename
+            }
+
         try:
-            df = pd.read_excel(io.BytesIO(content))
+            result = await run_in_threadpool(import_excel_file, path, None, mode)
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Excel文件解析失败: {str(e)}")
-        
-        # 转换为字典列表
-        data = df.to_dict('records')
-        
-        # 清理空值
-        cleaned_data = []
-        for item in data:
-            cleaned_item = {k: v for k, v in item.items() if pd.notna(v)}
-            if cleaned_item:  # 只添加非空记录
-                cleaned_data.append(cleaned_item)
-        
-        # 导入数据
-        repo = WorkReportRepository(db)
-        count = await repo.import_excel_data(cleaned_data)
+        finally:
+            os.remove(path)
         
         return {
             "success": True,
-            "message": f"成功导入 {count} 条记录",
-            "count": count,
-            "filename": file.filename
+            "message": _import_summary(result),
+            "count": result["inserted"],
+            "filename": file.filename,
+            **result
         }
         
     except HTTPException:
@@ -123,16 +214,27 @@ async def upload_excel_file(
         logger.error(f"上传Excel文件失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/import-jobs/{job_id}")
+async def get_import_job(job_id: str):
+    """查询Excel导入任务：progress 为已处理行数/入库行数/错误数，完成后 result 含完整错误报告"""
+    job = train_jobs.get_job(job_id)
+    if job is None or job.get("kind") != "work-report-import":
+        raise HTTPException(status_code=404, detail="导入任务不存在或已过期")
+    return job
+
 @router.get("/statistics")
-async def get_statistics(db = Depends(get_db)):
-    """获取报工统计信息"""
+async def get_statistics(request: Request, db = Depends(get_db)):
+    """获取报工统计信息（按报工表版本缓存，支持 ETag/304）"""
     try:
         repo = WorkReportRepository(db)
-        stats = await repo.get_work_report_statistics()
-        return {
-            "success": True,
-            "data": stats
-        }
+
+        async def _build():
+            return {
+                "success": True,
+                "data": await repo.get_work_report_statistics()
+            }
+
+        return await cached_json_response(request, (WORK_REPORTS,), _build)
     except Exception as e:
         logger.error(f"获取统计信息失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -154,10 +256,10 @@ async def export_data(
             page=1,
             size=10000  # 导出所有数据
         )
-        return {
+        return FastJSONResponse({
             "success": True,
             "data": result["data"]
-        }
+        })
     except Exception as e:
         logger.error(f"导出数据失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -317,172 +419,103 @@ async def create_department(
         raise HTTPException(status_code=500, detail=str(e))
 
 # === AI对话式查询接口 ===
+def _parsed_text(parsed: Dict[str, Any]) -> str:
+    return (
+        f"员工={parsed.get('employee_name') or '未指定'}，项目={parsed.get('project_name') or '未指定'}，"
+        + (f"部门={parsed['department_name']}，" if parsed.get("department_name") else "")
+        + f"时间={parsed.get('start_date') or '未指定'}~{parsed.get('end_date') or '未指定'}。"
+    )
+
+
+async def _ai_query_events(
+    text: str,
+    parsed: Dict[str, Any],
+    smalltalk: bool,
+    repo: WorkReportRepository,
+    search_kwargs: Dict[str, Any],
+    llm: Optional[LLMClient],
+) -> AsyncIterator[str]:
+    """流式模式：先推送规则解析结果与检索结果，再逐段推送 LLM 说明（省去 function call 往返）"""
+    start = time.perf_counter()
+    yield sse_event("parsed", {"query": text, "parsed": parsed})
+
+    rows: List[Dict[str, Any]] = []
+    total = 0
+    llm_params: Dict[str, Any] = {}
+    if smalltalk:
+        messages = [{"role": "system", "content": AI_QUERY_SMALLTALK_SYSTEM}, {"role": "user", "content": text}]
+        fallback = AI_QUERY_SMALLTALK_FALLBACK
+        llm_params["semantic"] = True
+    else:
+        try:
+            result = await repo.search_work_reports(**search_kwargs)
+        except Exception as e:
+            logger.error("AI查询失败: %s", e)
+            yield sse_event("error", {"detail": str(e)})
+            return
+        rows = result.get("data", [])
+        total = result.get("total", len(rows))
+        yield sse_event("rows", {"rows": rows, "total": total})
+        if rows:
+            messages = [
+                {"role": "system", "content": AI_QUERY_SUMMARY_SYSTEM},
+                {"role": "user", "content": f"原始问题：{text}\n已解析：{_parsed_text(parsed)}"},
+            ]
+            fallback = f"已为你筛选：{_parsed_text(parsed)}共{total}条结果。"
+        else:
+            messages = [{"role": "system", "content": AI_QUERY_NO_DATA_SYSTEM}, {"role": "user", "content": text}]
+            fallback = AI_QUERY_NO_DATA_FALLBACK
+
+    explanation = ""
+    if llm is not None:
+        try:
+            async for delta in llm.astream(messages, timeout=30, **llm_params):
+                explanation += delta
+                yield sse_event("delta", {"text": delta})
+        except Exception as _e:
+            logger.warning("LLM流式说明失败: %s", _e)
+    if not explanation:
+        explanation = fallback
+        yield sse_event("delta", {"text": explanation})
+    yield sse_event("done", {
+        "explanation": explanation,
+        "total": total,
+        "elapsed_ms": int((time.perf_counter() - start) * 1000),
+    })
+
+
 @router.post("/ai-query")
 async def ai_query(
-    payload: Dict[str, Any]
+    payload: Dict[str, Any],
+    stream: bool = False
 ):
     """
     对话式文本查询报工：
     - 输入自然语言，如："查询AI智能助手项目的报工情况"、"查询王五9月的报工"
     - 输出检索命中的报工表格数据
+    - stream=true：SSE 流式返回，事件依次为 parsed、rows、delta（说明文本增量）、done
     """
     try:
         text = str(payload.get("query", "")).strip()
         if not text:
             raise HTTPException(status_code=400, detail="query不能为空")
 
-        # 规则式轻量解析：提取可能的员工名/项目名/日期范围
-        employee_name = None
-        project_name = None
-        keyword = None
-        start_date = None
-        end_date = None
-
-        # 添加详细调试日志
-        print("=" * 50)
-        print(f"🔍 AI查询请求开始")
-        print(f"📝 原始查询文本: '{text}'")
-        print(f"📦 请求参数: {payload}")
-        logger.info("=" * 50)
-        logger.info(f"🔍 AI查询请求开始")
-        logger.info(f"📝 原始查询文本: '{text}'")
-        logger.info(f"📦 请求参数: {payload}")
-
-        # 提取项目名称 - 改进的匹配逻辑
-        # 1. 先尝试匹配 "XXX项目" 格式（优先匹配字母项目名）
-        m = re.search(r"([A-Za-z]{2,})项目", text)
-        if m:
-            project_name = m.group(1)
-        else:
-            # 2. 再尝试匹配中文项目名
-            m = re.search(r"([\u4e00-\u9fa5]{2,})项目", text)
-            if m:
-                project_name = m.group(1)
-            else:
-                # 3. 最后尝试匹配 "项目XXX" 格式
-                m = re.search(r"项目([\u4e00-\u9fa5A-Za-z0-9_\-]+)", text)
-                if m:
-                    project_name = m.group(1)
-
-        # 提取"查询XXX的报工/XXX报工" => 认为是员工姓名
-        print("🔍 开始解析员工姓名...")
-        logger.info("🔍 开始解析员工姓名...")
-        # 修复正则表达式：允许"查询"和"报工"之间有空格和"的"字
-        m = re.search(r"查询\s*([\u4e00-\u9fa5A-Za-z]{1,6})\s*的?\s*报工", text)
-        if m:
-            employee_name = m.group(1)
-            print(f"  ✅ 正则匹配成功: '{employee_name}'")
-            logger.info(f"  ✅ 正则匹配成功: '{employee_name}'")
-            # 去除可能的"的"字
-            if employee_name.endswith('的'):
-                employee_name = employee_name[:-1]
-                print(f"  🔧 去除'的'字后: '{employee_name}'")
-                logger.info(f"  🔧 去除'的'字后: '{employee_name}'")
-        else:
-            print("  ❌ 正则匹配失败，未找到员工名")
-            logger.info("  ❌ 正则匹配失败，未找到员工名")
-            # 尝试其他模式
-            print("  🔍 尝试其他匹配模式...")
-            logger.info("  🔍 尝试其他匹配模式...")
-            # 可以添加更多匹配模式
-
-        # 提取"订单/物料/工序"关键词，作为通用keyword
-        m = re.findall(r"(订单\S+|物料\S+|工序\S+)", text)
-        if m:
-            keyword = " ".join(m)
-        else:
-            # 回退：去除停用词后的剩余词作为keyword
-            stop = ["查询", "报工", "情况", "的", "一下", "下", "请", "帮我", "项目"]
-            tmp = text
-            for s in stop:
-                tmp = tmp.replace(s, "")
-            # 也要排除已识别的员工名和项目名（避免keyword和employee_name/project_name重复）
-            if employee_name:
-                tmp = tmp.replace(employee_name, "")
-            if project_name:
-                tmp = tmp.replace(project_name, "")
-            tmp = tmp.strip()
-            if tmp:
-                keyword = tmp
-
-        # 中文时间短语解析（简化版）：上周/本周/上月/本月/今年/9月/2025-09
-        def _first_day_of_this_month(today: date) -> date:
-            return today.replace(day=1)
-
-        def _first_day_of_last_month(today: date) -> date:
-            first_this = _first_day_of_this_month(today)
-            return (first_this - timedelta(days=1)).replace(day=1)
-
-        def _last_day_of_month(some_day: date) -> date:
-            next_month = (some_day.replace(day=28) + timedelta(days=4)).replace(day=1)
-            return next_month - timedelta(days=1)
-
-        today = date.today()
-        lowered = text
-        # 上周
-        if re.search(r"上周", lowered):
-            weekday = today.weekday()  # 0=Mon
-            last_sunday = today - timedelta(days=weekday + 1)
-            last_monday = last_sunday - timedelta(days=6)
-            start_date = last_monday
-            end_date = last_sunday
-        # 本周
-        elif re.search(r"本周|这周", lowered):
-            weekday = today.weekday()
-            start_date = today - timedelta(days=weekday)
-            end_date = start_date + timedelta(days=6)
-        # 上月
-        elif re.search(r"上月|上个月", lowered):
-            first_last = _first_day_of_last_month(today)
-            start_date = first_last
-            end_date = _last_day_of_month(first_last)
-        # 本月
-        elif re.search(r"本月|这个月", lowered):
-            first_this = _first_day_of_this_month(today)
-            start_date = first_this
-            end_date = _last_day_of_month(first_this)
-        # 今年
-        elif re.search(r"今年", lowered):
-            start_date = date(today.year, 1, 1)
-            end_date = date(today.year, 12, 31)
-        else:
-            # 形如 “2025-09” 或 “9月/09月”
-            m = re.search(r"(20\d{2})-(0?[1-9]|1[0-2])", lowered)
-            if m:
-                y = int(m.group(1)); mth = int(m.group(2))
-                start_date = date(y, mth, 1)
-                end_date = _last_day_of_month(start_date)
-            else:
-                m = re.search(r"(\d{1,2})月", lowered)
-                if m:
-                    mth = int(m.group(1))
-                    y = today.year
-                    start_date = date(y, mth, 1)
-                    end_date = _last_day_of_month(start_date)
-
-        # 默认近90天
-        if not start_date and not end_date:
-            end_date = today
-            start_date = today - timedelta(days=90)
-        
-        # 打印解析结果
-        logger.info("📊 解析结果:")
-        logger.info(f"  👤 员工名: '{employee_name}'")
-        logger.info(f"  🏢 项目名: '{project_name}'")
-        logger.info(f"  🔍 关键词: '{keyword}'")
-        logger.info(f"  📅 开始日期: '{start_date}'")
-        logger.info(f"  📅 结束日期: '{end_date}'")
+        # 规则式轻量解析：提取可能的员工名/项目名/部门名/日期范围（预编译正则 + 名称词典，结果带缓存）
+        query = parse_work_report_query(text)
+        employee_name = query.employee_name
+        project_name = query.project_name
+        department_name = query.department_name
+        keyword = query.keyword
+        start_date = query.start_date
+        end_date = query.end_date
+        logger.info("AI查询: %r", text, extra={"parsed": query.to_dict()})
 
         # 若用户开启LLM并配置了密钥，则优先走LLM function call
         use_llm = os.getenv("USE_LLM_WORKREPORT", "true").lower() == "true"
         openai_api_key = os.getenv("OPENAI_API_KEY", 'sk-c3ddf7d415bb492587f725ec3845a4ce')
         openai_base_url = os.getenv("OPENAI_BASE_URL", 'https://dashscope.aliyuncs.com/compatible-mode/v1')
         openai_model = os.getenv("WORKREPORT_LLM_MODEL", "qwen-max-latest")
-
-        print(f"use_llm: {use_llm}")
-        print(f"openai_api_key: {openai_api_key}")
-        print(f"openai_base_url: {openai_base_url}")
-        print(f"openai_model: {openai_model}")
+        llm = LLMClient.openai_compatible(openai_base_url, openai_api_key, openai_model) if openai_api_key and openai_base_url else None
 
         rows: List[Dict[str, Any]] = []
         explanation = None
@@ -492,68 +525,48 @@ async def ai_query(
         db = get_sqlite_db()
         repo = WorkReportRepository(db)
 
-        # 执行数据库查询
-        logger.info("🗄️ 开始数据库查询:")
-        logger.info(f"  📊 查询参数: employee_name='{employee_name}', project_name='{project_name}'")
-        logger.info(f"  📅 时间范围: {start_date} ~ {end_date}")
-        logger.info(f"  🗃️ 数据库类型: {type(db)}")
-        logger.info(f"  🔗 数据库实例: {db}")
-        
-        # === 先判断是否更像"闲聊/说明"而非"数据库查询" ===
-        # 规则：未识别到实体/时间/状态，且命中常见闲聊词或句长较短
-        def _is_smalltalk(q: str) -> bool:
-            smalltalk_patterns = [
-                r"^你好$", r"^在吗$", r"^嗨$", r"^hello$", r"^hi$",
-                r"帮助", r"说明", r"怎么用", r"示例", r"功能",
-            ]
-            if any(re.search(p, q.strip(), re.IGNORECASE) for p in smalltalk_patterns):
-                return True
-            # 无实体且字数很短也视为聊天
-            no_entity = not any([employee_name, project_name]) and not any([start_date, end_date, status])
-            return no_entity and len(q.strip()) <= 12
+        if stream:
+            search_kwargs = dict(
+                keyword=keyword,
+                employee_name=employee_name,
+                project_name=project_name,
+                department_name=department_name,
+                start_date=start_date,
+                end_date=end_date,
+                page=int(payload.get("page", 1)),
+                size=int(payload.get("size", 20))
+            )
+            return StreamingResponse(
+                _ai_query_events(text, query.to_dict(), query.smalltalk, repo, search_kwargs, llm),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS
+            )
 
-        if _is_smalltalk(text):
+        if query.smalltalk:
             explanation = None
             if openai_api_key and openai_base_url:
                 try:
-                    import requests
-                    conv_system = (
-                        "你是企业报工助手。用简洁中文回答用户的问候或问题，"
-                        "可提示使用方式与示例问法（如：查询王五9月报工/AI智能助手项目上周记录），"
-                        "不要编造具体数据或表格。"
-                    )
-                    resp_chat = requests.post(
-                        f"{openai_base_url}/chat/completions",
-                        headers={"Authorization": f"Bearer {openai_api_key}", "Content-Type": "application/json"},
-                        json={
-                            "model": openai_model,
-                            "messages": [
-                                {"role": "system", "content": conv_system},
-                                {"role": "user", "content": text}
-                            ]
-                        }, timeout=30
-                    )
-                    resp_chat.raise_for_status()
-                    data_chat = resp_chat.json()
-                    explanation = (
-                        data_chat.get("choices", [{}])[0]
-                        .get("message", {})
-                        .get("content")
+                    data_chat = await llm.acomplete(
+                        [
+                            {"role": "system", "content": AI_QUERY_SMALLTALK_SYSTEM},
+                            {"role": "user", "content": text}
+                        ],
+                        semantic=True,
+                        timeout=30
                     )
+                    explanation = first_message_content(data_chat)
                 except Exception as _e:
-                    logger.warning(f"LLM聊天回答失败: {_e}")
+                    logger.warning("LLM聊天回答失败: %s", _e)
             # 无LLM或失败，给默认说明
             if not explanation:
-                explanation = (
-                    "你好，我是报工智能体。你可以这样问我：1) 查询王五9月报工；"
-                    "2) AI智能助手项目上周通过的记录；3) 研发部本月报工汇总。"
-                )
+                explanation = AI_QUERY_SMALLTALK_FALLBACK
             return {
                 "success": True,
                 "query": text,
                 "parsed": {
                     "employee_name": None,
                     "project_name": None,
+                    "department_name": None,
                     "keyword": None,
                     "start_date": None,
                     "end_date": None
@@ -564,7 +577,6 @@ async def ai_query(
         if use_llm and openai_api_key and openai_base_url:
             try:
                 # 尝试使用OpenAI兼容接口（function call）
-                import requests
                 system_prompt = (
                     "你是一个企业级报工智能体，将中文问题解析为查询参数，并严格使用" \
                     "query_work_reports 函数进行检索，返回简短中文说明与表格行。"
@@ -597,18 +609,12 @@ async def ai_query(
                     }
                 ]
 
-                resp = requests.post(
-                    f"{openai_base_url}/chat/completions",
-                    headers={"Authorization": f"Bearer {openai_api_key}", "Content-Type": "application/json"},
-                    json={
-                        "model": openai_model,
-                        "messages": messages,
-                        "tools": tools,
-                        "tool_choice": "auto"
-                    }, timeout=30
+                data_json = await llm.acomplete(
+                    messages,
+                    tools=tools,
+                    tool_choice="auto",
+                    timeout=30
                 )
-                resp.raise_for_status()
-                data_json = resp.json()
                 tool_calls = (
                     data_json.get("choices", [{}])[0]
                     .get("message", {})
@@ -647,7 +653,7 @@ async def ai_query(
                     keyword=keyword,
                     employee_name=args.get("employee_name") or employee_name,
                     project_name=args.get("project_name") or project_name,
-                    department_name=args.get("department_name"),
+                    department_name=args.get("department_name") or department_name,
                     status=args.get("status"),
                     start_date=_coerce_date(args.get("start_date")) or start_date,
                     end_date=_coerce_date(args.get("end_date")) or end_date,
@@ -663,11 +669,12 @@ async def ai_query(
                     f"共{result.get('total', len(rows))}条结果。"
                 )
             except Exception as _e:
-                logger.warning(f"LLM调用失败，回退规则解析: {_e}")
+                logger.warning("LLM调用失败，回退规则解析: %s", _e)
                 result = await repo.search_work_reports(
                     keyword=keyword,
                     employee_name=employee_name,
                     project_name=project_name,
+                    department_name=department_name,
                     start_date=start_date,
                     end_date=end_date,
                     page=int(payload.get("page", 1)),
@@ -680,6 +687,7 @@ async def ai_query(
                 keyword=keyword,
                 employee_name=employee_name,
                 project_name=project_name,
+                department_name=department_name,
                 start_date=start_date,
                 end_date=end_date,
                 page=int(payload.get("page", 1)),
@@ -687,113 +695,57 @@ async def ai_query(
             )
             rows = result.get("data", [])
 
-        # 查询结果处理
-        logger.info(f"📋 数据库查询完成:")
-        logger.info(f"  📊 查询到记录数: {len(rows)}")
-        logger.info(f"  📝 记录详情: {[{'id': r.get('id'), 'employee_name': r.get('employee_name'), 'report_date': r.get('report_date')} for r in rows[:3]]}")
-        
         # 若无命中记录，走对话式回答兜底（优先用LLM，没有则给出规则建议文案）
         if not rows:
-            logger.info("⚠️ 未查询到记录，准备生成解释说明")
             if openai_api_key and openai_base_url:
                 try:
-                    import requests
-                    conv_system = (
-                        "你现在扮演企业报工助手。如果没有检索到符合条件的报工数据，"
-                        "请根据用户的问题给出友好的说明、可尝试的查询建议（如补充员工/项目/时间），"
-                        "并提供1-2条可能有帮助的示例问法。不要捏造数据表格。"
-                    )
-                    resp2 = requests.post(
-                        f"{openai_base_url}/chat/completions",
-                        headers={"Authorization": f"Bearer {openai_api_key}", "Content-Type": "application/json"},
-                        json={
-                            "model": openai_model,
-                            "messages": [
-                                {"role": "system", "content": conv_system},
-                                {"role": "user", "content": text}
-                            ]
-                        }, timeout=30
-                    )
-                    resp2.raise_for_status()
-                    data2 = resp2.json()
-                    completion = (
-                        data2.get("choices", [{}])[0]
-                        .get("message", {})
-                        .get("content")
+                    data2 = await llm.acomplete(
+                        [
+                            {"role": "system", "content": AI_QUERY_NO_DATA_SYSTEM},
+                            {"role": "user", "content": text}
+                        ],
+                        timeout=30
                     )
+                    completion = first_message_content(data2)
                     if completion:
                         explanation = completion
                 except Exception as _e:
-                    logger.warning(f"LLM无数据对话兜底失败: {_e}")
+                    logger.warning("LLM无数据对话兜底失败: %s", _e)
             # 若LLM不可用或失败，返回默认建议说明
             if not explanation:
-                explanation = (
-                    "未检索到相关报工记录。建议：1) 指定员工姓名（如：查询王五9月报工）；"
-                    "2) 指定项目名称（如：AI智能助手项目上周记录）；3) 指定时间范围（如：2025-09、上周、本月）。"
-                )
+                explanation = AI_QUERY_NO_DATA_FALLBACK
 
         # 若用户希望“正常沟通也由大模型作答”，则在返回前优先用LLM生成简短说明
         if openai_api_key and openai_base_url and not explanation:
             try:
-                import requests as _rq
-                sys_prompt = (
-                    "你是企业报工助手，请用简洁中文确认你对用户问题的理解，"
-                    "如果可能，点明你将依据的筛选条件（员工/项目/时间/状态），"
-                    "并提示‘下方表格为匹配结果’。不要编造数据。"
-                )
-                parsed_text = (
-                    f"员工={employee_name or '未指定'}，项目={project_name or '未指定'}，"
-                    f"时间={ (start_date.isoformat() if start_date else '未指定') }~{ (end_date.isoformat() if end_date else '未指定') }。"
-                )
-                _resp = _rq.post(
-                    f"{openai_base_url}/chat/completions",
-                    headers={"Authorization": f"Bearer {openai_api_key}", "Content-Type": "application/json"},
-                    json={
-                        "model": openai_model,
-                        "messages": [
-                            {"role": "system", "content": sys_prompt},
-                            {"role": "user", "content": f"原始问题：{text}\n已解析：{parsed_text}"}
-                        ]
-                    }, timeout=20
+                # 与流式模式使用同一段解析文本，两种模式共享 LLM 缓存条目
+                _data = await llm.acomplete(
+                    [
+                        {"role": "system", "content": AI_QUERY_SUMMARY_SYSTEM},
+                        {"role": "user", "content": f"原始问题：{text}\n已解析：{_parsed_text(query.to_dict())}"}
+                    ],
+                    timeout=20
                 )
-                _resp.raise_for_status()
-                _data = _resp.json()
-                explanation = (
-                    _data.get("choices", [{}])[0]
-                    .get("message", {})
-                    .get("content")
-                ) or explanation
+                explanation = first_message_content(_data) or explanation
             except Exception as _e:
-                logger.debug(f"LLM简要说明生成失败: {_e}")
+                logger.debug("LLM简要说明生成失败: %s", _e)
 
         # 最终响应
         response_data = {
             "success": True,
             "query": text,
-            "parsed": {
-                "employee_name": employee_name,
-                "project_name": project_name,
-                "keyword": keyword,
-                "start_date": start_date.isoformat() if start_date else None,
-                "end_date": end_date.isoformat() if end_date else None
-            },
+            "parsed": query.to_dict(),
             "data": {
                 "rows": rows,
                 "total": result.get("total", len(rows)),
                 "explanation": explanation
             }
         }
-        
-        logger.info("✅ 响应数据准备完成:")
-        logger.info(f"  📊 成功状态: {response_data['success']}")
-        logger.info(f"  📝 解析结果: {response_data['parsed']}")
-        logger.info(f"  📋 数据条数: {len(rows)}")
-        logger.info(f"  💬 解释说明: {explanation[:100] if explanation else 'None'}...")
-        logger.info("=" * 50)
-        
+
+        logger.info("AI查询完成: %d 条记录", len(rows))
         return response_data
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"AI查询失败: {e}")
+        logger.error("AI查询失败: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
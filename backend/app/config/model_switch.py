@@ -1,3 +1,4 @@
+import os
 from enum import Enum
 from pydantic import BaseModel
 
@@ -9,8 +10,14 @@ class PredictBackend(str, Enum):
     llm = "llm"  # 大模型直接预测/修正
 
 
+class ForecastEngine(str, Enum):
+    numpy = "numpy"  # 内置 NumPy Holt/Holt-Winters，批量向量化拟合
+    statsmodels = "statsmodels"  # statsmodels ExponentialSmoothing（需额外安装）
+
+
 class ModelSwitch(BaseModel):
     predict_backend: PredictBackend = PredictBackend.llm
+    forecast_engine: ForecastEngine = ForecastEngine(os.getenv("FORECAST_ENGINE", ForecastEngine.numpy.value))
 
 
 global_switch = ModelSwitch()
@@ -21,7 +28,7 @@ def get_model_status() -> dict:
     return {
         "current_backend": global_switch.predict_backend.value,
         "available_backends": [backend.value for backend in PredictBackend],
+        "forecast_engine": global_switch.forecast_engine.value,
+        "available_forecast_engines": [engine.value for engine in ForecastEngine],
         "recommended": "llm"
     }
-
-
@@ -3,6 +3,8 @@ import logging
 from typing import Any, Optional, Dict, List
 from pymongo import MongoClient
 
+from ..utils.metrics.timing import MongoTimingListener
+
 # 说明：MongoDB连接管理器，提供全局client与数据库访问
 
 logger = logging.getLogger(__name__)
@@ -60,7 +62,13 @@ def get_mongo_client() -> Optional[MongoClient[Any]]:
                     uri = "mongodb://192.144.231.158:27017"
             
             # 设置较长的超时时间，适应网络连接
-            _client = MongoClient(uri, serverSelectionTimeoutMS=10000, connectTimeoutMS=10000)
+            # 命令监听器把查询耗时记入当前请求的 Server-Timing（db）
+            _client = MongoClient(
+                uri,
+                serverSelectionTimeoutMS=10000,
+                connectTimeoutMS=10000,
+                event_listeners=[MongoTimingListener()],
+            )
             # 测试连接
             _client.admin.command('ping')
             logger.info(f"MongoDB连接成功: {uri}")
@@ -150,6 +158,18 @@ class MemoryCollection:
         self.data.append(doc_copy)
         return type('Result', (), {'inserted_id': doc_copy['_id']})()
     
+    def insert_many(self, documents: List[Dict[str, Any]]):
+        """模拟MongoDB insert_many操作"""
+        inserted_ids = []
+        for document in documents:
+            doc_copy = document.copy()
+            if '_id' not in doc_copy:
+                doc_copy['_id'] = f"mem_{self.name}_{self._id_counter}"
+                self._id_counter += 1
+            inserted_ids.append(doc_copy['_id'])
+            self.data.append(doc_copy)
+        return type('Result', (), {'inserted_ids': inserted_ids})()
+    
     def update_one(self, filter_dict: Dict[str, Any], update_dict: Dict[str, Any]):
         """模拟MongoDB update_one操作"""
         for i, item in enumerate(self.data):
@@ -159,6 +179,17 @@ class MemoryCollection:
                 return type('Result', (), {'modified_count': 1})()
         return type('Result', (), {'modified_count': 0})()
     
+    def update_many(self, filter_dict: Dict[str, Any], update_dict: Dict[str, Any]):
+        """模拟MongoDB update_many操作：一次遍历完成全部匹配项更新"""
+        filter_dict = self._prepare_filter(filter_dict)
+        patch = update_dict.get('$set', {})
+        modified = 0
+        for item in self.data:
+            if self._matches_filter(item, filter_dict):
+                item.update(patch)
+                modified += 1
+        return type('Result', (), {'modified_count': modified, 'matched_count': modified})()
+    
     def delete_one(self, filter_dict: Dict[str, Any]):
         """模拟MongoDB delete_one操作"""
         for i, item in enumerate(self.data):
@@ -178,6 +209,16 @@ class MemoryCollection:
                 count += 1
         return count
     
+    @staticmethod
+    def _prepare_filter(filter_dict: Dict[str, Any]) -> Dict[str, Any]:
+        """将 $in/$nin 的列表转为集合，避免逐条匹配时线性查找"""
+        prepared = {}
+        for key, value in filter_dict.items():
+            if isinstance(value, dict) and ('$in' in value or '$nin' in value):
+                value = {op: (set(v) if op in ('$in', '$nin') else v) for op, v in value.items()}
+            prepared[key] = value
+        return prepared
+    
     def _matches_filter(self, item: Dict[str, Any], filter_dict: Dict[str, Any]) -> bool:
         """检查项目是否匹配过滤器"""
         for key, value in filter_dict.items():
@@ -205,6 +246,12 @@ class MemoryCollection:
                     elif op == '$lte':
                         if item[key] > op_value:
                             return False
+                    elif op == '$in':
+                        if item[key] not in op_value:
+                            return False
+                    elif op == '$nin':
+                        if item[key] in op_value:
+                            return False
                     elif op == '$options':
                         continue  # 忽略选项
                     else:
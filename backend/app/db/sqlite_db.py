@@ -13,6 +13,8 @@ from typing import Any, Optional, Dict, List
 from datetime import datetime, date
 import os
 
+from ..utils.metrics.timing import TimedSQLiteConnection
+
 logger = logging.getLogger(__name__)
 
 class SQLiteDatabase:
@@ -26,7 +28,7 @@ class SQLiteDatabase:
     def _init_database(self):
         """初始化数据库和表结构"""
         try:
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False, factory=TimedSQLiteConnection)
             self.conn.row_factory = sqlite3.Row  # 使结果可以按列名访问
             
             # 创建表结构
@@ -115,6 +117,7 @@ class SQLiteDatabase:
         # 创建索引
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_work_reports_employee ON work_reports(employee_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_work_reports_project ON work_reports(project_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_work_reports_department ON work_reports(department_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_work_reports_date ON work_reports(report_date)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_work_reports_status ON work_reports(status)')
         
@@ -161,6 +164,38 @@ class SQLiteDatabase:
 
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_pricing_batch_results_trace ON pricing_batch_results(trace_id)')
 
+        # 批量核价：物料价格缓存（规范化物料签名 + 规则版本）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS pricing_price_cache (
+                signature TEXT NOT NULL,
+                rule_version TEXT NOT NULL,
+                unit_price REAL NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (signature, rule_version)
+            )
+        ''')
+
+        # LLM 响应缓存（精确键 + 字符 n-gram 向量，按最近访问时间淘汰）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS llm_response_cache (
+                cache_key TEXT PRIMARY KEY,
+                bucket TEXT NOT NULL,
+                prompt_norm TEXT NOT NULL,
+                embedding BLOB,
+                response_json TEXT NOT NULL,
+                prompt_tokens INTEGER DEFAULT 0,
+                completion_tokens INTEGER DEFAULT 0,
+                cost REAL DEFAULT 0,
+                hits INTEGER DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_response_cache_bucket ON llm_response_cache(bucket)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_response_cache_access ON llm_response_cache(last_access)')
+
         self.conn.commit()
 
         # 兼容新增列：为任务表补充文件路径列
@@ -174,6 +209,11 @@ class SQLiteDatabase:
         self._ensure_column_exists('projects', 'status', 'TEXT')
         self._ensure_column_exists('departments', 'status', 'TEXT')
 
+        # 报工自然键（员工/项目/日期/工时/内容的哈希），唯一索引保证重复导入幂等；NULL 不参与唯一约束
+        self._ensure_column_exists('work_reports', 'natural_key', 'TEXT')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_work_reports_natural_key ON work_reports(natural_key)')
+        self.conn.commit()
+
     def _ensure_column_exists(self, table: str, column: str, col_type: str) -> None:
         """确保表存在指定列，不存在则添加"""
         try:
@@ -268,9 +308,8 @@ class SQLiteCollection:
     def update_one(self, filter_dict: Dict, update_dict: Dict):
         """更新单条记录"""
         where_clause, where_params = self._build_where_clause(filter_dict)
-        
-        set_clause = ', '.join([f"{key} = ?" for key in update_dict.keys()])
-        params = list(update_dict.values()) + where_params
+        set_clause, set_params = self._build_set_clause(update_dict)
+        params = set_params + where_params
         
         sql = f"UPDATE {self.table_name} SET {set_clause} WHERE {where_clause}"
         self.cursor.execute(sql, params)
@@ -278,6 +317,17 @@ class SQLiteCollection:
         
         return type('Result', (), {'modified_count': self.cursor.rowcount})()
     
+    def update_many(self, filter_dict: Dict, update_dict: Dict):
+        """批量更新：单条UPDATE语句、单个事务完成（支持 $in 过滤）"""
+        where_clause, where_params = self._build_where_clause(filter_dict)
+        set_clause, set_params = self._build_set_clause(update_dict)
+        
+        sql = f"UPDATE {self.table_name} SET {set_clause} WHERE {where_clause}"
+        with self.conn:
+            self.cursor.execute(sql, set_params + where_params)
+        
+        return type('Result', (), {'modified_count': self.cursor.rowcount, 'matched_count': self.cursor.rowcount})()
+    
     def delete_one(self, filter_dict: Dict):
         """删除单条记录"""
         where_clause, params = self._build_where_clause(filter_dict)
@@ -323,6 +373,13 @@ class SQLiteCollection:
         
         return []
     
+    def _build_set_clause(self, update_dict: Dict):
+        """构建SET子句，兼容 {"$set": {...}} 与直接字段字典两种写法"""
+        fields = update_dict.get('$set', update_dict) if isinstance(update_dict, dict) else {}
+        processed = self._process_document(fields)
+        set_clause = ', '.join([f"{key} = ?" for key in processed.keys()])
+        return set_clause, list(processed.values())
+    
     def _build_where_clause(self, filter_dict: Dict):
         """构建WHERE子句"""
         if not filter_dict:
@@ -352,6 +409,14 @@ class SQLiteCollection:
                     elif op == '$lte':
                         conditions.append(f"{key} <= ?")
                         params.append(op_value)
+                    elif op in ('$in', '$nin'):
+                        values = list(op_value)
+                        if not values:
+                            conditions.append("1=0" if op == '$in' else "1=1")
+                        else:
+                            negate = "NOT " if op == '$nin' else ""
+                            conditions.append(f"{key} {negate}IN ({', '.join(['?'] * len(values))})")
+                            params.extend(values)
                     elif op == '$options':
                         continue  # 忽略选项
                     else:
@@ -1,25 +1,17 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .middleware.request_id import RequestIdMiddleware
-from .middleware.rate_limit import SimpleRateLimit
+from .middleware.rate_limit import RateLimitMiddleware
+from .middleware.llm_usage import LLMUsageContextMiddleware
+from .middleware.compression import CompressionMiddleware
+from .middleware.timing import TimingMiddleware
+from .utils.fast_json import FastJSONResponse
+from .utils.logs.structured import configure_logging
 import logging
 from datetime import date, datetime, timedelta
 import random
 import os
 
-# 配置日志级别
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),  # 输出到控制台
-    ]
-)
-
-# 设置特定模块的日志级别
-logging.getLogger("app.api.v1.work_reports").setLevel(logging.INFO)
-logging.getLogger("app.repository.work_report_repo").setLevel(logging.INFO)
-
 # 可选加载 .env（若已安装 python-dotenv）
 try:
     from dotenv import load_dotenv
@@ -27,6 +19,9 @@ try:
 except Exception:
     pass
 
+# 日志：QueueHandler 入队 + 后台线程输出（LOG_LEVEL / LOG_FORMAT=json|text / LOG_SAMPLE_RATES）
+configure_logging()
+
 # 说明：FastAPI应用入口，注册路由与中间件
 
 async def init_test_data(memory_db):
@@ -146,7 +141,7 @@ async def init_test_data(memory_db):
         logging.error(f"初始化测试数据失败: {e}")
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="AI ERP Backend", version="0.1.0")
+    app = FastAPI(title="AI ERP Backend", version="0.1.0", default_response_class=FastJSONResponse)
 
     # CORS配置：前后端分离，允许本地开发端口访问
     app.add_middleware(
@@ -157,9 +152,15 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
-    # 请求ID与开发环境全局限流（可按需调整limit）
+    # 请求ID与限流（RATE_LIMIT_PER_MINUTE 全局配额，RATE_LIMIT_ROUTES 按路由前缀单独配置）
     app.add_middleware(RequestIdMiddleware)
-    app.add_middleware(SimpleRateLimit, limit_per_minute=120)
+    app.add_middleware(RateLimitMiddleware)
+    # LLM token 计量的调用上下文（接口/用户）
+    app.add_middleware(LLMUsageContextMiddleware)
+    # 响应压缩（覆盖全部路由；小响应与 SSE 不压缩）
+    app.add_middleware(CompressionMiddleware)
+    # 请求耗时指标与 Server-Timing（置于压缩之外，计入完整处理耗时；/metrics 导出）
+    app.add_middleware(TimingMiddleware)
 
     # 路由注册
     from .api.routes import register_routes
@@ -180,6 +181,26 @@ def create_app() -> FastAPI:
             logging.info("初始化报工智能体测试数据...")
             await init_test_data(memory_db)
 
+        # 预加载员工/项目/部门实体字典，首个报工查询无需再读维表
+        try:
+            from .utils.cache.entity_cache import get_entity_cache
+            get_entity_cache().warm()
+        except Exception as e:
+            logging.warning(f"实体字典预加载失败: {e}")
+
+        # 后台预热批量预测进程池，首个批量预测请求无需等待子进程启动与预测引擎导入
+        if os.getenv("FORECAST_POOL_WARMUP", "true").lower() == "true":
+            import asyncio
+            from .models.train.forecast_executor import get_forecast_executor
+            asyncio.get_running_loop().run_in_executor(None, get_forecast_executor().warm)
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        from .models.train.forecast_executor import shutdown_forecast_executor
+        shutdown_forecast_executor()
+        from .utils.llm.transport import shutdown_llm_transport
+        await shutdown_llm_transport()
+
     return app
 
 
@@ -0,0 +1,21 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..utils.llm.token_accounting import reset_usage_scope, set_usage_scope
+
+# 说明：记录当前请求的 scope，LLM token 计量据此按接口（路由模板）与用户归集
+
+
+class LLMUsageContextMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope.get("type") != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = set_usage_scope(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_usage_scope(token)
@@ -1,101 +1,112 @@
-import time
-from typing import Dict, Tuple, Callable, Any
-from starlette.types import ASGIApp, Receive, Scope, Send
+import os
 from functools import wraps
+from typing import Callable, List, Optional, Sequence, Tuple
 
-# 说明：简易内存限流（令牌桶简化版），用于开发环境
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from ..utils.ratelimit.gcra import RateLimitPolicy, get_rate_limiter
 
-class SimpleRateLimit:
-    def __init__(self, app: ASGIApp, limit_per_minute: int = 60, key_header: str = "x-api-key") -> None:
+# 说明：基于 GCRA 的内存限流，按 API Key（缺省为客户端 IP）计数；支持按路由前缀单独配置，
+# 所有经过限流的响应附带 RateLimit-* 头，超限返回 429 与 Retry-After
+
+RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "120"))
+# 路由级限流，逗号分隔的 "路径前缀=次数/周期秒[/突发]"，如 "/api/work-reports/ai-query=20/60"
+RATE_LIMIT_ROUTES = os.getenv("RATE_LIMIT_ROUTES", "")
+
+_TOO_MANY_REQUESTS = b'{"error":"too_many_requests"}'
+
+
+def parse_route_limits(text: str) -> List[Tuple[str, RateLimitPolicy]]:
+    routes = []
+    for item in text.split(","):
+        prefix, sep, spec = item.strip().partition("=")
+        if sep and prefix and spec:
+            routes.append((prefix.strip(), RateLimitPolicy.parse(spec)))
+    return routes
+
+
+class RateLimitMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        limit_per_minute: int = RATE_LIMIT_PER_MINUTE,
+        key_header: str = "x-api-key",
+        routes: Optional[Sequence[Tuple[str, RateLimitPolicy]]] = None,
+    ) -> None:
         self.app = app
-        self.limit = limit_per_minute
-        self.key_header = key_header
-        self.bucket: Dict[str, Tuple[int, float]] = {}
+        self.default_policy = RateLimitPolicy(limit=limit_per_minute, period=60)
+        self.key_header = key_header.lower().encode("latin-1")
+        # 最长前缀优先匹配
+        routes = list(routes) if routes is not None else parse_route_limits(RATE_LIMIT_ROUTES)
+        self.routes = sorted(routes, key=lambda r: len(r[0]), reverse=True)
+        self.limiter = get_rate_limiter()
+
+    def _client_key(self, scope: Scope) -> str:
+        # 只扫描一遍原始头、命中即停，不再为每个请求构造 dict
+        for name, value in scope.get("headers") or ():
+            if name == self.key_header:
+                return "key:" + value.decode("latin-1")
+        client = scope.get("client") or ("unknown", 0)
+        return f"ip:{client[0]}"
+
+    def _policy_for(self, path: str) -> Tuple[str, RateLimitPolicy]:
+        for prefix, policy in self.routes:
+            if path.startswith(prefix):
+                return prefix, policy
+        return "*", self.default_policy
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         if scope.get("type") != "http":
             await self.app(scope, receive, send)
             return
 
-        # 以IP或header作为限流key
-        headers = dict(scope.get("headers") or [])
-        key = headers.get(self.key_header.encode())
-        if key is None:
-            client = scope.get("client") or ("unknown", 0)
-            key = f"ip:{client[0]}".encode()
-
-        now = time.time()
-        count, ts = self.bucket.get(key, (0, now))
-        if now - ts > 60:
-            count, ts = 0, now
-        count += 1
-        self.bucket[key] = (count, ts)
-
-        if count > self.limit:
+        route, policy = self._policy_for(scope.get("path", ""))
+        decision = self.limiter.acquire(f"{route}|{self._client_key(scope)}", policy)
+        rate_headers = decision.headers(policy)
+
+        if not decision.allowed:
             await send({
                 "type": "http.response.start",
                 "status": 429,
-                "headers": [(b"content-type", b"application/json"), (b"retry-after", b"60")],
+                "headers": [(b"content-type", b"application/json")] + rate_headers,
             })
-            await send({"type": "http.response.body", "body": b'{"error":"too_many_requests"}'})
+            await send({"type": "http.response.body", "body": _TOO_MANY_REQUESTS})
             return
 
-        await self.app(scope, receive, send)
-
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", []).extend(rate_headers)
+            await send(message)
 
-# 全局限流存储
-_rate_limit_storage: Dict[str, Dict[str, Tuple[int, float]]] = {}
+        await self.app(scope, receive, send_wrapper)
 
 
 def rate_limit(max_requests: int = 60, window_seconds: int = 60, key_func: Callable = None):
     """
-    限流装饰器
-    
+    限流装饰器（与中间件共用 GCRA 限流器，空闲 key 自动回收）
+
     Args:
         max_requests: 窗口期内最大请求数
         window_seconds: 时间窗口（秒）
-        key_func: 自定义key生成函数，默认为IP地址
+        key_func: 自定义key生成函数，默认所有调用方共享同一配额
     """
+    policy = RateLimitPolicy(limit=max_requests, period=window_seconds)
+
     def decorator(func: Callable) -> Callable:
+        prefix = f"fn:{func.__module__}.{func.__name__}|"
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            # 生成限流key
-            if key_func:
-                key = key_func(*args, **kwargs)
-            else:
-                # 默认使用IP地址作为key
-                key = "default"
-            
-            now = time.time()
-            window_key = f"{func.__name__}_{key}"
-            
-            # 获取或初始化计数器
-            if window_key not in _rate_limit_storage:
-                _rate_limit_storage[window_key] = {"count": 0, "window_start": now}
-            
-            window_data = _rate_limit_storage[window_key]
-            
-            # 检查是否需要重置窗口
-            if now - window_data["window_start"] > window_seconds:
-                window_data["count"] = 0
-                window_data["window_start"] = now
-            
-            # 检查是否超过限制
-            if window_data["count"] >= max_requests:
+            key = key_func(*args, **kwargs) if key_func else "default"
+            decision = get_rate_limiter().acquire(prefix + str(key), policy)
+            if not decision.allowed:
                 from fastapi import HTTPException
                 raise HTTPException(
-                    status_code=429, 
-                    detail=f"Rate limit exceeded: {max_requests} requests per {window_seconds} seconds"
+                    status_code=429,
+                    detail=f"Rate limit exceeded: {max_requests} requests per {window_seconds} seconds",
+                    headers={k.decode(): v.decode() for k, v in decision.headers(policy)},
                 )
-            
-            # 增加计数
-            window_data["count"] += 1
-            
-            # 调用原函数
             return await func(*args, **kwargs)
-        
+
         return wrapper
     return decorator
-
-
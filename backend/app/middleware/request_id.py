@@ -2,7 +2,9 @@ import uuid
 from typing import Callable
 from starlette.types import ASGIApp, Receive, Scope, Send
 
-# 说明：为每个请求注入 X-Request-ID，便于排查与链路追踪
+from ..utils.logs.structured import reset_request_id, set_request_id
+
+# 说明：为每个请求注入 X-Request-ID，便于排查与链路追踪；请求处理期间的日志记录自动带上该 ID
 
 
 class RequestIdMiddleware:
@@ -24,6 +26,10 @@ class RequestIdMiddleware:
 
         scope.setdefault("state", {})
         scope["state"]["request_id"] = request_id
-        await self.app(scope, receive, send_wrapper)
+        token = set_request_id(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            reset_request_id(token)
 
 
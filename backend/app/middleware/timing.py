@@ -0,0 +1,44 @@
+from time import perf_counter
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..utils.metrics.request_metrics import UNMATCHED, get_request_metrics
+from ..utils.metrics.timing import format_server_timing, reset_request_timings, start_request_timings
+
+# 说明：记录每个请求的耗时、状态码与在途数（按路由模板归集），并以 Server-Timing 头返回 db/llm/parse 分段耗时
+
+
+class TimingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.metrics = get_request_metrics()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope.get("type") != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        token, timings = start_request_timings()
+        metrics = self.metrics
+        metrics.in_flight += 1
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # 流式响应只含响应头发出前的耗时
+                message.setdefault("headers", []).append(
+                    (b"server-timing", format_server_timing(timings, perf_counter() - start))
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.in_flight -= 1
+            reset_request_timings(token)
+            # 路由匹配后 FastAPI 会把 route 写回 scope
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED
+            metrics.observe(scope.get("method", ""), route, status, perf_counter() - start, timings)
@@ -0,0 +1,130 @@
+"""
+滚动原点回测（rolling-origin cross validation）
+在多个截止点上用截止点之前的数据拟合并预测未来 1..H 步，汇总每个预测步长的 MAE/MAPE 分布；
+NumPy 引擎下所有截止点（扩展窗口共享同一前缀）在一次向量化递推中同时拟合
+"""
+
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config.model_switch import ForecastEngine
+from app.models.train.numpy_holt import fit_holt
+
+logger = logging.getLogger(__name__)
+
+# 截止点过多时只保留最近的若干个
+BACKTEST_MAX_CUTOFFS = int(os.getenv("BACKTEST_MAX_CUTOFFS", "36"))
+
+
+def make_cutoffs(n_obs: int, min_train: int, step: int = 1, max_cutoffs: Optional[int] = None) -> List[int]:
+    """截止点 c 表示用前 c 个观测拟合，且 c 之后至少还有一个观测可用于评估"""
+    cutoffs = list(range(min_train, n_obs, max(1, step)))
+    limit = max_cutoffs or BACKTEST_MAX_CUTOFFS
+    return cutoffs[-limit:] if len(cutoffs) > limit else cutoffs
+
+
+def _forecast_at_cutoffs(
+    y: np.ndarray, cutoffs: List[int], horizon: int, seasonal_periods: int, engine: ForecastEngine
+) -> np.ndarray:
+    """返回 (截止点数, horizon) 的预测矩阵"""
+    if engine == ForecastEngine.statsmodels:
+        from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+        rows = []
+        for c in cutoffs:
+            model = ExponentialSmoothing(
+                y[:c], trend='add',
+                seasonal='add' if seasonal_periods else None,
+                seasonal_periods=seasonal_periods or None
+            )
+            rows.append(model.fit().forecast(horizon))
+        return np.vstack(rows)
+
+    # 各行为同一序列、只是截止点不同：一次递推同时得到所有截止点的拟合
+    fit = fit_holt(np.broadcast_to(y, (len(cutoffs), len(y))), seasonal_periods, window_ends=cutoffs)
+    return fit.forecast(horizon)
+
+
+def _distribution(values: np.ndarray) -> Dict[str, float]:
+    if values.size == 0:
+        return {"mean": 0.0, "p50": 0.0, "p90": 0.0, "max": 0.0}
+    p50, p90 = np.percentile(values, [50, 90])
+    return {"mean": float(values.mean()), "p50": float(p50), "p90": float(p90), "max": float(values.max())}
+
+
+def rolling_origin_backtest(
+    series: Sequence[float],
+    horizon: int = 3,
+    min_train: Optional[int] = None,
+    step: int = 1,
+    max_cutoffs: Optional[int] = None,
+    seasonal_periods: int = 0,
+    engine: ForecastEngine = ForecastEngine.numpy,
+) -> Dict[str, Any]:
+    """
+    滚动原点回测
+
+    Returns:
+        {
+            "cutoffs", "horizon", "per_horizon": [{"horizon", "n", "mae": {...}, "mape": {...}}],
+            "mae", "mape", "is_accurate",
+            "origin": 第一个截止点对其后全部观测的预测与实际值
+        }
+    """
+    y = np.asarray(series, dtype=np.float64)
+    n_obs = len(y)
+    m = seasonal_periods if seasonal_periods and seasonal_periods > 1 else 0
+    if min_train is None:
+        min_train = max(6, n_obs // 2)
+    min_train = max(min_train, 2 + (m - 1 if m else 0), 2)
+    cutoffs = make_cutoffs(n_obs, min_train, step, max_cutoffs)
+    if not cutoffs:
+        raise ValueError(f"序列长度{n_obs}不足以在训练窗口{min_train}之后回测")
+
+    # 第一个截止点需预测到序列末尾，用于给出完整的预测/实际对照
+    span = max(horizon, n_obs - cutoffs[0])
+    forecasts = _forecast_at_cutoffs(y, cutoffs, span, m, engine)
+
+    # 误差矩阵 (截止点数, horizon)，超出序列末尾的位置为 NaN
+    cut = np.asarray(cutoffs)[:, None]
+    target_idx = cut + np.arange(horizon)[None, :]
+    valid = target_idx < n_obs
+    actual = np.where(valid, y[np.minimum(target_idx, n_obs - 1)], np.nan)
+    abs_err = np.abs(actual - forecasts[:, :horizon])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ape = np.where(actual != 0, abs_err / np.abs(actual) * 100, np.nan)
+
+    per_horizon = []
+    for h in range(horizon):
+        errs = abs_err[:, h][~np.isnan(abs_err[:, h])]
+        apes = ape[:, h][~np.isnan(ape[:, h])]
+        per_horizon.append({
+            "horizon": h + 1,
+            "n": int(errs.size),
+            "mae": _distribution(errs),
+            "mape": _distribution(apes),
+        })
+
+    mae = float(np.nanmean(abs_err)) if np.any(valid) else 0.0
+    mape = float(np.nanmean(ape)) if np.any(~np.isnan(ape)) else 0.0
+    c0 = cutoffs[0]
+    return {
+        "engine": engine.value,
+        "seasonal_periods": m,
+        "min_train": min_train,
+        "horizon": horizon,
+        "cutoffs": cutoffs,
+        "n_cutoffs": len(cutoffs),
+        "per_horizon": per_horizon,
+        "mae": mae,
+        "mape": mape,
+        "is_accurate": bool(mape < 5.0),
+        "origin": {
+            "cutoff": c0,
+            "predictions": forecasts[0, :n_obs - c0].tolist(),
+            "actuals": y[c0:].tolist(),
+        },
+    }
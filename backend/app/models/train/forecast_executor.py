@@ -0,0 +1,158 @@
+"""
+批量预测进程池
+指数平滑拟合为CPU密集型，放到预热好的子进程中按块并行执行，避免阻塞事件循环；
+结果按完成顺序流式产出，附带每条序列的耗时
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+FORECAST_WORKERS = int(os.getenv("FORECAST_WORKERS", "0")) or (os.cpu_count() or 1)
+FORECAST_CHUNK_SIZE = int(os.getenv("FORECAST_CHUNK_SIZE", "25"))
+# 子进程启动方式：默认 spawn，避免在已有线程/数据库连接的服务进程中 fork
+FORECAST_MP_START = os.getenv("FORECAST_MP_START", "spawn")
+
+# (序号, 序列, 预测月数)
+ForecastTask = Tuple[int, List[float], int]
+
+
+def _warm_worker() -> None:
+    """子进程初始化：提前导入预测引擎并完成一次拟合，首个真实任务不再承担冷启动开销"""
+    from app.models.train.simple_predictor import predict_simple
+    predict_simple([1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0], 1)
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _forecast_chunk(tasks: Sequence[ForecastTask]) -> List[Dict[str, Any]]:
+    """
+    在子进程中拟合一个任务块：整块批量拟合（NumPy 引擎下为一次向量化拟合），
+    elapsed_ms 为块耗时按条均摊；批量失败时逐条拟合并记录各自耗时与错误
+    """
+    from app.models.train.simple_predictor import predict_simple, predict_simple_batch
+
+    started = time.perf_counter()
+    try:
+        forecasts = predict_simple_batch([series for _, series, _ in tasks], [horizon for _, _, horizon in tasks])
+        elapsed_ms = round((time.perf_counter() - started) * 1000 / len(tasks), 2)
+        return [
+            {"index": index, "forecast": forecast, "elapsed_ms": elapsed_ms}
+            for (index, _, _), forecast in zip(tasks, forecasts)
+        ]
+    except Exception as e:
+        logger.warning(f"[forecast-pool] 批量拟合失败，改为逐条拟合: {e}")
+
+    results = []
+    for index, series, horizon in tasks:
+        started = time.perf_counter()
+        item: Dict[str, Any] = {"index": index}
+        try:
+            item["forecast"] = predict_simple(series, horizon)
+        except Exception as e:
+            item["error"] = str(e)
+        item["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        results.append(item)
+    return results
+
+
+def _chunks(tasks: Sequence[ForecastTask], size: int) -> List[Sequence[ForecastTask]]:
+    size = max(1, size)
+    return [tasks[i:i + size] for i in range(0, len(tasks), size)]
+
+
+class ForecastExecutor:
+    """预热的预测进程池，按块提交、按完成顺序产出结果"""
+
+    def __init__(self, max_workers: int = FORECAST_WORKERS, chunk_size: int = FORECAST_CHUNK_SIZE) -> None:
+        self.max_workers = max(1, max_workers)
+        self.chunk_size = max(1, chunk_size)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._warmed = False
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context(FORECAST_MP_START),
+                        initializer=_warm_worker,
+                    )
+        return self._pool
+
+    def warm(self) -> List[int]:
+        """拉起全部子进程并等待其完成初始化，返回子进程PID"""
+        pool = self._get_pool()
+        started = time.perf_counter()
+        # 每个子进程同一时刻只处理一个任务，提交 max_workers 个即可迫使全部进程启动
+        pids = sorted({f.result() for f in [pool.submit(_worker_ready) for _ in range(self.max_workers)]})
+        self._warmed = True
+        logger.info(f"[forecast-pool] 预热完成: {len(pids)} 个子进程, 耗时 {time.perf_counter() - started:.2f}s")
+        return pids
+
+    async def iter_forecasts(
+        self, tasks: Sequence[ForecastTask], chunk_size: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """按块提交到进程池，按完成顺序逐条产出 {"index", "forecast"|"error", "elapsed_ms"}"""
+        if not tasks:
+            return
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        futures = [
+            loop.run_in_executor(pool, _forecast_chunk, chunk)
+            for chunk in _chunks(tasks, chunk_size or self.chunk_size)
+        ]
+        try:
+            for finished in asyncio.as_completed(futures):
+                for item in await finished:
+                    yield item
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """在进程池中执行单个函数（须为模块级函数，参数可序列化），如训练、回测任务"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_pool(), fn, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "chunk_size": self.chunk_size,
+            "started": self._pool is not None,
+            "warmed": self._warmed,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+                self._warmed = False
+
+
+_executor: Optional[ForecastExecutor] = None
+
+
+def get_forecast_executor() -> ForecastExecutor:
+    """获取全局预测进程池"""
+    global _executor
+    if _executor is None:
+        _executor = ForecastExecutor()
+    return _executor
+
+
+def shutdown_forecast_executor() -> None:
+    if _executor is not None:
+        _executor.shutdown()
@@ -1,20 +1,27 @@
 import os
+import copy
 import json
+import time
+import asyncio
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional, Tuple
-
-# 尝试导入statsmodels，如果失败则使用备选方案
-try:
-    from statsmodels.tsa.holtwinters import ExponentialSmoothing
-    STATSMODELS_AVAILABLE = True
-except ImportError:
-    STATSMODELS_AVAILABLE = False
-    logging.warning("statsmodels未安装，将使用简化的预测方法")
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 
 from ...utils.llm.base_client import LLMClient
+from ...utils.cache.ttl_lru import TTLLRUCache
+from .simple_predictor import predict_simple
 
 logger = logging.getLogger(__name__)
 
+# 同时在途的 LLM 请求上限（全局，跨请求共享）
+LLM_PREDICT_CONCURRENCY = int(os.getenv("LLM_PREDICT_CONCURRENCY", "4"))
+# 单次 LLM 调用超时；批量预测的整体时间预算，超出后剩余序列回退到统计预测
+LLM_PREDICT_CALL_TIMEOUT_SECONDS = float(os.getenv("LLM_PREDICT_CALL_TIMEOUT_SECONDS", "20"))
+LLM_PREDICT_BATCH_BUDGET_SECONDS = float(os.getenv("LLM_PREDICT_BATCH_BUDGET_SECONDS", "30"))
+# 解析后的预测结果按提示词哈希缓存
+LLM_PREDICT_CACHE_SIZE = int(os.getenv("LLM_PREDICT_CACHE_SIZE", "1024"))
+LLM_PREDICT_CACHE_TTL_SECONDS = float(os.getenv("LLM_PREDICT_CACHE_TTL_SECONDS", "600"))
+
 class LLMTimeSeriesPredictor:
     """
     基于LLM的时间序列预测器，使用Qwen-Max-Latest等大模型进行预测
@@ -24,6 +31,15 @@ class LLMTimeSeriesPredictor:
         self.client = LLMClient(provider=provider)
         self.model = model
         self.use_real_llm = os.getenv("USE_REAL_LLM", "false").lower() == "true"
+        # 键: prompt_key，值: 解析并校验后的预测结果
+        self.cache = TTLLRUCache(max_size=LLM_PREDICT_CACHE_SIZE, ttl_seconds=LLM_PREDICT_CACHE_TTL_SECONDS)
+        # 相同提示词的在途请求共享同一个任务
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # 在途任务的等待方数量；已开始调用LLM的键记入 _started
+        self._waiters: Dict[str, int] = {}
+        self._started: set = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.counters = {"llm_calls": 0, "cache_hits": 0, "inflight_dedup": 0, "fallbacks": 0}
         
     def _build_prediction_prompt(self, series: List[float], horizon_months: int, 
                                context: str = "", factors: List[str] = None) -> str:
@@ -118,10 +134,60 @@ class LLMTimeSeriesPredictor:
                 "methodology": "解析失败"
             }
     
+    def prompt_key(self, prompt: str) -> str:
+        """缓存/去重键：模型 + 提示词的哈希"""
+        return hashlib.sha1(f"{self.model}\n{prompt}".encode("utf-8")).hexdigest()
+    
+    def _insufficient_result(self, series: List[float], horizon_months: int) -> Dict[str, Any]:
+        return {
+            "predictions": [series[-1]] * horizon_months if series else [0.0] * horizon_months,
+            "confidence": 0.0,
+            "trend_analysis": "数据不足，无法进行有效预测",
+            "risk_factors": ["历史数据不足"],
+            "recommendations": ["需要更多历史数据"],
+            "methodology": "数据不足回退"
+        }
+    
+    def _error_result(self, series: List[float], horizon_months: int, reason: str) -> Dict[str, Any]:
+        """LLM 失败或超出预算时回退到统计预测"""
+        self.counters["fallbacks"] += 1
+        return {
+            "predictions": self._fallback_prediction(series, horizon_months),
+            "confidence": 0.5,
+            "trend_analysis": f"LLM预测失败: {reason}",
+            "risk_factors": ["LLM服务异常"],
+            "recommendations": ["使用传统方法预测"],
+            "methodology": "LLM失败回退到指数平滑"
+        }
+    
+    def _request_completion(self, prompt: str, series: List[float], horizon_months: int) -> str:
+        """调用LLM（同步网络请求）"""
+        if self.use_real_llm:
+            self.counters["llm_calls"] += 1
+            response = self.client.chat(prompt, model=self.model, temperature=0.1)
+            return response.get("completion", "")
+        # 模拟LLM响应
+        return self._generate_mock_prediction(series, horizon_months)
+    
+    def _finalize(self, key: str, llm_result: str, series: List[float], horizon_months: int) -> Dict[str, Any]:
+        """解析并校验结果；只有LLM给出有效预测时才写入缓存"""
+        result = self._parse_llm_response(llm_result)
+        
+        # 验证预测结果
+        if not result.get("predictions") or len(result["predictions"]) != horizon_months:
+            # 如果LLM返回的预测数量不对，使用指数平滑作为备选
+            fallback_predictions = self._fallback_prediction(series, horizon_months)
+            result["predictions"] = fallback_predictions
+            result["methodology"] = "LLM预测失败，使用指数平滑备选"
+            result["confidence"] = 0.6
+        else:
+            self.cache.set(key, result)
+        return copy.deepcopy(result)
+    
     def predict(self, series: List[float], horizon_months: int, 
                 context: str = "", factors: List[str] = None) -> Dict[str, Any]:
         """
-        使用LLM进行时间序列预测
+        使用LLM进行时间序列预测（同步）
         
         Args:
             series: 历史数据序列
@@ -134,51 +200,142 @@ class LLMTimeSeriesPredictor:
         """
         try:
             if not series or len(series) < 3:
-                return {
-                    "predictions": [series[-1]] * horizon_months if series else [0.0] * horizon_months,
-                    "confidence": 0.0,
-                    "trend_analysis": "数据不足，无法进行有效预测",
-                    "risk_factors": ["历史数据不足"],
-                    "recommendations": ["需要更多历史数据"],
-                    "methodology": "数据不足回退"
-                }
+                return self._insufficient_result(series, horizon_months)
             
             # 构建提示词
             prompt = self._build_prediction_prompt(series, horizon_months, context, factors)
+            key = self.prompt_key(prompt)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.counters["cache_hits"] += 1
+                return copy.deepcopy(cached)
             
-            # 调用LLM
-            if self.use_real_llm:
-                response = self.client.chat(prompt, model=self.model, temperature=0.1)
-                llm_result = response.get("completion", "")
-            else:
-                # 模拟LLM响应
-                llm_result = self._generate_mock_prediction(series, horizon_months)
-            
-            # 解析结果
-            result = self._parse_llm_response(llm_result)
+            llm_result = self._request_completion(prompt, series, horizon_months)
+            return self._finalize(key, llm_result, series, horizon_months)
             
-            # 验证预测结果
-            if not result.get("predictions") or len(result["predictions"]) != horizon_months:
-                # 如果LLM返回的预测数量不对，使用指数平滑作为备选
-                fallback_predictions = self._fallback_prediction(series, horizon_months)
-                result["predictions"] = fallback_predictions
-                result["methodology"] = "LLM预测失败，使用指数平滑备选"
-                result["confidence"] = 0.6
+        except Exception as e:
+            logger.error(f"LLM预测失败: {e}")
+            return self._error_result(series, horizon_months, str(e))
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(1, LLM_PREDICT_CONCURRENCY))
+        return self._semaphore
+    
+    async def _fetch(self, key: str, prompt: str, series: List[float], horizon_months: int) -> Dict[str, Any]:
+        """受全局并发上限约束的一次异步LLM调用"""
+        if not self.use_real_llm:
+            return self._finalize(key, self._request_completion(prompt, series, horizon_months), series, horizon_months)
+        async with self._get_semaphore():
+            self._started.add(key)
+            self.counters["llm_calls"] += 1
+            response = await asyncio.wait_for(
+                self.client.achat(prompt, model=self.model, temperature=0.1),
+                timeout=LLM_PREDICT_CALL_TIMEOUT_SECONDS
+            )
+            llm_result = response.get("completion", "")
+        return self._finalize(key, llm_result, series, horizon_months)
+    
+    def _release(self, key: str) -> None:
+        self._inflight.pop(key, None)
+        self._waiters.pop(key, None)
+        self._started.discard(key)
+    
+    def _on_done(self, key: str, task: asyncio.Task) -> None:
+        # 被取消的任务可能已被同键的新任务替换
+        if self._inflight.get(key) is task:
+            self._release(key)
+    
+    def _leave(self, key: str, task: asyncio.Task) -> None:
+        """等待方离开；已无人等待且仍在排队（未开始调用）的任务直接取消，不占用并发名额"""
+        if self._inflight.get(key) is not task:
+            return
+        remaining = self._waiters.get(key, 1) - 1
+        if remaining > 0:
+            self._waiters[key] = remaining
+            return
+        self._waiters.pop(key, None)
+        if not task.done() and key not in self._started:
+            self._release(key)
+            task.cancel()
+    
+    async def apredict(self, series: List[float], horizon_months: int,
+                       context: str = "", factors: List[str] = None,
+                       timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        异步预测：先查缓存，相同提示词的在途请求只发送一次；
+        timeout 为本次调用愿意等待的秒数（含排队），超时回退到统计预测，已发出的请求继续完成并写入缓存
+        """
+        if not series or len(series) < 3:
+            return self._insufficient_result(series, horizon_months)
+        try:
+            prompt = self._build_prediction_prompt(series, horizon_months, context, factors)
+            key = self.prompt_key(prompt)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.counters["cache_hits"] += 1
+                return {**copy.deepcopy(cached), "source": "cache"}
             
-            return result
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.create_task(self._fetch(key, prompt, series, horizon_months))
+                self._inflight[key] = task
+                task.add_done_callback(lambda t, k=key: self._on_done(k, t))
+            else:
+                self.counters["inflight_dedup"] += 1
             
+            # shield：单个调用方超时/取消不影响共享同一任务的其他调用方
+            self._waiters[key] = self._waiters.get(key, 0) + 1
+            try:
+                result = await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+            finally:
+                self._leave(key, task)
+            return {**copy.deepcopy(result), "source": "llm"}
+        
+        except asyncio.TimeoutError:
+            logger.debug("LLM预测超出时间预算，回退到统计预测")
+            return {**self._error_result(series, horizon_months, "超出时间预算"), "source": "fallback"}
         except Exception as e:
             logger.error(f"LLM预测失败: {e}")
-            # 回退到指数平滑
-            fallback_predictions = self._fallback_prediction(series, horizon_months)
-            return {
-                "predictions": fallback_predictions,
-                "confidence": 0.5,
-                "trend_analysis": f"LLM预测失败: {str(e)}",
-                "risk_factors": ["LLM服务异常"],
-                "recommendations": ["使用传统方法预测"],
-                "methodology": "LLM失败回退到指数平滑"
-            }
+            return {**self._error_result(series, horizon_months, str(e)), "source": "fallback"}
+    
+    async def iter_predict_batch(self, items: List[Dict[str, Any]],
+                                 budget_seconds: Optional[float] = None) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        批量异步预测，按完成顺序产出 (序号, 结果)
+        items: [{"series", "horizon_months", "context"?, "factors"?}]
+        并发受全局上限约束；整批超出 budget_seconds 后，尚未完成的序列逐条回退到统计预测
+        """
+        budget = LLM_PREDICT_BATCH_BUDGET_SECONDS if budget_seconds is None else budget_seconds
+        deadline = time.monotonic() + budget
+        
+        async def _one(index: int, item: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+            result = await self.apredict(
+                item["series"], item["horizon_months"], item.get("context", ""), item.get("factors"),
+                timeout=max(0.0, deadline - time.monotonic())
+            )
+            return index, result
+        
+        tasks = [asyncio.create_task(_one(i, item)) for i, item in enumerate(items)]
+        fallbacks = 0
+        try:
+            for finished in asyncio.as_completed(tasks):
+                index, result = await finished
+                fallbacks += result.get("source") == "fallback"
+                yield index, result
+            if fallbacks:
+                logger.warning(f"批量LLM预测: {fallbacks}/{len(items)} 条超出预算或失败，已回退到统计预测")
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def apredict_batch(self, items: List[Dict[str, Any]],
+                             budget_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+        """批量异步预测，按输入顺序返回"""
+        results: List[Dict[str, Any]] = [{} for _ in items]
+        async for index, result in self.iter_predict_batch(items, budget_seconds):
+            results[index] = result
+        return results
     
     def _generate_mock_prediction(self, series: List[float], horizon_months: int) -> str:
         """生成模拟的LLM预测结果（用于测试）"""
@@ -216,20 +373,14 @@ class LLMTimeSeriesPredictor:
         return json.dumps(mock_result, ensure_ascii=False, indent=2)
     
     def _fallback_prediction(self, series: List[float], horizon_months: int) -> List[float]:
-        """使用指数平滑作为备选预测方法"""
+        """使用指数平滑作为备选预测方法（简单预测器，带拟合缓存）"""
         try:
             if not series:
                 return [0.0] * horizon_months
             
-            # 如果statsmodels可用，使用指数平滑
-            if STATSMODELS_AVAILABLE:
-                model = ExponentialSmoothing(series, trend='add', seasonal=None)
-                fit_model = model.fit()
-                forecast = fit_model.forecast(horizon_months)
-                return forecast.tolist()
-            else:
-                # 备选方案：使用简单的移动平均和趋势
-                return self._simple_trend_prediction(series, horizon_months)
+            if len(series) >= 2:
+                return predict_simple(series, horizon_months)
+            return self._simple_trend_prediction(series, horizon_months)
             
         except Exception as e:
             logger.error(f"预测失败: {e}")
@@ -321,6 +472,25 @@ def predict_with_llm(series: List[float], horizon_months: int,
     return _llm_predictor.predict(series, horizon_months, context, factors)
 
 
+async def apredict_with_llm(series: List[float], horizon_months: int,
+                            context: str = "", factors: List[str] = None,
+                            timeout: Optional[float] = None) -> Dict[str, Any]:
+    """异步LLM预测（缓存 + 在途去重 + 并发上限）"""
+    return await _llm_predictor.apredict(series, horizon_months, context, factors, timeout)
+
+
+def iter_llm_predict_batch(items: List[Dict[str, Any]],
+                           budget_seconds: Optional[float] = None) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """批量异步LLM预测，按完成顺序产出 (序号, 结果)"""
+    return _llm_predictor.iter_predict_batch(items, budget_seconds)
+
+
+async def predict_with_llm_batch(items: List[Dict[str, Any]],
+                                 budget_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+    """批量异步LLM预测，按输入顺序返回"""
+    return await _llm_predictor.apredict_batch(items, budget_seconds)
+
+
 def train_llm_model(series: List[float], test_size: float = 0.2) -> Dict[str, Any]:
     """训练LLM模型（实际上是评估）"""
     return _llm_predictor.train_and_evaluate(series, test_size)
@@ -333,5 +503,9 @@ def get_llm_model_status() -> Dict[str, Any]:
         "provider": _llm_predictor.client.provider,
         "model": _llm_predictor.model,
         "use_real_llm": _llm_predictor.use_real_llm,
+        "concurrency": LLM_PREDICT_CONCURRENCY,
+        "inflight": len(_llm_predictor._inflight),
+        "counters": dict(_llm_predictor.counters),
+        "cache": _llm_predictor.cache.stats(),
         "available": True
     }
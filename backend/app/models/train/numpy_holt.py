@@ -0,0 +1,275 @@
+"""
+纯 NumPy 的 Holt / Holt-Winters（加法）指数平滑
+多条等长序列组成二维数组一次拟合：平滑系数用网格搜索 + 逐序列局部细化，
+初始状态（水平、趋势、季节项）对给定平滑系数是线性最小二乘问题，直接闭式求解
+"""
+
+import logging
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 粗网格点数（每个平滑系数）与细化轮数
+_HOLT_GRID = 15
+_HW_GRID = (8, 5, 5)
+_REFINE_ROUNDS = 2
+# 季节模型拟合时每批序列数，控制中间数组内存
+_HW_BATCH = 128
+
+
+class HoltFit(NamedTuple):
+    """一组序列的拟合结果，各字段首维为序列"""
+    alpha: np.ndarray
+    beta: np.ndarray
+    gamma: np.ndarray
+    level: np.ndarray
+    trend: np.ndarray
+    season: np.ndarray  # (S, m)，按 时间 % m 存放最近一个周期的季节项；无季节时 m=0
+    sse: np.ndarray
+    n_obs: np.ndarray  # (S,) 各行参与拟合的观测数
+    seasonal_periods: int
+
+    def forecast(self, horizon: int) -> np.ndarray:
+        """h 步预测：level + h * trend (+ 对应季节项)，返回 (S, horizon)"""
+        steps = np.arange(1, horizon + 1)
+        out = self.level[:, None] + self.trend[:, None] * steps
+        if self.seasonal_periods:
+            idx = (self.n_obs[:, None] + steps - 1) % self.seasonal_periods
+            out = out + np.take_along_axis(self.season, idx, axis=1)
+        return out
+
+
+def _n_init(m: int) -> int:
+    # 初始水平、趋势 + (m-1) 个自由季节项（第 m 个由和为0约束确定）
+    return 2 + (m - 1 if m else 0)
+
+
+def _impulse_states(shape: Tuple[int, ...], m: int) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """各初始参数的单位脉冲初态，末维为初始参数序号"""
+    k = _n_init(m)
+    level = np.zeros(shape + (k,))
+    trend = np.zeros(shape + (k,))
+    level[..., 0] = 1.0
+    trend[..., 1] = 1.0
+    season = None
+    if m:
+        season = np.zeros(shape + (k, m))
+        for i in range(m - 1):
+            season[..., 2 + i, i] = 1.0
+            season[..., 2 + i, m - 1] = -1.0
+    return level, trend, season
+
+
+def _fit_grid(
+    Y: np.ndarray, alpha: np.ndarray, beta: np.ndarray, gamma: Optional[np.ndarray], m: int,
+    ends: Optional[np.ndarray] = None,
+):
+    """
+    对每条序列、每组平滑系数求最优初态下的 SSE
+
+    Y: (S, T)；alpha/beta/gamma: (A, G)，A 为 1（全体共用网格）或 S（逐序列网格）
+    ends: (S,) 每行只使用前 ends[i] 个观测（滚动原点回测时各行为同一序列的不同截止点），
+    各行共享同一次递推，只在截止点处截取累计量与状态
+
+    一步预测误差对初态是仿射的：e_t = e_t^(y) + Σ_i θ_i e_t^(i)，
+    其中 e^(y) 为零初态下的数据误差，e^(i) 为第 i 个初态单位脉冲、y=0 时的误差（与序列无关），
+    于是 SSE(θ) 是二次型，θ* = -M⁻¹ r，SSE* = Σ e^(y)² + θ*·r
+    """
+    S, T = Y.shape
+    A, G = alpha.shape
+    k = _n_init(m)
+    a, b_ = alpha[..., None], beta[..., None]
+    ab = a * b_
+    g = gamma[..., None] if m else None
+
+    # 数据递推（零初态）
+    level = np.zeros((S, G))
+    trend = np.zeros((S, G))
+    season = np.zeros((S, G, m)) if m else None
+    # 脉冲递推
+    i_level, i_trend, i_season = _impulse_states((A, G), m)
+
+    # 有截止点时 M 随行不同
+    M = np.zeros((A if ends is None else S, G, k, k))
+    r = np.zeros((S, G, k))
+    yy = np.zeros((S, G))
+
+    if ends is not None:
+        T = int(ends.max())
+        snap = {
+            "level": np.zeros((S, G)), "trend": np.zeros((S, G)),
+            "i_level": np.zeros((S, G, k)), "i_trend": np.zeros((S, G, k)),
+        }
+        if m:
+            snap["season"] = np.zeros((S, G, m))
+            snap["i_season"] = np.zeros((S, G, k, m))
+
+    for t in range(T):
+        y = Y[:, t:t + 1]
+        if m:
+            j = t % m
+            err = y - (level + trend + season[:, :, j])
+            i_err = -(i_level + i_trend + i_season[..., j])
+        else:
+            err = y - (level + trend)
+            i_err = -(i_level + i_trend)
+
+        outer = i_err[..., :, None] * i_err[..., None, :]
+        if ends is None:
+            yy += err * err
+            r += err[..., None] * i_err
+            M += outer
+        else:
+            active = (t < ends)[:, None]
+            err_active = err * active
+            yy += err_active * err_active
+            r += err_active[..., None] * i_err
+            M += active[..., None, None] * outer
+
+        level = level + trend + alpha * err
+        trend = trend + alpha * beta * err
+        i_level = i_level + i_trend + a * i_err
+        i_trend = i_trend + ab * i_err
+        if m:
+            season[:, :, j] += gamma * err
+            i_season[..., j] += g * i_err
+
+        if ends is not None:
+            rows = np.flatnonzero(ends == t + 1)
+            if rows.size:
+                src = rows if A == S else np.zeros_like(rows)
+                snap["level"][rows] = level[rows]
+                snap["trend"][rows] = trend[rows]
+                snap["i_level"][rows] = i_level[src]
+                snap["i_trend"][rows] = i_trend[src]
+                if m:
+                    snap["season"][rows] = season[rows]
+                    snap["i_season"][rows] = i_season[src]
+
+    if ends is not None:
+        level, trend, i_level, i_trend = snap["level"], snap["trend"], snap["i_level"], snap["i_trend"]
+        if m:
+            season, i_season = snap["season"], snap["i_season"]
+
+    # 极小岭项保证可逆（序列过短或系数退化时）
+    ridge = (np.trace(M, axis1=-2, axis2=-1)[..., None, None] / k + 1.0) * 1e-10
+    M_inv = np.broadcast_to(np.linalg.inv(M + ridge * np.eye(k)), (S, G, k, k))
+    theta = -np.einsum("sgij,sgj->sgi", M_inv, r)
+    sse = yy + np.einsum("sgi,sgi->sg", theta, r)
+
+    final_level = level + np.einsum("sgi,sgi->sg", theta, np.broadcast_to(i_level, (S, G, k)))
+    final_trend = trend + np.einsum("sgi,sgi->sg", theta, np.broadcast_to(i_trend, (S, G, k)))
+    final_season = None
+    if m:
+        final_season = season + np.einsum("sgi,sgij->sgj", theta, np.broadcast_to(i_season, (S, G, k, m)))
+    return np.maximum(sse, 0.0), final_level, final_trend, final_season
+
+
+def _select(sse: np.ndarray, *arrays):
+    """按每条序列 SSE 最小的网格点取值"""
+    best = np.argmin(sse, axis=1)
+    rows = np.arange(sse.shape[0])
+    return best, [None if arr is None else arr[rows, best] for arr in arrays]
+
+
+def _local_grid(center: np.ndarray, step: float, points: int) -> np.ndarray:
+    """以 center (S,) 为中心、步长 step 的局部网格，截断到 [0, 1]，返回 (S, points)"""
+    offsets = (np.arange(points) - (points - 1) / 2) * step
+    return np.clip(center[:, None] + offsets[None, :], 0.0, 1.0)
+
+
+def _fit_block(Y: np.ndarray, m: int, ends: Optional[np.ndarray] = None) -> HoltFit:
+    S, T = Y.shape
+    if m:
+        axes = [np.linspace(0.0, 1.0, n) for n in _HW_GRID]
+    else:
+        axes = [np.linspace(0.0, 1.0, _HOLT_GRID)] * 2
+    mesh = np.meshgrid(*axes, indexing="ij")
+    grid = [p.reshape(1, -1) for p in mesh]
+    steps = [ax[1] - ax[0] for ax in axes]
+
+    sse, level, trend, season = _fit_grid(Y, grid[0], grid[1], grid[2] if m else None, m, ends)
+    _, (best_sse, best_level, best_trend, best_season, *best_params) = _select(
+        sse, sse, level, trend, season, *[np.broadcast_to(p, sse.shape) for p in grid]
+    )
+
+    # 逐序列在最优点附近加密网格
+    for _ in range(_REFINE_ROUNDS):
+        steps = [s / 2 for s in steps]
+        local_axes = [_local_grid(p, s, 3) for p, s in zip(best_params, steps)]
+        # (S, 3^d) 的逐序列网格
+        idx = np.stack(np.meshgrid(*[np.arange(3)] * len(local_axes), indexing="ij"), axis=-1).reshape(-1, len(local_axes))
+        local = [ax[:, idx[:, d]] for d, ax in enumerate(local_axes)]
+        sse, level, trend, season = _fit_grid(Y, local[0], local[1], local[2] if m else None, m, ends)
+        _, (cand_sse, cand_level, cand_trend, cand_season, *cand_params) = _select(sse, sse, level, trend, season, *local)
+        better = cand_sse < best_sse
+        best_sse = np.where(better, cand_sse, best_sse)
+        best_level = np.where(better, cand_level, best_level)
+        best_trend = np.where(better, cand_trend, best_trend)
+        if m:
+            best_season = np.where(better[:, None], cand_season, best_season)
+        best_params = [np.where(better, c, b) for c, b in zip(cand_params, best_params)]
+
+    return HoltFit(
+        alpha=best_params[0],
+        beta=best_params[1],
+        gamma=best_params[2] if m else np.zeros(S),
+        level=best_level,
+        trend=best_trend,
+        season=best_season if m else np.zeros((S, 0)),
+        sse=best_sse,
+        n_obs=np.full(S, T) if ends is None else ends.copy(),
+        seasonal_periods=m,
+    )
+
+
+def fit_holt(Y: np.ndarray, seasonal_periods: int = 0, window_ends: Optional[Sequence[int]] = None) -> HoltFit:
+    """
+    拟合一组等长序列
+
+    Args:
+        Y: (S, T) 或 (T,) 数组
+        seasonal_periods: 季节周期，0 表示无季节（Holt 线性趋势）
+        window_ends: 可选，(S,) 每行只用前 window_ends[i] 个观测拟合
+    """
+    Y = np.atleast_2d(np.asarray(Y, dtype=np.float64))
+    m = int(seasonal_periods or 0)
+    if m == 1:
+        m = 0
+    ends = None
+    if window_ends is not None:
+        ends = np.asarray(window_ends, dtype=np.int64)
+        if ends.shape != (Y.shape[0],) or ends.max() > Y.shape[1]:
+            raise ValueError("window_ends 需与序列行数一致且不超过序列长度")
+    n_min = int(Y.shape[1] if ends is None else ends.min())
+    if n_min < 2:
+        raise ValueError("序列长度至少为2")
+    if m and n_min < _n_init(m):
+        raise ValueError(f"序列长度不足以估计周期为{m}的季节项")
+    if not m or Y.shape[0] <= _HW_BATCH:
+        return _fit_block(Y, m, ends)
+    parts = [
+        _fit_block(Y[i:i + _HW_BATCH], m, None if ends is None else ends[i:i + _HW_BATCH])
+        for i in range(0, Y.shape[0], _HW_BATCH)
+    ]
+    return HoltFit(
+        *[np.concatenate([getattr(p, f) for p in parts]) for f in ("alpha", "beta", "gamma", "level", "trend", "season", "sse", "n_obs")],
+        seasonal_periods=m,
+    )
+
+
+def holt_forecast_batch(
+    series_list: Sequence[Sequence[float]], horizon: int, seasonal_periods: int = 0
+) -> List[List[float]]:
+    """多条（可不等长）序列批量预测：按长度分组后整组拟合"""
+    groups: Dict[int, List[int]] = {}
+    for i, series in enumerate(series_list):
+        groups.setdefault(len(series), []).append(i)
+    out: List[List[float]] = [[] for _ in series_list]
+    for _, indexes in groups.items():
+        fit = fit_holt(np.array([series_list[i] for i in indexes], dtype=np.float64), seasonal_periods)
+        for i, row in zip(indexes, fit.forecast(horizon).tolist()):
+            out[i] = row
+    return out
@@ -1,17 +1,94 @@
 """
 简化的预测器，不依赖TensorFlow
 使用指数平滑和简单统计方法进行时间序列预测
+默认使用内置 NumPy Holt/Holt-Winters 引擎，可通过 config/model_switch.py 切换为 statsmodels
 """
 
 import os
 import json
+import hashlib
 import logging
 from typing import List, Dict, Any, Optional, Tuple
-from statsmodels.tsa.holtwinters import ExponentialSmoothing
 import numpy as np
 
+from app.config.model_switch import ForecastEngine, global_switch
+from app.models.train.backtest import rolling_origin_backtest
+from app.models.train.numpy_holt import fit_holt
+from app.utils.cache.ttl_lru import TTLLRUCache
+
+# statsmodels 为可选依赖，仅在选择 statsmodels 引擎时使用
+try:
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+    STATSMODELS_AVAILABLE = True
+except ImportError:
+    STATSMODELS_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# 拟合参数缓存：同一序列（如看板刷新）重复预测时跳过重新拟合
+FIT_CACHE_SIZE = int(os.getenv("FORECAST_FIT_CACHE_SIZE", "4096"))
+FIT_CACHE_TTL_SECONDS = float(os.getenv("FORECAST_FIT_CACHE_TTL_SECONDS", "3600"))
+
+# 预测所用模型配置，参与缓存键计算；配置或引擎变化时旧缓存自然失效
+_PREDICT_MODEL_CONFIG = "ExponentialSmoothing:trend=add:seasonal=None"
+
+
+def series_fingerprint(series: List[float], config: str) -> str:
+    """序列取值（按float64）+ 模型配置的哈希"""
+    digest = hashlib.sha1(np.asarray(series, dtype=np.float64).tobytes())
+    digest.update(config.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def current_engine() -> ForecastEngine:
+    """当前预测引擎；选择了 statsmodels 但未安装时回退到 NumPy 引擎"""
+    engine = global_switch.forecast_engine
+    if engine == ForecastEngine.statsmodels and not STATSMODELS_AVAILABLE:
+        return ForecastEngine.numpy
+    return engine
+
+
+def fit_holt_state(series: List[float]) -> Tuple[float, float]:
+    """拟合加法趋势 Holt 模型，返回末期 (level, trend)"""
+    if current_engine() == ForecastEngine.statsmodels:
+        fit_model = ExponentialSmoothing(series, trend='add', seasonal=None).fit()
+        return float(np.asarray(fit_model.level)[-1]), float(np.asarray(fit_model.trend)[-1])
+    fit = fit_holt(np.asarray(series, dtype=np.float64))
+    return float(fit.level[0]), float(fit.trend[0])
+
+
+def fit_holt_states(series_list: List[List[float]]) -> List[Tuple[float, float]]:
+    """批量拟合 Holt 模型；NumPy 引擎按长度分组整组向量化拟合"""
+    if current_engine() == ForecastEngine.statsmodels:
+        return [fit_holt_state(series) for series in series_list]
+    groups: Dict[int, List[int]] = {}
+    for i, series in enumerate(series_list):
+        groups.setdefault(len(series), []).append(i)
+    states: List[Tuple[float, float]] = [(0.0, 0.0)] * len(series_list)
+    for indexes in groups.values():
+        fit = fit_holt(np.array([series_list[i] for i in indexes], dtype=np.float64))
+        for i, level, trend in zip(indexes, fit.level.tolist(), fit.trend.tolist()):
+            states[i] = (level, trend)
+    return states
+
+
+def forecast_holt_winters(series: List[float], horizon: int, seasonal_periods: int) -> Tuple[List[float], float]:
+    """拟合加法趋势 + 加法季节模型并预测，返回 (预测值, alpha)"""
+    if current_engine() == ForecastEngine.statsmodels:
+        fit_model = ExponentialSmoothing(
+            series, trend='add', seasonal='add', seasonal_periods=seasonal_periods
+        ).fit()
+        return fit_model.forecast(horizon).tolist(), float(fit_model.params.get('smoothing_level', 0.5))
+    fit = fit_holt(np.asarray(series, dtype=np.float64), seasonal_periods)
+    return fit.forecast(horizon)[0].tolist(), float(fit.alpha[0])
+
+def _backtest_summary(backtest: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """回测结果中返回给调用方的部分（去掉逐点的预测/实际对照）"""
+    if backtest is None:
+        return None
+    return {k: v for k, v in backtest.items() if k != "origin"}
+
+
 class SimpleTimeSeriesPredictor:
     """
     简化的时间序列预测器，使用指数平滑和统计方法
@@ -20,6 +97,8 @@ class SimpleTimeSeriesPredictor:
     def __init__(self):
         self.is_trained = False
         self.model_params = None
+        # 键: series_fingerprint，值: 拟合末期的 (level, trend)
+        self.fit_cache = TTLLRUCache(max_size=FIT_CACHE_SIZE, ttl_seconds=FIT_CACHE_TTL_SECONDS)
         
     def train(self, series: List[float], test_size: float = 0.2) -> Dict[str, Any]:
         """训练预测器"""
@@ -28,39 +107,30 @@ class SimpleTimeSeriesPredictor:
                 return {"is_trained": False, "error": "数据不足"}
             
             # 使用指数平滑
-            model = ExponentialSmoothing(
-                series, 
-                trend='add', 
-                seasonal='add', 
-                seasonal_periods=min(12, len(series) // 2)
-            )
-            fitted_model = model.fit()
+            _, alpha = forecast_holt_winters(series, 1, min(12, len(series) // 2))
             
-            # 简单评估
-            if len(series) > 6:
-                train_series = series[:-3]
-                test_series = series[-3:]
-                test_model = ExponentialSmoothing(
-                    train_series, 
-                    trend='add', 
-                    seasonal='add', 
-                    seasonal_periods=min(12, len(train_series) // 2)
+            # 滚动原点回测：末尾 test_size 部分的每个截止点都拟合一次并预测未来3步
+            min_train = max(6, int(len(series) * (1 - test_size)))
+            if len(series) > min_train:
+                backtest = rolling_origin_backtest(
+                    series, horizon=3, min_train=min_train,
+                    seasonal_periods=min(12, min_train // 2), engine=current_engine()
                 )
-                fitted_test = test_model.fit()
-                predictions = fitted_test.forecast(len(test_series))
-                
-                mae = np.mean(np.abs(np.array(test_series) - predictions))
-                mape = np.mean(np.abs((np.array(test_series) - predictions) / np.array(test_series))) * 100
+                mae, mape = backtest["mae"], backtest["mape"]
             else:
+                backtest = None
                 mae = 0.0
                 mape = 0.0
             
             self.model_params = {
                 "model_type": "ExponentialSmoothing",
-                "alpha": float(fitted_model.params.get('smoothing_level', 0.5)),
+                "engine": current_engine().value,
+                "alpha": alpha,
                 "mae": float(mae),
                 "mape": float(mape),
-                "is_accurate": mape < 5.0
+                "is_accurate": bool(mape < 5.0),
+                "is_trained": True,
+                "backtest": _backtest_summary(backtest)
             }
             self.is_trained = True
             
@@ -76,11 +146,14 @@ class SimpleTimeSeriesPredictor:
             if not series:
                 return [0.0] * horizon_months
             
-            # 使用指数平滑预测
-            model = ExponentialSmoothing(series, trend='add', seasonal=None)
-            fit_model = model.fit()
-            forecast = fit_model.forecast(horizon_months)
-            return forecast.tolist()
+            # 使用指数平滑预测；加法趋势的 h 步预测为 level + h * trend，缓存命中时只需 O(horizon)
+            key = series_fingerprint(series, f"{_PREDICT_MODEL_CONFIG}:{current_engine().value}")
+            params = self.fit_cache.get(key)
+            if params is None:
+                params = fit_holt_state(series)
+                self.fit_cache.set(key, params)
+            level, trend = params
+            return [level + trend * h for h in range(1, horizon_months + 1)]
             
         except Exception as e:
             logger.error(f"预测失败: {e}")
@@ -90,34 +163,50 @@ class SimpleTimeSeriesPredictor:
                 return [last_value] * horizon_months
             return [0.0] * horizon_months
     
+    def predict_batch(self, series_list: List[List[float]], horizons: List[int]) -> List[List[float]]:
+        """批量预测：未命中拟合缓存的序列一次性批量拟合"""
+        config = f"{_PREDICT_MODEL_CONFIG}:{current_engine().value}"
+        keys = [series_fingerprint(series, config) for series in series_list]
+        states = [self.fit_cache.get(key) for key in keys]
+        missing = [i for i, state in enumerate(states) if state is None]
+        if missing:
+            try:
+                fitted = fit_holt_states([series_list[i] for i in missing])
+            except Exception as e:
+                logger.warning(f"批量拟合失败，改为逐条预测: {e}")
+                return [self.predict(series, horizon) for series, horizon in zip(series_list, horizons)]
+            for i, state in zip(missing, fitted):
+                states[i] = state
+                self.fit_cache.set(keys[i], state)
+        return [
+            [level + trend * h for h in range(1, horizon + 1)]
+            for (level, trend), horizon in zip(states, horizons)
+        ]
+    
     def evaluate(self, series: List[float], test_size: float = 0.2) -> Dict[str, Any]:
-        """评估模型"""
+        """评估模型：滚动原点回测，不修改预测器的训练状态"""
         try:
             if len(series) < 6:
                 return {"mae": 0.0, "mape": 0.0, "is_accurate": False}
             
-            # 分割数据
-            split_index = int(len(series) * (1 - test_size))
-            train_series = series[:split_index]
-            test_series = series[split_index:]
-            
-            if len(test_series) == 0:
+            # 分割点之后的每个观测都作为一次截止点，预测步长不超过6
+            split_index = max(3, int(len(series) * (1 - test_size)))
+            if split_index >= len(series):
                 return {"mae": 0.0, "mape": 0.0, "is_accurate": False}
             
-            # 训练和预测
-            self.train(train_series)
-            predictions = self.predict(train_series, len(test_series))
-            
-            # 计算指标
-            mae = np.mean(np.abs(np.array(test_series) - np.array(predictions)))
-            mape = np.mean(np.abs((np.array(test_series) - np.array(predictions)) / np.array(test_series))) * 100
+            backtest = rolling_origin_backtest(
+                series, horizon=min(6, len(series) - split_index),
+                min_train=split_index, engine=current_engine()
+            )
+            origin = backtest["origin"]
             
             return {
-                "mae": float(mae),
-                "mape": float(mape),
-                "is_accurate": mape < 5.0,
-                "predictions": predictions,
-                "actuals": test_series
+                "mae": backtest["mae"],
+                "mape": backtest["mape"],
+                "is_accurate": backtest["is_accurate"],
+                "predictions": origin["predictions"],
+                "actuals": origin["actuals"],
+                "backtest": _backtest_summary(backtest)
             }
             
         except Exception as e:
@@ -134,11 +223,23 @@ def predict_simple(series: List[float], horizon_months: int) -> List[float]:
     return _predictor.predict(series, horizon_months)
 
 
+def predict_simple_batch(series_list: List[List[float]], horizons: List[int]) -> List[List[float]]:
+    """批量简单预测函数"""
+    return _predictor.predict_batch(series_list, horizons)
+
+
 def train_simple_model(series: List[float], test_size: float = 0.2) -> Dict[str, Any]:
     """训练简单模型"""
     return _predictor.train(series, test_size)
 
 
+def apply_training_result(model_params: Dict[str, Any]) -> None:
+    """将后台任务（子进程）中的训练结果同步到本进程的全局预测器"""
+    if model_params.get("is_trained"):
+        _predictor.model_params = model_params
+        _predictor.is_trained = True
+
+
 def evaluate_simple_model(series: List[float], test_size: float = 0.2) -> Dict[str, Any]:
     """评估简单模型"""
     return _predictor.evaluate(series, test_size)
@@ -150,5 +251,8 @@ def get_simple_model_status() -> Dict[str, Any]:
         "model_type": "Simple",
         "is_trained": _predictor.is_trained,
         "model_params": _predictor.model_params,
+        "forecast_engine": current_engine().value,
+        "statsmodels_available": STATSMODELS_AVAILABLE,
+        "fit_cache": _predictor.fit_cache.stats(),
         "available": True
     }
@@ -0,0 +1,59 @@
+"""
+模型训练后台任务登记表
+/train 提交后立即返回 job_id，训练在预测进程池中执行，调用方轮询任务状态；
+任务记录保存在共享状态后端（SHARED_STATE_BACKEND=sqlite 时多 worker 共享，轮询可落到任意进程），过期或超出容量后淘汰
+"""
+
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from app.utils.state.shared_state import get_state_backend
+
+TRAIN_JOB_TTL_SECONDS = float(os.getenv("TRAIN_JOB_TTL_SECONDS", "3600"))
+TRAIN_JOB_MAX_ENTRIES = int(os.getenv("TRAIN_JOB_MAX_ENTRIES", "1000"))
+
+# 任务状态
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+_jobs = get_state_backend().kv("jobs", max_size=TRAIN_JOB_MAX_ENTRIES, ttl_seconds=TRAIN_JOB_TTL_SECONDS)
+
+
+def create_job(kind: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """登记新任务，返回任务记录"""
+    job = {
+        "job_id": f"{kind}-{uuid.uuid4().hex[:12]}",
+        "kind": kind,
+        "status": PENDING,
+        "params": params or {},
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "result": None,
+        "error": None,
+    }
+    _jobs.set(job["job_id"], job)
+    return job
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    job = _jobs.get(job_id)
+    return dict(job) if job else None
+
+
+def update_job(job_id: str, **fields: Any) -> None:
+    """更新任务字段；状态切换时自动记录开始/结束时间"""
+    status = fields.get("status")
+    if status == RUNNING:
+        fields.setdefault("started_at", time.time())
+    elif status in (COMPLETED, FAILED):
+        fields.setdefault("finished_at", time.time())
+    _jobs.update(job_id, lambda job: dict(job, **fields) if job is not None else None)
+
+
+def get_job_stats() -> Dict[str, Any]:
+    return _jobs.stats()
@@ -6,17 +6,46 @@
 负责批量任务与结果的持久化访问
 """
 
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from itertools import islice
 import json
+import os
 import sqlite3
+import time
 from datetime import datetime
 
 from app.db.sqlite_db import get_sqlite_db
 
+# 单次 executemany 行数；整批仍在同一事务内提交
+INSERT_CHUNK_SIZE = int(os.getenv("BATCH_PRICING_INSERT_CHUNK", "50000"))
+
+_RESULT_COLUMNS = (
+    "trace_id, row_index, material_code, material_name, specification, process_requirements, "
+    "quantity, uom, estimated_price, currency, status, reason_or_notes, rule_version, extra_json"
+)
+_RESULT_PLACEHOLDERS = ", ".join(["?"] * 14)
+# 语句文本保持不变，sqlite3 的语句缓存即可复用预编译结果
+_INSERT_RESULTS_SQL = f"INSERT INTO pricing_batch_results({_RESULT_COLUMNS}) VALUES({_RESULT_PLACEHOLDERS})"
+
+
+def _result_tuples(trace_id: str, rows: Iterable[Dict]) -> Iterator[Tuple]:
+    """按列顺序惰性生成参数元组，仅对 dict/list 类型的 extra_json 做序列化"""
+    dumps = json.dumps
+    for r in rows:
+        get = r.get
+        extra = get('extra_json')
+        if isinstance(extra, (dict, list)):
+            extra = dumps(extra, ensure_ascii=False)
+        yield (
+            trace_id, get('row_index'), get('material_code'), get('material_name'), get('specification'),
+            get('process_requirements'), get('quantity'), get('uom'), get('estimated_price'), get('currency'),
+            get('status'), get('reason_or_notes'), get('rule_version'), extra,
+        )
+
 
 class BatchPricingRepository:
-    def __init__(self) -> None:
-        self.db = get_sqlite_db().conn
+    def __init__(self, conn: Optional[sqlite3.Connection] = None) -> None:
+        self.db = conn if conn is not None else get_sqlite_db().conn
 
     def create_task(self, trace_id: str, task_name: Optional[str], source_file_name: str, total_rows: int, normalized_columns: List[str], source_file_path: Optional[str]) -> None:
         cur = self.db.cursor()
@@ -55,38 +84,41 @@ class BatchPricingRepository:
         row = cur.fetchone()
         return dict(row) if row else None
 
-    def insert_results(self, trace_id: str, rows: List[Dict]) -> None:
-        if not rows:
-            return
+    def insert_results(self, trace_id: str, rows: Iterable[Dict], chunk_size: Optional[int] = None) -> Dict:
+        """
+        批量写入核价结果：整批在一个事务内提交，复用同一条预编译语句
+
+        Args:
+            trace_id: 批量任务ID
+            rows: 结果行，可为生成器（边算边写，内存占用与 chunk_size 相关）
+            chunk_size: 每次 executemany 的行数，默认取 BATCH_PRICING_INSERT_CHUNK；
+                        中途失败时整批回滚，正式表不会留下半批数据
+
+        Returns:
+            {"rows": 写入行数, "seconds": 耗时, "rows_per_sec": 吞吐}
+        """
+        chunk_size = chunk_size or INSERT_CHUNK_SIZE
+        start = time.perf_counter()
+        values = _result_tuples(trace_id, rows)
+        written = 0
         cur = self.db.cursor()
-        sql = (
-            """
-            INSERT INTO pricing_batch_results(
-                trace_id, row_index, material_code, material_name, specification, process_requirements,
-                quantity, uom, estimated_price, currency, status, reason_or_notes, rule_version, extra_json
-            ) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-        )
-        values = [
-            (
-                trace_id,
-                r.get('row_index'),
-                r.get('material_code'),
-                r.get('material_name'),
-                r.get('specification'),
-                r.get('process_requirements'),
-                r.get('quantity'),
-                r.get('uom'),
-                r.get('estimated_price'),
-                r.get('currency'),
-                r.get('status'),
-                r.get('reason_or_notes'),
-                r.get('rule_version'),
-                json.dumps(r.get('extra_json'), ensure_ascii=False) if isinstance(r.get('extra_json'), (dict, list)) else r.get('extra_json')
-            ) for r in rows
-        ]
-        cur.executemany(sql, values)
-        self.db.commit()
+        try:
+            while True:
+                chunk = list(islice(values, chunk_size))
+                if not chunk:
+                    break
+                cur.executemany(_INSERT_RESULTS_SQL, chunk)
+                written += len(chunk)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        elapsed = time.perf_counter() - start
+        return {
+            "rows": written,
+            "seconds": round(elapsed, 4),
+            "rows_per_sec": int(written / elapsed) if elapsed > 0 else written,
+        }
 
     def list_results(self, trace_id: str, status: Optional[str], page: int, size: int) -> Dict:
         cur = self.db.cursor()
@@ -2,7 +2,7 @@
 核价数据访问层
 """
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import uuid
 import json
@@ -12,6 +12,8 @@ from ..schemas.pricing import (
     PricingRule, PricingHistory, ComplexityLevel, PricingStatus
 )
 from ..db.mongo import get_db
+from ..utils.pricing.material_index import get_material_index, get_material_index_cache
+from ..utils.cache.response_cache import MATERIALS, PRICING_RESULTS, bump_table_version
 
 logger = logging.getLogger(__name__)
 
@@ -52,11 +54,48 @@ class PricingRepository:
                 # Memory database
                 self.materials_collection.insert_one(material_dict)
             
-            return MaterialData(**material_dict)
+            material = MaterialData(**material_dict)
+            self._material_index().add(material.id, material, **self._index_fields(material_dict))
+            self._materials_changed()
+            return material
         except Exception as e:
             logger.error(f"创建物料数据失败: {e}")
             raise
     
+    async def update_material(self, material_id: str, material: MaterialData) -> bool:
+        """更新物料数据，同步更新检索索引"""
+        try:
+            material_dict = material.dict(exclude={"id", "created_at"})
+            material_dict["updated_at"] = datetime.now()
+            result = self.materials_collection.update_one({"id": material_id}, {"$set": material_dict})
+            updated = getattr(result, "modified_count", 1) > 0
+            if updated:
+                material = material.copy(update={"id": material_id, "updated_at": material_dict["updated_at"]})
+                self._material_index().add(material_id, material, **self._index_fields(material_dict))
+                self._materials_changed()
+            return updated
+        except Exception as e:
+            logger.error(f"更新物料数据失败: {e}")
+            raise
+    
+    async def delete_material(self, material_id: str) -> bool:
+        """删除物料数据，同步移出检索索引"""
+        try:
+            result = self.materials_collection.delete_one({"id": material_id})
+            deleted = getattr(result, "deleted_count", 1) > 0
+            if deleted:
+                self._material_index().remove(material_id)
+                self._materials_changed()
+            return deleted
+        except Exception as e:
+            logger.error(f"删除物料数据失败: {e}")
+            raise
+    
+    @staticmethod
+    def _materials_changed() -> None:
+        """递增共享物料版本号：其他 worker 的索引据此重建；本进程已增量更新，认领新版本不重建"""
+        get_material_index_cache().note_write(bump_table_version(MATERIALS)[0])
+    
     async def get_materials(self, skip: int = 0, limit: int = 100) -> List[MaterialData]:
         """获取物料列表"""
         try:
@@ -93,6 +132,7 @@ class PricingRepository:
             else:
                 # Memory database
                 self.pricing_results_collection.insert_one(result_dict)
+            bump_table_version(PRICING_RESULTS)
             
             return PricingResult(**result_dict)
         except Exception as e:
@@ -119,6 +159,7 @@ class PricingRepository:
                 # Memory database
                 for result_dict in result_dicts:
                     self.pricing_results_collection.insert_one(result_dict)
+            bump_table_version(PRICING_RESULTS)
             
             return [PricingResult(**rd) for rd in result_dicts]
         except Exception as e:
@@ -169,6 +210,7 @@ class PricingRepository:
                     {"id": result_id}, 
                     {"$set": update_data}
                 )
+                bump_table_version(PRICING_RESULTS)
                 return result.modified_count > 0
             else:
                 # Memory database
@@ -176,6 +218,7 @@ class PricingRepository:
                     {"id": result_id}, 
                     {"$set": update_data}
                 )
+                bump_table_version(PRICING_RESULTS)
                 return True
         except Exception as e:
             logger.error(f"更新核价结果状态失败: {e}")
@@ -294,6 +337,25 @@ class PricingRepository:
             logger.error(f"保存核价历史失败: {e}")
             raise
     
+    async def batch_save_pricing_history(self, histories: List[PricingHistory]) -> int:
+        """批量保存核价历史记录（insert_many 一次写入）"""
+        try:
+            if not histories:
+                return 0
+            now = datetime.now()
+            history_dicts = []
+            for history in histories:
+                history_dict = history.dict()
+                history_dict["id"] = str(uuid.uuid4())
+                history_dict["created_at"] = now
+                history_dicts.append(history_dict)
+            
+            result = self.pricing_history_collection.insert_many(history_dicts)
+            return len(result.inserted_ids)
+        except Exception as e:
+            logger.error(f"批量保存核价历史失败: {e}")
+            raise
+    
     async def batch_update_pricing_status(self, result_ids: List[str], status: PricingStatus, approved_by: str = None) -> int:
         """批量更新核价结果状态"""
         try:
@@ -307,75 +369,83 @@ class PricingRepository:
                 if approved_by:
                     update_data["approved_by"] = approved_by
             
-            if hasattr(self.pricing_results_collection, 'update_many'):
-                # MongoDB
-                result = self.pricing_results_collection.update_many(
-                    {"id": {"$in": result_ids}}, 
-                    {"$set": update_data}
-                )
-                return result.modified_count
-            else:
-                # Memory database
-                updated_count = 0
-                for result_id in result_ids:
-                    self.pricing_results_collection.update_one(
-                        {"id": result_id}, 
-                        {"$set": update_data}
-                    )
-                    updated_count += 1
-                return updated_count
+            if not result_ids:
+                return 0
+            
+            # MongoDB / SQLite / 内存库均支持 update_many + $in，单条语句完成批量更新
+            result = self.pricing_results_collection.update_many(
+                {"id": {"$in": list(result_ids)}}, 
+                {"$set": update_data}
+            )
+            bump_table_version(PRICING_RESULTS)
+            return result.modified_count
         except Exception as e:
             logger.error(f"批量更新核价结果状态失败: {e}")
             return 0
     
-    async def search_materials(
+    @staticmethod
+    def _doc_to_material(doc: Dict[str, Any]) -> MaterialData:
+        """数据库文档转物料对象（SQLite 中工艺要求以JSON文本存储）"""
+        doc = dict(doc)
+        if "_id" in doc:
+            doc["id"] = str(doc.get("id") or doc.pop("_id"))
+            doc.pop("_id", None)
+        process = doc.get("process_requirements")
+        if isinstance(process, str):
+            try:
+                doc["process_requirements"] = json.loads(process) if process else []
+            except ValueError:
+                doc["process_requirements"] = [p.strip() for p in process.split(",") if p.strip()]
+        return MaterialData(**doc)
+    
+    @staticmethod
+    def _index_fields(doc: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "material_name": doc.get("material_name"),
+            "specification": doc.get("specification"),
+            "process_requirements": doc.get("process_requirements"),
+            "material_code": doc.get("material_code"),
+        }
+    
+    def _material_index(self):
+        """物料检索索引（从物料表全量构建，本进程的增删改增量更新；其他进程写入或 TTL 到期后重建）"""
+        def _load():
+            for doc in self.materials_collection.find({}):
+                try:
+                    material = self._doc_to_material(doc)
+                except Exception as e:
+                    logger.warning(f"物料索引跳过无效记录 {doc.get('id')}: {e}")
+                    continue
+                yield material.id, material, self._index_fields(material.dict())
+        
+        return get_material_index(_load)
+    
+    async def search_materials_ranked(
         self, 
         material_name: Optional[str] = None,
         specification: Optional[str] = None,
         keyword: Optional[str] = None,
         limit: int = 20
-    ) -> List[MaterialData]:
-        """搜索物料数据"""
+    ) -> List[Tuple[MaterialData, float]]:
+        """搜索物料数据，返回按相关度降序的 (物料, 相关度分数)"""
         try:
-            query = {}
-            
-            # 构建查询条件
-            if material_name:
-                query["material_name"] = {"$regex": material_name, "$options": "i"}
-            
-            if specification:
-                query["specification"] = {"$regex": specification, "$options": "i"}
-            
-            if keyword:
-                # 关键词搜索：在物料名称、规格、工艺要求中搜索
-                query["$or"] = [
-                    {"material_name": {"$regex": keyword, "$options": "i"}},
-                    {"specification": {"$regex": keyword, "$options": "i"}},
-                    {"process_requirements": {"$regex": keyword, "$options": "i"}}
-                ]
-            
-            # 执行查询
-            if hasattr(self.materials_collection, 'find'):
-                # MongoDB
-                cursor = self.materials_collection.find(query).limit(limit)
-                materials = []
-                for doc in cursor:
-                    # 转换MongoDB文档为MaterialData对象
-                    doc["id"] = str(doc.get("_id", doc.get("id")))
-                    materials.append(MaterialData(**doc))
-                return materials
-            else:
-                # Memory数据库或SQLite
-                all_materials = self.materials_collection.find(query)
-                materials = []
-                count = 0
-                for doc in all_materials:
-                    if count >= limit:
-                        break
-                    materials.append(MaterialData(**doc))
-                    count += 1
-                return materials
-                
+            return self._material_index().search(
+                material_name=material_name,
+                specification=specification,
+                keyword=keyword,
+                limit=limit
+            )
         except Exception as e:
             logger.error(f"搜索物料数据失败: {e}")
-            return []
\ No newline at end of file
+            return []
+    
+    async def search_materials(
+        self, 
+        material_name: Optional[str] = None,
+        specification: Optional[str] = None,
+        keyword: Optional[str] = None,
+        limit: int = 20
+    ) -> List[MaterialData]:
+        """搜索物料数据（按相关度排序）"""
+        ranked = await self.search_materials_ranked(material_name, specification, keyword, limit)
+        return [material for material, _ in ranked]
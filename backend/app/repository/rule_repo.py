@@ -1,5 +1,6 @@
 from typing import Any, Dict, List, Optional
 from ..db.mongo import get_db
+from ..utils.cache.response_cache import PROCESS_RULES, bump_table_version
 import logging
 
 logger = logging.getLogger(__name__)
@@ -35,6 +36,7 @@ def create_rule(rule: Dict[str, Any]) -> str:
     try:
         db = get_db()
         res = db.process_rules.insert_one(rule)
+        bump_table_version(PROCESS_RULES)
         return str(res.inserted_id)
     except Exception as e:
         logger.error(f"MongoDB connection failed: {e}")
@@ -46,6 +48,7 @@ def update_rule(rule_id: str, patch: Dict[str, Any]) -> bool:
         from bson import ObjectId
         db = get_db()
         res = db.process_rules.update_one({"_id": ObjectId(rule_id)}, {"$set": patch})
+        bump_table_version(PROCESS_RULES)
         return res.modified_count > 0
     except Exception as e:
         logger.error(f"MongoDB connection failed: {e}")
@@ -57,6 +60,7 @@ def delete_rule(rule_id: str) -> bool:
         from bson import ObjectId
         db = get_db()
         res = db.process_rules.delete_one({"_id": ObjectId(rule_id)})
+        bump_table_version(PROCESS_RULES)
         return res.deleted_count > 0
     except Exception as e:
         logger.error(f"MongoDB connection failed: {e}")
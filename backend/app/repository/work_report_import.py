@@ -0,0 +1,391 @@
+"""
+报工数据分块导入
+- 输入为按块产出的 DataFrame（Excel 流式读取或字典列表），每块向量化完成日期/工时/状态转换，
+  员工/项目/部门名称经实体字典映射为 id
+- 不合法的行不入库，记入行级错误报告（行号、列、值、原因），其余行每块一个事务批量写入
+- 每行按 (员工, 项目, 日期, 工时, 内容) 计算自然键，唯一索引 + ON CONFLICT 保证重复导入幂等：
+  skip 模式跳过已存在的行，update 模式更新其部门/地点/状态
+- 使用独立的 SQLite 连接，块事务不会与其他请求在共享连接上的提交交错
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..db.sqlite_db import get_sqlite_db
+from ..utils.cache.entity_cache import DEPARTMENT, EMPLOYEE, PROJECT, get_entity_cache
+from ..utils.cache.response_cache import WORK_REPORTS, bump_table_version
+from ..utils.parsers.excel_stream import ROW_COLUMN, iter_excel_chunks, iter_record_chunks
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = int(os.getenv("WORK_REPORT_IMPORT_CHUNK", "5000"))
+# 错误报告最多保留的条目数（错误行数仍完整计数）
+IMPORT_MAX_ERRORS = int(os.getenv("WORK_REPORT_IMPORT_MAX_ERRORS", "1000"))
+
+_HEADER_ALIASES = {
+    "员工姓名": "employee_name", "员工": "employee_name", "姓名": "employee_name",
+    "员工id": "employee_id", "员工编号": "employee_id",
+    "项目名称": "project_name", "项目": "project_name",
+    "项目id": "project_id", "项目编号": "project_id",
+    "部门名称": "department_name", "部门": "department_name",
+    "部门id": "department_id", "部门编号": "department_id",
+    "报工日期": "report_date", "日期": "report_date",
+    "工作时长": "work_hours", "工时": "work_hours", "时长": "work_hours",
+    "工作内容": "work_content", "内容": "work_content",
+    "工作地点": "work_location", "地点": "work_location",
+    "状态": "status",
+}
+
+_STATUS_ALIASES = {"待审核": "pending", "已通过": "approved", "已驳回": "rejected"}
+_VALID_STATUS = {"pending", "approved", "rejected"}
+
+# kind => (id 列, 名称列, 报错用中文名)
+_ENTITY_COLUMNS = (
+    (EMPLOYEE, "employee_id", "employee_name", "员工"),
+    (PROJECT, "project_id", "project_name", "项目"),
+    (DEPARTMENT, "department_id", "department_name", "部门"),
+)
+
+# 导入模式：skip 已存在的行保持不变；update 以新数据覆盖非键字段
+IMPORT_MODES = ("skip", "update")
+
+_INSERT_COLUMNS = (
+    "id", "employee_id", "project_id", "department_id", "report_date", "work_hours",
+    "work_content", "work_location", "status", "created_at", "updated_at", "natural_key",
+)
+_INSERT_SQL = (
+    f"INSERT INTO work_reports ({', '.join(_INSERT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(_INSERT_COLUMNS))})"
+)
+_UPSERT_SQL = {
+    "skip": f"{_INSERT_SQL} ON CONFLICT(natural_key) DO NOTHING",
+    # 非键字段无变化时不改写，rowcount 只统计真正插入或更新的行；表中未填地点时保留原值
+    "update": (
+        f"{_INSERT_SQL} ON CONFLICT(natural_key) DO UPDATE SET "
+        "department_id = excluded.department_id, "
+        "work_location = COALESCE(excluded.work_location, work_location), "
+        "status = excluded.status, updated_at = excluded.updated_at "
+        "WHERE (department_id, work_location, status) IS NOT "
+        "(excluded.department_id, COALESCE(excluded.work_location, work_location), excluded.status)"
+    ),
+}
+_KEY_LOOKUP_BATCH = 500
+# Excel（1900 日期系统）序列日期的起点与上限（9999-12-31 之后）
+_EXCEL_EPOCH = "1899-12-30"
+_EXCEL_SERIAL_MAX = 2958466
+
+
+def normalize_header(header: str) -> str:
+    h = (header or "").strip()
+    return _HEADER_ALIASES.get(h.lower(), _HEADER_ALIASES.get(h, h.lower()))
+
+
+def _column(frame: pd.DataFrame, name: str) -> pd.Series:
+    if name in frame.columns:
+        return frame[name]
+    return pd.Series([None] * len(frame), index=frame.index, dtype=object)
+
+
+def _text(series: pd.Series) -> pd.Series:
+    """去除首尾空白，空串视为缺失；结果为 object 列，缺失值为 None"""
+    s = series.astype("string").str.strip()
+    s = s.mask(s == "")
+    return s.astype(object).where(s.notna(), None)
+
+
+def _is_number(value: Any) -> bool:
+    return pd.api.types.is_number(value) and not isinstance(value, (bool, np.bool_))
+
+
+def _dates(series: pd.Series) -> pd.Series:
+    """解析报工日期；数值单元格（常规格式的日期、openpyxl 读出的整数）按 Excel 序列日期换算，
+    不能交给 to_datetime（会被当作纪元纳秒解析成 1970-01-01），超出合理范围的数值记为无效"""
+    if pd.api.types.is_bool_dtype(series):
+        numeric = pd.Series(False, index=series.index)
+    elif pd.api.types.is_numeric_dtype(series):
+        numeric = series.notna()
+    else:
+        numeric = series.map(_is_number)
+    parsed = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+    if numeric.any():
+        serials = pd.to_numeric(series[numeric], errors="coerce")
+        serials = serials.where((serials >= 1) & (serials < _EXCEL_SERIAL_MAX))
+        parsed[numeric] = pd.to_datetime(serials, unit="D", origin=_EXCEL_EPOCH)
+    text = ~numeric & series.notna()
+    if text.any():
+        values = series[text]
+        converted = pd.to_datetime(values, errors="coerce")
+        retry = converted.isna()
+        if retry.any():
+            # 同一列混有多种日期写法时，按首个值推断出的格式会把其余写法判为无效，逐格式重试
+            converted[retry] = pd.to_datetime(values[retry].astype(str), errors="coerce", format="mixed")
+        parsed[text] = converted
+    return parsed
+
+
+def natural_keys(
+    employee_ids: pd.Series,
+    project_ids: pd.Series,
+    report_dates: pd.Series,
+    work_hours: pd.Series,
+    work_contents: pd.Series,
+) -> List[str]:
+    """自然键：日期为 YYYY-MM-DD 字符串，工时保留两位小数，内容去首尾空白"""
+    joined = (
+        employee_ids.astype(str) + "\x1f" + project_ids.astype(str) + "\x1f" + report_dates.astype(str)
+        + "\x1f" + pd.to_numeric(work_hours).round(2).map("{:.2f}".format)
+        + "\x1f" + work_contents.fillna("").astype(str).str.strip()
+    )
+    return [hashlib.blake2b(v.encode("utf-8"), digest_size=16).hexdigest() for v in joined.tolist()]
+
+
+class ImportErrors:
+    """行级错误报告：完整计数，明细按上限截断"""
+
+    def __init__(self, limit: int = IMPORT_MAX_ERRORS) -> None:
+        self.limit = limit
+        self.count = 0
+        self.items: List[Dict[str, Any]] = []
+
+    def add(self, rows: pd.Series, values: pd.Series, column: str, reason: str) -> None:
+        self.count += len(rows)
+        room = self.limit - len(self.items)
+        if room <= 0:
+            return
+        for row, value in zip(rows.iloc[:room].tolist(), values.iloc[:room].tolist()):
+            self.items.append({
+                "row": int(row),
+                "column": column,
+                "value": None if value is None or (isinstance(value, float) and pd.isna(value)) else str(value),
+                "error": reason,
+            })
+
+    def add_chunk(self, first_row: int, last_row: int, rows: int, reason: str) -> None:
+        """整块写入失败：只记一条明细，计数按块内待写入行数"""
+        self.count += rows
+        if len(self.items) < self.limit:
+            self.items.append({"row": first_row, "last_row": last_row, "column": None, "value": None, "error": reason})
+
+
+def coerce_chunk(frame: pd.DataFrame, errors: ImportErrors) -> List[Tuple[Any, ...]]:
+    """整块类型转换与校验，返回待写入的行元组；不合法行写入 errors"""
+    rows = _column(frame, ROW_COLUMN)
+    bad = pd.Series(False, index=frame.index)
+    cache = get_entity_cache()
+
+    resolved: Dict[str, pd.Series] = {}
+    for kind, id_column, name_column, label in _ENTITY_COLUMNS:
+        ids = _text(_column(frame, id_column))
+        known = ids.isin(cache.known_ids(kind))
+        unknown_id = ids.notna() & ~known
+        if unknown_id.any():
+            errors.add(rows[unknown_id], ids[unknown_id], id_column, f"{label}ID不存在")
+            bad |= unknown_id
+        names = _text(_column(frame, name_column))
+        by_name = names.map(cache.name_map(kind))
+        need_name = ids.isna()
+        unknown_name = need_name & names.notna() & by_name.isna()
+        if unknown_name.any():
+            errors.add(rows[unknown_name], names[unknown_name], name_column, f"{label}不存在")
+            bad |= unknown_name
+        missing = need_name & names.isna()
+        if missing.any():
+            errors.add(rows[missing], names[missing], name_column, f"缺少{label}")
+            bad |= missing
+        resolved[id_column] = ids.where(ids.notna(), by_name)
+
+    raw_dates = _column(frame, "report_date")
+    dates = _dates(raw_dates)
+    invalid_date = dates.isna()
+    if invalid_date.any():
+        errors.add(rows[invalid_date], raw_dates[invalid_date], "report_date", "报工日期缺失或格式错误")
+        bad |= invalid_date
+
+    raw_hours = _column(frame, "work_hours")
+    hours = pd.to_numeric(raw_hours, errors="coerce")
+    invalid_hours = hours.isna() | (hours < 0) | (hours > 24)
+    if invalid_hours.any():
+        errors.add(rows[invalid_hours], raw_hours[invalid_hours], "work_hours", "工作时长需为 0~24 的数字")
+        bad |= invalid_hours
+
+    status = _text(_column(frame, "status")).replace(_STATUS_ALIASES)
+    status = status.where(status.notna(), "pending")
+    invalid_status = ~status.isin(_VALID_STATUS)
+    if invalid_status.any():
+        errors.add(rows[invalid_status], status[invalid_status], "status", "状态仅支持 pending/approved/rejected")
+        bad |= invalid_status
+
+    good = ~bad
+    count = int(good.sum())
+    if not count:
+        return []
+    prefix = uuid.uuid4().hex[:16]
+    now = datetime.now().isoformat()
+    employee_ids = resolved["employee_id"][good]
+    project_ids = resolved["project_id"][good]
+    report_dates = dates[good].dt.strftime("%Y-%m-%d")
+    work_hours = hours[good].astype(float)
+    work_contents = _text(_column(frame, "work_content"))[good]
+    return list(zip(
+        [f"{prefix}{i:08x}" for i in range(count)],
+        employee_ids.tolist(),
+        project_ids.tolist(),
+        resolved["department_id"][good].tolist(),
+        report_dates.tolist(),
+        work_hours.tolist(),
+        work_contents.tolist(),
+        _text(_column(frame, "work_location"))[good].tolist(),
+        status[good].tolist(),
+        [now] * count,
+        [now] * count,
+        natural_keys(employee_ids, project_ids, report_dates, work_hours, work_contents),
+    ))
+
+
+def backfill_natural_keys(conn: sqlite3.Connection, batch_size: int = IMPORT_CHUNK_SIZE) -> int:
+    """为尚无自然键的存量/手工录入行补算自然键；与已有行重复的保持为空（UPDATE OR IGNORE）"""
+    cur = conn.cursor()
+    last_rowid = 0
+    keyed = 0
+    while True:
+        rows = cur.execute(
+            "SELECT rowid, employee_id, project_id, report_date, work_hours, work_content FROM work_reports "
+            "WHERE natural_key IS NULL AND rowid > ? ORDER BY rowid LIMIT ?",
+            (last_rowid, batch_size),
+        ).fetchall()
+        if not rows:
+            break
+        frame = pd.DataFrame(rows, columns=["rowid", "employee_id", "project_id", "report_date", "work_hours", "work_content"])
+        keys = natural_keys(
+            frame["employee_id"], frame["project_id"], frame["report_date"].astype(str).str[:10],
+            frame["work_hours"], _text(frame["work_content"]),
+        )
+        cur.executemany("UPDATE OR IGNORE work_reports SET natural_key = ? WHERE rowid = ?", zip(keys, frame["rowid"].tolist()))
+        keyed += cur.rowcount
+        conn.commit()
+        last_rowid = int(frame["rowid"].iloc[-1])
+    if keyed:
+        logger.info(f"已为 {keyed} 条报工记录补算自然键")
+    return keyed
+
+
+def open_import_connection() -> sqlite3.Connection:
+    return sqlite3.connect(get_sqlite_db().db_path, timeout=30)
+
+
+class WorkReportImporter:
+    """分块导入执行器；progress 回调在每块提交后收到当前统计"""
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        max_errors: int = IMPORT_MAX_ERRORS,
+        mode: str = "skip",
+    ) -> None:
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"不支持的导入模式: {mode}")
+        self.conn = conn
+        self.progress = progress
+        self.mode = mode
+        self.errors = ImportErrors(max_errors)
+        self.stats: Dict[str, Any] = {"rows": 0, "inserted": 0, "updated": 0, "skipped": 0, "failed": 0, "chunks": 0}
+
+    def _existing_keys(self, cur: sqlite3.Cursor, keys: List[str]) -> set:
+        existing = set()
+        for i in range(0, len(keys), _KEY_LOOKUP_BATCH):
+            batch = keys[i:i + _KEY_LOOKUP_BATCH]
+            cur.execute(
+                f"SELECT natural_key FROM work_reports WHERE natural_key IN ({', '.join('?' * len(batch))})", batch
+            )
+            existing.update(row[0] for row in cur.fetchall())
+        return existing
+
+    def _write_chunk(self, cur: sqlite3.Cursor, records: List[Tuple[Any, ...]]) -> Tuple[int, int, int]:
+        """返回 (插入, 更新, 跳过)；同一块内重复的行也按冲突处理"""
+        if self.mode == "update":
+            keys = [r[-1] for r in records]
+            new_keys = len(set(keys) - self._existing_keys(cur, keys))
+            cur.executemany(_UPSERT_SQL["update"], records)
+            changed = cur.rowcount
+            return new_keys, changed - new_keys, len(records) - changed
+        cur.executemany(_UPSERT_SQL["skip"], records)
+        return cur.rowcount, 0, len(records) - cur.rowcount
+
+    def run(self, chunks: Iterable[pd.DataFrame]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        backfill_natural_keys(self.conn)
+        cur = self.conn.cursor()
+        for frame in chunks:
+            errors_before = self.errors.count
+            records = coerce_chunk(frame, self.errors)
+            rows = len(frame)
+            inserted = updated = skipped = 0
+            try:
+                if records:
+                    inserted, updated, skipped = self._write_chunk(cur, records)
+                self.conn.commit()
+                if inserted or updated:
+                    bump_table_version(WORK_REPORTS)
+            except Exception as e:
+                self.conn.rollback()
+                logger.error(f"报工导入第 {self.stats['chunks'] + 1} 块写入失败: {e}")
+                row_numbers = _column(frame, ROW_COLUMN)
+                self.errors.add_chunk(
+                    int(row_numbers.iloc[0]), int(row_numbers.iloc[-1]), len(records), f"写入失败: {e}"
+                )
+                inserted = updated = skipped = 0
+            self.stats["rows"] += rows
+            self.stats["inserted"] += inserted
+            self.stats["updated"] += updated
+            self.stats["skipped"] += skipped
+            self.stats["failed"] += rows - inserted - updated - skipped
+            self.stats["chunks"] += 1
+            if self.errors.count > errors_before:
+                logger.debug(f"报工导入第 {self.stats['chunks']} 块: {self.errors.count - errors_before} 个错误")
+            if self.progress is not None:
+                self.progress(dict(self.stats, error_count=self.errors.count))
+        elapsed = time.perf_counter() - start
+        return dict(
+            self.stats,
+            mode=self.mode,
+            error_count=self.errors.count,
+            errors=self.errors.items,
+            errors_truncated=self.errors.count > len(self.errors.items),
+            seconds=round(elapsed, 3),
+            rows_per_sec=int(self.stats["rows"] / elapsed) if elapsed > 0 else self.stats["rows"],
+        )
+
+
+def import_chunks(
+    chunks: Iterable[pd.DataFrame],
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    mode: str = "skip",
+) -> Dict[str, Any]:
+    """以独立连接执行分块导入，返回导入统计与错误报告"""
+    conn = open_import_connection()
+    try:
+        return WorkReportImporter(conn, progress, mode=mode).run(chunks)
+    finally:
+        conn.close()
+
+
+def import_excel_file(
+    path: str,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    mode: str = "skip",
+) -> Dict[str, Any]:
+    return import_chunks(iter_excel_chunks(path, IMPORT_CHUNK_SIZE, normalize_header), progress, mode)
+
+
+def import_records(records: Iterable[Dict[str, Any]], mode: str = "skip") -> Dict[str, Any]:
+    return import_chunks(iter_record_chunks(records, IMPORT_CHUNK_SIZE, normalize_header), mode=mode)
@@ -3,10 +3,27 @@ from typing import List, Optional, Dict, Any
 from datetime import date, datetime
 from bson import ObjectId
 import logging
+import os
 import re
 
+from ..utils.cache.entity_cache import DEPARTMENT, EMPLOYEE, ENTITY_TABLES, PROJECT, get_entity_cache
+from ..utils.nlp.work_report_query_parser import invalidate_name_index
+from ..utils.cache.response_cache import ENTITIES, WORK_REPORTS, bump_table_version
+from .work_report_import import import_records
+
 logger = logging.getLogger(__name__)
 
+# 名称过滤展开为 IN (...) 的最大 id 个数，超过后改用子查询
+ENTITY_IN_LIST_MAX = int(os.getenv("WORK_REPORT_ENTITY_IN_LIST_MAX", "500"))
+
+
+def _entities_changed() -> None:
+    """员工/项目/部门有写入：实体字典与查询解析器的名称索引一并失效（共享版本号通知其他 worker）"""
+    bump_table_version(ENTITIES)
+    get_entity_cache().invalidate()
+    invalidate_name_index()
+
+
 class WorkReportRepository:
     def __init__(self, db):
         self.db = db
@@ -54,21 +71,27 @@ class WorkReportRepository:
                     keyword_param = f"%{keyword}%"
                     params.extend([keyword_param, keyword_param])
                 
-                # 员工姓名过滤（通过JOIN查询）
-                if employee_name:
-                    conditions.append("e.name LIKE ?")
-                    params.append(f"%{employee_name}%")
-                    logger.info(f"添加员工名过滤条件: e.name LIKE '%{employee_name}%'")
-                
-                # 项目名称过滤（通过JOIN查询）
-                if project_name:
-                    conditions.append("p.project_name LIKE ?")
-                    params.append(f"%{project_name}%")
-                
-                # 部门名称过滤（通过JOIN查询）
-                if department_name:
-                    conditions.append("d.department_name LIKE ?")
-                    params.append(f"%{department_name}%")
+                # 员工/项目/部门名称过滤：经实体字典解析为 id 列表，直接命中 work_reports 上的索引列
+                entity_cache = get_entity_cache()
+                no_match = False
+                for kind, name, column in (
+                    (EMPLOYEE, employee_name, "employee_id"),
+                    (PROJECT, project_name, "project_id"),
+                    (DEPARTMENT, department_name, "department_id"),
+                ):
+                    if not name:
+                        continue
+                    ids = entity_cache.match_ids(kind, name)
+                    if not ids:
+                        no_match = True
+                    elif len(ids) > ENTITY_IN_LIST_MAX:
+                        # 命中过多时改用子查询，避免超出 SQLite 参数个数上限
+                        table, name_column = ENTITY_TABLES[kind]
+                        conditions.append(f"{column} IN (SELECT id FROM {table} WHERE {name_column} LIKE ?)")
+                        params.append(f"%{name}%")
+                    else:
+                        conditions.append(f"{column} IN ({', '.join('?' * len(ids))})")
+                        params.extend(ids)
                 
                 # 精确匹配（只使用实际存在的字段）
                 if status:
@@ -86,46 +109,26 @@ class WorkReportRepository:
                 # 构建SQL查询
                 where_clause = " AND ".join(conditions) if conditions else "1=1"
                 
-                # 获取总数（需要JOIN来支持员工名查询）
-                count_sql = (
-                    "SELECT COUNT(*) FROM work_reports wr "
-                    "LEFT JOIN employees e ON wr.employee_id = e.id "
-                    "LEFT JOIN projects p ON wr.project_id = p.id "
-                    "LEFT JOIN departments d ON wr.department_id = d.id "
-                    f"WHERE {where_clause}"
-                )
-                logger.info("🔍 执行SQLite COUNT查询:")
-                logger.info(f"  📝 SQL: {count_sql}")
-                logger.info(f"  📊 参数: {params}")
-                total = self.work_reports.cursor.execute(count_sql, params).fetchone()[0]
-                logger.info(f"  ✅ 查询结果总数: {total}")
-                
-                # 获取分页数据（带JOIN补充姓名/项目/部门名称）
-                skip = (page - 1) * size
-                data_sql = (
-                    "SELECT wr.*, "
-                    "COALESCE(e.name, '未知员工') AS employee_name, "
-                    "COALESCE(p.project_name, '未知项目') AS project_name, "
-                    "COALESCE(d.department_name, '未知部门') AS department_name "
-                    "FROM work_reports wr "
-                    "LEFT JOIN employees e ON wr.employee_id = e.id "
-                    "LEFT JOIN projects p ON wr.project_id = p.id "
-                    "LEFT JOIN departments d ON wr.department_id = d.id "
-                    f"WHERE {where_clause} ORDER BY wr.report_date DESC LIMIT ? OFFSET ?"
-                )
-                params_with_pagination = params + [size, skip]
-                
-                logger.info("🔍 执行SQLite数据查询:")
-                logger.info(f"  📝 SQL: {data_sql}")
-                logger.info(f"  📊 参数: {params_with_pagination}")
-                
-                self.work_reports.cursor.execute(data_sql, params_with_pagination)
-                rows = self.work_reports.cursor.fetchall()
-                results = [dict(row) for row in rows]
+                if no_match:
+                    # 名称在字典中不存在，结果必为空
+                    total = 0
+                    results = []
+                else:
+                    count_sql = f"SELECT COUNT(*) FROM work_reports WHERE {where_clause}"
+                    total = self.work_reports.cursor.execute(count_sql, params).fetchone()[0]
+                    
+                    # 获取分页数据（名称由实体字典补充，无需 JOIN）
+                    skip = (page - 1) * size
+                    data_sql = f"SELECT * FROM work_reports WHERE {where_clause} ORDER BY report_date DESC LIMIT ? OFFSET ?"
+                    self.work_reports.cursor.execute(data_sql, params + [size, skip])
+                    results = [dict(row) for row in self.work_reports.cursor.fetchall()]
+                    for result in results:
+                        result.pop("natural_key", None)
+                        result["employee_name"] = entity_cache.name_of(EMPLOYEE, result.get("employee_id"))
+                        result["project_name"] = entity_cache.name_of(PROJECT, result.get("project_id"))
+                        result["department_name"] = entity_cache.name_of(DEPARTMENT, result.get("department_id"))
                 
-                logger.info(f"  ✅ 查询到 {len(results)} 条记录")
-                if results:
-                    logger.info(f"  📋 前3条记录: {[{'id': r.get('id'), 'employee_name': r.get('employee_name'), 'report_date': r.get('report_date')} for r in results[:3]]}")
+                logger.debug("SQLite报工查询: %s %s => %d 条", where_clause, params, total)
                 
             elif is_memory_db:
                 # 内存数据库 - 使用Python过滤
@@ -299,9 +302,16 @@ class WorkReportRepository:
                 "avg_hours": 0
             }
     
-    async def import_excel_data(self, data: List[Dict]) -> int:
-        """导入Excel数据"""
+    async def import_excel_data(self, data: List[Dict], mode: str = "skip") -> int:
+        """导入Excel数据（SQLite 下按自然键幂等：mode=skip 跳过已存在的行，update 更新部门/地点/状态）"""
         try:
+            if hasattr(self.work_reports, 'cursor'):
+                # SQLite：分块向量化校验并批量写入，不合法行跳过
+                result = import_records(data, mode=mode)
+                if result["error_count"]:
+                    logger.warning(f"报工导入跳过 {result['failed']} 行，示例错误: {result['errors'][:3]}")
+                return result["inserted"]
+
             # 数据预处理
             processed_data = []
             for item in data:
@@ -335,6 +345,7 @@ class WorkReportRepository:
                 # 检查是否是内存数据库
                 if hasattr(self.work_reports, 'insert_many'):
                     result = self.work_reports.insert_many(processed_data)
+                    bump_table_version(WORK_REPORTS)
                     return len(result.inserted_ids)
                 else:
                     # 内存数据库使用insert_one
@@ -342,6 +353,7 @@ class WorkReportRepository:
                     for item in processed_data:
                         self.work_reports.insert_one(item)
                         count += 1
+                    bump_table_version(WORK_REPORTS)
                     return count
             else:
                 return 0
@@ -358,6 +370,7 @@ class WorkReportRepository:
             work_report_data["updated_at"] = datetime.now()
             
             result = self.work_reports.insert_one(work_report_data)
+            bump_table_version(WORK_REPORTS)
             return str(result.inserted_id)
             
         except Exception as e:
@@ -368,11 +381,15 @@ class WorkReportRepository:
         """更新报工记录"""
         try:
             update_data["updated_at"] = datetime.now()
+            if hasattr(self.work_reports, 'cursor') and ("work_hours" in update_data or "work_content" in update_data):
+                # 键字段变化：清空自然键，下次导入前重新补算
+                update_data["natural_key"] = None
             
             result = self.work_reports.update_one(
                 {"id": report_id},
                 {"$set": update_data}
             )
+            bump_table_version(WORK_REPORTS)
             return result.modified_count > 0
             
         except Exception as e:
@@ -383,6 +400,7 @@ class WorkReportRepository:
         """删除报工记录"""
         try:
             result = self.work_reports.delete_one({"id": report_id})
+            bump_table_version(WORK_REPORTS)
             return result.deleted_count > 0
             
         except Exception as e:
@@ -394,6 +412,7 @@ class WorkReportRepository:
         try:
             result = self.work_reports.find_one({"id": report_id})
             if result:
+                result.pop("natural_key", None)
                 if "_id" in result:
                     result["id"] = str(result["_id"])
                     del result["_id"]
@@ -413,6 +432,7 @@ class WorkReportRepository:
             employee_data["updated_at"] = datetime.now()
             
             result = self.employees.insert_one(employee_data)
+            _entities_changed()
             return str(result.inserted_id)
             
         except Exception as e:
@@ -428,6 +448,7 @@ class WorkReportRepository:
             project_data["updated_at"] = datetime.now()
             
             result = self.projects.insert_one(project_data)
+            _entities_changed()
             return str(result.inserted_id)
             
         except Exception as e:
@@ -443,6 +464,7 @@ class WorkReportRepository:
             department_data["updated_at"] = datetime.now()
             
             result = self.departments.insert_one(department_data)
+            _entities_changed()
             return str(result.inserted_id)
             
         except Exception as e:
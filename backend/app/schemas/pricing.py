@@ -65,9 +65,11 @@ class PricingResult(BaseModel):
 
 
 class BatchPricingRequest(BaseModel):
-    """批量核价请求"""
-    materials: List[MaterialData] = Field(..., description="物料列表")
+    """批量核价请求（materials 与 upload_id 二选一）"""
+    materials: List[MaterialData] = Field(default_factory=list, description="物料列表")
+    upload_id: Optional[str] = Field(default=None, description="parse-excel 返回的解析结果引用")
     pricing_rules: Optional[Dict[str, Any]] = Field(default=None, description="核价规则")
+    concurrency: Optional[int] = Field(default=None, ge=1, le=64, description="并发核价数")
 
 
 class BatchPricingResponse(BaseModel):
@@ -77,6 +79,7 @@ class BatchPricingResponse(BaseModel):
     data: List[PricingResult] = Field(..., description="核价结果列表")
     total_count: int = Field(..., description="总数量")
     processing_time: Optional[float] = Field(default=None, description="处理时间(秒)")
+    item_latency_ms: Optional[List[float]] = Field(default=None, description="逐项核价耗时(毫秒)，与data顺序一致")
 
 
 class PricingStatistics(BaseModel):
@@ -131,6 +134,7 @@ class ExcelUploadResponse(BaseModel):
     message: str = Field(..., description="响应消息")
     data: List[MaterialData] = Field(..., description="解析的物料数据")
     error_rows: Optional[List[int]] = Field(default=None, description="错误行号")
+    upload_id: Optional[str] = Field(default=None, description="解析结果引用，可直接用于批量核价")
 
 
 class PricingSaveRequest(BaseModel):
@@ -0,0 +1,219 @@
+"""
+员工/项目/部门实体字典缓存
+- 进程内维护 id→名称、名称→id 映射，报工查询不再为了取名称而 JOIN 三张维表
+- 每类实体一棵前缀树，插入名称的全部后缀，前缀查找即等价于 SQL 的 LIKE '%名称%' 模糊匹配
+- 启动时预热；仓储创建员工/项目/部门后调用 invalidate()，另有 TTL 兜底其他写入途径
+- 可选 version_source（共享的实体表版本号）：其他 worker 进程写入实体后，本进程下次访问即重新加载
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+ENTITY_CACHE_TTL_SECONDS = float(os.getenv("ENTITY_CACHE_TTL_SECONDS", "300"))
+# 共享版本号的检查间隔：逐行取名称时不必每次都读共享状态
+ENTITY_CACHE_VERSION_CHECK_SECONDS = float(os.getenv("ENTITY_CACHE_VERSION_CHECK_SECONDS", "1"))
+
+EMPLOYEE = "employee"
+PROJECT = "project"
+DEPARTMENT = "department"
+
+# kind => (表名, 名称列)
+ENTITY_TABLES = {
+    EMPLOYEE: ("employees", "name"),
+    PROJECT: ("projects", "project_name"),
+    DEPARTMENT: ("departments", "department_name"),
+}
+
+_IDS = object()
+
+
+class PrefixTrie:
+    """字符级前缀树，节点下挂实体 id 集合"""
+
+    def __init__(self) -> None:
+        self._root: Dict[Any, Any] = {}
+
+    def insert(self, key: str, value: str) -> None:
+        node = self._root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node.setdefault(_IDS, set()).add(value)
+
+    def search(self, prefix: str) -> Set[str]:
+        """返回所有以 prefix 开头的键对应的值"""
+        node = self._root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return set()
+        found: Set[str] = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for ch, child in node.items():
+                if ch is _IDS:
+                    found.update(child)
+                else:
+                    stack.append(child)
+        return found
+
+
+class _Entities:
+    """某一时刻的实体快照，整体替换，读取无需加锁"""
+
+    def __init__(self, rows: Dict[str, Iterable[Tuple[str, str]]], generation: int = 0, source_version: Any = None) -> None:
+        self.loaded_at = time.monotonic()
+        self.generation = generation
+        self.source_version = source_version
+        self.names: Dict[str, Dict[str, str]] = {}
+        self.ids: Dict[str, Dict[str, List[str]]] = {}
+        self.tries: Dict[str, PrefixTrie] = {}
+        for kind in ENTITY_TABLES:
+            names: Dict[str, str] = {}
+            ids: Dict[str, List[str]] = {}
+            trie = PrefixTrie()
+            for entity_id, name in rows.get(kind, ()):
+                if entity_id is None or not name:
+                    continue
+                entity_id, name = str(entity_id), str(name)
+                names[entity_id] = name
+                ids.setdefault(name, []).append(entity_id)
+                lowered = name.lower()
+                for i in range(len(lowered)):
+                    trie.insert(lowered[i:], entity_id)
+            self.names[kind] = names
+            self.ids[kind] = ids
+            self.tries[kind] = trie
+
+
+def load_entities_from_sqlite(conn) -> Dict[str, List[Tuple[str, str]]]:
+    cur = conn.cursor()
+    rows: Dict[str, List[Tuple[str, str]]] = {}
+    for kind, (table, column) in ENTITY_TABLES.items():
+        cur.execute(f"SELECT id, {column} FROM {table}")
+        rows[kind] = [(row[0], row[1]) for row in cur.fetchall()]
+    return rows
+
+
+class EntityCache:
+    """实体字典缓存；loader 返回 {kind: [(id, 名称), ...]}"""
+
+    def __init__(
+        self,
+        loader: Callable[[], Dict[str, Iterable[Tuple[str, str]]]],
+        ttl_seconds: float = ENTITY_CACHE_TTL_SECONDS,
+        version_source: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.version_source = version_source
+        self._checked_version: Any = None
+        self._checked_at = float("-inf")
+        self._entities: Optional[_Entities] = None
+        self._lock = threading.Lock()
+        self.version = 0
+        self.loads = 0
+
+    def _source_version(self) -> Any:
+        if self.version_source is None:
+            return None
+        now = time.monotonic()
+        if now - self._checked_at < ENTITY_CACHE_VERSION_CHECK_SECONDS:
+            return self._checked_version
+        try:
+            self._checked_version = self.version_source()
+        except Exception as e:
+            logger.warning(f"读取实体版本号失败: {e}")
+        self._checked_at = now
+        return self._checked_version
+
+    def _fresh(self, entities: Optional[_Entities], source_version: Any) -> bool:
+        return (
+            entities is not None
+            and entities.source_version == source_version
+            and time.monotonic() - entities.loaded_at < self.ttl_seconds
+        )
+
+    def snapshot(self) -> _Entities:
+        entities = self._entities
+        source_version = self._source_version()
+        if self._fresh(entities, source_version):
+            return entities
+        with self._lock:
+            entities = self._entities
+            if not self._fresh(entities, source_version):
+                entities = _Entities(self.loader(), generation=self.loads + 1, source_version=source_version)
+                self._entities = entities
+                self.loads += 1
+                logger.debug(
+                    "实体字典已加载: "
+                    + ", ".join(f"{kind}={len(entities.names[kind])}" for kind in ENTITY_TABLES)
+                )
+            return entities
+
+    def warm(self) -> None:
+        self.snapshot()
+
+    def invalidate(self) -> None:
+        """实体有增改：下次访问时重新加载"""
+        with self._lock:
+            self._entities = None
+            self._checked_at = float("-inf")
+            self.version += 1
+
+    def name_of(self, kind: str, entity_id: Optional[str]) -> Optional[str]:
+        if entity_id is None:
+            return None
+        return self.snapshot().names[kind].get(str(entity_id))
+
+    def ids_of(self, kind: str, name: str) -> List[str]:
+        """名称精确匹配（重名时返回多个 id）"""
+        return list(self.snapshot().ids[kind].get(name, ()))
+
+    def name_map(self, kind: str) -> Dict[str, str]:
+        """名称 → id（重名取第一个），供批量导入按列映射"""
+        return {name: ids[0] for name, ids in self.snapshot().ids[kind].items()}
+
+    def known_ids(self, kind: str) -> Set[str]:
+        return set(self.snapshot().names[kind])
+
+    def match_ids(self, kind: str, text: str) -> List[str]:
+        """名称包含 text 的全部 id（不区分大小写，与 LIKE '%text%' 一致）"""
+        text = (text or "").lower()
+        if not text:
+            return []
+        return sorted(self.snapshot().tries[kind].search(text))
+
+    def names(self) -> Dict[str, List[str]]:
+        entities = self.snapshot()
+        return {kind: list(entities.ids[kind]) for kind in ENTITY_TABLES}
+
+    def stats(self) -> Dict[str, Any]:
+        entities = self._entities
+        return {
+            "loaded": entities is not None,
+            "counts": {kind: len(entities.names[kind]) for kind in ENTITY_TABLES} if entities else {},
+            "version": self.version,
+            "loads": self.loads,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+_entity_cache: Optional[EntityCache] = None
+
+
+def get_entity_cache() -> EntityCache:
+    global _entity_cache
+    if _entity_cache is None:
+        from ...db.sqlite_db import get_sqlite_db
+        from .response_cache import ENTITIES, table_version
+        _entity_cache = EntityCache(
+            lambda: load_entities_from_sqlite(get_sqlite_db().conn),
+            version_source=lambda: table_version(ENTITIES),
+        )
+    return _entity_cache
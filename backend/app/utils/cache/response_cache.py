@@ -0,0 +1,167 @@
+"""
+接口响应缓存（ETag / 304）
+- 表版本号：写入路径调用 bump_table_version(...) 递增对应表的计数器；缓存键由路由、查询参数与所依赖表的版本组成，
+  写入后旧条目不再命中，无需逐键失效
+- 缓存已序列化的响应体及其强 ETag（响应体 blake2b 摘要），命中时不再重新计算；If-None-Match 匹配时返回 304
+- 版本号存放在共享状态后端：SHARED_STATE_BACKEND=sqlite 时任一 worker 的写入对所有 worker 的缓存立即生效；
+  进程内后端下其他进程的写入不可见，由条目 TTL（RESPONSE_CACHE_TTL_SECONDS）兜底
+"""
+
+import hashlib
+import inspect
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .ttl_lru import TTLLRUCache
+from ..fast_json import dumps
+from ..state.shared_state import get_state_backend
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+
+# 版本计数器使用的表名
+WORK_REPORTS = "work_reports"
+PRICING_RESULTS = "pricing_results"
+PROCESS_RULES = "process_rules"
+# 员工/项目/部门（实体字典缓存与查询解析器名称索引跟随该版本号重建）
+ENTITIES = "entities"
+# 物料（物料检索索引跟随该版本号重建）
+MATERIALS = "materials"
+
+
+class TableVersions:
+    """按表维护的写入版本号，保存在共享状态后端的 kv 命名空间中"""
+
+    def __init__(self, kv) -> None:
+        self._kv = kv
+
+    def bump(self, *tables: str) -> Tuple[int, ...]:
+        """递增并返回各表的新版本号"""
+        return tuple(self._kv.incr(table) for table in tables)
+
+    def get(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._kv.get(table, 0) for table in tables)
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            table: self._kv.get(table, 0)
+            for table in (WORK_REPORTS, PRICING_RESULTS, PROCESS_RULES, ENTITIES, MATERIALS)
+        }
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    body: bytes
+    etag: str
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 使用弱比较：忽略 W/ 前缀（压缩中间件会把强 ETag 转为弱 ETag）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        versions: TableVersions,
+        max_size: int = RESPONSE_CACHE_SIZE,
+        ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+    ) -> None:
+        self.versions = versions
+        self._cache = TTLLRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+
+    def _key(self, request: Request, tables: Tuple[str, ...]) -> Tuple[Any, ...]:
+        params = tuple(sorted(request.query_params.multi_items()))
+        return request.url.path, params, tables, self.versions.get(tables)
+
+    async def respond(
+        self,
+        request: Request,
+        tables: Iterable[str],
+        producer: Callable[[], Any],
+        ttl_seconds: Optional[float] = None,
+    ) -> Response:
+        """命中则复用缓存的响应体，否则调用 producer（同步或异步）生成并缓存；producer 抛出的异常不缓存"""
+        # 先取版本再计算：计算期间发生写入时，条目记在旧版本下，之后不会再被命中
+        key = self._key(request, tuple(tables))
+        entry = self._cache.get(key)
+        if entry is None:
+            content = producer()
+            if inspect.isawaitable(content):
+                content = await content
+            body = dumps(content)
+            entry = CachedBody(body=body, etag=make_etag(body))
+            self._cache.set(key, entry, ttl_seconds)
+
+        # no-cache：客户端每次携带 If-None-Match 重新验证，未变化时只返回 304
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(entry.body, media_type="application/json", headers=headers)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._cache.stats(), versions=self.versions.snapshot())
+
+
+_table_versions: Optional[TableVersions] = None
+_response_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_table_versions() -> TableVersions:
+    global _table_versions
+    if _table_versions is None:
+        with _cache_lock:
+            if _table_versions is None:
+                _table_versions = TableVersions(get_state_backend().kv("table_versions"))
+    return _table_versions
+
+
+def get_response_cache() -> ResponseCache:
+    global _response_cache
+    if _response_cache is None:
+        versions = get_table_versions()
+        with _cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(versions)
+    return _response_cache
+
+
+def bump_table_version(*tables: str) -> Tuple[int, ...]:
+    return get_table_versions().bump(*tables)
+
+
+def table_version(table: str) -> int:
+    return get_table_versions().get((table,))[0]
+
+
+async def cached_json_response(
+    request: Request,
+    tables: Iterable[str],
+    producer: Callable[[], Any],
+    ttl_seconds: Optional[float] = None,
+) -> Response:
+    return await get_response_cache().respond(request, tables, producer, ttl_seconds)
@@ -1,6 +1,8 @@
 """
 DataX执行器
 负责执行DataX作业，监控执行状态，处理错误
+作业状态在每次变化时同步到共享状态后端，多 worker 部署下任一进程都能查询；
+子进程句柄只在发起作业的进程内，取消作业需落到该进程
 """
 
 import subprocess
@@ -9,12 +11,16 @@ import os
 import time
 import threading
 from typing import Dict, Any, Optional, List
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from enum import Enum
 import logging
 
+from ..state.shared_state import get_state_backend
+
 logger = logging.getLogger(__name__)
 
+DATAX_JOB_TTL_SECONDS = float(os.getenv("DATAX_JOB_TTL_SECONDS", str(24 * 3600)))
+
 
 class JobStatus(Enum):
     PENDING = "pending"
@@ -36,6 +42,13 @@ class JobResult:
     error_message: Optional[str] = None
     config_path: Optional[str] = None
 
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(asdict(self), status=self.status.value)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "JobResult":
+        return cls(**dict(data, status=JobStatus(data["status"])))
+
 
 class DataXExecutor:
     """DataX执行器"""
@@ -45,6 +58,14 @@ class DataXExecutor:
         self.running_jobs: Dict[str, subprocess.Popen] = {}
         self.job_results: Dict[str, JobResult] = {}
         self._lock = threading.Lock()
+        self._shared = get_state_backend().kv("datax_jobs", max_size=1000, ttl_seconds=DATAX_JOB_TTL_SECONDS)
+
+    def _publish(self, job_result: JobResult) -> None:
+        """作业状态变化后写入共享状态"""
+        try:
+            self._shared.set(job_result.job_id, job_result.to_dict())
+        except Exception as e:
+            logger.warning(f"同步DataX作业状态失败: {e}")
     
     def execute_job(self, config_path: str, job_id: str) -> JobResult:
         """执行DataX作业"""
@@ -65,6 +86,7 @@ class DataXExecutor:
             config_path=config_path
         )
         self.job_results[job_id] = job_result
+        self._publish(job_result)
         
         try:
             # 构建DataX命令
@@ -86,6 +108,7 @@ class DataXExecutor:
             with self._lock:
                 self.running_jobs[job_id] = process
                 job_result.status = JobStatus.RUNNING
+            self._publish(job_result)
             
             # 启动监控线程
             monitor_thread = threading.Thread(
@@ -101,12 +124,14 @@ class DataXExecutor:
             logger.error(f"启动DataX作业失败: {e}")
             job_result.status = JobStatus.FAILED
             job_result.error_message = str(e)
+            self._publish(job_result)
             return job_result
     
     def _mock_execute_job(self, job_id: str, config_path: str) -> JobResult:
         """模拟执行DataX作业（用于开发环境）"""
         job_result = self.job_results[job_id]
         job_result.status = JobStatus.RUNNING
+        self._publish(job_result)
         
         # 模拟执行过程
         def mock_execution():
@@ -120,6 +145,7 @@ class DataXExecutor:
                 
                 if job_id in self.running_jobs:
                     del self.running_jobs[job_id]
+            self._publish(job_result)
         
         thread = threading.Thread(target=mock_execution)
         thread.daemon = True
@@ -151,6 +177,7 @@ class DataXExecutor:
                 # 清理运行中的作业记录
                 if job_id in self.running_jobs:
                     del self.running_jobs[job_id]
+            self._publish(job_result)
                     
         except Exception as e:
             logger.error(f"监控DataX作业失败: {e}")
@@ -161,6 +188,8 @@ class DataXExecutor:
                     job_result.error_message = str(e)
                     if job_id in self.running_jobs:
                         del self.running_jobs[job_id]
+            if job_result:
+                self._publish(job_result)
     
     def _parse_records_count(self, output: str, count_type: str) -> int:
         """从DataX输出中解析记录数"""
@@ -178,9 +207,13 @@ class DataXExecutor:
         return 0
     
     def get_job_status(self, job_id: str) -> Optional[JobResult]:
-        """获取作业状态"""
+        """获取作业状态（本进程发起的作业直接返回，否则查共享状态）"""
         with self._lock:
-            return self.job_results.get(job_id)
+            job_result = self.job_results.get(job_id)
+        if job_result is not None:
+            return job_result
+        data = self._shared.get(job_id)
+        return JobResult.from_dict(data) if data else None
     
     def cancel_job(self, job_id: str) -> bool:
         """取消作业"""
@@ -194,14 +227,17 @@ class DataXExecutor:
                 if job_result:
                     job_result.status = JobStatus.CANCELLED
                     job_result.end_time = time.time()
+                    self._publish(job_result)
                 
                 return True
         return False
     
     def list_jobs(self) -> List[JobResult]:
-        """列出所有作业"""
+        """列出所有作业（含其他 worker 进程发起的作业）"""
+        jobs = {data["job_id"]: JobResult.from_dict(data) for data in self._shared.values()}
         with self._lock:
-            return list(self.job_results.values())
+            jobs.update(self.job_results)
+        return list(jobs.values())
     
     def cleanup_completed_jobs(self, max_age_hours: int = 24):
         """清理已完成的作业记录"""
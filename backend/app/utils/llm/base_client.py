@@ -1,10 +1,23 @@
+import asyncio
+import json
+import logging
 import os
 import time
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
-import requests
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from .response_cache import get_llm_response_cache
+from .token_accounting import (
+    LLM_DEFAULT_COMPLETION_TOKENS, count_message_tokens, count_tokens, get_token_ledger,
+)
+from .transport import LLMTransportError, first_message_content, get_llm_transport, provider_from_url
+
+logger = logging.getLogger(__name__)
 
 # 说明：统一管理Qwen/DeepSeek的API调用，包含超时重试与成本控制（按token计数）
+# HTTP 连接池、退避重试、熔断与并发限制由 transport.py 统一处理
+# 真实调用的响应经 response_cache.py 缓存（精确匹配 + 可选相似匹配），调用方可传 cache=False 关闭
+# token 计量与滑动窗口预算由 token_accounting.py 处理，预算不足时抛出 LLMBudgetExceeded（RuntimeError 子类）
 
 
 @dataclass
@@ -20,70 +33,318 @@ class LLMCallCost:
 
 
 class LLMClient:
-    def __init__(self, provider: str = "qwen", timeout_seconds: int = 15, max_retries: int = 2):
+    def __init__(
+        self,
+        provider: str = "qwen",
+        timeout_seconds: int = 15,
+        max_retries: int = 2,
+        api_base: Optional[str] = None,
+        api_key: Optional[str] = None,
+        default_model: Optional[str] = None,
+    ):
         self.provider = provider
         self.timeout_seconds = timeout_seconds
         self.max_retries = max_retries
-        self.api_key = os.getenv("LLM_API_KEY", "")
-        self.api_base = os.getenv("LLM_API_BASE", "")  # 若配置则走真实HTTP接口
-        self.default_model = os.getenv("LLM_MODEL", "")
+        self.api_key = api_key or os.getenv("LLM_API_KEY", "")
+        self.api_base = api_base or os.getenv("LLM_API_BASE", "")  # 若配置则走真实HTTP接口
+        self.default_model = default_model or os.getenv("LLM_MODEL", "")
         self.use_real = os.getenv("USE_REAL_LLM", "false").lower() == "true"
 
-    def _mock_token_count(self, prompt: str, completion: str) -> LLMCallCost:
-        # 示例：简单按字符数估算为token，真实实现请接入各模型的tokenizer
-        prompt_tokens = max(1, len(prompt) // 4)
-        completion_tokens = max(1, len(completion) // 4)
-        unit_price = 0.002 if self.provider == "deepseek" else 0.003
-        return LLMCallCost(prompt_tokens, completion_tokens, unit_price)
-
-    def chat(self, prompt: str, model: Optional[str] = None, temperature: float = 0.2) -> Dict[str, Any]:
-        # 若配置了真实调用环境，则使用HTTP最小闭环；否则使用占位
-        last_error: Optional[Exception] = None
-        for _ in range(self.max_retries + 1):
+    @classmethod
+    def openai_compatible(cls, base_url: str, api_key: str, model: str, timeout_seconds: int = 30) -> "LLMClient":
+        """OpenAI 兼容接口（OPENAI_BASE_URL/OPENAI_API_KEY）的客户端，供 acomplete 使用"""
+        return cls(
+            provider=provider_from_url(base_url), timeout_seconds=timeout_seconds,
+            api_base=base_url, api_key=api_key, default_model=model,
+        )
+
+    def _unit_price(self) -> float:
+        return 0.002 if self.provider == "deepseek" else 0.003
+
+    def _token_count(self, prompt: str, completion: str) -> LLMCallCost:
+        # 本地有 tiktoken 时为真实分词，否则按字符估算（见 token_accounting.count_tokens）
+        prompt_tokens = max(1, count_tokens(prompt))
+        completion_tokens = max(1, count_tokens(completion))
+        return LLMCallCost(prompt_tokens, completion_tokens, self._unit_price())
+
+    def _request(self, prompt: str, model: Optional[str], temperature: float):
+        """统一的最小HTTP接口：POST {api_base}/chat；可在网关侧将其映射到Qwen/DeepSeek官方HTTP接口"""
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        payload = {
+            "provider": self.provider,
+            "model": model or self.default_model or "auto",
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+        }
+        return f"{self.api_base.rstrip('/')}/chat", payload, headers
+
+    def _use_http(self) -> bool:
+        return bool(self.use_real and self.api_base and self.api_key)
+
+    def _build_result(self, prompt: str, model: Optional[str], completion: str, elapsed: float) -> Dict[str, Any]:
+        cost = self._token_count(prompt, completion)
+        return {
+            "provider": self.provider,
+            "model": model or "auto",
+            "prompt": prompt,
+            "completion": completion,
+            "elapsed_seconds": elapsed,
+            "cost": {
+                "prompt_tokens": cost.prompt_tokens,
+                "completion_tokens": cost.completion_tokens,
+                "unit_price_per_1k_tokens": cost.unit_price_per_1k_tokens,
+                "total_cost": round(cost.total_cost, 6),
+            },
+        }
+
+    # ---- 响应缓存 ----
+
+    def _cache_lookup(self, namespace: str, model: str, temperature: float, prompt: str,
+                      params: Optional[Dict[str, Any]], semantic: bool,
+                      semantic_text: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        cache = get_llm_response_cache()
+        if cache is None:
+            return None
+        try:
+            return cache.lookup(namespace, model, temperature, prompt, params=params,
+                                semantic=semantic, semantic_text=semantic_text)
+        except Exception as e:
+            logger.warning(f"LLM 响应缓存读取失败: {e}")
+            return None
+
+    def _cache_store(self, namespace: str, model: str, temperature: float, prompt: str,
+                     response: Dict[str, Any], cost: LLMCallCost, params: Optional[Dict[str, Any]],
+                     semantic_text: Optional[str] = None) -> None:
+        cache = get_llm_response_cache()
+        if cache is None:
+            return
+        try:
+            cache.store(namespace, model, temperature, prompt, response,
+                        prompt_tokens=cost.prompt_tokens, completion_tokens=cost.completion_tokens,
+                        cost=cost.total_cost, params=params, semantic_text=semantic_text)
+        except Exception as e:
+            logger.warning(f"LLM 响应缓存写入失败: {e}")
+
+    def _cached_chat(self, prompt: str, model: Optional[str], temperature: float, cache: bool,
+                     semantic: bool, cache_namespace: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not (cache and self._use_http()):
+            return None
+        hit = self._cache_lookup(cache_namespace or self.provider, model or self.default_model or "auto",
+                                 temperature, prompt, None, semantic)
+        if hit is None:
+            return None
+        result = self._build_result(prompt, model, hit.get("completion", ""), 0.0)
+        result["cached"] = True
+        get_token_ledger().record_cached(result["cost"]["prompt_tokens"] + result["cost"]["completion_tokens"])
+        return result
+
+    def _store_chat(self, prompt: str, model: Optional[str], temperature: float, completion: str,
+                    cache: bool, cache_namespace: Optional[str]) -> None:
+        if cache and completion:
+            self._cache_store(cache_namespace or self.provider, model or self.default_model or "auto",
+                              temperature, prompt, {"completion": completion},
+                              self._token_count(prompt, completion), None)
+
+    def _record_chat(self, entry: List[Any], prompt: str, completion: Optional[str]) -> None:
+        """completion 为 None 表示请求失败，仅计入预估的输入 token"""
+        if completion is None:
+            get_token_ledger().record(entry, count_tokens(prompt), 0, 0.0, error=True)
+            return
+        cost = self._token_count(prompt, completion)
+        get_token_ledger().record(entry, cost.prompt_tokens, cost.completion_tokens, cost.total_cost)
+
+    # ---- 调用 ----
+
+    def chat(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        temperature: float = 0.2,
+        cache: bool = True,
+        semantic: bool = False,
+        cache_namespace: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        若配置了真实调用环境，则经共享传输层（连接池、退避重试、熔断）调用；否则使用占位
+        cache=False 跳过响应缓存；semantic=True 允许相似提示词命中
+        """
+        cached = self._cached_chat(prompt, model, temperature, cache, semantic, cache_namespace)
+        if cached is not None:
+            return cached
+        start = time.time()
+        if self._use_http():
+            url, payload, headers = self._request(prompt, model, temperature)
+            entry = get_token_ledger().acquire_sync(count_tokens(prompt) + LLM_DEFAULT_COMPLETION_TOKENS)
+            try:
+                data = get_llm_transport().post_json(
+                    url, payload, headers=headers, provider=self.provider,
+                    timeout=self.timeout_seconds, max_retries=self.max_retries,
+                )
+            except LLMTransportError as e:
+                self._record_chat(entry, prompt, None)
+                raise RuntimeError(f"LLM request failed: {e}") from e
+            completion = data.get("content") or data.get("text") or ""
+            self._record_chat(entry, prompt, completion)
+            self._store_chat(prompt, model, temperature, completion, cache, cache_namespace)
+        else:
+            # 占位返回
+            completion = "placeholder response"
+        return self._build_result(prompt, model, completion, time.time() - start)
+
+    async def achat(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        temperature: float = 0.2,
+        cache: bool = True,
+        semantic: bool = False,
+        cache_namespace: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """chat 的异步版本，不阻塞事件循环"""
+        cached = self._cached_chat(prompt, model, temperature, cache, semantic, cache_namespace)
+        if cached is not None:
+            return cached
+        start = time.time()
+        if self._use_http():
+            url, payload, headers = self._request(prompt, model, temperature)
+            entry = await get_token_ledger().acquire(count_tokens(prompt) + LLM_DEFAULT_COMPLETION_TOKENS)
             try:
-                start = time.time()
-                if self.use_real and self.api_base and self.api_key:
-                    # 统一的最小HTTP接口：POST {api_base}/chat
-                    # 你可以在网关侧将其映射到Qwen/DeepSeek官方HTTP接口
-                    headers = {
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                    }
-                    payload = {
-                        "provider": self.provider,
-                        "model": model or self.default_model or "auto",
-                        "messages": [{"role": "user", "content": prompt}],
-                        "temperature": temperature,
-                    }
-                    resp = requests.post(
-                        f"{self.api_base.rstrip('/')}/chat",
-                        json=payload,
-                        headers=headers,
-                        timeout=self.timeout_seconds,
-                    )
-                    resp.raise_for_status()
-                    data = resp.json()
-                    completion = data.get("content") or data.get("text") or ""
-                else:
-                    # 占位返回
-                    completion = "placeholder response"
-                elapsed = time.time() - start
-                cost = self._mock_token_count(prompt, completion)
-                return {
-                    "provider": self.provider,
-                    "model": model or "auto",
-                    "prompt": prompt,
-                    "completion": completion,
-                    "elapsed_seconds": elapsed,
-                    "cost": {
-                        "prompt_tokens": cost.prompt_tokens,
-                        "completion_tokens": cost.completion_tokens,
-                        "unit_price_per_1k_tokens": cost.unit_price_per_1k_tokens,
-                        "total_cost": round(cost.total_cost, 6),
-                    },
-                }
-            except Exception as e:  # noqa: BLE001
-                last_error = e
-        raise RuntimeError(f"LLM request failed: {last_error}")
+                data = await get_llm_transport().apost_json(
+                    url, payload, headers=headers, provider=self.provider,
+                    timeout=self.timeout_seconds, max_retries=self.max_retries,
+                )
+            except (LLMTransportError, asyncio.CancelledError) as e:
+                self._record_chat(entry, prompt, None)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                raise RuntimeError(f"LLM request failed: {e}") from e
+            completion = data.get("content") or data.get("text") or ""
+            self._record_chat(entry, prompt, completion)
+            self._store_chat(prompt, model, temperature, completion, cache, cache_namespace)
+        else:
+            completion = "placeholder response"
+        return self._build_result(prompt, model, completion, time.time() - start)
+
+    async def acomplete(
+        self,
+        messages: List[Dict[str, Any]],
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        cache: bool = True,
+        semantic: bool = False,
+        cache_namespace: Optional[str] = None,
+        timeout: Optional[float] = None,
+        **params: Any,
+    ) -> Dict[str, Any]:
+        """
+        OpenAI 兼容 /chat/completions 调用（api_base 需为 OpenAI 兼容地址），返回原始响应 JSON
+        缓存键包含全部消息与调用参数（tools、max_tokens 等）；semantic=True 时仅以最后一条用户消息做相似匹配
+        """
+        model = model or self.default_model or "auto"
+        if temperature is not None:
+            params["temperature"] = temperature
+        namespace, temp, prompt, key_params, user_text = self._completion_key(messages, cache_namespace, params)
+        ledger = get_token_ledger()
+        prompt_tokens = count_message_tokens(messages)
+
+        if cache:
+            hit = self._cache_lookup(namespace, model, temp, prompt, key_params, semantic, user_text)
+            if hit is not None:
+                saved = self._completion_cost(hit, prompt_tokens)
+                ledger.record_cached(saved.prompt_tokens + saved.completion_tokens)
+                return {**hit, "cached": True}
+
+        entry = await ledger.acquire(prompt_tokens + int(params.get("max_tokens") or LLM_DEFAULT_COMPLETION_TOKENS))
+        try:
+            data = await get_llm_transport().achat_completions(
+                self.api_base, self.api_key, model, messages, provider=self.provider,
+                timeout=timeout or self.timeout_seconds, **params,
+            )
+        except (LLMTransportError, asyncio.CancelledError) as e:
+            ledger.record(entry, prompt_tokens, 0, 0.0, error=True)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise RuntimeError(f"LLM request failed: {e}") from e
+
+        cost = self._completion_cost(data, prompt_tokens)
+        ledger.record(entry, cost.prompt_tokens, cost.completion_tokens, cost.total_cost)
+        if cache and data.get("choices"):
+            self._cache_store(namespace, model, temp, prompt, data, cost, key_params, user_text)
+        return data
+
+    async def astream(
+        self,
+        messages: List[Dict[str, Any]],
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        cache: bool = True,
+        semantic: bool = False,
+        cache_namespace: Optional[str] = None,
+        timeout: Optional[float] = None,
+        **params: Any,
+    ) -> AsyncIterator[str]:
+        """acomplete 的流式版本，逐段产出回复文本；与 acomplete 共用缓存条目，命中时整段产出"""
+        model = model or self.default_model or "auto"
+        if temperature is not None:
+            params["temperature"] = temperature
+        namespace, temp, prompt, key_params, user_text = self._completion_key(messages, cache_namespace, params)
+        ledger = get_token_ledger()
+        prompt_tokens = count_message_tokens(messages)
+
+        if cache:
+            hit = self._cache_lookup(namespace, model, temp, prompt, key_params, semantic, user_text)
+            if hit is not None:
+                saved = self._completion_cost(hit, prompt_tokens)
+                ledger.record_cached(saved.prompt_tokens + saved.completion_tokens)
+                text = first_message_content(hit)
+                if text:
+                    yield text
+                return
+
+        entry = await ledger.acquire(prompt_tokens + int(params.get("max_tokens") or LLM_DEFAULT_COMPLETION_TOKENS))
+        parts: List[str] = []
+        try:
+            async for delta in get_llm_transport().astream_chat_completions(
+                self.api_base, self.api_key, model, messages, provider=self.provider,
+                timeout=timeout or self.timeout_seconds, **params,
+            ):
+                parts.append(delta)
+                yield delta
+        except (LLMTransportError, asyncio.CancelledError, GeneratorExit) as e:
+            # 失败或调用方提前关闭（客户端断开）：按已收到的内容计量
+            ledger.record(entry, prompt_tokens, count_tokens("".join(parts)), 0.0, error=True)
+            if isinstance(e, LLMTransportError):
+                raise RuntimeError(f"LLM request failed: {e}") from e
+            raise
+
+        text = "".join(parts)
+        cost = LLMCallCost(prompt_tokens, count_tokens(text), self._unit_price())
+        ledger.record(entry, cost.prompt_tokens, cost.completion_tokens, cost.total_cost)
+        if cache and text:
+            response = {"choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}]}
+            self._cache_store(namespace, model, temp, prompt, response, cost, key_params, user_text)
 
+    def _completion_key(self, messages: List[Dict[str, Any]], cache_namespace: Optional[str],
+                        params: Dict[str, Any]) -> Tuple[str, float, str, Optional[Dict[str, Any]], str]:
+        """缓存键要素：命名空间、温度、序列化消息、其余调用参数、参与相似匹配的最后一条用户消息"""
+        namespace = f"{cache_namespace or self.provider}:completions"
+        prompt = json.dumps(messages, ensure_ascii=False, sort_keys=True)
+        user_text = next((str(m.get("content", "")) for m in reversed(messages) if m.get("role") == "user"), prompt)
+        temp = float(params.get("temperature", 1.0))
+        key_params = {k: v for k, v in params.items() if k != "temperature"} or None
+        return namespace, temp, prompt, key_params, user_text
 
+    def _completion_cost(self, data: Dict[str, Any], prompt_tokens: int) -> LLMCallCost:
+        """优先使用响应中的 usage，缺失时用本地分词计数"""
+        usage = data.get("usage") or {}
+        completion_tokens = usage.get("completion_tokens")
+        if completion_tokens is None:
+            message = ((data.get("choices") or [{}])[0].get("message") or {})
+            text = message.get("content") or ""
+            if message.get("tool_calls"):
+                text += json.dumps(message["tool_calls"], ensure_ascii=False)
+            completion_tokens = count_tokens(text)
+        return LLMCallCost(int(usage.get("prompt_tokens") or prompt_tokens), int(completion_tokens), self._unit_price())
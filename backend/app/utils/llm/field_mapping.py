@@ -50,28 +50,45 @@ class FieldMappingGenerator:
             
             # 调用LLM
             result = self.client.chat(prompt, temperature=0.1)
-            
-            # 解析结果
-            mapping_result = self._parse_mapping_result(result)
-            
-            # 添加置信度评分
-            mapping_result["confidence_scores"] = self._calculate_confidence_scores(
-                source_fields, target_fields, mapping_result["mappings"]
-            )
-            
-            # 添加字段类型推断
-            mapping_result["field_types"] = self._infer_field_types(source_fields + target_fields)
-            
-            return mapping_result
+            return self._build_mapping_result(result, source_fields, target_fields)
             
         except Exception as e:
             logger.error(f"生成字段映射失败: {e}")
-            return {
-                "error": str(e),
-                "mappings": {},
-                "confidence_scores": {},
-                "field_types": {}
-            }
+            return self._error_result(e)
+
+    async def agenerate_field_mapping(self, source_fields: List[str], target_fields: List[str],
+                                      source_system: str = "", target_system: str = "") -> Dict[str, Any]:
+        """generate_field_mapping 的异步版本，供 async 路由使用，不阻塞事件循环"""
+        try:
+            prompt = self._build_mapping_prompt(source_fields, target_fields, source_system, target_system)
+            result = await self.client.achat(prompt, temperature=0.1)
+            return self._build_mapping_result(result, source_fields, target_fields)
+        except Exception as e:
+            logger.error(f"生成字段映射失败: {e}")
+            return self._error_result(e)
+
+    def _build_mapping_result(self, result: Any, source_fields: List[str], target_fields: List[str]) -> Dict[str, Any]:
+        # 解析结果
+        mapping_result = self._parse_mapping_result(result)
+        
+        # 添加置信度评分
+        mapping_result["confidence_scores"] = self._calculate_confidence_scores(
+            source_fields, target_fields, mapping_result["mappings"]
+        )
+        
+        # 添加字段类型推断
+        mapping_result["field_types"] = self._infer_field_types(source_fields + target_fields)
+        
+        return mapping_result
+
+    @staticmethod
+    def _error_result(e: Exception) -> Dict[str, Any]:
+        return {
+            "error": str(e),
+            "mappings": {},
+            "confidence_scores": {},
+            "field_types": {}
+        }
     
     def _build_mapping_prompt(self, source_fields: List[str], target_fields: List[str],
                             source_system: str, target_system: str) -> str:
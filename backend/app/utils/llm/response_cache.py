@@ -0,0 +1,348 @@
+"""
+LLM 响应缓存
+- 精确匹配：规范化提示词 + 模型 + 温度 + 调用参数的哈希
+- 相似匹配（调用方按需开启）：在同一命名空间/模型/温度/参数下，对用户可变部分（如最后一条用户消息）
+  做字符 2/3-gram 哈希向量的余弦相似度，并要求两者中的数字完全一致，避免“9月”命中“8月”的回答
+- 进程内 LRU 在前，SQLite 持久表 llm_response_cache 在后；超出容量按最近访问时间淘汰
+- 记录精确/相似命中、未命中次数与节省的 token 数
+- chat() 在线程池中并发调用：相似索引与计数只在 self._lock 内修改，检索时在锁内取一致的快照
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.db.sqlite_db import get_sqlite_db
+from app.utils.cache.ttl_lru import TTLLRUCache
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_RESPONSE_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_MEMORY_SIZE = int(os.getenv("LLM_RESPONSE_CACHE_MEMORY_SIZE", "1024"))
+# 相似匹配的余弦相似度阈值
+LLM_CACHE_SIMILARITY = float(os.getenv("LLM_RESPONSE_CACHE_SIMILARITY", "0.92"))
+
+# 字符 n-gram 哈希向量维度
+_EMBED_DIM = 1024
+# 最近访问时间累计到该条数后批量落盘
+_TOUCH_FLUSH_SIZE = 64
+# 按 key 批量删除时每条语句的参数个数（低于旧版 SQLite 的 999 变量上限）
+_DELETE_BATCH = 500
+
+_WS_RE = re.compile(r"\s+")
+_NUM_RE = re.compile(r"\d+(?:\.\d+)?")
+# 相似匹配时忽略标点与空白（“你好！”与“你好”视为同一问题）
+_PUNCT_RE = re.compile(r"[\W_]+")
+
+
+def normalize_prompt(text: str) -> str:
+    """全半角/大小写归一，空白折叠"""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return _WS_RE.sub(" ", text).strip()
+
+
+def embed_text(text: str) -> np.ndarray:
+    """字符 2/3-gram 计数经 crc32 哈希到固定维度并 L2 归一（crc32 跨进程稳定，可持久化）"""
+    vec = np.zeros(_EMBED_DIM, dtype=np.float32)
+    compact = _PUNCT_RE.sub("", text)
+    for n in (2, 3):
+        for i in range(len(compact) - n + 1):
+            vec[zlib.crc32(compact[i:i + n].encode("utf-8")) % _EMBED_DIM] += 1.0
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else vec
+
+
+def _numbers(text: str) -> List[str]:
+    return _NUM_RE.findall(text)
+
+
+class LLMResponseCache:
+    """两级 LLM 响应缓存：进程内 LRU + SQLite 持久表"""
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+        similarity: float = LLM_CACHE_SIMILARITY,
+    ) -> None:
+        self.conn = conn
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.memory = TTLLRUCache(max_size=LLM_CACHE_MEMORY_SIZE, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        # 相似匹配索引：bucket -> (keys, 向量矩阵, 提示词数字)；bucket 内新增条目后矩阵惰性重建
+        self._buckets: Dict[str, Dict[str, Any]] = {}
+        self.metrics = {
+            "exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "evictions": 0,
+            "tokens_saved": 0, "cost_saved": 0.0,
+        }
+
+    # ---- 键 ----
+
+    @staticmethod
+    def make_bucket(namespace: str, model: str, temperature: float, params: Optional[Dict[str, Any]] = None) -> str:
+        """相似匹配只在同一 bucket 内进行"""
+        bucket = f"{namespace}|{model}|{temperature:g}"
+        if params:
+            extra = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+            bucket += "|" + hashlib.sha1(extra.encode("utf-8")).hexdigest()[:12]
+        return bucket
+
+    @staticmethod
+    def make_key(bucket: str, prompt: str) -> str:
+        return hashlib.sha1(f"{bucket}\x1f{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+    # ---- 查询 ----
+
+    def lookup(
+        self,
+        namespace: str,
+        model: str,
+        temperature: float,
+        prompt: str,
+        params: Optional[Dict[str, Any]] = None,
+        semantic: bool = False,
+        semantic_text: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        命中返回缓存的响应（dict），未命中返回 None
+        semantic_text: 参与相似匹配的文本，默认为整个提示词；固定的系统提示不应计入
+        """
+        bucket = self.make_bucket(namespace, model, temperature, params)
+        key = self.make_key(bucket, prompt)
+
+        entry = self._get_exact(key)
+        kind = "exact_hits"
+        if entry is None and semantic:
+            entry = self._get_similar(bucket, normalize_prompt(semantic_text or prompt))
+            kind = "semantic_hits"
+        with self._lock:
+            if entry is None:
+                self.metrics["misses"] += 1
+                return None
+            self.metrics[kind] += 1
+            self.metrics["tokens_saved"] += entry["prompt_tokens"] + entry["completion_tokens"]
+            self.metrics["cost_saved"] += entry.get("cost", 0.0)
+        self._touch(entry["key"])
+        return entry["response"]
+
+    def _get_exact(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry
+        with self._lock:
+            cur = self.conn.cursor()
+            cur.execute(
+                "SELECT response_json, prompt_tokens, completion_tokens, cost FROM llm_response_cache "
+                "WHERE cache_key = ? AND expires_at > ?",
+                (key, time.time()),
+            )
+            row = cur.fetchone()
+        if row is None:
+            return None
+        entry = {
+            "key": key, "response": json.loads(row[0]),
+            "prompt_tokens": row[1] or 0, "completion_tokens": row[2] or 0, "cost": row[3] or 0.0,
+        }
+        self.memory.set(key, entry)
+        return entry
+
+    def _bucket_snapshot(self, bucket: str) -> Tuple[List[str], Optional[np.ndarray], List[List[str]]]:
+        """在锁内取 bucket 的 (keys, 向量矩阵, 提示词数字)；首次访问时从持久表加载"""
+        with self._lock:
+            index = self._buckets.get(bucket)
+            if index is None:
+                cur = self.conn.cursor()
+                cur.execute(
+                    "SELECT cache_key, prompt_norm, embedding FROM llm_response_cache "
+                    "WHERE bucket = ? AND expires_at > ?",
+                    (bucket, time.time()),
+                )
+                rows = cur.fetchall()
+                index = self._buckets[bucket] = {
+                    "keys": [r[0] for r in rows],
+                    "vectors": [np.frombuffer(r[2], dtype=np.float32) for r in rows],
+                    "numbers": [_numbers(r[1]) for r in rows],
+                    "matrix": None,
+                }
+            if not index["keys"]:
+                return [], None, []
+            if index["matrix"] is None:
+                index["matrix"] = np.vstack(index["vectors"])
+            # 写入与淘汰会替换或追加列表，这里复制一份与矩阵行对齐的引用
+            return list(index["keys"]), index["matrix"], list(index["numbers"])
+
+    def _get_similar(self, bucket: str, prompt_norm: str) -> Optional[Dict[str, Any]]:
+        keys, matrix, bucket_numbers = self._bucket_snapshot(bucket)
+        if matrix is None:
+            return None
+        scores = matrix @ embed_text(prompt_norm)
+        numbers = _numbers(prompt_norm)
+        for i in np.argsort(-scores):
+            if scores[i] < self.similarity:
+                break
+            if bucket_numbers[i] != numbers:
+                continue
+            entry = self._get_exact(keys[i])
+            if entry is not None:
+                return entry
+        return None
+
+    # ---- 写入与淘汰 ----
+
+    def store(
+        self,
+        namespace: str,
+        model: str,
+        temperature: float,
+        prompt: str,
+        response: Dict[str, Any],
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cost: float = 0.0,
+        params: Optional[Dict[str, Any]] = None,
+        semantic_text: Optional[str] = None,
+    ) -> None:
+        bucket = self.make_bucket(namespace, model, temperature, params)
+        key = self.make_key(bucket, prompt)
+        prompt_norm = normalize_prompt(semantic_text or prompt)
+        vector = embed_text(prompt_norm)
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT INTO llm_response_cache(cache_key, bucket, prompt_norm, embedding, response_json,
+                                               prompt_tokens, completion_tokens, cost, created_at, last_access, expires_at)
+                VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                    response_json = excluded.response_json, prompt_tokens = excluded.prompt_tokens,
+                    completion_tokens = excluded.completion_tokens, cost = excluded.cost,
+                    last_access = excluded.last_access, expires_at = excluded.expires_at
+                """,
+                (key, bucket, prompt_norm, vector.tobytes(), json.dumps(response, ensure_ascii=False),
+                 prompt_tokens, completion_tokens, cost, now, now, now + self.ttl_seconds),
+            )
+            self.conn.commit()
+            index = self._buckets.get(bucket)
+            if index is not None and key not in index["keys"]:
+                index["keys"].append(key)
+                index["vectors"].append(vector)
+                index["numbers"].append(_numbers(prompt_norm))
+                index["matrix"] = None
+            self.metrics["stores"] += 1
+            due = self.metrics["stores"] % _TOUCH_FLUSH_SIZE == 0
+        self.memory.set(key, {
+            "key": key, "response": response,
+            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "cost": cost,
+        })
+        if due:
+            self.evict()
+
+    def _touch(self, key: str) -> None:
+        with self._lock:
+            self._touched[key] = time.time()
+            pending = len(self._touched)
+        if pending >= _TOUCH_FLUSH_SIZE:
+            self.flush_access()
+
+    def flush_access(self) -> int:
+        """批量更新最近访问时间（LRU 依据）"""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            if touched:
+                self.conn.executemany(
+                    "UPDATE llm_response_cache SET last_access = ?, hits = hits + 1 WHERE cache_key = ?",
+                    [(ts, key) for key, ts in touched.items()],
+                )
+                self.conn.commit()
+        return len(touched)
+
+    def evict(self) -> int:
+        """删除过期条目，并按最近访问时间淘汰超出容量的条目"""
+        self.flush_access()
+        with self._lock:
+            cur = self.conn.cursor()
+            now = time.time()
+            cur.execute("SELECT cache_key FROM llm_response_cache WHERE expires_at <= ?", (now,))
+            removed = {row[0] for row in cur.fetchall()}
+            cur.execute("SELECT COUNT(*) FROM llm_response_cache WHERE expires_at > ?", (now,))
+            overflow = cur.fetchone()[0] - self.max_entries
+            if overflow > 0:
+                cur.execute(
+                    "SELECT cache_key FROM llm_response_cache WHERE expires_at > ? ORDER BY last_access ASC LIMIT ?",
+                    (now, overflow),
+                )
+                removed.update(row[0] for row in cur.fetchall())
+            keys = list(removed)
+            for start in range(0, len(keys), _DELETE_BATCH):
+                batch = keys[start:start + _DELETE_BATCH]
+                cur.execute(f"DELETE FROM llm_response_cache WHERE cache_key IN ({','.join('?' * len(batch))})", batch)
+            self.conn.commit()
+            if removed:
+                self.metrics["evictions"] += len(removed)
+                # 只从相似索引中移除被删除的条目，其余热条目保留
+                for index in self._buckets.values():
+                    keep = [i for i, key in enumerate(index["keys"]) if key not in removed]
+                    if len(keep) != len(index["keys"]):
+                        index["keys"] = [index["keys"][i] for i in keep]
+                        index["vectors"] = [index["vectors"][i] for i in keep]
+                        index["numbers"] = [index["numbers"][i] for i in keep]
+                        index["matrix"] = None
+        for key in removed:
+            self.memory.pop(key)
+        return len(removed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM llm_response_cache")
+            self.conn.commit()
+            self._touched.clear()
+            self._buckets.clear()
+        self.memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cur = self.conn.cursor()
+            cur.execute("SELECT COUNT(*) FROM llm_response_cache")
+            entries = cur.fetchone()[0]
+            metrics = dict(self.metrics)
+        lookups = metrics["exact_hits"] + metrics["semantic_hits"] + metrics["misses"]
+        hits = metrics["exact_hits"] + metrics["semantic_hits"]
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "persistent_entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "similarity_threshold": self.similarity,
+            **{k: (round(v, 6) if isinstance(v, float) else v) for k, v in metrics.items()},
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory": self.memory.stats(),
+        }
+
+
+_response_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_response_cache() -> Optional[LLMResponseCache]:
+    """获取全局 LLM 响应缓存；LLM_RESPONSE_CACHE_ENABLED=false 时返回 None"""
+    global _response_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _response_cache is None:
+        _response_cache = LLMResponseCache(get_sqlite_db().conn)
+    return _response_cache
@@ -0,0 +1,11 @@
+import json
+from typing import Any
+
+# 说明：SSE（text/event-stream）事件编码，对话式查询接口的流式模式使用
+# 事件顺序约定：parsed（规则解析结果）-> rows（检索结果）-> delta*（说明文本增量）-> done；出错时为 error
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
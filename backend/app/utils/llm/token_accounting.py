@@ -0,0 +1,451 @@
+"""
+LLM token 计量与预算
+- 分词：本地可用 tiktoken（且编码文件已缓存/可加载）时使用真实分词，否则按中日韩字符 1 token、其余约 4 字符 1 token 估算
+- 计量：按接口（路由模板）与用户累计调用次数、token 与费用；调用上下文由 LLMUsageContextMiddleware 写入 contextvar
+- 预算：滑动窗口内全局与单用户 token 上限；超限时最多排队等待 LLM_BUDGET_MAX_WAIT_SECONDS，
+  仍不足则抛出 LLMBudgetExceeded（RuntimeError 子类），调用方既有的异常分支即回退到规则解析/统计预测
+- 共享状态后端为 sqlite 时预算窗口存入共享 kv，多个 worker 共用同一预算（否则实际上限为 N 倍）；
+  共享窗口写锁竞争超时时放行本次调用。调用计数与费用统计为进程内数据，与请求指标一致，各 worker 分别导出
+"""
+
+import asyncio
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+LLM_TOKENIZER = os.getenv("LLM_TOKENIZER", "auto").lower()  # auto | tiktoken | heuristic
+LLM_TOKENIZER_ENCODING = os.getenv("LLM_TOKENIZER_ENCODING", "cl100k_base")
+# 滑动窗口内 token 上限，0 表示不限
+LLM_TOKEN_BUDGET = int(os.getenv("LLM_TOKEN_BUDGET", "200000"))
+LLM_USER_TOKEN_BUDGET = int(os.getenv("LLM_USER_TOKEN_BUDGET", "50000"))
+LLM_BUDGET_WINDOW_SECONDS = float(os.getenv("LLM_BUDGET_WINDOW_SECONDS", "60"))
+LLM_BUDGET_MAX_WAIT_SECONDS = float(os.getenv("LLM_BUDGET_MAX_WAIT_SECONDS", "2"))
+# 未指定 max_tokens 时预占的输出 token 数，请求完成后按实际用量校正
+LLM_DEFAULT_COMPLETION_TOKENS = int(os.getenv("LLM_DEFAULT_COMPLETION_TOKENS", "256"))
+# 每个维度最多保留的计数键（按最近使用淘汰）
+LLM_USAGE_MAX_KEYS = int(os.getenv("LLM_USAGE_MAX_KEYS", "1000"))
+
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]")
+# OpenAI 消息格式的固定开销（每条消息的角色标记与回复起始标记）
+_TOKENS_PER_MESSAGE = 4
+_TOKENS_PER_REPLY = 3
+
+
+class LLMBudgetExceeded(RuntimeError):
+    """token 预算不足且排队超时"""
+
+
+# ---- 分词 ----
+
+_encode: Optional[Callable[[str], List[int]]] = None
+_tokenizer_name: Optional[str] = None
+_tokenizer_lock = threading.Lock()
+
+
+def _load_tokenizer() -> None:
+    global _encode, _tokenizer_name
+    with _tokenizer_lock:
+        if _tokenizer_name is not None:
+            return
+        if LLM_TOKENIZER != "heuristic":
+            try:
+                import tiktoken
+                encoding = tiktoken.get_encoding(LLM_TOKENIZER_ENCODING)
+                _encode = encoding.encode
+                _tokenizer_name = f"tiktoken:{LLM_TOKENIZER_ENCODING}"
+                return
+            except Exception as e:
+                level = logging.WARNING if LLM_TOKENIZER == "tiktoken" else logging.INFO
+                logger.log(level, f"tiktoken 不可用，使用字符估算: {e}")
+        _tokenizer_name = "heuristic"
+
+
+def tokenizer_name() -> str:
+    if _tokenizer_name is None:
+        _load_tokenizer()
+    return _tokenizer_name or "heuristic"
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _tokenizer_name is None:
+        _load_tokenizer()
+    if _encode is not None:
+        return len(_encode(text))
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def count_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    total = _TOKENS_PER_REPLY
+    for message in messages:
+        total += _TOKENS_PER_MESSAGE + count_tokens(str(message.get("content") or ""))
+    return total
+
+
+# ---- 调用上下文 ----
+
+_usage_scope: ContextVar[Optional[Dict[str, Any]]] = ContextVar("llm_usage_scope", default=None)
+
+
+def set_usage_scope(scope: Optional[Dict[str, Any]]):
+    return _usage_scope.set(scope)
+
+
+def reset_usage_scope(token) -> None:
+    _usage_scope.reset(token)
+
+
+def _resolve_user(scope: Dict[str, Any]) -> str:
+    # 只扫描一遍原始头（与 RateLimitMiddleware 一致），不为每个请求构造 dict
+    auth = ""
+    api_key = None
+    for name, value in scope.get("headers") or ():
+        if name == b"authorization":
+            auth = value.decode("latin-1")
+        elif name == b"x-api-key":
+            api_key = value
+    if auth.lower().startswith("bearer "):
+        from ..auth.jwt import verify_token
+        try:
+            return f"user:{verify_token(auth.split(' ', 1)[1]).get('sub', 'unknown')}"
+        except Exception:
+            pass
+    if api_key:
+        return f"key:{api_key.decode('latin-1')[:8]}"
+    client = scope.get("client") or ("unknown", 0)
+    return f"ip:{client[0]}"
+
+
+def current_usage_context() -> Dict[str, str]:
+    """返回当前调用的 {endpoint, user}；非 HTTP 请求内（后台任务、脚本）记为 internal"""
+    scope = _usage_scope.get()
+    if scope is None:
+        return {"endpoint": "internal", "user": "internal"}
+    state = scope.setdefault("state", {})
+    if "llm_user" not in state:
+        state["llm_user"] = _resolve_user(scope)
+    route = scope.get("route")
+    endpoint = getattr(route, "path", None) or scope.get("path", "")
+    return {"endpoint": f"{scope.get('method', '')} {endpoint}".strip(), "user": state["llm_user"]}
+
+
+# ---- 计量与预算 ----
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def _new_counter() -> Dict[str, Any]:
+    return {
+        "calls": 0, "cached_calls": 0, "rejected": 0, "errors": 0,
+        "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0,
+        "tokens_saved": 0, "cost": 0.0,
+    }
+
+
+def _wait_for(
+    entries: Iterable[List[Any]], window_seconds: float, used: int, limit: int, tokens: int, now: float,
+    user: Optional[str],
+) -> float:
+    """窗口内需要过期多少条目才能容纳 tokens，返回等待秒数；0 表示可立即放行"""
+    if limit <= 0:
+        return 0.0
+    tokens = min(tokens, limit)  # 单次超过上限的请求在窗口清空后放行
+    if used + tokens <= limit:
+        return 0.0
+    freed = 0
+    for ts, entry_tokens, entry_user, *_ in entries:
+        if user is None or entry_user == user:
+            freed += entry_tokens
+            if used - freed + tokens <= limit:
+                return max(1e-3, ts + window_seconds - now)
+    return window_seconds
+
+
+class LocalBudgetWindow:
+    """进程内滑动窗口；条目: [时间戳, token 数, 用户]，token 数在请求完成后按实际用量校正"""
+
+    def __init__(self, budget: int, user_budget: int, window_seconds: float) -> None:
+        self.budget = budget
+        self.user_budget = user_budget
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._entries: Deque[List[Any]] = deque()
+        self._total = 0
+        self._users: Dict[str, int] = {}
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        while self._entries and self._entries[0][0] <= cutoff:
+            _, tokens, user = self._entries.popleft()
+            self._total -= tokens
+            left = self._users.get(user, 0) - tokens
+            if left > 0:
+                self._users[user] = left
+            else:
+                self._users.pop(user, None)
+
+    def reserve(self, tokens: int, user: str) -> Union[List[Any], float]:
+        """预占成功返回窗口条目，否则返回需等待的秒数"""
+        with self._lock:
+            now = time.time()
+            self._prune(now)
+            wait = max(
+                _wait_for(self._entries, self.window_seconds, self._total, self.budget, tokens, now, None),
+                _wait_for(self._entries, self.window_seconds, self._users.get(user, 0), self.user_budget, tokens, now, user),
+            )
+            if wait > 0:
+                return wait
+            entry = [now, tokens, user]
+            self._entries.append(entry)
+            self._total += tokens
+            self._users[user] = self._users.get(user, 0) + tokens
+            return entry
+
+    def correct(self, entry: List[Any], actual: int) -> None:
+        with self._lock:
+            if entry[0] > time.time() - self.window_seconds:
+                delta = actual - entry[1]
+                entry[1] = actual
+                self._total += delta
+                if entry[2] in self._users:
+                    self._users[entry[2]] += delta
+
+    def usage(self) -> Tuple[int, Dict[str, int]]:
+        """(窗口内总 token, 各用户 token)"""
+        with self._lock:
+            self._prune(time.time())
+            return self._total, dict(self._users)
+
+
+class SharedBudgetWindow:
+    """共享状态后端上的滑动窗口：整个窗口存为一个键，在 kv.update 的事务内裁剪、判定并追加；
+    条目: [时间戳, token 数, 用户, 条目ID]。kv 使用短 busy_timeout，写锁竞争超时时放行（fail open）"""
+
+    _KEY = "window"
+
+    def __init__(self, kv, budget: int, user_budget: int, window_seconds: float) -> None:
+        self.kv = kv
+        self.budget = budget
+        self.user_budget = user_budget
+        self.window_seconds = window_seconds
+        self.fail_open = 0
+
+    def _live(self, stored: Optional[List[List[Any]]], now: float) -> List[List[Any]]:
+        cutoff = now - self.window_seconds
+        return [e for e in stored or () if e[0] > cutoff]
+
+    def reserve(self, tokens: int, user: str) -> Union[List[Any], float]:
+        result: List[Any] = [0.0]
+
+        def _apply(stored):
+            now = time.time()
+            entries = self._live(stored, now)
+            used_user = sum(e[1] for e in entries if e[2] == user)
+            wait = max(
+                _wait_for(entries, self.window_seconds, sum(e[1] for e in entries), self.budget, tokens, now, None),
+                _wait_for(entries, self.window_seconds, used_user, self.user_budget, tokens, now, user),
+            )
+            if wait > 0:
+                result[0] = wait
+                return None
+            entry = [now, tokens, user, uuid.uuid4().hex[:12]]
+            entries.append(entry)
+            result[0] = entry
+            return entries
+
+        try:
+            self.kv.update(self._KEY, _apply, ttl_seconds=self.window_seconds)
+        except sqlite3.OperationalError as e:
+            self.fail_open += 1
+            logger.debug("共享 LLM 预算窗口繁忙，放行本次调用: %s", e)
+            return [time.time(), tokens, user, None]
+        return result[0]
+
+    def correct(self, entry: List[Any], actual: int) -> None:
+        if entry[3] is None:
+            return
+
+        def _apply(stored):
+            entries = self._live(stored, time.time())
+            for e in entries:
+                if e[3] == entry[3]:
+                    e[1] = actual
+                    return entries
+            return None
+
+        try:
+            self.kv.update(self._KEY, _apply, ttl_seconds=self.window_seconds)
+        except sqlite3.OperationalError as e:
+            logger.debug("共享 LLM 预算窗口繁忙，跳过用量校正: %s", e)
+
+    def usage(self) -> Tuple[int, Dict[str, int]]:
+        users: Dict[str, int] = {}
+        for _, tokens, user, _ in self._live(self.kv.get(self._KEY), time.time()):
+            users[user] = users.get(user, 0) + tokens
+        return sum(users.values()), users
+
+
+class TokenLedger:
+    """按接口/用户累计 token，并以滑动窗口限制 token 速率"""
+
+    def __init__(
+        self,
+        budget: int = LLM_TOKEN_BUDGET,
+        user_budget: int = LLM_USER_TOKEN_BUDGET,
+        window_seconds: float = LLM_BUDGET_WINDOW_SECONDS,
+        max_wait_seconds: float = LLM_BUDGET_MAX_WAIT_SECONDS,
+        window=None,
+    ) -> None:
+        self.budget = budget
+        self.user_budget = user_budget
+        self.window_seconds = window_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self._lock = threading.Lock()
+        self._window = window if window is not None else LocalBudgetWindow(budget, user_budget, window_seconds)
+        self._totals = _new_counter()
+        self._endpoints: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._users: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def _reject(self, ctx: Dict[str, str], tokens: int) -> LLMBudgetExceeded:
+        with self._lock:
+            for counter in self._counters_for(ctx):
+                counter["rejected"] += 1
+        logger.warning(f"LLM token 预算不足，回退非 LLM 路径: endpoint={ctx['endpoint']} user={ctx['user']} tokens≈{tokens}")
+        return LLMBudgetExceeded(f"LLM token budget exceeded ({tokens} tokens requested)")
+
+    async def acquire(self, tokens: int) -> List[Any]:
+        """预占 tokens；预算不足时排队等待，超过最长等待时间则抛出 LLMBudgetExceeded"""
+        ctx = current_usage_context()
+        deadline = time.monotonic() + self.max_wait_seconds
+        while True:
+            result = self._window.reserve(tokens, ctx["user"])
+            if isinstance(result, list):
+                return result
+            if time.monotonic() + result > deadline:
+                raise self._reject(ctx, tokens)
+            await asyncio.sleep(result)
+
+    def acquire_sync(self, tokens: int) -> List[Any]:
+        """acquire 的同步版本，供线程池中的 LLMClient.chat 使用；
+        若在事件循环线程上被调用（async 路由误用同步 chat），预算不足时直接拒绝而不 sleep，避免冻结整个事件循环"""
+        ctx = current_usage_context()
+        deadline = time.monotonic() + self.max_wait_seconds
+        on_loop = _on_event_loop()
+        while True:
+            result = self._window.reserve(tokens, ctx["user"])
+            if isinstance(result, list):
+                return result
+            if on_loop or time.monotonic() + result > deadline:
+                raise self._reject(ctx, tokens)
+            time.sleep(result)
+
+    # ---- 计数 ----
+
+    def _counter(self, table: "OrderedDict[str, Dict[str, Any]]", key: str) -> Dict[str, Any]:
+        counter = table.get(key)
+        if counter is None:
+            counter = table[key] = _new_counter()
+            if len(table) > LLM_USAGE_MAX_KEYS:
+                table.popitem(last=False)
+        else:
+            table.move_to_end(key)
+        return counter
+
+    def _counters_for(self, ctx: Dict[str, str]) -> List[Dict[str, Any]]:
+        return [self._totals, self._counter(self._endpoints, ctx["endpoint"]), self._counter(self._users, ctx["user"])]
+
+    def record(
+        self,
+        entry: Optional[List[Any]],
+        prompt_tokens: int,
+        completion_tokens: int,
+        cost: float,
+        error: bool = False,
+    ) -> None:
+        """请求完成后记录实际用量，并将预占的窗口额度校正为实际值"""
+        ctx = current_usage_context()
+        actual = prompt_tokens + completion_tokens
+        if entry is not None:
+            self._window.correct(entry, actual)
+        with self._lock:
+            for counter in self._counters_for(ctx):
+                counter["calls"] += 1
+                counter["errors"] += int(error)
+                counter["prompt_tokens"] += prompt_tokens
+                counter["completion_tokens"] += completion_tokens
+                counter["total_tokens"] += actual
+                counter["cost"] += cost
+
+    def record_cached(self, tokens_saved: int) -> None:
+        ctx = current_usage_context()
+        with self._lock:
+            for counter in self._counters_for(ctx):
+                counter["cached_calls"] += 1
+                counter["tokens_saved"] += tokens_saved
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals = _new_counter()
+            self._endpoints.clear()
+            self._users.clear()
+
+    def snapshot(self, top: int = 20) -> Dict[str, Any]:
+        def _fmt(counter: Dict[str, Any]) -> Dict[str, Any]:
+            return {**counter, "cost": round(counter["cost"], 6)}
+
+        window_used, window_users = self._window.usage()
+        with self._lock:
+            users = sorted(self._users.items(), key=lambda kv: kv[1]["total_tokens"], reverse=True)[:top]
+            return {
+                "tokenizer": tokenizer_name(),
+                "budget": {
+                    "window_seconds": self.window_seconds,
+                    "limit": self.budget,
+                    "used": window_used,
+                    "shared": isinstance(self._window, SharedBudgetWindow),
+                    "user_limit": self.user_budget,
+                    "max_wait_seconds": self.max_wait_seconds,
+                },
+                "totals": _fmt(self._totals),
+                "endpoints": {k: _fmt(v) for k, v in self._endpoints.items()},
+                "users": {k: {**_fmt(v), "window_used": window_users.get(k, 0)} for k, v in users},
+            }
+
+
+_token_ledger: Optional[TokenLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_token_ledger() -> TokenLedger:
+    global _token_ledger
+    if _token_ledger is None:
+        with _ledger_lock:
+            if _token_ledger is None:
+                from ..state.shared_state import SHARED_STATE_FAST_TIMEOUT_MS, SQLITE, get_state_backend
+                backend = get_state_backend()
+                window = None
+                if backend.kind == SQLITE:
+                    kv = backend.kv(
+                        "llm_budget", max_size=1, ttl_seconds=LLM_BUDGET_WINDOW_SECONDS,
+                        busy_timeout_ms=SHARED_STATE_FAST_TIMEOUT_MS,
+                    )
+                    window = SharedBudgetWindow(kv, LLM_TOKEN_BUDGET, LLM_USER_TOKEN_BUDGET, LLM_BUDGET_WINDOW_SECONDS)
+                _token_ledger = TokenLedger(window=window)
+    return _token_ledger
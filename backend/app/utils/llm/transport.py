@@ -0,0 +1,505 @@
+"""
+LLM 共享 HTTP 传输层
+- 连接池复用：异步走 httpx.AsyncClient（keep-alive），同步走 requests.Session
+- 失败重试：指数退避 + 全抖动（full jitter），仅对超时/连接错误/429/5xx 重试
+- 熔断：连续失败达到阈值后在冷却期内直接失败，冷却结束放行单个探测请求
+- 按供应商限制并发
+- 流式：OpenAI 兼容 SSE（stream=true），首个分片前的失败同样重试，开始输出后不再重试
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+from ..metrics.timing import LLM, timed
+
+logger = logging.getLogger(__name__)
+
+LLM_HTTP_TIMEOUT_SECONDS = float(os.getenv("LLM_HTTP_TIMEOUT_SECONDS", "30"))
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "32"))
+LLM_HTTP_KEEPALIVE_SECONDS = float(os.getenv("LLM_HTTP_KEEPALIVE_SECONDS", "60"))
+LLM_HTTP_MAX_RETRIES = int(os.getenv("LLM_HTTP_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+# 半开探测请求的最长占用时间：超时未回报结果（如探测协程被取消而未走到 finally）时放行新的探测
+LLM_BREAKER_PROBE_TIMEOUT_SECONDS = float(
+    os.getenv("LLM_BREAKER_PROBE_TIMEOUT_SECONDS", str(LLM_HTTP_TIMEOUT_SECONDS * 2))
+)
+# 每个供应商的并发上限，可用 LLM_CONCURRENCY_<供应商大写> 单独覆盖
+LLM_PROVIDER_CONCURRENCY = int(os.getenv("LLM_PROVIDER_CONCURRENCY", "8"))
+
+# 可重试的HTTP状态码
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class LLMTransportError(RuntimeError):
+    """LLM 请求失败（已用尽重试或不可重试）"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitOpenError(LLMTransportError):
+    """熔断器打开，请求未发出即失败"""
+
+
+class CircuitBreaker:
+    """连续失败计数熔断器：closed -> open -> half_open -> closed/open"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = LLM_BREAKER_FAILURES,
+        reset_seconds: float = LLM_BREAKER_RESET_SECONDS,
+        probe_timeout_seconds: float = LLM_BREAKER_PROBE_TIMEOUT_SECONDS,
+    ) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.probe_timeout_seconds = probe_timeout_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """是否放行请求；冷却期结束后只放行一个探测请求，探测超时未回报时再放行下一个"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and (
+                not self._probing or now - self._probe_started >= self.probe_timeout_seconds
+            ):
+                self._probing = True
+                self._probe_started = now
+                return True
+            return False
+
+    def release(self) -> None:
+        """请求被取消/中断、未得出成败结论时调用：交还探测名额，不计入失败"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"[llm-transport] 熔断打开: 连续失败 {self.failures} 次")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "failures": self.failures}
+
+
+def _provider_limit(provider: str) -> int:
+    key = "LLM_CONCURRENCY_" + "".join(ch if ch.isalnum() else "_" for ch in provider.upper())
+    return max(1, int(os.getenv(key, str(LLM_PROVIDER_CONCURRENCY))))
+
+
+def backoff_delay(attempt: int, base: float = LLM_BACKOFF_BASE_SECONDS, cap: float = LLM_BACKOFF_MAX_SECONDS) -> float:
+    """第 attempt 次重试前的等待时间：[0, min(cap, base * 2^attempt)] 内均匀随机"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _retry_after(headers: Any) -> Optional[float]:
+    value = headers.get("Retry-After") if headers is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def provider_from_url(url: str) -> str:
+    """未指定供应商时按主机名区分熔断与并发"""
+    return urlparse(url).netloc or "default"
+
+
+def first_message_content(data: Dict[str, Any]) -> Optional[str]:
+    """OpenAI 兼容响应中第一条回复的文本"""
+    return (data.get("choices") or [{}])[0].get("message", {}).get("content")
+
+
+def sse_delta_content(line: str) -> Optional[str]:
+    """解析 OpenAI 兼容 SSE 的一行（data: {...}），返回增量文本；非数据行、[DONE] 返回 None"""
+    if not line.startswith("data:"):
+        return None
+    data = line[5:].strip()
+    if not data or data == "[DONE]":
+        return None
+    try:
+        choice = (json.loads(data).get("choices") or [{}])[0]
+    except ValueError:
+        return None
+    return (choice.get("delta") or {}).get("content") or None
+
+
+class LLMTransport:
+    """进程内共享的 LLM HTTP 传输"""
+
+    def __init__(
+        self,
+        timeout_seconds: float = LLM_HTTP_TIMEOUT_SECONDS,
+        max_connections: int = LLM_HTTP_MAX_CONNECTIONS,
+        max_retries: int = LLM_HTTP_MAX_RETRIES,
+    ) -> None:
+        self.timeout_seconds = timeout_seconds
+        self.max_connections = max(1, max_connections)
+        self.max_retries = max(0, max_retries)
+        self._lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+        self._async_client = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_limits: Dict[str, asyncio.Semaphore] = {}
+        self._sync_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    # ---- 共享资源 ----
+
+    def _get_session(self) -> requests.Session:
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_connections)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+    def _bind_loop(self) -> None:
+        """异步客户端与信号量绑定在当前事件循环上，循环变化（如脚本多次 asyncio.run）时重建"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._async_client = None
+            self._async_limits = {}
+
+    def _get_async_client(self):
+        self._bind_loop()
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout_seconds),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=LLM_HTTP_KEEPALIVE_SECONDS,
+                ),
+            )
+        return self._async_client
+
+    def _async_limit(self, provider: str) -> asyncio.Semaphore:
+        self._bind_loop()
+        if provider not in self._async_limits:
+            self._async_limits[provider] = asyncio.Semaphore(_provider_limit(provider))
+        return self._async_limits[provider]
+
+    def _sync_limit(self, provider: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if provider not in self._sync_limits:
+                self._sync_limits[provider] = threading.BoundedSemaphore(_provider_limit(provider))
+            return self._sync_limits[provider]
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            if provider not in self._breakers:
+                self._breakers[provider] = CircuitBreaker()
+            return self._breakers[provider]
+
+    def _count(self, provider: str, name: str) -> None:
+        with self._lock:
+            counters = self._counters.setdefault(
+                provider, {"requests": 0, "retries": 0, "failures": 0, "short_circuits": 0}
+            )
+            counters[name] += 1
+
+    # ---- 重试判定 ----
+
+    def _check_breaker(self, provider: str) -> CircuitBreaker:
+        breaker = self.breaker(provider)
+        if not breaker.allow():
+            self._count(provider, "short_circuits")
+            raise CircuitOpenError(f"LLM供应商 {provider} 熔断中，请稍后重试")
+        return breaker
+
+    def _should_retry(self, provider: str, breaker: CircuitBreaker, attempt: int, retries: int) -> bool:
+        if attempt >= retries or breaker.state == CircuitBreaker.OPEN:
+            return False
+        self._count(provider, "retries")
+        return True
+
+    # ---- 同步 ----
+
+    def post_json(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None,
+        provider: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """同步 POST JSON（复用 Session 连接池），返回解析后的 JSON"""
+        provider = provider or provider_from_url(url)
+        retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            breaker = self._check_breaker(provider)
+            self._count(provider, "requests")
+            wait: Optional[float] = None
+            try:
+                # 计入 Server-Timing 的 llm 段（含等待供应商并发名额）
+                with timed(LLM), self._sync_limit(provider):
+                    resp = self._get_session().post(url, json=payload, headers=headers, timeout=timeout or self.timeout_seconds)
+                if resp.status_code < 400:
+                    breaker.record_success()
+                    return resp.json()
+                error = LLMTransportError(f"LLM HTTP {resp.status_code}: {resp.text[:200]}", resp.status_code)
+                if resp.status_code not in RETRYABLE_STATUS:
+                    # 4xx 为请求本身的问题，不计入熔断
+                    breaker.record_success()
+                    raise error
+                wait = _retry_after(resp.headers)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = LLMTransportError(f"LLM 请求失败: {e}")
+            except LLMTransportError:
+                raise
+            except Exception as e:
+                # 响应无法解析等异常：计入熔断但不重试
+                breaker.record_failure()
+                raise LLMTransportError(f"LLM 响应异常: {e}") from e
+            except BaseException:
+                # KeyboardInterrupt 等中断：交还半开探测名额
+                breaker.release()
+                raise
+            breaker.record_failure()
+            self._count(provider, "failures")
+            if not self._should_retry(provider, breaker, attempt, retries):
+                raise error
+            time.sleep(max(wait or 0.0, backoff_delay(attempt)))
+            attempt += 1
+
+    # ---- 异步 ----
+
+    async def apost_json(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None,
+        provider: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """异步 POST JSON（keep-alive 连接池 + 供应商并发上限），返回解析后的 JSON"""
+        if not HTTPX_AVAILABLE:
+            return await asyncio.to_thread(self.post_json, url, payload, headers, provider, timeout, max_retries)
+        provider = provider or provider_from_url(url)
+        retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            breaker = self._check_breaker(provider)
+            self._count(provider, "requests")
+            wait: Optional[float] = None
+            try:
+                with timed(LLM):
+                    async with self._async_limit(provider):
+                        resp = await self._get_async_client().post(
+                            url, json=payload, headers=headers, timeout=timeout or self.timeout_seconds
+                        )
+                if resp.status_code < 400:
+                    breaker.record_success()
+                    return resp.json()
+                error = LLMTransportError(f"LLM HTTP {resp.status_code}: {resp.text[:200]}", resp.status_code)
+                if resp.status_code not in RETRYABLE_STATUS:
+                    breaker.record_success()
+                    raise error
+                wait = _retry_after(resp.headers)
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                error = LLMTransportError(f"LLM 请求失败: {e!r}")
+            except LLMTransportError:
+                raise
+            except Exception as e:
+                breaker.record_failure()
+                raise LLMTransportError(f"LLM 响应异常: {e}") from e
+            except BaseException:
+                # 调用方取消（CancelledError，如 wait_for 超时）：交还半开探测名额，否则熔断器会停留在半开
+                breaker.release()
+                raise
+            breaker.record_failure()
+            self._count(provider, "failures")
+            if not self._should_retry(provider, breaker, attempt, retries):
+                raise error
+            await asyncio.sleep(max(wait or 0.0, backoff_delay(attempt)))
+            attempt += 1
+
+    async def achat_completions(
+        self,
+        base_url: str,
+        api_key: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        provider: Optional[str] = None,
+        timeout: Optional[float] = None,
+        **params: Any,
+    ) -> Dict[str, Any]:
+        """OpenAI 兼容 /chat/completions 调用，返回原始响应 JSON"""
+        return await self.apost_json(
+            f"{base_url.rstrip('/')}/chat/completions",
+            {"model": model, "messages": messages, **params},
+            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+            provider=provider,
+            timeout=timeout,
+        )
+
+    async def astream_chat_completions(
+        self,
+        base_url: str,
+        api_key: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        provider: Optional[str] = None,
+        timeout: Optional[float] = None,
+        **params: Any,
+    ) -> AsyncIterator[str]:
+        """OpenAI 兼容流式 /chat/completions，逐段产出回复文本；服务端不支持流式时整段产出"""
+        if not HTTPX_AVAILABLE:
+            data = await self.achat_completions(base_url, api_key, model, messages, provider, timeout, **params)
+            text = first_message_content(data)
+            if text:
+                yield text
+            return
+        url = f"{base_url.rstrip('/')}/chat/completions"
+        provider = provider or provider_from_url(url)
+        payload = {"model": model, "messages": messages, **params, "stream": True}
+        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        attempt = 0
+        while True:
+            breaker = self._check_breaker(provider)
+            self._count(provider, "requests")
+            wait: Optional[float] = None
+            started = False
+            try:
+                async with self._async_limit(provider):
+                    async with self._get_async_client().stream(
+                        "POST", url, json=payload, headers=headers, timeout=timeout or self.timeout_seconds
+                    ) as resp:
+                        if resp.status_code < 400:
+                            if "text/event-stream" not in resp.headers.get("content-type", ""):
+                                text = first_message_content(json.loads(await resp.aread()))
+                                breaker.record_success()
+                                if text:
+                                    yield text
+                                return
+                            # 响应头正常即视为供应商可用；之后客户端断开（GeneratorExit）不影响熔断状态
+                            breaker.record_success()
+                            async for line in resp.aiter_lines():
+                                delta = sse_delta_content(line)
+                                if delta:
+                                    started = True
+                                    yield delta
+                            return
+                        body = (await resp.aread()).decode("utf-8", "replace")
+                        error = LLMTransportError(f"LLM HTTP {resp.status_code}: {body[:200]}", resp.status_code)
+                        if resp.status_code not in RETRYABLE_STATUS:
+                            breaker.record_success()
+                            raise error
+                        wait = _retry_after(resp.headers)
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                error = LLMTransportError(f"LLM 请求失败: {e!r}")
+            except LLMTransportError:
+                raise
+            except Exception as e:
+                breaker.record_failure()
+                raise LLMTransportError(f"LLM 响应异常: {e}") from e
+            except BaseException:
+                # 取消或客户端断开（GeneratorExit）：交还半开探测名额
+                breaker.release()
+                raise
+            breaker.record_failure()
+            self._count(provider, "failures")
+            if started or not self._should_retry(provider, breaker, attempt, retries=self.max_retries):
+                raise error
+            await asyncio.sleep(max(wait or 0.0, backoff_delay(attempt)))
+            attempt += 1
+
+    # ---- 状态与关闭 ----
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            providers = {
+                name: {**counters, "concurrency": _provider_limit(name)}
+                for name, counters in self._counters.items()
+            }
+            breakers = dict(self._breakers)
+        for name, breaker in breakers.items():
+            providers.setdefault(name, {"concurrency": _provider_limit(name)})["breaker"] = breaker.snapshot()
+        return {
+            "httpx_available": HTTPX_AVAILABLE,
+            "max_connections": self.max_connections,
+            "max_retries": self.max_retries,
+            "providers": providers,
+        }
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+_transport: Optional[LLMTransport] = None
+
+
+def get_llm_transport() -> LLMTransport:
+    """获取全局 LLM 传输实例"""
+    global _transport
+    if _transport is None:
+        _transport = LLMTransport()
+    return _transport
+
+
+async def shutdown_llm_transport() -> None:
+    if _transport is not None:
+        await _transport.aclose()
@@ -0,0 +1,203 @@
+"""
+结构化、非阻塞的日志输出
+- 根 logger 只挂一个 QueueHandler：调用线程（含事件循环）只做入队，格式化与写 stdout/stderr 由 QueueListener 后台线程完成
+- 入队时不格式化消息（与标准库 QueueHandler.prepare 不同），%s 参数在后台线程中才拼接；
+  因此请使用 logger.info("... %s", value) 的惰性写法，且不要在记录日志后修改传入的可变对象
+- 队列有界（LOG_QUEUE_SIZE），写满时丢弃新记录并计数，不阻塞请求
+- 输出格式：LOG_FORMAT=json（默认，每行一个 JSON，带 request_id 与 extra 字段）或 text
+- 按 logger 采样 DEBUG 级别热路径日志：LOG_SAMPLE_RATES="app.repository.work_report_repo=0.1,..."，
+  每 1/rate 条保留 1 条；INFO 及以上不采样
+"""
+
+import atexit
+import itertools
+import logging
+import os
+import queue
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..fast_json import dumps
+
+DEFAULT_SAMPLE_RATES = (
+    "app.repository.work_report_repo=0.1,app.api.v1.work_reports=0.1,app.utils.nlp.work_report_query_parser=0.1"
+)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+_request_id: ContextVar[Optional[str]] = ContextVar("log_request_id", default=None)
+
+
+def set_request_id(request_id: Optional[str]):
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token) -> None:
+    _request_id.reset(token)
+
+
+def get_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+# LogRecord 自带属性；其余属性视为 extra={...} 传入的结构化字段
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+_exc_formatter = logging.Formatter()
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """只在调用线程中捕获上下文（request_id、异常栈），不格式化消息；队列满时丢弃"""
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        request_id = _request_id.get()
+        if request_id is not None and not hasattr(record, "request_id"):
+            record.request_id = request_id
+        if record.exc_info:
+            # traceback 会持有调用栈帧，入队前转成文本
+            record.exc_text = _exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id is not None:
+            payload["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED:
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        if record.lineno:
+            payload["src"] = f"{record.module}:{record.lineno}"
+        if record.stack_info:
+            payload["stack"] = record.stack_info
+        try:
+            return dumps(payload).decode("utf-8")
+        except (TypeError, ValueError):
+            # extra 中有无法序列化的对象时退化为 repr
+            return dumps({k: v if isinstance(v, (str, int, float, bool, type(None))) else repr(v)
+                          for k, v in payload.items()}).decode("utf-8")
+
+
+class SamplingFilter(logging.Filter):
+    """每 every 条保留 1 条，只作用于 max_level 及以下级别；计数器为 itertools.count，线程安全"""
+
+    def __init__(self, rate: float, max_level: int = logging.DEBUG) -> None:
+        super().__init__()
+        self.every = round(1 / rate) if rate > 0 else 0
+        self.max_level = max_level
+        self._counter = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        if self.every == 0:
+            return False
+        return next(self._counter) % self.every == 0
+
+
+def parse_sample_rates(text: str) -> List[Tuple[str, float]]:
+    rates = []
+    for item in text.split(","):
+        name, sep, rate = item.strip().partition("=")
+        if not sep:
+            continue
+        try:
+            rates.append((name.strip(), min(1.0, max(0.0, float(rate)))))
+        except ValueError:
+            continue
+    return rates
+
+
+_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    fmt: Optional[str] = None,
+    sample_rates: Optional[str] = None,
+    stream=None,
+    force: bool = False,
+) -> None:
+    """与 logging.basicConfig 一致：根 logger 已有 handler 时不做改动（force=True 时替换）；
+    未传入的参数在调用时读取环境变量（.env 加载之后调用即可生效）"""
+    global _handler, _listener
+    root = logging.getLogger()
+    if root.handlers and not force:
+        return
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "json")).lower()
+    if sample_rates is None:
+        sample_rates = os.getenv("LOG_SAMPLE_RATES", DEFAULT_SAMPLE_RATES)
+    shutdown_logging()
+    # 输出格式不含进程/线程名与调用位置：关闭 LogRecord 中对应的采集（findCaller 需遍历调用栈，
+    # 是创建日志记录的主要开销），LOG_CALLER_INFO=true 时保留文件名与行号
+    logging.logMultiprocessing = False
+    logging.logProcesses = False
+    logging.logThreads = False
+    if os.getenv("LOG_CALLER_INFO", "false").lower() != "true":
+        logging._srcfile = None
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if fmt == "json":
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT, defaults={"request_id": "-"}))
+
+    log_queue: queue.Queue = queue.Queue(int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    _handler = NonBlockingQueueHandler(log_queue)
+    root.addHandler(_handler)
+    root.setLevel(level)
+
+    for name, rate in parse_sample_rates(sample_rates):
+        target = logging.getLogger(name)
+        for existing in [f for f in target.filters if isinstance(f, SamplingFilter)]:
+            target.removeFilter(existing)
+        if rate < 1.0:
+            target.addFilter(SamplingFilter(rate))
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """停止后台线程并写出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> Dict[str, Any]:
+    if _handler is None:
+        return {"enabled": False}
+    return {"enabled": True, "queued": _handler.queue.qsize(), "dropped": _handler.dropped}
+
+
+atexit.register(shutdown_logging)
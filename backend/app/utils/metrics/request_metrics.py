@@ -0,0 +1,168 @@
+"""
+按路由的请求指标
+- 延迟直方图采用 HDR 风格的对数-线性分桶：每个 2 的幂区间再等分 SUB_BUCKETS 份，相对误差不超过 1/SUB_BUCKETS；
+  记录时由 frexp 直接算出桶下标，O(1) 且不分配对象
+- 另记录状态码计数、在途请求数与各环节（db/llm/parse）耗时累计，以 Prometheus 文本格式导出
+- 路由按模板（如 /api/work-reports/{report_id}）归集，未匹配的路径统一记为 unmatched，避免标签基数膨胀
+指标为进程内数据，多 worker 部署时每个进程各自导出
+"""
+
+import math
+import os
+from typing import Dict, List, Tuple
+
+METRICS_HISTOGRAM_MIN_SECONDS = float(os.getenv("METRICS_HISTOGRAM_MIN_SECONDS", "0.0001"))
+METRICS_HISTOGRAM_SUB_BUCKETS = int(os.getenv("METRICS_HISTOGRAM_SUB_BUCKETS", "4"))
+# 最大可区分的 2 的幂区间数：0.1ms * 2^20 ≈ 105s，更慢的请求计入 +Inf
+METRICS_HISTOGRAM_RANGES = int(os.getenv("METRICS_HISTOGRAM_RANGES", "20"))
+
+UNMATCHED = "unmatched"
+
+
+def _bucket_bounds(minimum: float, sub_buckets: int, ranges: int) -> List[float]:
+    bounds = [minimum]
+    for e in range(ranges):
+        base = minimum * (2 ** e)
+        for sub in range(1, sub_buckets + 1):
+            bounds.append(base * (1 + sub / sub_buckets))
+    return bounds
+
+
+class LatencyHistogram:
+    __slots__ = ("minimum", "sub_buckets", "bounds", "counts", "overflow", "sum", "count")
+
+    def __init__(
+        self,
+        minimum: float = METRICS_HISTOGRAM_MIN_SECONDS,
+        sub_buckets: int = METRICS_HISTOGRAM_SUB_BUCKETS,
+        ranges: int = METRICS_HISTOGRAM_RANGES,
+    ) -> None:
+        self.minimum = minimum
+        self.sub_buckets = sub_buckets
+        self.bounds = _bucket_bounds(minimum, sub_buckets, ranges)
+        self.counts = [0] * len(self.bounds)
+        self.overflow = 0
+        self.sum = 0.0
+        self.count = 0
+
+    def index(self, seconds: float) -> int:
+        x = seconds / self.minimum
+        if x <= 1.0:
+            return 0
+        mantissa, exponent = math.frexp(x)  # x = mantissa * 2**exponent, mantissa ∈ [0.5, 1)
+        return 1 + (exponent - 1) * self.sub_buckets + int((mantissa - 0.5) * 2 * self.sub_buckets)
+
+    def record(self, seconds: float) -> None:
+        i = self.index(seconds)
+        if i < len(self.counts):
+            self.counts[i] += 1
+        else:
+            self.overflow += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """按桶上界估算分位数（相对误差受分桶精度约束）"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return math.inf
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        result = []
+        total = 0
+        for bound, n in zip(self.bounds, self.counts):
+            total += n
+            result.append((bound, total))
+        return result
+
+
+class _RouteStats:
+    __slots__ = ("histogram", "statuses", "phases")
+
+    def __init__(self) -> None:
+        self.histogram = LatencyHistogram()
+        self.statuses: Dict[int, int] = {}
+        self.phases: Dict[str, float] = {}
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt(value: float) -> str:
+    return repr(float(value)) if math.isfinite(value) else "+Inf"
+
+
+class RequestMetrics:
+    """只在事件循环线程内更新，无需加锁"""
+
+    def __init__(self) -> None:
+        self._routes: Dict[Tuple[str, str], _RouteStats] = {}
+        self.in_flight = 0
+
+    def observe(self, method: str, route: str, status: int, seconds: float, phases: Dict[str, float]) -> None:
+        stats = self._routes.get((method, route))
+        if stats is None:
+            stats = self._routes[(method, route)] = _RouteStats()
+        stats.histogram.record(seconds)
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        for name, value in phases.items():
+            stats.phases[name] = stats.phases.get(name, 0.0) + value
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """各路由的请求数与 p50/p95/p99（秒），便于日志或调试接口查看"""
+        return {
+            f"{method} {route}": {
+                "count": stats.histogram.count,
+                "p50": stats.histogram.quantile(0.5),
+                "p95": stats.histogram.quantile(0.95),
+                "p99": stats.histogram.quantile(0.99),
+            }
+            for (method, route), stats in self._routes.items()
+        }
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_request_duration_seconds Request latency by route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        routes = sorted(self._routes.items())
+        for (method, route), stats in routes:
+            labels = f'method="{_label(method)}",route="{_label(route)}"'
+            hist = stats.histogram
+            for bound, total in hist.cumulative():
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound:.6g}"}} {total}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {hist.count}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {_fmt(hist.sum)}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {hist.count}")
+
+        lines.append("# HELP http_requests_total Requests by route and status code.")
+        lines.append("# TYPE http_requests_total counter")
+        for (method, route), stats in routes:
+            labels = f'method="{_label(method)}",route="{_label(route)}"'
+            for status, n in sorted(stats.statuses.items()):
+                lines.append(f'http_requests_total{{{labels},status="{status}"}} {n}')
+
+        lines.append("# HELP http_request_phase_seconds_total Time spent in db/llm/parse by route.")
+        lines.append("# TYPE http_request_phase_seconds_total counter")
+        for (method, route), stats in routes:
+            labels = f'method="{_label(method)}",route="{_label(route)}"'
+            for phase, value in sorted(stats.phases.items()):
+                lines.append(f'http_request_phase_seconds_total{{{labels},phase="{_label(phase)}"}} {_fmt(value)}')
+        return "\n".join(lines) + "\n"
+
+
+_request_metrics = RequestMetrics()
+
+
+def get_request_metrics() -> RequestMetrics:
+    return _request_metrics
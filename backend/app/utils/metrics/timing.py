@@ -0,0 +1,131 @@
+"""
+请求内分段计时（Server-Timing）
+- 计时中间件为每个请求开启一张计时表（ContextVar），db / llm / parse 等环节用 timed(...) 累加耗时
+- run_in_threadpool / asyncio.to_thread 会复制上下文，线程池中的耗时同样记入当前请求；请求之外调用时为空操作
+- SQLite 通过连接工厂 TimedSQLiteConnection 统计游标执行与取数耗时，MongoDB 通过命令监听器统计
+"""
+
+import functools
+import inspect
+import sqlite3
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DB = "db"
+LLM = "llm"
+PARSE = "parse"
+
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> Tuple[Any, Dict[str, float]]:
+    timings: Dict[str, float] = {}
+    return _timings.set(timings), timings
+
+
+def reset_request_timings(token) -> None:
+    _timings.reset(token)
+
+
+def add_timing(name: str, seconds: float) -> None:
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+class timed:
+    """上下文管理器：with timed(DB): ...；也可用作装饰器（同步与异步函数均可）"""
+
+    __slots__ = ("name", "_timings", "_start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> "timed":
+        self._timings = _timings.get()
+        if self._timings is not None:
+            self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        timings = self._timings
+        if timings is not None:
+            timings[self.name] = timings.get(self.name, 0.0) + perf_counter() - self._start
+
+    def __call__(self, func: Callable) -> Callable:
+        name = self.name
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timed(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def format_server_timing(timings: Dict[str, float], total_seconds: float) -> bytes:
+    """Server-Timing 头，毫秒保留一位小数，如 db;dur=3.2, llm;dur=812.0, total;dur=820.5"""
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    parts.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(parts).encode("latin-1")
+
+
+# ---- SQLite ----
+
+class TimedSQLiteCursor(sqlite3.Cursor):
+    def execute(self, *args: Any) -> "TimedSQLiteCursor":
+        with timed(DB):
+            return super().execute(*args)
+
+    def executemany(self, *args: Any) -> "TimedSQLiteCursor":
+        with timed(DB):
+            return super().executemany(*args)
+
+    def executescript(self, *args: Any) -> "TimedSQLiteCursor":
+        with timed(DB):
+            return super().executescript(*args)
+
+    def fetchone(self) -> Any:
+        with timed(DB):
+            return super().fetchone()
+
+    def fetchmany(self, *args: Any) -> Any:
+        with timed(DB):
+            return super().fetchmany(*args)
+
+    def fetchall(self) -> Any:
+        with timed(DB):
+            return super().fetchall()
+
+
+class TimedSQLiteConnection(sqlite3.Connection):
+    """sqlite3.connect(..., factory=TimedSQLiteConnection)；conn.execute 内部同样经由 cursor() 创建游标"""
+
+    def cursor(self, factory: Any = TimedSQLiteCursor) -> Any:
+        return super().cursor(factory)
+
+
+# ---- MongoDB ----
+
+try:
+    from pymongo import monitoring
+
+    class MongoTimingListener(monitoring.CommandListener):
+        """命令在调用线程内同步执行，回调时仍处于请求上下文中"""
+
+        def started(self, event) -> None:
+            pass
+
+        def succeeded(self, event) -> None:
+            add_timing(DB, event.duration_micros / 1e6)
+
+        def failed(self, event) -> None:
+            add_timing(DB, event.duration_micros / 1e6)
+except ImportError:  # pragma: no cover
+    MongoTimingListener = None
@@ -0,0 +1,351 @@
+"""
+报工对话式查询解析（ai-query 的规则解析部分）
+- 正则全部预编译；时间短语、停用词、闲聊判断均为模块级常量
+- 已知员工/项目/部门名称构建 Aho-Corasick 自动机，一次扫描取最左最长匹配；
+  名称取自实体字典缓存，仓储写入时调用 invalidate_name_index() 失效，另有 TTL 兜底其他写入途径
+- 解析结果按 (文本, 当天日期, 名称索引版本) 缓存在 LRU 中
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..cache.entity_cache import DEPARTMENT, EMPLOYEE, PROJECT, get_entity_cache
+from ..cache.ttl_lru import TTLLRUCache
+from ..metrics.timing import PARSE, timed
+
+logger = logging.getLogger(__name__)
+
+WORK_REPORT_PARSE_CACHE_SIZE = int(os.getenv("WORK_REPORT_PARSE_CACHE_SIZE", "2048"))
+# 名称索引的最长使用时间（秒），覆盖 Excel 导入、直接写库等未调用失效钩子的写入
+WORK_REPORT_NAME_INDEX_TTL_SECONDS = float(os.getenv("WORK_REPORT_NAME_INDEX_TTL_SECONDS", "300"))
+
+# 项目名：优先字母项目名，其次中文项目名，最后“项目XXX”
+_PROJECT_PATTERNS = (
+    re.compile(r"([A-Za-z]{2,})项目"),
+    re.compile(r"([一-龥]{2,})项目"),
+    re.compile(r"项目([一-龥A-Za-z0-9_\-]+)"),
+)
+# “查询XXX的报工/查询XXX报工” => 员工姓名
+_EMPLOYEE_PATTERN = re.compile(r"查询\s*([一-龥A-Za-z]{1,6})\s*的?\s*报工")
+_KEYWORD_PATTERN = re.compile(r"(订单\S+|物料\S+|工序\S+)")
+# 停用词按原先逐个 replace 的顺序排列（“一下”在“下”之前）
+_STOPWORDS_PATTERN = re.compile("|".join(["查询", "报工", "情况", "的", "一下", "下", "请", "帮我", "项目"]))
+
+_LAST_WEEK = re.compile(r"上周")
+_THIS_WEEK = re.compile(r"本周|这周")
+_LAST_MONTH = re.compile(r"上月|上个月")
+_THIS_MONTH = re.compile(r"本月|这个月")
+_THIS_YEAR = re.compile(r"今年")
+_YEAR_MONTH = re.compile(r"(20\d{2})-(0?[1-9]|1[0-2])")
+_MONTH = re.compile(r"(\d{1,2})月")
+
+_SMALLTALK_PATTERN = re.compile(
+    r"^你好$|^在吗$|^嗨$|^hello$|^hi$|帮助|说明|怎么用|示例|功能", re.IGNORECASE
+)
+
+# 未指定时间时的默认回溯天数
+DEFAULT_LOOKBACK_DAYS = 90
+
+
+# ---- Aho-Corasick ----
+
+class AhoCorasick:
+    """多模式串匹配自动机（纯 Python），构建后一次扫描找出文本中所有已知名称"""
+
+    def __init__(self) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]
+        self._built = True
+
+    def add(self, word: str, value: Any) -> None:
+        if not word:
+            return
+        node = 0
+        for ch in word:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(word), value))
+        self._built = False
+
+    def build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+
+    def find_all(self, text: str) -> List[Tuple[int, int, Any]]:
+        """返回所有匹配 (起点, 终点, 值)"""
+        if not self._built:
+            self.build()
+        matches: List[Tuple[int, int, Any]] = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for length, value in self._out[node]:
+                matches.append((i - length + 1, i + 1, value))
+        return matches
+
+    def longest_matches(self, text: str) -> List[Tuple[int, int, Any]]:
+        """最左最长、互不重叠的匹配（“AI智能助手”优先于其中的“智能助手”）"""
+        chosen: List[Tuple[int, int, Any]] = []
+        last_end = 0
+        for start, end, value in sorted(self.find_all(text), key=lambda m: (m[0], m[0] - m[1])):
+            if start >= last_end:
+                chosen.append((start, end, value))
+                last_end = end
+        return chosen
+
+
+class NameIndex:
+    """已知员工/项目/部门名称索引"""
+
+    def __init__(self, names: Dict[str, Iterable[str]], version: int = 0) -> None:
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.source: Any = None
+        self.automaton = AhoCorasick()
+        self.size = 0
+        for kind, values in names.items():
+            for name in {str(v).strip() for v in values if v}:
+                if name:
+                    self.automaton.add(name, (kind, name))
+                    self.size += 1
+        self.automaton.build()
+
+    def lookup(self, text: str) -> Dict[str, Tuple[int, int, str]]:
+        """每类取文本中最先出现的名称：{kind: (起点, 终点, 名称)}"""
+        found: Dict[str, Tuple[int, int, str]] = {}
+        for start, end, (kind, name) in self.automaton.longest_matches(text):
+            found.setdefault(kind, (start, end, name))
+        return found
+
+
+# ---- 解析 ----
+
+@dataclass(frozen=True)
+class ParsedWorkReportQuery:
+    employee_name: Optional[str]
+    project_name: Optional[str]
+    department_name: Optional[str]
+    keyword: Optional[str]
+    start_date: Optional[date]
+    end_date: Optional[date]
+    smalltalk: bool
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "employee_name": self.employee_name,
+            "project_name": self.project_name,
+            "department_name": self.department_name,
+            "keyword": self.keyword,
+            "start_date": self.start_date.isoformat() if self.start_date else None,
+            "end_date": self.end_date.isoformat() if self.end_date else None,
+        }
+
+
+def _last_day_of_month(some_day: date) -> date:
+    next_month = (some_day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def parse_date_range(text: str, today: date) -> Tuple[Optional[date], Optional[date], Optional[str]]:
+    """中文时间短语：上周/本周/上月/本月/今年/2025-09/9月；返回 (开始, 结束, 命中的短语)"""
+    m = _LAST_WEEK.search(text)
+    if m:
+        last_sunday = today - timedelta(days=today.weekday() + 1)
+        return last_sunday - timedelta(days=6), last_sunday, m.group(0)
+    m = _THIS_WEEK.search(text)
+    if m:
+        start = today - timedelta(days=today.weekday())
+        return start, start + timedelta(days=6), m.group(0)
+    m = _LAST_MONTH.search(text)
+    if m:
+        first_last = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+        return first_last, _last_day_of_month(first_last), m.group(0)
+    m = _THIS_MONTH.search(text)
+    if m:
+        first_this = today.replace(day=1)
+        return first_this, _last_day_of_month(first_this), m.group(0)
+    m = _THIS_YEAR.search(text)
+    if m:
+        return date(today.year, 1, 1), date(today.year, 12, 31), m.group(0)
+    m = _YEAR_MONTH.search(text)
+    if m:
+        start = date(int(m.group(1)), int(m.group(2)), 1)
+        return start, _last_day_of_month(start), m.group(0)
+    m = _MONTH.search(text)
+    if m and 1 <= int(m.group(1)) <= 12:
+        start = date(today.year, int(m.group(1)), 1)
+        return start, _last_day_of_month(start), m.group(0)
+    return None, None, None
+
+
+def _parse(text: str, today: date, index: Optional[NameIndex]) -> ParsedWorkReportQuery:
+    known = index.lookup(text) if index is not None else {}
+
+    # 已知名称优先；未命中时回退到正则
+    project_name = known[PROJECT][2] if PROJECT in known else None
+    if project_name is None:
+        for pattern in _PROJECT_PATTERNS:
+            m = pattern.search(text)
+            if m:
+                project_name = m.group(1)
+                break
+
+    employee_name = known[EMPLOYEE][2] if EMPLOYEE in known else None
+    if employee_name is None:
+        m = _EMPLOYEE_PATTERN.search(text)
+        if m:
+            employee_name = m.group(1)
+            if employee_name.endswith("的"):
+                employee_name = employee_name[:-1]
+
+    department_name = known[DEPARTMENT][2] if DEPARTMENT in known else None
+    start_date, end_date, date_phrase = parse_date_range(text, today)
+
+    # 关键词：订单/物料/工序短语；否则取去掉停用词、已识别名称与时间短语后的剩余文本
+    found = _KEYWORD_PATTERN.findall(text)
+    if found:
+        keyword: Optional[str] = " ".join(found)
+    else:
+        rest = _STOPWORDS_PATTERN.sub("", text)
+        for consumed in (employee_name, project_name, department_name, date_phrase):
+            if consumed:
+                rest = rest.replace(consumed, "")
+        keyword = rest.strip() or None
+
+    if not start_date and not end_date:
+        end_date = today
+        start_date = today - timedelta(days=DEFAULT_LOOKBACK_DAYS)
+
+    return ParsedWorkReportQuery(
+        employee_name=employee_name,
+        project_name=project_name,
+        department_name=department_name,
+        keyword=keyword,
+        start_date=start_date,
+        end_date=end_date,
+        smalltalk=bool(_SMALLTALK_PATTERN.search(text.strip())),
+    )
+
+
+class WorkReportQueryParser:
+    """带名称索引与解析结果缓存的报工查询解析器"""
+
+    def __init__(
+        self,
+        names_loader: Optional[Callable[[], Dict[str, Iterable[str]]]] = None,
+        cache_size: int = WORK_REPORT_PARSE_CACHE_SIZE,
+        index_ttl_seconds: float = WORK_REPORT_NAME_INDEX_TTL_SECONDS,
+        source_version: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        self.names_loader = names_loader
+        self.index_ttl_seconds = index_ttl_seconds
+        # 名称来源的版本（如实体字典的加载代数），变化时重建索引
+        self.source_version = source_version
+        self.cache = TTLLRUCache(max_size=cache_size) if cache_size > 0 else None
+        self._index: Optional[NameIndex] = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        """名称有变更：下次解析时重建索引，旧版本的解析缓存随版本号失效"""
+        with self._lock:
+            self._version += 1
+
+    def _index_fresh(self, index: Optional[NameIndex], source: Any) -> bool:
+        return (
+            index is not None
+            and index.version == self._version
+            and index.source == source
+            and time.monotonic() - index.loaded_at < self.index_ttl_seconds
+        )
+
+    def name_index(self) -> Optional[NameIndex]:
+        if self.names_loader is None:
+            return None
+        source = self.source_version() if self.source_version is not None else None
+        index = self._index
+        if self._index_fresh(index, source):
+            return index
+        with self._lock:
+            index = self._index
+            if not self._index_fresh(index, source):
+                try:
+                    index = NameIndex(self.names_loader(), version=self._version)
+                except Exception as e:
+                    logger.warning(f"加载员工/项目/部门名称失败，仅使用正则解析: {e}")
+                    index = NameIndex({}, version=self._version)
+                index.source = source
+                self._index = index
+                logger.debug("报工查询名称索引已重建: %d 个名称, 版本 %s", index.size, index.version)
+            return index
+
+    @timed(PARSE)
+    def parse(self, text: str, today: Optional[date] = None) -> ParsedWorkReportQuery:
+        today = today or date.today()
+        index = self.name_index()
+        if self.cache is None:
+            return _parse(text, today, index)
+        # 索引重建（失效或 TTL 到期）后旧结果自然不再命中
+        key = (text, today, (index.version, index.loaded_at) if index is not None else None)
+        parsed = self.cache.get(key)
+        if parsed is None:
+            parsed = _parse(text, today, index)
+            self.cache.set(key, parsed)
+        return parsed
+
+    def stats(self) -> Dict[str, Any]:
+        index = self._index
+        return {
+            "names": index.size if index is not None else 0,
+            "index_version": self._version,
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+
+_parser: Optional[WorkReportQueryParser] = None
+
+
+def get_work_report_query_parser() -> WorkReportQueryParser:
+    global _parser
+    if _parser is None:
+        _parser = WorkReportQueryParser(
+            lambda: get_entity_cache().names(),
+            source_version=lambda: get_entity_cache().snapshot().generation,
+        )
+    return _parser
+
+
+def parse_work_report_query(text: str, today: Optional[date] = None) -> ParsedWorkReportQuery:
+    return get_work_report_query_parser().parse(text, today)
+
+
+def invalidate_name_index() -> None:
+    """员工/项目/部门写入后调用"""
+    if _parser is not None:
+        _parser.invalidate()
@@ -0,0 +1,96 @@
+"""
+Excel 分块流式读取
+.xlsx/.xlsm 使用 openpyxl 只读模式逐行读取，按块组装 DataFrame，内存占用取决于块大小而非文件行数；
+.xls 无流式读取器，回退为 pandas 整表读取后切块
+"""
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    from openpyxl import load_workbook
+except Exception:  # pragma: no cover
+    load_workbook = None
+
+# 每块附带的原始行号列（Excel 行号，表头为第 1 行）
+ROW_COLUMN = "_row"
+
+
+def _chunk_frame(header: List[str], rows: List[Tuple[Any, ...]], row_numbers: List[int]) -> pd.DataFrame:
+    width = len(header)
+    frame = pd.DataFrame([tuple(r[:width]) + (None,) * (width - len(r)) for r in rows], columns=header)
+    frame[ROW_COLUMN] = row_numbers
+    return frame
+
+
+def excel_total_rows(path: str) -> Optional[int]:
+    """按工作表 dimension 估算数据行数（不含表头），无法获取时返回 None"""
+    if load_workbook is None or path.lower().endswith(".xls"):
+        return None
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        max_row = wb.active.max_row
+        return max(max_row - 1, 0) if max_row else None
+    finally:
+        wb.close()
+
+
+def iter_excel_chunks(
+    path: str,
+    chunk_size: int,
+    normalize_header: Callable[[str], str] = lambda h: h,
+) -> Iterator[pd.DataFrame]:
+    """逐块产出 DataFrame；列名经 normalize_header 归一化，整行为空的行跳过"""
+    if path.lower().endswith(".xls") or load_workbook is None:
+        frame = pd.read_excel(path)
+        frame.columns = [normalize_header(str(c)) for c in frame.columns]
+        frame[ROW_COLUMN] = range(2, len(frame) + 2)
+        frame = frame.dropna(how="all", subset=[c for c in frame.columns if c != ROW_COLUMN])
+        for start in range(0, len(frame), chunk_size):
+            yield frame.iloc[start:start + chunk_size]
+        return
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows_iter = wb.active.iter_rows(values_only=True)
+        first = next(rows_iter, None)
+        if first is None:
+            return
+        header = [normalize_header(str(h).strip() if h is not None else f"column_{i}") for i, h in enumerate(first)]
+        rows: List[Tuple[Any, ...]] = []
+        row_numbers: List[int] = []
+        for row_number, row in enumerate(rows_iter, start=2):
+            if all(v is None or (isinstance(v, str) and not v.strip()) for v in row):
+                continue
+            rows.append(row)
+            row_numbers.append(row_number)
+            if len(rows) >= chunk_size:
+                yield _chunk_frame(header, rows, row_numbers)
+                rows, row_numbers = [], []
+        if rows:
+            yield _chunk_frame(header, rows, row_numbers)
+    finally:
+        wb.close()
+
+
+def iter_record_chunks(
+    records: Iterable[Dict[str, Any]],
+    chunk_size: int,
+    normalize_header: Callable[[str], str] = lambda h: h,
+) -> Iterator[pd.DataFrame]:
+    """字典列表按块转为 DataFrame（行号从 1 开始）"""
+    batch: List[Dict[str, Any]] = []
+    start = 1
+    for record in records:
+        batch.append({normalize_header(str(k)): v for k, v in record.items()})
+        if len(batch) >= chunk_size:
+            frame = pd.DataFrame(batch)
+            frame[ROW_COLUMN] = range(start, start + len(batch))
+            yield frame
+            start += len(batch)
+            batch = []
+    if batch:
+        frame = pd.DataFrame(batch)
+        frame[ROW_COLUMN] = range(start, start + len(batch))
+        yield frame
@@ -0,0 +1,91 @@
+"""
+核价Excel解析
+按列向量化完成清洗与校验，避免逐行 iterrows 构造物料对象
+"""
+
+import logging
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.schemas.pricing import MaterialData, ComplexityLevel
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ['物料编码', '物料名称', '规格型号', '数量', '单位', '复杂度']
+OPTIONAL_COLUMNS = ['工艺要求']
+
+_COMPLEXITY_BY_VALUE = {level.value: level for level in ComplexityLevel}
+_DEFAULT_COMPLEXITY = ComplexityLevel.MEDIUM.value
+
+
+def missing_columns(df: pd.DataFrame) -> List[str]:
+    return [col for col in REQUIRED_COLUMNS if col not in df.columns]
+
+
+def _clean_str(series: pd.Series) -> pd.Series:
+    # 与 str(value).strip() 保持一致：空值转为 'nan'
+    return series.astype(str).str.strip()
+
+
+def _split_process_requirements(df: pd.DataFrame) -> List[List[str]]:
+    if '工艺要求' not in df.columns:
+        return [[] for _ in range(len(df))]
+    raw = df['工艺要求']
+    text = raw.astype(str)
+    empty = raw.isna() | text.eq('') | text.eq('nan')
+    # 先去掉逗号两侧空白再整体 split，省去逐元素 strip
+    parts = text.str.strip().str.replace(r'\s*,\s*', ',', regex=True).str.split(',')
+    return [[] if is_empty else items for is_empty, items in zip(empty.to_numpy(), parts.to_list())]
+
+
+def materials_from_dataframe(df: pd.DataFrame) -> Tuple[List[MaterialData], List[int]]:
+    """
+    将核价Excel的DataFrame转换为物料列表
+
+    Returns:
+        (materials, error_rows)，error_rows 为从1开始的行号（与原逐行解析一致）
+    """
+    if df.empty:
+        return [], []
+
+    codes = _clean_str(df['物料编码'])
+    names = _clean_str(df['物料名称'])
+    specs = _clean_str(df['规格型号'])
+    units = _clean_str(df['单位'])
+
+    complexity = df['复杂度'].fillna(_DEFAULT_COMPLEXITY).astype(str).str.strip()
+    complexity = complexity.where(complexity.isin(_COMPLEXITY_BY_VALUE.keys()), _DEFAULT_COMPLEXITY)
+
+    # 数量需为正整数（按 int() 截断语义），无法转换或 <=0 的行记为错误行
+    qty = pd.to_numeric(df['数量'], errors='coerce').to_numpy(dtype='float64')
+    finite = np.isfinite(qty)
+    qty_int = np.where(finite, np.trunc(qty), 0).astype('int64')
+    valid = finite & (qty_int > 0)
+
+    process = _split_process_requirements(df)
+
+    error_rows = (np.flatnonzero(~valid) + 1).tolist()
+    if error_rows:
+        logger.warning(f"Excel共 {len(error_rows)} 行数量无效，已跳过（前10行: {error_rows[:10]}）")
+
+    construct = MaterialData.model_construct
+    levels = _COMPLEXITY_BY_VALUE
+    materials = [
+        construct(
+            material_code=code,
+            material_name=name,
+            specification=spec,
+            quantity=q,
+            unit=unit,
+            complexity=levels[level],
+            process_requirements=proc,
+        )
+        for ok, code, name, spec, q, unit, level, proc in zip(
+            valid.tolist(), codes.to_list(), names.to_list(), specs.to_list(), qty_int.tolist(),
+            units.to_list(), complexity.to_list(), process,
+        )
+        if ok
+    ]
+    return materials, error_rows
@@ -0,0 +1,412 @@
+"""
+物料检索索引
+进程内 n-gram（单字 + 双字）倒排索引，支持中文子串与规格型号（如 Φ50×200）检索，
+按 idf 加权的覆盖率打分，只遍历查询 n-gram 的倒排链，heap 取 top-k
+全局索引的新鲜度与 EntityCache 一致：仓储写入时增量更新并递增共享的物料表版本号；
+其他 worker 写入（版本号变化）或超过 MATERIAL_INDEX_TTL_SECONDS（兜底脚本直写数据库）时全量重建。
+重建不在请求路径上：过期后检索仍使用旧索引，由单个后台线程构建新索引后整体替换；仅首次构建同步进行；
+索引本身是各 worker 的进程内副本（倒排表不放入共享状态后端），跨进程一致性只依赖共享的物料表版本号
+"""
+
+import heapq
+import logging
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 字段位掩码
+FIELD_NAME = 1
+FIELD_SPEC = 2
+FIELD_PROCESS = 4
+FIELD_CODE = 8
+FIELD_ALL = FIELD_NAME | FIELD_SPEC | FIELD_PROCESS | FIELD_CODE
+
+# 关键词命中不同字段时的权重
+_FIELD_WEIGHTS = ((FIELD_NAME, 1.0), (FIELD_CODE, 0.9), (FIELD_SPEC, 0.8), (FIELD_PROCESS, 0.6))
+# 命中位掩码 -> 所命中字段中的最高权重
+_MASK_WEIGHT = [max((w for bit, w in _FIELD_WEIGHTS if m & bit), default=0.0) for m in range(FIELD_ALL + 1)]
+
+# 条件覆盖率（命中 n-gram 的 idf 之和 / 查询 n-gram 的 idf 之和）低于该值视为不匹配
+MIN_COVERAGE = float(os.getenv("MATERIAL_SEARCH_MIN_COVERAGE", "0.5"))
+# 规范化后整体为字段子串时的加分
+_SUBSTRING_BONUS = 0.5
+
+MATERIAL_INDEX_TTL_SECONDS = float(os.getenv("MATERIAL_INDEX_TTL_SECONDS", "300"))
+# 共享版本号的检查间隔：不必每次检索都读共享状态
+MATERIAL_INDEX_VERSION_CHECK_SECONDS = float(os.getenv("MATERIAL_INDEX_VERSION_CHECK_SECONDS", "1"))
+# 后台重建失败后的重试间隔
+_REBUILD_RETRY_SECONDS = 5.0
+# 重建期间本进程持续有写入时，最多重新构建的次数
+_REBUILD_ATTEMPTS = 3
+
+_WS_RE = re.compile(r"\s+")
+# 数字之间的 x/X/*/✕ 统一为 ×，便于 50x200 与 50×200 互查
+_DIM_SEP_RE = re.compile(r"(?<=\d)\s*[x*✕✖]\s*(?=\d)")
+# casefold 后 Φ 变为 φ；ø/⌀ 等直径符号同样归一为 φ
+_DIAMETER_RE = re.compile(r"[ø⌀∅]")
+
+
+def normalize_text(value: Any) -> str:
+    """全半角/大小写/直径符号/尺寸分隔符归一，并去掉空白"""
+    if value is None:
+        return ""
+    text = unicodedata.normalize("NFKC", str(value)).casefold()
+    text = _DIAMETER_RE.sub("φ", text)
+    text = _DIM_SEP_RE.sub("×", text)
+    return _WS_RE.sub("", text)
+
+
+def text_grams(text: str) -> Set[str]:
+    """建索引用：单字 + 相邻双字"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def query_grams(text: str) -> List[str]:
+    """查询用：单字查询走单字倒排，其余只用双字（更有区分度）"""
+    if len(text) <= 1:
+        return [text] if text else []
+    return list(dict.fromkeys(text[i:i + 2] for i in range(len(text) - 1)))
+
+
+class MaterialSearchIndex:
+    """物料 n-gram 倒排索引（线程安全，增量更新）"""
+
+    def __init__(self) -> None:
+        # gram -> {内部编号: 字段位掩码}
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        # 内部编号 -> (各字段规范化文本, 载荷)；FIELD_ALL 键存各字段以分隔符拼接的文本
+        self._docs: Dict[int, Tuple[Dict[int, str], Any]] = {}
+        self._doc_ids: Dict[str, int] = {}
+        self._next_id = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(
+        self,
+        doc_id: str,
+        payload: Any,
+        material_name: Any = None,
+        specification: Any = None,
+        process_requirements: Any = None,
+        material_code: Any = None,
+    ) -> None:
+        """新增或覆盖一条物料"""
+        if isinstance(process_requirements, (list, tuple)):
+            process_requirements = " ".join(str(p) for p in process_requirements)
+        fields = {
+            FIELD_NAME: normalize_text(material_name),
+            FIELD_SPEC: normalize_text(specification),
+            FIELD_PROCESS: normalize_text(process_requirements),
+            FIELD_CODE: normalize_text(material_code),
+        }
+        with self._lock:
+            self._remove_locked(doc_id)
+            key = self._next_id
+            self._next_id += 1
+            for bit, text in fields.items():
+                for gram in text_grams(text):
+                    posting = self._postings[gram]
+                    posting[key] = posting.get(key, 0) | bit
+            self._docs[key] = ({**fields, FIELD_ALL: "\x1f".join(fields.values())}, payload)
+            self._doc_ids[doc_id] = key
+
+    def remove(self, doc_id: str) -> None:
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id: str) -> None:
+        key = self._doc_ids.pop(doc_id, None)
+        if key is None:
+            return
+        fields = self._docs.pop(key)[0]
+        for bit in (FIELD_NAME, FIELD_SPEC, FIELD_PROCESS, FIELD_CODE):
+            text = fields[bit]
+            for gram in text_grams(text):
+                posting = self._postings.get(gram)
+                if posting is not None:
+                    posting.pop(key, None)
+                    if not posting:
+                        del self._postings[gram]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._docs.clear()
+            self._doc_ids.clear()
+
+    def _idf(self, gram: str) -> float:
+        # 未出现过的 gram 取最大 idf，使其计入分母、拉低覆盖率
+        df = len(self._postings.get(gram, ()))
+        return math.log((len(self._docs) + 1) / (df + 1)) + 1.0
+
+    def _clause_scores(self, text: str, mask: int, threshold: float, allowed: Optional[Dict[int, float]]) -> Dict[int, float]:
+        """
+        单个条件在各候选文档上的得分（加权覆盖率 + 子串加分），低于阈值的文档不返回
+
+        候选只取自最稀有的若干 gram：未命中其中任何一个的文档覆盖率必然低于阈值，
+        因此常见 gram 的长倒排链只用于给候选补分（字典查找），不做遍历
+        """
+        grams = query_grams(text)
+        if not grams:
+            return {}
+        weighted = sorted(((self._idf(g), g) for g in grams), reverse=True)
+        total = sum(w for w, _ in weighted)
+        keyword = mask == FIELD_ALL
+
+        candidates: Set[int] = set()
+        covered = 0.0
+        rest = 0
+        for idf, gram in weighted:
+            posting = self._postings.get(gram)
+            if posting:
+                if allowed is None:
+                    candidates.update(k for k, bits in posting.items() if bits & mask)
+                else:
+                    candidates.update(k for k, bits in posting.items() if bits & mask and k in allowed)
+            covered += idf
+            rest += 1
+            if covered > (1.0 - threshold) * total:
+                break
+        if not candidates:
+            return {}
+
+        postings = [(idf / total, self._postings.get(gram) or {}) for idf, gram in weighted]
+        docs = self._docs
+        n_grams = len(postings)
+        # 长度<=2 的查询命中全部 gram 即为子串，无需再比对原文
+        check_substring = len(text) > 2
+        scores: Dict[int, float] = {}
+        for key in candidates:
+            coverage = 0.0
+            matched = 0
+            for weight, posting in postings:
+                hit = posting.get(key, 0) & mask
+                if hit:
+                    coverage += weight * _MASK_WEIGHT[hit] if keyword else weight
+                    matched += 1
+            if coverage < threshold:
+                continue
+            # 全部 gram 命中时才可能是子串
+            if matched == n_grams and (not check_substring or text in docs[key][0][mask]):
+                coverage += _SUBSTRING_BONUS
+            scores[key] = coverage
+        return scores
+
+    def search(
+        self,
+        material_name: Optional[str] = None,
+        specification: Optional[str] = None,
+        keyword: Optional[str] = None,
+        limit: int = 20,
+        min_coverage: Optional[float] = None,
+    ) -> List[Tuple[Any, float]]:
+        """
+        检索物料，返回按相关度降序的 [(载荷, 分数)]
+
+        - material_name / specification：必须满足的条件（分别只匹配名称/规格字段）
+        - keyword：按空白切分为多个词，任一词命中名称/编码/规格/工艺即可，取最高分
+        """
+        threshold = MIN_COVERAGE if min_coverage is None else min_coverage
+        clauses: List[List[Tuple[str, int]]] = []
+        if material_name:
+            clauses.append([(normalize_text(material_name), FIELD_NAME)])
+        if specification:
+            clauses.append([(normalize_text(specification), FIELD_SPEC)])
+        if keyword:
+            clauses.append([(t, FIELD_ALL) for t in (normalize_text(k) for k in str(keyword).split()) if t])
+        clauses = [c for c in clauses if c and any(t for t, _ in c)]
+        if not clauses or limit <= 0:
+            return []
+
+        with self._lock:
+            totals: Optional[Dict[int, float]] = None
+            # 逐条件求分并与已有候选取交集，后续条件只在已有候选中找
+            for clause in clauses:
+                best: Dict[int, float] = {}
+                for text, mask in clause:
+                    for key, score in self._clause_scores(text, mask, threshold, totals).items():
+                        if score > best.get(key, 0.0):
+                            best[key] = score
+                if totals is not None:
+                    best = {key: totals[key] + score for key, score in best.items()}
+                totals = best
+                if not totals:
+                    return []
+
+            docs = self._docs
+            top = heapq.nlargest(limit, totals.items(), key=itemgetter(1))
+            return [(docs[key][1], round(score / len(clauses), 4)) for key, score in top]
+
+
+Loader = Callable[[], Iterable[Tuple[str, Any, Dict[str, Any]]]]
+
+
+class MaterialIndexCache:
+    """全局物料索引的持有者：按 TTL 与共享版本号判断是否需要全量重建"""
+
+    def __init__(
+        self,
+        ttl_seconds: float = MATERIAL_INDEX_TTL_SECONDS,
+        version_source: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.version_source = version_source
+        self._index: Optional[MaterialSearchIndex] = None
+        self._built_at = 0.0
+        self._index_version: Any = None
+        self._checked_version: Any = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+        self._rebuilding: Optional[threading.Thread] = None
+        self._retry_at = 0.0
+        # 本进程增量写入计数，后台重建据此判断新索引是否漏掉了构建期间的写入
+        self._writes = 0
+        self.builds = 0
+
+    def _source_version(self) -> Any:
+        if self.version_source is None:
+            return None
+        now = time.monotonic()
+        if now - self._checked_at < MATERIAL_INDEX_VERSION_CHECK_SECONDS:
+            return self._checked_version
+        try:
+            self._checked_version = self.version_source()
+        except Exception as e:
+            logger.warning(f"[material-index] 读取物料版本号失败: {e}")
+        self._checked_at = now
+        return self._checked_version
+
+    def _fresh(self, source_version: Any) -> bool:
+        return (
+            self._index is not None
+            and self._index_version == source_version
+            and time.monotonic() - self._built_at < self.ttl_seconds
+        )
+
+    def get(self, loader: Loader) -> MaterialSearchIndex:
+        """loader 返回 (doc_id, 载荷, 字段dict) 序列，字段dict 的键与 MaterialSearchIndex.add 参数一致；
+        已有索引时立即返回（过期则安排后台重建），只有尚无索引时才在调用方同步构建"""
+        source_version = self._source_version()
+        index = self._index
+        if index is not None:
+            if not self._fresh(source_version):
+                self._schedule_rebuild(loader, source_version)
+            return index
+        with self._lock:
+            if self._index is None:
+                self._swap(self._build(loader), source_version)
+            return self._index
+
+    @staticmethod
+    def _build(loader: Loader) -> MaterialSearchIndex:
+        index = MaterialSearchIndex()
+        for doc_id, payload, fields in loader():
+            index.add(doc_id, payload, **fields)
+        return index
+
+    def _swap(self, index: MaterialSearchIndex, source_version: Any) -> None:
+        """调用方持有 self._lock"""
+        self._index = index
+        self._index_version = source_version
+        self._built_at = time.monotonic()
+        self.builds += 1
+        logger.info(f"[material-index] 已构建物料检索索引: {len(index)} 条, 版本 {source_version}")
+
+    def _schedule_rebuild(self, loader: Loader, source_version: Any) -> None:
+        with self._lock:
+            if self._rebuilding is not None or time.monotonic() < self._retry_at:
+                return
+            self._rebuilding = threading.Thread(
+                target=self._rebuild, args=(loader, source_version), name="material-index-rebuild", daemon=True
+            )
+            self._rebuilding.start()
+
+    def _rebuild(self, loader: Loader, source_version: Any) -> None:
+        try:
+            for _ in range(_REBUILD_ATTEMPTS):
+                writes = self._writes
+                index = self._build(loader)
+                with self._lock:
+                    # 构建期间本进程的增量写入只进了旧索引，新索引可能漏掉，重新构建
+                    if self._writes == writes:
+                        self._swap(index, source_version)
+                        return
+            logger.info("[material-index] 重建期间持续有写入，保留已增量更新的旧索引")
+        except Exception as e:
+            logger.warning(f"[material-index] 后台重建物料检索索引失败: {e}")
+            self._retry_at = time.monotonic() + _REBUILD_RETRY_SECONDS
+        finally:
+            with self._lock:
+                self._rebuilding = None
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """等待进行中的后台重建结束（测试与脚本使用）"""
+        thread = self._rebuilding
+        if thread is not None:
+            thread.join(timeout)
+
+    def note_write(self, new_version: Any) -> None:
+        """本进程已把写入增量应用到索引，且递增后的版本号为 new_version：
+        若期间没有其他进程的写入（版本号恰好 +1），直接认领新版本，避免自身写入触发全量重建"""
+        with self._lock:
+            self._writes += 1
+            if (
+                self._index is not None
+                and isinstance(new_version, int)
+                and isinstance(self._index_version, int)
+                and new_version == self._index_version + 1
+            ):
+                self._index_version = new_version
+            self._checked_version = new_version
+            self._checked_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """丢弃索引，下次检索时重新构建"""
+        with self._lock:
+            self._index = None
+            self._checked_at = float("-inf")
+            self._retry_at = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        index = self._index
+        return {
+            "size": len(index) if index is not None else 0,
+            "version": self._index_version,
+            "builds": self.builds,
+            "rebuilding": self._rebuilding is not None,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+def _materials_version() -> int:
+    from ..cache.response_cache import MATERIALS, table_version
+    return table_version(MATERIALS)
+
+
+_index_cache = MaterialIndexCache(version_source=_materials_version)
+
+
+def get_material_index_cache() -> MaterialIndexCache:
+    return _index_cache
+
+
+def get_material_index(loader: Loader) -> MaterialSearchIndex:
+    """获取全局物料索引；首次调用时用 loader 同步构建，TTL 到期或其他进程写入物料后在后台重建"""
+    return _index_cache.get(loader)
+
+
+def reset_material_index() -> None:
+    """丢弃全局索引，下次检索时重新构建"""
+    _index_cache.invalidate()
@@ -0,0 +1,177 @@
+"""
+物料价格缓存（内容寻址）
+以"规范化物料签名 + 规则版本"为键，内存LRU在前、SQLite持久表在后，
+批量核价时同一物料在文件内、跨文件重复出现只需计算一次
+"""
+
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Any, Dict, Optional, Tuple
+
+from app.db.sqlite_db import get_sqlite_db
+from app.utils.cache.ttl_lru import TTLLRUCache
+
+logger = logging.getLogger(__name__)
+
+_WS_RE = re.compile(r"\s+")
+_PROC_SEP_RE = re.compile(r"[,，、;；/]+")
+
+
+def _norm_text(value: Any) -> str:
+    if value is None:
+        return ""
+    text = unicodedata.normalize("NFKC", str(value)).casefold()
+    return _WS_RE.sub(" ", text).strip()
+
+
+def normalize_material(
+    material_code: Any, material_name: Any, specification: Any, process_requirements: Any
+) -> Tuple[str, str, str, str]:
+    """规范化物料字段：全半角/大小写/空白归一，工艺要求按工序去重排序。
+    估价必须基于同一组规范化字段，才能保证签名相同的物料价格相同"""
+    if isinstance(process_requirements, (list, tuple)):
+        proc_parts = [_norm_text(p) for p in process_requirements]
+    else:
+        proc_parts = [_norm_text(p) for p in _PROC_SEP_RE.split(str(process_requirements or ""))]
+    proc = ",".join(sorted({p for p in proc_parts if p}))
+    return _norm_text(material_code), _norm_text(material_name), _norm_text(specification), proc
+
+
+def signature_of(normalized: Tuple[str, str, str, str]) -> str:
+    return hashlib.sha1("\x1f".join(normalized).encode("utf-8")).hexdigest()
+
+
+def material_signature(material_code: Any, material_name: Any, specification: Any, process_requirements: Any) -> str:
+    """计算规范化物料签名"""
+    return signature_of(normalize_material(material_code, material_name, specification, process_requirements))
+
+
+class MaterialPriceCache:
+    """两级价格缓存：进程内LRU + pricing_price_cache 持久表"""
+
+    def __init__(self, conn: sqlite3.Connection, rule_version: str, max_size: int = 50000) -> None:
+        self.conn = conn
+        self.rule_version = rule_version
+        self.memory = TTLLRUCache(max_size=max_size)
+        self._pending: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def set_rule_version(self, rule_version: str) -> None:
+        """规则版本变更：清空内存层并删除旧版本的持久条目"""
+        if rule_version == self.rule_version:
+            return
+        with self._lock:
+            self.memory.clear()
+            self._pending.clear()
+            self.rule_version = rule_version
+        self.purge_stale_versions()
+
+    def purge_stale_versions(self) -> int:
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM pricing_price_cache WHERE rule_version != ?", (self.rule_version,))
+        self.conn.commit()
+        if cur.rowcount:
+            logger.info(f"[price-cache] 已清理旧规则版本缓存 {cur.rowcount} 条, 当前版本={self.rule_version}")
+        return cur.rowcount
+
+    def lookup(self, signature: str) -> Tuple[Optional[float], str]:
+        """查询单价，返回 (unit_price, 命中层级 memory/db/miss)"""
+        price = self.memory.get(signature)
+        if price is not None:
+            return price, "memory"
+        price = self._pending.get(signature)
+        if price is not None:
+            self.memory.set(signature, price)
+            return price, "memory"
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT unit_price FROM pricing_price_cache WHERE signature = ? AND rule_version = ?",
+            (signature, self.rule_version),
+        )
+        row = cur.fetchone()
+        if row is None:
+            return None, "miss"
+        price = float(row[0])
+        self.memory.set(signature, price)
+        return price, "db"
+
+    def store(self, signature: str, unit_price: float) -> None:
+        """写入内存层，持久层在 flush 时批量落盘"""
+        self.memory.set(signature, unit_price)
+        with self._lock:
+            self._pending[signature] = unit_price
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        cur = self.conn.cursor()
+        cur.executemany(
+            """
+            INSERT INTO pricing_price_cache(signature, rule_version, unit_price)
+            VALUES(?, ?, ?)
+            ON CONFLICT(signature, rule_version) DO UPDATE SET
+                unit_price = excluded.unit_price, updated_at = CURRENT_TIMESTAMP
+            """,
+            [(sig, self.rule_version, price) for sig, price in pending.items()],
+        )
+        self.conn.commit()
+        return len(pending)
+
+    def stats(self) -> Dict[str, Any]:
+        cur = self.conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM pricing_price_cache WHERE rule_version = ?", (self.rule_version,))
+        return {
+            "rule_version": self.rule_version,
+            "persistent_entries": cur.fetchone()[0],
+            "memory": self.memory.stats(),
+        }
+
+
+class PriceCacheRunStats:
+    """单次批量任务的缓存命中统计，写入任务 stats_json"""
+
+    def __init__(self) -> None:
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def record(self, source: str) -> None:
+        if source == "memory":
+            self.memory_hits += 1
+        elif source == "db":
+            self.db_hits += 1
+        else:
+            self.misses += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.db_hits + self.misses
+        hits = self.memory_hits + self.db_hits
+        return {
+            "cache_lookups": lookups,
+            "cache_hits": hits,
+            "cache_memory_hits": self.memory_hits,
+            "cache_db_hits": self.db_hits,
+            "cache_misses": self.misses,
+            "cache_hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_price_cache_instance: Optional[MaterialPriceCache] = None
+
+
+def get_price_cache(rule_version: str) -> MaterialPriceCache:
+    """获取全局价格缓存；规则版本变化时自动失效旧条目"""
+    global _price_cache_instance
+    if _price_cache_instance is None:
+        _price_cache_instance = MaterialPriceCache(get_sqlite_db().conn, rule_version)
+        _price_cache_instance.purge_stale_versions()
+    else:
+        _price_cache_instance.set_rule_version(rule_version)
+    return _price_cache_instance
+
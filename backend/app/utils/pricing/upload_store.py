@@ -0,0 +1,33 @@
+"""
+已解析物料暂存
+parse-excel 解析后的物料按 upload_id 暂存一段时间，批量核价可直接引用，避免客户端回传整份物料列表
+存放在共享状态后端：sqlite 后端下多个 worker 均可取回（上传与核价请求可能落在不同进程）
+"""
+
+import os
+import uuid
+from typing import List, Optional
+
+from app.schemas.pricing import MaterialData
+from app.utils.state.shared_state import get_state_backend
+
+UPLOAD_TTL_SECONDS = int(os.getenv("PRICING_UPLOAD_TTL_SECONDS", "1800"))
+UPLOAD_MAX_ENTRIES = int(os.getenv("PRICING_UPLOAD_MAX_ENTRIES", "64"))
+
+_uploads = get_state_backend().kv("pricing_uploads", max_size=UPLOAD_MAX_ENTRIES, ttl_seconds=UPLOAD_TTL_SECONDS)
+
+
+def save_parsed_materials(materials: List[MaterialData]) -> str:
+    """暂存解析结果，返回 upload_id"""
+    upload_id = uuid.uuid4().hex
+    _uploads.set(upload_id, materials)
+    return upload_id
+
+
+def get_parsed_materials(upload_id: str) -> Optional[List[MaterialData]]:
+    """按 upload_id 取回解析结果，过期或不存在返回 None"""
+    materials = _uploads.get(upload_id)
+    if materials is None:
+        return None
+    # 进程内后端原样保存模型对象，sqlite 后端取回的是 JSON 字典
+    return [m if isinstance(m, MaterialData) else MaterialData(**m) for m in materials]
@@ -0,0 +1,201 @@
+"""
+GCRA（通用信元速率算法）限流
+- 每个 key 只保存一个浮点数 TAT（理论到达时间），等价于容量为 burst、匀速补充的令牌桶，没有固定窗口边界处的两倍突发
+- 空闲 key 惰性回收：TAT 早于当前时间的 key 与新 key 等价，可直接删除；按最近访问顺序从头清理，
+  另以 RATE_LIMIT_MAX_KEYS 封顶，内存不随访问过的客户端数量无限增长
+- 判定逻辑与存储分离：默认进程内存储；共享状态后端为 sqlite 时改用 SharedGCRAStore，多个 worker 进程共用配额；
+  共享存储的写锁等待上限很短（SHARED_STATE_FAST_TIMEOUT_MS），超时即放行，不在事件循环上阻塞
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, List, Optional, Tuple
+
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# 每次请求最多顺带清理的过期 key 个数
+RATE_LIMIT_SWEEP_BATCH = int(os.getenv("RATE_LIMIT_SWEEP_BATCH", "16"))
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """period 秒内最多 limit 次，burst 为可瞬时突发的请求数（默认等于 limit）"""
+
+    limit: int
+    period: float = 60.0
+    burst: Optional[int] = None
+
+    # 派生值按实例缓存，避免每个请求重复计算
+    @cached_property
+    def emission_interval(self) -> float:
+        return self.period / self.limit
+
+    @cached_property
+    def tolerance(self) -> float:
+        return self.emission_interval * (self.burst or self.limit)
+
+    @cached_property
+    def header_value(self) -> bytes:
+        """RateLimit-Policy 头，如 120;w=60"""
+        return f"{self.limit};w={int(self.period)}".encode()
+
+    @cached_property
+    def limit_header(self) -> bytes:
+        return str(self.limit).encode()
+
+    @classmethod
+    def parse(cls, text: str) -> "RateLimitPolicy":
+        """解析 "limit/period[/burst]"，如 "20/60" 或 "20/60/5" """
+        parts = [p.strip() for p in text.split("/")]
+        limit = int(parts[0])
+        period = float(parts[1]) if len(parts) > 1 and parts[1] else 60.0
+        burst = int(parts[2]) if len(parts) > 2 and parts[2] else None
+        return cls(limit=limit, period=period, burst=burst)
+
+
+@dataclass
+class RateLimitDecision:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float
+    retry_after: float
+
+    def headers(self, policy: RateLimitPolicy) -> List[Tuple[bytes, bytes]]:
+        headers = [
+            (b"ratelimit-limit", policy.limit_header),
+            (b"ratelimit-remaining", str(self.remaining).encode()),
+            (b"ratelimit-reset", str(math.ceil(self.reset_after)).encode()),
+            (b"ratelimit-policy", policy.header_value),
+        ]
+        if not self.allowed:
+            headers.append((b"retry-after", str(max(1, math.ceil(self.retry_after))).encode()))
+        return headers
+
+
+class LocalGCRAStore:
+    """进程内 TAT 存储：OrderedDict 按最近访问排序，过期 key 从头部惰性清理"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, sweep_batch: int = RATE_LIMIT_SWEEP_BATCH) -> None:
+        self.max_keys = max(1, int(max_keys))
+        self.sweep_batch = sweep_batch
+        self._tat: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def acquire(self, key: str, now: float, interval: float, tolerance: float, cost: int = 1) -> Tuple[bool, float]:
+        """原子地判定并更新；返回 (是否放行, 判定后的 TAT)"""
+        with self._lock:
+            tat = self._tat.get(key, now)
+            if tat < now:
+                tat = now
+            new_tat = tat + interval * cost
+            allowed = new_tat - tolerance <= now
+            if allowed:
+                self._tat[key] = new_tat
+                self._tat.move_to_end(key)
+            self._sweep(now)
+            return allowed, new_tat if allowed else tat
+
+    def _sweep(self, now: float) -> None:
+        tats = self._tat
+        for _ in range(self.sweep_batch):
+            if not tats:
+                return
+            key, tat = next(iter(tats.items()))
+            if tat > now:
+                break
+            del tats[key]
+            self.expired += 1
+        while len(tats) > self.max_keys:
+            tats.popitem(last=False)
+            self.evicted += 1
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    def stats(self) -> Dict[str, int]:
+        return {"keys": len(self._tat), "max_keys": self.max_keys, "expired": self.expired, "evicted": self.evicted}
+
+
+class SharedGCRAStore:
+    """基于共享状态后端 kv 的 TAT 存储；条目 TTL 为容差时长，超时即空闲，由后端清理。
+    kv 应使用短 busy_timeout：写锁竞争超时时放行本次请求（fail open）并计数"""
+
+    def __init__(self, kv) -> None:
+        self.kv = kv
+        self.fail_open = 0
+
+    def acquire(self, key: str, now: float, interval: float, tolerance: float, cost: int = 1) -> Tuple[bool, float]:
+        result = [False, now]
+
+        def _apply(stored):
+            tat = stored if stored is not None and stored > now else now
+            new_tat = tat + interval * cost
+            if new_tat - tolerance > now:
+                result[:] = [False, tat]
+                return None
+            result[:] = [True, new_tat]
+            return new_tat
+
+        try:
+            self.kv.update(key, _apply, ttl_seconds=tolerance)
+        except sqlite3.OperationalError as e:
+            self.fail_open += 1
+            logger.debug("共享限流存储繁忙，放行请求: %s", e)
+            return True, now
+        return result[0], result[1]
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.kv.stats(), fail_open=self.fail_open)
+
+
+class GCRARateLimiter:
+    def __init__(self, store=None, clock=time.monotonic) -> None:
+        self.store = store if store is not None else LocalGCRAStore()
+        self.clock = clock
+
+    def acquire(self, key: str, policy: RateLimitPolicy, cost: int = 1) -> RateLimitDecision:
+        now = self.clock()
+        interval = policy.emission_interval
+        tolerance = policy.tolerance
+        allowed, tat = self.store.acquire(key, now, interval, tolerance, cost)
+        reset_after = tat - now if tat > now else 0.0
+        if allowed:
+            remaining = int((tolerance - reset_after) / interval + 1e-9)
+            return RateLimitDecision(True, policy.limit, remaining if remaining > 0 else 0, reset_after, 0.0)
+        retry_after = reset_after + interval * cost - tolerance
+        return RateLimitDecision(False, policy.limit, 0, reset_after, retry_after if retry_after > 0 else 0.0)
+
+    def stats(self) -> Dict[str, int]:
+        return self.store.stats()
+
+
+_rate_limiter: Optional[GCRARateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> GCRARateLimiter:
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _limiter_lock:
+            if _rate_limiter is None:
+                from ..state.shared_state import SHARED_STATE_FAST_TIMEOUT_MS, SQLITE, get_state_backend
+                backend = get_state_backend()
+                if backend.kind == SQLITE:
+                    # 跨进程比较 TAT，使用墙钟时间
+                    kv = backend.kv("ratelimit", max_size=RATE_LIMIT_MAX_KEYS, busy_timeout_ms=SHARED_STATE_FAST_TIMEOUT_MS)
+                    store = SharedGCRAStore(kv)
+                    _rate_limiter = GCRARateLimiter(store, clock=time.time)
+                else:
+                    _rate_limiter = GCRARateLimiter()
+    return _rate_limiter
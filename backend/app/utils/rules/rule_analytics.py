@@ -4,21 +4,41 @@
 """
 
 import logging
+import os
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 import statistics
 from collections import defaultdict
 import json
 
+from ..state.shared_state import get_state_backend
+
 logger = logging.getLogger(__name__)
 
+# 规则执行记录保留条数（所有规则合计，存放于共享状态后端）
+RULE_EXECUTION_HISTORY_MAX = int(os.getenv("RULE_EXECUTION_HISTORY_MAX", "5000"))
+
 class RuleAnalytics:
     """规则分析器"""
     
     def __init__(self):
-        self.execution_history = []
-        self.performance_metrics = defaultdict(list)
+        # 执行记录写入共享状态后端的定长日志，多 worker 进程汇总同一份统计
+        self._history = get_state_backend().log("rule_executions", max_len=RULE_EXECUTION_HISTORY_MAX)
         self.optimization_history = []
+
+    def _records(self, rule_id: Optional[str] = None, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """按规则与起始时间筛选执行记录（时间戳还原为 datetime）"""
+        records = []
+        for r in self._history.tail():
+            if rule_id is not None and r["rule_id"] != rule_id:
+                continue
+            timestamp = r["timestamp"]
+            if isinstance(timestamp, str):
+                r = dict(r, timestamp=datetime.fromisoformat(timestamp))
+            if since is not None and r["timestamp"] < since:
+                continue
+            records.append(r)
+        return records
     
     def record_execution(self, rule_id: str, execution_data: Dict[str, Any]) -> None:
         """
@@ -40,12 +60,7 @@ class RuleAnalytics:
             "context": execution_data.get("context", {})
         }
         
-        self.execution_history.append(record)
-        self.performance_metrics[rule_id].append(record)
-        
-        # 保持最近1000条记录
-        if len(self.execution_history) > 1000:
-            self.execution_history = self.execution_history[-1000:]
+        self._history.append(record)
     
     def get_rule_performance_summary(self, rule_id: str, days: int = 30) -> Dict[str, Any]:
         """
@@ -61,10 +76,7 @@ class RuleAnalytics:
         try:
             # 获取指定时间范围内的执行记录
             cutoff_time = datetime.now() - timedelta(days=days)
-            records = [
-                r for r in self.performance_metrics.get(rule_id, [])
-                if r["timestamp"] >= cutoff_time
-            ]
+            records = self._records(rule_id, cutoff_time)
             
             if not records:
                 return {
@@ -364,7 +376,7 @@ class RuleAnalytics:
         """
         try:
             cutoff_time = datetime.now() - timedelta(days=days)
-            recent_records = [r for r in self.execution_history if r["timestamp"] >= cutoff_time]
+            recent_records = self._records(since=cutoff_time)
             
             if not recent_records:
                 return {"message": "无分析数据"}
@@ -435,15 +447,12 @@ class RuleAnalytics:
             
             if rule_id:
                 # 导出特定规则数据
-                records = [
-                    r for r in self.performance_metrics.get(rule_id, [])
-                    if r["timestamp"] >= cutoff_time
-                ]
+                records = self._records(rule_id, cutoff_time)
                 summary = self.get_rule_performance_summary(rule_id, days)
                 recommendations = self.generate_optimization_recommendations(rule_id, days)
             else:
                 # 导出所有规则数据
-                records = [r for r in self.execution_history if r["timestamp"] >= cutoff_time]
+                records = self._records(since=cutoff_time)
                 summary = self.get_system_analytics(days)
                 recommendations = []
             
@@ -0,0 +1,349 @@
+"""
+可插拔的共享状态后端
+- local：进程内字典（默认，单进程部署，行为与原先一致）
+- sqlite：WAL 模式的 SQLite 文件，同一主机上 `uvicorn --workers N` 的各进程共享限流计数、任务登记、
+  表版本号等状态，无需额外服务；读写并发由 WAL 保证，读改写在 BEGIN IMMEDIATE 事务内完成
+- 两种命名空间：kv（带 TTL 与容量上限的键值）与 log（定长追加日志）；值按 JSON 序列化（sqlite 后端）
+- 事件循环上调用的热路径（限流、LLM 预算）使用 busy_timeout_ms 很短的 kv：锁竞争时快速抛出
+  sqlite3.OperationalError 由调用方放行（fail open），不让 BEGIN IMMEDIATE 的锁等待阻塞事件循环
+配置：SHARED_STATE_BACKEND=local|sqlite，SHARED_STATE_PATH 为 sqlite 文件路径（默认系统临时目录）
+"""
+
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..cache.ttl_lru import TTLLRUCache
+from ..fast_json import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "local").lower()
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", os.path.join(tempfile.gettempdir(), "aierp_shared_state.db"))
+# sqlite 后端每写入多少次顺带清理一次过期/超量条目
+SHARED_STATE_PURGE_EVERY = int(os.getenv("SHARED_STATE_PURGE_EVERY", "256"))
+SHARED_STATE_BUSY_TIMEOUT_MS = int(os.getenv("SHARED_STATE_BUSY_TIMEOUT_MS", "10000"))
+# 事件循环上的热路径等待写锁的上限
+SHARED_STATE_FAST_TIMEOUT_MS = int(os.getenv("SHARED_STATE_FAST_TIMEOUT_MS", "50"))
+
+LOCAL = "local"
+SQLITE = "sqlite"
+
+
+# ---------------------------------------------------------------------------
+# local
+# ---------------------------------------------------------------------------
+
+class LocalKV:
+    def __init__(self, name: str, max_size: int, ttl_seconds: Optional[float]) -> None:
+        self.name = name
+        self._cache = TTLLRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        # 读改写需要跨 get/set 的锁
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._cache.get(key, default)
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        self._cache.set(key, value, ttl_seconds)
+
+    def update(self, key: str, fn: Callable[[Any], Any], ttl_seconds: Optional[float] = None) -> Any:
+        """原子读改写：fn(旧值或 None) 返回新值；返回 None 时不写入"""
+        with self._lock:
+            value = fn(self._cache.get(key))
+            if value is not None:
+                self._cache.set(key, value, ttl_seconds)
+            return value
+
+    def incr(self, key: str, delta: int = 1) -> int:
+        with self._lock:
+            value = int(self._cache.get(key, 0)) + delta
+            self._cache.set(key, value)
+            return value
+
+    def delete(self, key: str) -> None:
+        self._cache.pop(key)
+
+    def values(self) -> List[Any]:
+        return [value for _, value in self._cache.items()]
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._cache.stats(), backend=LOCAL)
+
+
+class LocalLog:
+    def __init__(self, name: str, max_len: int) -> None:
+        self.name = name
+        self._items: deque = deque(maxlen=max(1, int(max_len)))
+        self._lock = threading.Lock()
+
+    def append(self, value: Any) -> None:
+        with self._lock:
+            self._items.append(value)
+
+    def tail(self, limit: Optional[int] = None) -> List[Any]:
+        with self._lock:
+            items = list(self._items)
+        return items[-limit:] if limit else items
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._items), "max_len": self._items.maxlen, "backend": LOCAL}
+
+
+class LocalStateBackend:
+    kind = LOCAL
+
+    def __init__(self) -> None:
+        self._namespaces: Dict[Tuple[str, str], Any] = {}
+        self._lock = threading.Lock()
+
+    def _namespace(self, kind: str, name: str, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            ns = self._namespaces.get((kind, name))
+            if ns is None:
+                ns = self._namespaces[(kind, name)] = factory()
+            return ns
+
+    def kv(
+        self, name: str, max_size: int = 10000, ttl_seconds: Optional[float] = None,
+        busy_timeout_ms: Optional[int] = None,
+    ) -> LocalKV:
+        # 进程内字典没有锁等待，busy_timeout_ms 仅对 sqlite 后端有意义
+        return self._namespace("kv", name, lambda: LocalKV(name, max_size, ttl_seconds))
+
+    def log(self, name: str, max_len: int = 1000) -> LocalLog:
+        return self._namespace("log", name, lambda: LocalLog(name, max_len))
+
+
+# ---------------------------------------------------------------------------
+# sqlite（WAL）
+# ---------------------------------------------------------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared_kv (
+    ns TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB,
+    expires_at REAL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (ns, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_shared_kv_updated ON shared_kv(ns, updated_at);
+CREATE TABLE IF NOT EXISTS shared_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ns TEXT NOT NULL,
+    value BLOB,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_shared_log_ns ON shared_log(ns, id);
+"""
+
+
+def _decode(value: Any) -> Any:
+    # incr 写入的计数器以 INTEGER 存储，其余值为 JSON
+    return loads(value) if isinstance(value, (bytes, str)) else value
+
+
+class SQLiteStateBackend:
+    kind = SQLITE
+
+    def __init__(self, path: str = SHARED_STATE_PATH) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connect(SHARED_STATE_BUSY_TIMEOUT_MS)
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self, busy_timeout_ms: int) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=busy_timeout_ms / 1000, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL 下 NORMAL 只在检查点时 fsync，状态数据可接受断电时丢失最近的写入
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        return conn
+
+    def connection(self, busy_timeout_ms: int = SHARED_STATE_BUSY_TIMEOUT_MS) -> sqlite3.Connection:
+        """每个线程、每种锁等待时长一个连接（sqlite3 连接不可跨线程共享）"""
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = self._local.conns = {}
+        conn = conns.get(busy_timeout_ms)
+        if conn is None:
+            conn = conns[busy_timeout_ms] = self._connect(busy_timeout_ms)
+        return conn
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        return self.connection()
+
+    def wrote(self) -> bool:
+        """计数写入次数，返回本次是否应顺带清理"""
+        self._writes += 1
+        return self._writes % SHARED_STATE_PURGE_EVERY == 0
+
+    def kv(
+        self, name: str, max_size: int = 10000, ttl_seconds: Optional[float] = None,
+        busy_timeout_ms: Optional[int] = None,
+    ) -> "SQLiteKV":
+        return SQLiteKV(self, name, max_size, ttl_seconds, busy_timeout_ms or SHARED_STATE_BUSY_TIMEOUT_MS)
+
+    def log(self, name: str, max_len: int = 1000) -> "SQLiteLog":
+        return SQLiteLog(self, name, max_len)
+
+
+class SQLiteKV:
+    def __init__(
+        self, backend: SQLiteStateBackend, name: str, max_size: int, ttl_seconds: Optional[float],
+        busy_timeout_ms: int = SHARED_STATE_BUSY_TIMEOUT_MS,
+    ) -> None:
+        self.backend = backend
+        self.name = name
+        self.max_size = max(1, int(max_size))
+        self.ttl_seconds = ttl_seconds
+        self.busy_timeout_ms = busy_timeout_ms
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        return self.backend.connection(self.busy_timeout_ms)
+
+    def _expires_at(self, now: float, ttl_seconds: Optional[float]) -> Optional[float]:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        return now + ttl if ttl else None
+
+    def _read(self, conn: sqlite3.Connection, key: str, now: float) -> Any:
+        row = conn.execute(
+            "SELECT value FROM shared_kv WHERE ns = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (self.name, key, now),
+        ).fetchone()
+        return _decode(row[0]) if row else None
+
+    def _write(self, conn: sqlite3.Connection, key: str, value: Any, now: float, ttl_seconds: Optional[float]) -> None:
+        conn.execute(
+            "INSERT INTO shared_kv (ns, key, value, expires_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(ns, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, "
+            "updated_at = excluded.updated_at",
+            (self.name, key, dumps(value), self._expires_at(now, ttl_seconds), now),
+        )
+
+    def _after_write(self) -> None:
+        if self.backend.wrote():
+            self.purge()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._read(self.conn, key, time.time())
+        return default if value is None else value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        self._write(self.conn, key, value, time.time(), ttl_seconds)
+        self._after_write()
+
+    def update(self, key: str, fn: Callable[[Any], Any], ttl_seconds: Optional[float] = None) -> Any:
+        """原子读改写：fn(旧值或 None) 返回新值；返回 None 时不写入"""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            value = fn(self._read(conn, key, now))
+            if value is not None:
+                self._write(conn, key, value, now, ttl_seconds)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if value is not None:
+            self._after_write()
+        return value
+
+    def incr(self, key: str, delta: int = 1) -> int:
+        row = self.conn.execute(
+            "INSERT INTO shared_kv (ns, key, value, expires_at, updated_at) VALUES (?, ?, ?, NULL, ?) "
+            "ON CONFLICT(ns, key) DO UPDATE SET value = CAST(value AS INTEGER) + ?, "
+            "updated_at = excluded.updated_at RETURNING value",
+            (self.name, key, delta, time.time(), delta),
+        ).fetchone()
+        return int(row[0])
+
+    def delete(self, key: str) -> None:
+        self.conn.execute("DELETE FROM shared_kv WHERE ns = ? AND key = ?", (self.name, key))
+
+    def values(self) -> List[Any]:
+        rows = self.conn.execute(
+            "SELECT value FROM shared_kv WHERE ns = ? AND (expires_at IS NULL OR expires_at > ?) ORDER BY updated_at",
+            (self.name, time.time()),
+        ).fetchall()
+        return [_decode(row[0]) for row in rows]
+
+    def purge(self) -> int:
+        """删除过期条目，并按最近更新时间只保留 max_size 条"""
+        conn = self.conn
+        removed = conn.execute(
+            "DELETE FROM shared_kv WHERE ns = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+            (self.name, time.time()),
+        ).rowcount
+        removed += conn.execute(
+            "DELETE FROM shared_kv WHERE ns = ? AND key IN ("
+            "SELECT key FROM shared_kv WHERE ns = ? ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.name, self.name, self.max_size),
+        ).rowcount
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        size = self.conn.execute("SELECT COUNT(*) FROM shared_kv WHERE ns = ?", (self.name,)).fetchone()[0]
+        return {"size": size, "max_size": self.max_size, "ttl_seconds": self.ttl_seconds, "backend": SQLITE}
+
+
+class SQLiteLog:
+    def __init__(self, backend: SQLiteStateBackend, name: str, max_len: int) -> None:
+        self.backend = backend
+        self.name = name
+        self.max_len = max(1, int(max_len))
+
+    def append(self, value: Any) -> None:
+        conn = self.backend.conn
+        conn.execute(
+            "INSERT INTO shared_log (ns, value, created_at) VALUES (?, ?, ?)", (self.name, dumps(value), time.time())
+        )
+        if self.backend.wrote():
+            conn.execute(
+                "DELETE FROM shared_log WHERE ns = ? AND id <= ("
+                "SELECT id FROM shared_log WHERE ns = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (self.name, self.name, self.max_len),
+            )
+
+    def tail(self, limit: Optional[int] = None) -> List[Any]:
+        limit = min(limit or self.max_len, self.max_len)
+        rows = self.backend.conn.execute(
+            "SELECT value FROM shared_log WHERE ns = ? ORDER BY id DESC LIMIT ?", (self.name, limit)
+        ).fetchall()
+        return [loads(row[0]) for row in reversed(rows)]
+
+    def stats(self) -> Dict[str, Any]:
+        size = self.backend.conn.execute("SELECT COUNT(*) FROM shared_log WHERE ns = ?", (self.name,)).fetchone()[0]
+        return {"size": size, "max_len": self.max_len, "backend": SQLITE}
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_state_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if SHARED_STATE_BACKEND == SQLITE:
+                    _backend = SQLiteStateBackend(SHARED_STATE_PATH)
+                    logger.info(f"共享状态后端: sqlite ({SHARED_STATE_PATH})")
+                else:
+                    if SHARED_STATE_BACKEND != LOCAL:
+                        logger.warning(f"未知的 SHARED_STATE_BACKEND={SHARED_STATE_BACKEND}，使用进程内状态")
+                    _backend = LocalStateBackend()
+    return _backend
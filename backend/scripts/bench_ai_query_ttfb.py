@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+对话式查询首字节时间（TTFB）对比：非流式 vs SSE 流式（?stream=true）
+以子进程启动本地 LLM 桩服务（scripts/fake_llm_server.py）与 uvicorn 应用，
+分别统计响应头、rows 事件、首个 delta、完成的耗时；关闭 LLM 响应缓存以测量真实往返
+用法: python scripts/bench_ai_query_ttfb.py [每个查询的重复次数] [桩服务首包延迟ms] [分片间隔ms]
+"""
+
+import sys
+import os
+import json
+import subprocess
+import time
+from typing import Dict, List
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_SCRIPT = os.path.join(BACKEND_DIR, "scripts", "fake_llm_server.py")
+LLM_PORT = 8197
+API_PORT = 8196
+
+CASES = [
+    ("/api/work-reports/ai-query", "查询王五9月报工"),
+    ("/api/work-reports/ai-query", "你好"),
+    ("/api/pricing/ai-query", "查询纺机主轴的价格"),
+]
+
+
+def _wait_ready(url: str, proc: subprocess.Popen) -> None:
+    for _ in range(300):
+        if proc.poll() is not None:
+            raise RuntimeError(f"子进程提前退出: {proc.args}")
+        try:
+            requests.get(url, headers={"Connection": "close"}, timeout=2)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f"等待服务启动超时: {url}")
+
+
+def start_services(latency_ms: float, token_ms: float):
+    llm = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPT, "--port", str(LLM_PORT), "--latency-ms", str(latency_ms),
+         "--token-ms", str(token_ms), "--reply-chars", "160"],
+        stdout=subprocess.DEVNULL,
+    )
+    env = dict(
+        os.environ,
+        OPENAI_BASE_URL=f"http://127.0.0.1:{LLM_PORT}",
+        OPENAI_API_KEY="fake",
+        LLM_RESPONSE_CACHE_ENABLED="false",
+        FORECAST_POOL_WARMUP="false",
+    )
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(API_PORT), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_ready(f"http://127.0.0.1:{LLM_PORT}/stats", llm)
+        _wait_ready(f"http://127.0.0.1:{API_PORT}/health", api)
+    except Exception:
+        stop_services(llm, api)
+        raise
+    return llm, api
+
+
+def stop_services(*procs: subprocess.Popen) -> None:
+    for proc in procs:
+        proc.terminate()
+        proc.wait()
+
+
+def measure_plain(path: str, query: str) -> Dict[str, float]:
+    started = time.perf_counter()
+    resp = requests.post(f"http://127.0.0.1:{API_PORT}{path}", json={"query": query}, stream=True, timeout=60)
+    headers_at = time.perf_counter() - started
+    resp.json()
+    total = time.perf_counter() - started
+    # 非流式：表格与说明随完整响应一起到达
+    return {"headers": headers_at, "rows": total, "first_delta": total, "done": total}
+
+
+def measure_stream(path: str, query: str) -> Dict[str, float]:
+    started = time.perf_counter()
+    resp = requests.post(f"http://127.0.0.1:{API_PORT}{path}?stream=true", json={"query": query}, stream=True, timeout=60)
+    timings = {"headers": time.perf_counter() - started}
+    event = None
+    for line in resp.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            now = time.perf_counter() - started
+            if event in ("parsed", "rows"):
+                timings.setdefault("rows", now)
+            elif event == "delta":
+                timings.setdefault("first_delta", now)
+            elif event == "done":
+                timings["done"] = now
+                json.loads(line[5:])
+    return timings
+
+
+def report(label: str, samples: List[Dict[str, float]]) -> None:
+    def _p50(key: str) -> str:
+        values = [s[key] for s in samples if key in s]
+        return f"{np.median(values) * 1000:7.0f}ms" if values else "      -"
+    print(f"  {label:<6} 响应头 {_p50('headers')}  表格数据 {_p50('rows')}  首段说明 {_p50('first_delta')}  完成 {_p50('done')}")
+
+
+def main(repeat: int, latency_ms: float, token_ms: float) -> None:
+    llm, api = start_services(latency_ms, token_ms)
+    try:
+        print(f"🚀 桩服务首包延迟 {latency_ms:.0f}ms, 分片间隔 {token_ms:.0f}ms, 每个查询 {repeat} 次（中位数）")
+        for path, query in CASES:
+            measure_stream(path, query)  # 预热
+            print(f"{path}  «{query}»")
+            report("非流式", [measure_plain(path, query) for _ in range(repeat)])
+            report("流式", [measure_stream(path, query) for _ in range(repeat)])
+    finally:
+        stop_services(api, llm)
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 300
+    token_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 20
+    main(repeat, latency_ms, token_ms)
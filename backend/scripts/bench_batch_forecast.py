@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+批量预测进程池基准
+对比事件循环内逐条拟合与预测进程池在不同子进程数下的耗时
+用法: python scripts/bench_batch_forecast.py [序列数] [子进程数列表，如 1,2,4,8]
+"""
+
+import sys
+import os
+import asyncio
+import time
+import warnings
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.models.train.forecast_executor import ForecastExecutor
+from app.models.train.simple_predictor import predict_simple
+
+
+def make_tasks(n: int):
+    rng = np.random.default_rng(7)
+    tasks = []
+    for i in range(n):
+        length = int(rng.integers(24, 60))
+        t = np.arange(length)
+        series = 100 + 0.8 * t + 10 * np.sin(2 * np.pi * t / 12) + rng.normal(0, 3, length)
+        tasks.append((i, series.round(2).tolist(), 3))
+    return tasks
+
+
+def run_sequential(tasks) -> float:
+    started = time.perf_counter()
+    for _, series, horizon in tasks:
+        predict_simple(series, horizon)
+    return time.perf_counter() - started
+
+
+async def run_pool(executor: ForecastExecutor, tasks):
+    started = time.perf_counter()
+    first = None
+    elapsed = []
+    async for item in executor.iter_forecasts(tasks):
+        if first is None:
+            first = time.perf_counter() - started
+        elapsed.append(item["elapsed_ms"])
+    return time.perf_counter() - started, first, elapsed
+
+
+def main(n: int, worker_counts) -> None:
+    warnings.filterwarnings("ignore")
+    tasks = make_tasks(n)
+    print(f"🚀 {n} 条序列, CPU核数 {os.cpu_count()}")
+
+    baseline = run_sequential(tasks)
+    print(f"  事件循环内逐条拟合: {baseline:.2f}s")
+
+    for workers in worker_counts:
+        executor = ForecastExecutor(max_workers=workers)
+        warm_started = time.perf_counter()
+        executor.warm()
+        warm = time.perf_counter() - warm_started
+        total, first, elapsed = asyncio.run(run_pool(executor, tasks))
+        executor.shutdown()
+        p50, p95 = np.percentile(elapsed, [50, 95])
+        print(
+            f"  进程池 workers={workers}: {total:.2f}s (加速 {baseline / total:.2f}x), "
+            f"首条结果 {first * 1000:.0f}ms, 单条 p50={p50:.1f}ms p95={p95:.1f}ms, 预热 {warm:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    total_series = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    counts = [int(x) for x in sys.argv[2].split(",")] if len(sys.argv) > 2 else sorted({1, 2, 4, os.cpu_count() or 1})
+    main(total_series, counts)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+批量核价结果写入基准
+对比不同 chunk_size 下单事务写入的吞吐（rows/sec）
+用法: python scripts/bench_batch_pricing_insert.py [行数] [chunk_size,...]
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.sqlite_db import SQLiteDatabase
+from app.repository.batch_pricing_repo import BatchPricingRepository
+
+
+def make_rows(n: int):
+    for i in range(n):
+        yield {
+            'row_index': i + 1,
+            'material_code': f'M{i % 5000:05d}',
+            'material_name': f'纺机零件{i % 5000}',
+            'specification': 'Φ50×200mm',
+            'process_requirements': '车削,磨削,热处理',
+            'quantity': (i % 10) + 1,
+            'uom': 'EA',
+            'estimated_price': 123.45,
+            'currency': 'CNY',
+            'status': 'success',
+            'reason_or_notes': '',
+            'rule_version': 'v1.0',
+        }
+
+
+def run(total: int, chunk_sizes) -> None:
+    print(f"🚀 写入 {total} 行")
+    for chunk_size in chunk_sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = SQLiteDatabase(os.path.join(tmp, 'bench.db'))
+            repo = BatchPricingRepository(conn=db.conn)
+            stats = repo.insert_results('BP-BENCH', make_rows(total), chunk_size=chunk_size)
+            count = db.conn.execute("SELECT COUNT(*) FROM pricing_batch_results").fetchone()[0]
+            db.close()
+        print(f"  chunk_size={chunk_size}: {stats['rows']} 行, {stats['seconds']:.2f}s, {stats['rows_per_sec']:,} rows/s (校验行数 {count})")
+
+
+if __name__ == "__main__":
+    total_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    chunks = [int(c) for c in sys.argv[2].split(',')] if len(sys.argv) > 2 else [1_000, 50_000]
+    run(total_rows, chunks)
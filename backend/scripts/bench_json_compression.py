@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+大列表响应序列化与压缩压测
+构造 N 行报工搜索结果，对比 jsonable_encoder + json.dumps（FastAPI 默认路径）与 orjson 的序列化耗时，
+以及原始 / gzip / brotli（已安装时）的传输字节数
+用法: python scripts/bench_json_compression.py [行数]
+"""
+
+import sys
+import os
+import json
+import random
+import time
+import zlib
+from datetime import date, datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+
+from app.middleware.compression import COMPRESSION_BROTLI_QUALITY, COMPRESSION_GZIP_LEVEL, brotli
+from app.utils.fast_json import dumps
+
+EMPLOYEES = ["张三", "李四", "王五", "赵六", "钱七"]
+PROJECTS = ["ERP系统开发", "数据分析平台", "移动应用开发", "AI智能助手", "用户管理系统"]
+DEPARTMENTS = ["技术部", "产品部", "运营部"]
+
+
+def build_payload(rows: int) -> dict:
+    rnd = random.Random(42)
+    start = date(2025, 1, 1)
+    created = datetime(2025, 1, 1, 9, 30)
+    data = [
+        {
+            "id": f"wr-{i:08d}",
+            "employee_name": rnd.choice(EMPLOYEES),
+            "project_name": rnd.choice(PROJECTS),
+            "department_name": rnd.choice(DEPARTMENTS),
+            "work_date": start + timedelta(days=i % 365),
+            "work_hours": round(rnd.uniform(1, 10), 1),
+            "work_content": f"开发任务 {i}：接口联调与单元测试",
+            "work_location": "办公室",
+            "status": rnd.choice(["pending", "approved"]),
+            "created_at": created + timedelta(minutes=i),
+        }
+        for i in range(rows)
+    ]
+    return {"success": True, "data": {"data": data, "total": rows, "page": 1, "size": rows}}
+
+
+def timeit(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(rows: int) -> None:
+    payload = build_payload(rows)
+
+    def _default_path() -> bytes:
+        return json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    baseline = timeit(_default_path)
+    fast = timeit(lambda: dumps(payload))
+    print(f"🧮 {rows:,} 行序列化: jsonable_encoder+json {baseline * 1000:.1f}ms, fast_json {fast * 1000:.1f}ms ({baseline / fast:.1f}x)")
+    assert json.loads(_default_path()) == json.loads(dumps(payload)), "两种序列化输出不一致"
+
+    body = dumps(payload)
+    print(f"📦 原始 {len(body) / 1024:.0f}KB")
+    t0 = time.perf_counter()
+    gz = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    gz_body = gz.compress(body) + gz.flush()
+    print(f"  gzip(level={COMPRESSION_GZIP_LEVEL}) {len(gz_body) / 1024:.0f}KB ({len(gz_body) / len(body):.1%}), {(time.perf_counter() - t0) * 1000:.1f}ms")
+    if brotli is not None:
+        t0 = time.perf_counter()
+        br_body = brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+        print(f"  br(quality={COMPRESSION_BROTLI_QUALITY}) {len(br_body) / 1024:.0f}KB ({len(br_body) / len(body):.1%}), {(time.perf_counter() - t0) * 1000:.1f}ms")
+    else:
+        print("  brotli 未安装，跳过")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LLM 传输层基准（对本地桩服务 scripts/fake_llm_server.py）
+对比：每次裸 requests.post / 共享 Session（线程并发）/ httpx 异步连接池，
+输出总耗时、单次延迟分位与桩服务观测到的新建连接数；最后演示熔断的快速失败
+用法: python scripts/bench_llm_transport.py [请求数] [并发数] [桩服务延迟ms]
+"""
+
+import sys
+import os
+import asyncio
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import requests
+
+from app.utils.llm.transport import CircuitOpenError, LLMTransport, LLMTransportError
+
+PORT = 8199
+FAILING_PORT = 8198
+PAYLOAD = {"model": "fake", "messages": [{"role": "user", "content": "你好"}]}
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_llm_server.py")
+
+
+class StubProcess:
+    """桩服务放在独立进程中运行，避免与客户端争用GIL"""
+
+    def __init__(self, port: int, latency_ms: float, fail_rate: float = 0.0) -> None:
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.proc = subprocess.Popen(
+            [sys.executable, SERVER_SCRIPT, "--port", str(port), "--latency-ms", str(latency_ms), "--fail-rate", str(fail_rate)],
+            stdout=subprocess.DEVNULL,
+        )
+        for _ in range(100):
+            try:
+                self.stats()
+                return
+            except requests.ConnectionError:
+                time.sleep(0.05)
+        raise RuntimeError("桩服务启动失败")
+
+    def stats(self):
+        return requests.get(f"{self.base_url}/stats", headers={"Connection": "close"}, timeout=5).json()
+
+    def reset(self) -> None:
+        requests.post(f"{self.base_url}/reset", headers={"Connection": "close"}, timeout=5)
+
+    def stop(self) -> None:
+        self.proc.terminate()
+        self.proc.wait()
+
+
+def report(name: str, server: StubProcess, total: float, latencies) -> None:
+    # 统计请求本身也占用一个新连接
+    stats = server.stats()
+    stats["connections_total"] -= 1
+    p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+    print(
+        f"  {name:<28} 总耗时 {total:6.2f}s  p50 {p50:6.1f}ms  p95 {p95:6.1f}ms  "
+        f"新建连接 {stats['connections_total']:4d}  服务端最大并发 {stats['max_concurrent_requests']}"
+    )
+
+
+def run_threads(fn, n: int, concurrency: int):
+    latencies = []
+
+    def _one(_):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(_one, range(n)))
+    return time.perf_counter() - started, latencies
+
+
+async def run_async(transport: LLMTransport, url: str, n: int, concurrency: int):
+    latencies = []
+    # 与线程方案一致：同一时刻最多 concurrency 个请求在途，延迟不含排队时间
+    slots = asyncio.Semaphore(concurrency)
+
+    async def _one():
+        async with slots:
+            started = time.perf_counter()
+            await transport.apost_json(url, PAYLOAD, provider="fake")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[_one() for _ in range(n)])
+    total = time.perf_counter() - started
+    await transport.aclose()
+    return total, latencies
+
+
+def main(n: int, concurrency: int, latency_ms: float) -> None:
+    os.environ["LLM_CONCURRENCY_FAKE"] = str(concurrency)
+    server = StubProcess(PORT, latency_ms)
+    try:
+        url = f"{server.base_url}/v1/chat/completions"
+        print(f"🚀 {n} 次请求, 并发 {concurrency}, 桩服务延迟 {latency_ms:.0f}ms")
+
+        server.reset()
+        total, lat = run_threads(lambda: requests.post(url, json=PAYLOAD, timeout=30).json(), n, concurrency)
+        report("裸 requests.post（线程）", server, total, lat)
+
+        server.reset()
+        transport = LLMTransport(max_connections=concurrency)
+        total, lat = run_threads(lambda: transport.post_json(url, PAYLOAD, provider="fake"), n, concurrency)
+        transport.close()
+        report("共享 Session（线程）", server, total, lat)
+
+        server.reset()
+        total, lat = asyncio.run(run_async(LLMTransport(max_connections=concurrency), url, n, concurrency))
+        report("httpx 异步连接池", server, total, lat)
+    finally:
+        server.stop()
+
+    # 熔断：桩服务全部返回503，连续失败达到阈值后不再发出请求
+    failing = StubProcess(FAILING_PORT, latency_ms, fail_rate=1.0)
+    try:
+        failing_url = f"{failing.base_url}/v1/chat/completions"
+        transport = LLMTransport(max_retries=0)
+        outcomes = {"failed": 0, "short_circuited": 0}
+        started = time.perf_counter()
+        for _ in range(50):
+            try:
+                transport.post_json(failing_url, PAYLOAD, provider="fake")
+            except CircuitOpenError:
+                outcomes["short_circuited"] += 1
+            except LLMTransportError:
+                outcomes["failed"] += 1
+        elapsed = time.perf_counter() - started
+        print(
+            f"  熔断: 50 次调用中 {outcomes['failed']} 次到达服务端后失败, {outcomes['short_circuited']} 次直接熔断, "
+            f"服务端收到 {failing.stats()['requests_total']} 次, 总耗时 {elapsed:.2f}s"
+        )
+        transport.close()
+    finally:
+        failing.stop()
+
+
+if __name__ == "__main__":
+    total_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    delay = float(sys.argv[3]) if len(sys.argv) > 3 else 100
+    main(total_requests, workers, delay)
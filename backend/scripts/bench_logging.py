@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+日志管道开销压测
+对比调用线程（事件循环）上的单条日志 CPU 耗时：同步 StreamHandler + f-string（原配置）、QueueHandler 管道（惰性格式化，JSON 由后台线程输出）、
+未开启的 DEBUG 日志，以及开启 DEBUG 后按 10% 采样的热路径日志；输出写入 /dev/null
+用法: python scripts/bench_logging.py [日志条数]
+"""
+
+import sys
+import os
+import logging
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.logs.structured import configure_logging, logging_stats, set_request_id, shutdown_logging
+
+WHERE = "employee_id IN (?, ?) AND report_date >= ?"
+PARAMS = ["emp_001", "emp_002", "2024-01-01"]
+
+
+def measure(label: str, emit, n: int) -> None:
+    # thread_time 只统计调用线程的 CPU 时间（后台输出线程不计入）
+    t0 = time.thread_time()
+    for i in range(n):
+        emit(i)
+    elapsed = time.thread_time() - t0
+    print(f"⏱️ {label}: 调用线程 {elapsed / n * 1e6:.2f}µs/条")
+
+
+def main(n: int) -> None:
+    devnull = open(os.devnull, "w")
+    logger = logging.getLogger("app.repository.work_report_repo")
+    root = logging.getLogger()
+
+    handler = logging.StreamHandler(devnull)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    measure("同步 StreamHandler + f-string", lambda i: logger.info(f"SQLite报工查询: {WHERE} {PARAMS} => {i} 条"), n)
+    root.removeHandler(handler)
+
+    set_request_id("bench-request")
+    configure_logging(level="INFO", fmt="json", stream=devnull, force=True)
+    measure("QueueHandler 管道 INFO（惰性格式化）", lambda i: logger.info("SQLite报工查询: %s %s => %d 条", WHERE, PARAMS, i), n)
+    measure("未开启的 DEBUG", lambda i: logger.debug("SQLite报工查询: %s %s => %d 条", WHERE, PARAMS, i), n)
+    shutdown_logging()
+
+    configure_logging(level="DEBUG", fmt="json", stream=devnull, force=True,
+                      sample_rates="app.repository.work_report_repo=0.1")
+    measure("DEBUG 开启，10% 采样", lambda i: logger.debug("SQLite报工查询: %s %s => %d 条", WHERE, PARAMS, i), n)
+    print(f"📦 队列状态: {logging_stats()}")
+    t0 = time.perf_counter()
+    shutdown_logging()
+    print(f"🧹 后台线程写完剩余日志: {(time.perf_counter() - t0) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+物料检索基准
+对比 n-gram 倒排索引 top-k 检索与逐条子串扫描（取出全部命中后才能排序）的耗时
+用法: python scripts/bench_material_search.py [物料数]
+"""
+
+import sys
+import os
+import random
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.pricing.material_index import MaterialSearchIndex, normalize_text
+
+NAMES = ['纺机主轴', '纺机齿轮', '纺机轴承座', '联轴器', '精密丝杠', '纺机罗拉', '张力器弹簧', '钢领板']
+PROCS = ['车削', '磨削', '热处理', '铣削', '滚齿', '淬火', '表面处理']
+QUERIES = [
+    {'material_name': '主轴'},
+    {'specification': 'φ50x200'},
+    {'keyword': '轴承 齿轮'},
+    {'material_name': '丝杠', 'specification': 'M20*300'},
+    {'keyword': '热处理'},
+]
+
+
+def make_docs(n: int):
+    rng = random.Random(42)
+    for i in range(n):
+        spec = rng.choice([f'Φ{rng.randint(10, 99)}×{rng.randint(100, 400)}mm', f'模数{rng.randint(1, 5)}.5', f'M{rng.randint(8, 30)}*{rng.randint(100, 400)}'])
+        yield {
+            'id': f'id{i}',
+            'material_code': f'SY{i:06d}',
+            'material_name': f'{rng.choice(NAMES)}{rng.randint(1, 50)}型',
+            'specification': spec,
+            'process_requirements': rng.sample(PROCS, 2),
+        }
+
+
+def linear_scan(docs, q):
+    """原 LIKE %x% 语义的逐条扫描，仅用于对比"""
+    name = normalize_text(q.get('material_name'))
+    spec = normalize_text(q.get('specification'))
+    keywords = [normalize_text(k) for k in (q.get('keyword') or '').split()]
+    hits = []
+    for d in docs:
+        if name and name not in d['_name']:
+            continue
+        if spec and spec not in d['_spec']:
+            continue
+        if keywords and not any(k in d['_all'] for k in keywords):
+            continue
+        hits.append(d)
+    return hits
+
+
+def main(n: int) -> None:
+    docs = list(make_docs(n))
+    start = time.perf_counter()
+    index = MaterialSearchIndex()
+    for d in docs:
+        index.add(d['id'], d, d['material_name'], d['specification'], d['process_requirements'], d['material_code'])
+    print(f"🚀 {n} 条物料, 建索引 {time.perf_counter() - start:.2f}s")
+
+    for d in docs:
+        d['_name'] = normalize_text(d['material_name'])
+        d['_spec'] = normalize_text(d['specification'])
+        d['_all'] = d['_name'] + d['_spec'] + normalize_text(' '.join(d['process_requirements'])) + normalize_text(d['material_code'])
+
+    for q in QUERIES:
+        start = time.perf_counter()
+        ranked = index.search(limit=20, **q)
+        index_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        scanned = linear_scan(docs, q)
+        scan_ms = (time.perf_counter() - start) * 1000
+        top = ranked[0] if ranked else None
+        print(f"  {q}: 索引 {index_ms:.1f}ms ({len(ranked)} 条, top={top[0]['material_name'] + ' ' + top[0]['specification'] if top else '-'} {top[1] if top else ''}), 扫描 {scan_ms:.1f}ms ({len(scanned)} 条)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+NumPy Holt/Holt-Winters 引擎：与 statsmodels 的精度对照 + 吞吐基准
+精度以 statsmodels 为基准比较样本内 SSE 比值与 3 步预测相对差异（未安装 statsmodels 时只跑吞吐）
+用法: python scripts/bench_numpy_holt.py [对照序列数] [吞吐序列数]
+"""
+
+import sys
+import os
+import time
+import warnings
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.models.train.numpy_holt import fit_holt
+
+try:
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+    STATSMODELS_AVAILABLE = True
+except ImportError:
+    STATSMODELS_AVAILABLE = False
+
+# 样本内 SSE 不得比 statsmodels 差超过该比例
+SSE_TOLERANCE = 0.01
+HORIZON = 3
+
+
+def make_series(n: int, length: int, seasonal: bool, seed: int = 11) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(length)
+    y = 100 + rng.uniform(-1.0, 2.0, (n, 1)) * t + rng.normal(0, 3, (n, length))
+    if seasonal:
+        y += rng.uniform(5, 15, (n, 1)) * np.sin(2 * np.pi * t / 12 + rng.uniform(0, np.pi, (n, 1)))
+    return y
+
+
+def parity(n: int) -> bool:
+    ok = True
+    for name, seasonal, m in (("Holt", False, 0), ("Holt-Winters(m=12)", True, 12)):
+        Y = make_series(n, 48, seasonal)
+        fit = fit_holt(Y, m)
+        sm_fits = [
+            ExponentialSmoothing(list(y), trend='add', seasonal='add' if m else None, seasonal_periods=m or None).fit()
+            for y in Y
+        ]
+        sm_sse = np.array([f.sse for f in sm_fits])
+        sm_fc = np.array([f.forecast(HORIZON) for f in sm_fits])
+        ratio = fit.sse / sm_sse
+        rel = np.abs(fit.forecast(HORIZON) - sm_fc) / np.maximum(np.abs(sm_fc), 1e-9)
+        passed = bool(np.all(ratio <= 1 + SSE_TOLERANCE))
+        ok &= passed
+        print(
+            f"  {name}: SSE比值 中位数 {np.median(ratio):.4f} 最大 {ratio.max():.4f}, "
+            f"预测相对差 中位数 {np.median(rel):.4%} p95 {np.percentile(rel, 95):.4%} -> {'通过' if passed else '未通过'}"
+        )
+    return ok
+
+
+def throughput(n: int) -> None:
+    for name, seasonal, m in (("Holt", False, 0), ("Holt-Winters(m=12)", True, 12)):
+        Y = make_series(n, 48, seasonal, seed=5)
+        started = time.perf_counter()
+        fit_holt(Y, m)
+        numpy_s = time.perf_counter() - started
+        line = f"  {name}: NumPy {n} 条 {numpy_s:.2f}s ({n / numpy_s:,.0f} 条/s)"
+        if STATSMODELS_AVAILABLE:
+            sample = Y[: max(1, min(n, 100))]
+            started = time.perf_counter()
+            for y in sample:
+                ExponentialSmoothing(list(y), trend='add', seasonal='add' if m else None, seasonal_periods=m or None).fit()
+            sm_rate = len(sample) / (time.perf_counter() - started)
+            line += f", statsmodels {sm_rate:,.0f} 条/s (抽样{len(sample)}条), 加速 {n / numpy_s / sm_rate:.1f}x"
+        print(line)
+
+
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")
+    parity_n = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    throughput_n = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    passed = True
+    if STATSMODELS_AVAILABLE:
+        print(f"🔍 精度对照（{parity_n} 条序列，长度48）")
+        passed = parity(parity_n)
+    else:
+        print("⚠️ 未安装 statsmodels，跳过精度对照")
+    print(f"🚀 吞吐（{throughput_n} 条序列，长度48）")
+    throughput(throughput_n)
+    sys.exit(0 if passed else 1)
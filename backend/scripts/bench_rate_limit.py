@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+限流中间件开销压测
+直接驱动 ASGI 调用链（不经网络），对比无限流 / RateLimitMiddleware 的单请求耗时；
+随后模拟大量不同客户端 IP，验证空闲 key 被回收、存储规模受 RATE_LIMIT_MAX_KEYS 约束
+用法: python scripts/bench_rate_limit.py [请求数]
+"""
+
+import sys
+import os
+import asyncio
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.utils.ratelimit.gcra import GCRARateLimiter, LocalGCRAStore, RateLimitPolicy
+
+HEADERS = [
+    (b"host", b"localhost"), (b"user-agent", b"bench"), (b"accept", b"application/json"),
+    (b"accept-encoding", b"gzip"), (b"x-api-key", b"bench-key"),
+]
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    pass
+
+
+def make_scope(path: str, client_ip: str = "127.0.0.1", headers=HEADERS) -> dict:
+    return {"type": "http", "method": "GET", "path": path, "headers": headers, "client": (client_ip, 12345)}
+
+
+async def drive(app, scopes) -> float:
+    t0 = time.perf_counter()
+    for scope in scopes:
+        await app(scope, _receive, _send)
+    return time.perf_counter() - t0
+
+
+def main(requests: int) -> None:
+    scopes = [make_scope("/api/work-reports/search")] * requests
+    bare = asyncio.run(drive(endpoint, scopes))
+
+    limited = RateLimitMiddleware(
+        endpoint, limit_per_minute=10 ** 9,
+        routes=[("/api/work-reports/ai-query", RateLimitPolicy(20, 60)), ("/api/predict/llm", RateLimitPolicy(10, 60))],
+    )
+    limited.limiter = GCRARateLimiter(LocalGCRAStore())
+    elapsed = asyncio.run(drive(limited, scopes))
+    overhead = (elapsed - bare) / requests * 1e6
+    print(f"⏱️ {requests:,} 次请求: 无限流 {bare / requests * 1e6:.2f}µs/次, 限流 {elapsed / requests * 1e6:.2f}µs/次, 额外开销 {overhead:.2f}µs/次")
+
+    # 大量不同 IP（无 API Key）：每个 key 的 TAT 领先当前时间 1 秒，期间存储受 max_keys 封顶；
+    # 1 秒后这些 key 全部空闲，由后续请求顺带回收
+    store = LocalGCRAStore(max_keys=50000)
+    limited.limiter = GCRARateLimiter(store)
+    limited.default_policy = RateLimitPolicy(limit=1, period=1)
+    ips = [make_scope("/api/data", f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", headers=[]) for i in range(80000)]
+    asyncio.run(drive(limited, ips))
+    print(f"🧹 8 万个不同 IP 后: {store.stats()}（超出 max_keys 的最旧 key 被淘汰）")
+    time.sleep(1.1)
+    asyncio.run(drive(limited, [make_scope("/api/data", f"192.168.0.{i % 250}", headers=[]) for i in range(5000)]))
+    print(f"🧹 空闲 1 秒后再处理 5000 次请求: {store.stats()}（过期 key 每次请求顺带清理）")
+
+    # 突发与补充：20 次/分钟的路由瞬时打满后被拒绝
+    limited.limiter = GCRARateLimiter(LocalGCRAStore())
+    statuses = []
+
+    async def _capture(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    async def _burst():
+        for _ in range(25):
+            await limited(make_scope("/api/work-reports/ai-query"), _receive, _capture)
+
+    asyncio.run(_burst())
+    print(f"🚦 ai-query 20/60 连续 25 次: 放行 {statuses.count(200)}, 拒绝 {statuses.count(429)}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+请求计时中间件开销压测
+直接驱动 ASGI 调用链（不经网络），对比无计时 / TimingMiddleware 的单请求耗时（端点内模拟 3 次 db 计时），
+并统计直方图单次记录耗时、分位数精度与 /metrics 渲染耗时
+用法: python scripts/bench_request_metrics.py [请求数]
+"""
+
+import sys
+import os
+import asyncio
+import random
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.middleware.timing import TimingMiddleware
+from app.utils.metrics.request_metrics import LatencyHistogram, RequestMetrics
+from app.utils.metrics.timing import DB, timed
+
+
+class _Route:
+    path = "/api/work-reports/{report_id}"
+
+
+ROUTE = _Route()
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = ROUTE
+    for _ in range(3):
+        with timed(DB):
+            pass
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    pass
+
+
+async def drive(app, requests: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(requests):
+        await app({"type": "http", "method": "GET", "path": "/api/work-reports/1", "headers": []}, _receive, _send)
+    return time.perf_counter() - t0
+
+
+def main(requests: int) -> None:
+    bare = asyncio.run(drive(endpoint, requests))
+    app = TimingMiddleware(endpoint)
+    app.metrics = RequestMetrics()
+    elapsed = asyncio.run(drive(app, requests))
+    print(f"⏱️ {requests:,} 次请求: 无计时 {bare / requests * 1e6:.2f}µs/次, 计时 {elapsed / requests * 1e6:.2f}µs/次, "
+          f"额外开销 {(elapsed - bare) / requests * 1e6:.2f}µs/次")
+
+    # 对数正态分布的模拟延迟：比较直方图分位数与精确分位数
+    rng = random.Random(42)
+    samples = [rng.lognormvariate(-4, 1.2) for _ in range(requests)]
+    hist = LatencyHistogram()
+    t0 = time.perf_counter()
+    for value in samples:
+        hist.record(value)
+    record_cost = (time.perf_counter() - t0) / requests * 1e9
+    ordered = sorted(samples)
+    print(f"📊 直方图 {len(hist.bounds)} 个桶, 单次记录 {record_cost:.0f}ns")
+    for q in (0.5, 0.95, 0.99):
+        exact = ordered[int(q * len(ordered)) - 1]
+        approx = hist.quantile(q)
+        print(f"   p{int(q * 100)}: 精确 {exact * 1000:.2f}ms, 直方图 {approx * 1000:.2f}ms, 偏差 {(approx / exact - 1) * 100:+.1f}%")
+
+    # 50 条路由 × 4 种状态码的导出
+    metrics = RequestMetrics()
+    for i in range(50):
+        for status in (200, 400, 404, 500):
+            metrics.observe("GET", f"/api/route-{i}", status, rng.random(), {DB: 0.001})
+    t0 = time.perf_counter()
+    text = metrics.render_prometheus()
+    print(f"📤 50 条路由导出 {len(text) / 1024:.0f}KB, 耗时 {(time.perf_counter() - t0) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
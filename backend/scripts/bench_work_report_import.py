@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+报工 Excel 分块导入压测
+生成 N 行报工表（约 1% 含错误行），导入到临时数据库副本，统计吞吐、错误报告与进程峰值内存；
+分块读取下峰值内存应随块大小而非行数增长。随后重复导入同一文件，验证自然键去重（应全部跳过）
+用法: python scripts/bench_work_report_import.py [行数] [块大小]
+"""
+
+import sys
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import Workbook
+
+from app.db.sqlite_db import get_sqlite_db
+from app.repository import work_report_import
+from app.utils.parsers.excel_stream import iter_excel_chunks
+
+EMPLOYEES = ["张三", "李四", "王五", "赵六", "钱七"]
+PROJECTS = ["ERP系统开发", "数据分析平台", "移动应用开发", "AI智能助手", "用户管理系统"]
+DEPARTMENTS = ["技术部", "产品部", "运营部"]
+
+
+def build_workbook(path: str, rows: int) -> None:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("报工")
+    ws.append(["员工姓名", "项目名称", "部门名称", "报工日期", "工作时长", "工作内容", "工作地点", "状态"])
+    rnd = random.Random(42)
+    start = date(2025, 1, 1)
+    for i in range(rows):
+        hours = round(rnd.uniform(1, 10), 1)
+        employee = rnd.choice(EMPLOYEES)
+        if i % 100 == 99:
+            # 约 1% 错误行：工时越界 / 未知员工 交替出现
+            hours, employee = (30, employee) if i % 200 == 199 else (hours, "不存在的员工")
+        ws.append([
+            employee, rnd.choice(PROJECTS), rnd.choice(DEPARTMENTS),
+            start + timedelta(days=i % 365), hours, f"开发任务 {i}", "办公室", "pending",
+        ])
+    wb.save(path)
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main(rows: int, chunk_size: int) -> None:
+    workdir = tempfile.mkdtemp(prefix="bench-import-")
+    try:
+        xlsx = os.path.join(workdir, "timesheet.xlsx")
+        t0 = time.perf_counter()
+        build_workbook(xlsx, rows)
+        print(f"🧾 生成 {rows:,} 行 ({os.path.getsize(xlsx) / 1e6:.1f}MB) 用时 {time.perf_counter() - t0:.1f}s, 峰值内存 {peak_rss_mb():.0f}MB")
+
+        db_copy = os.path.join(workdir, "aierp.db")
+        shutil.copyfile(get_sqlite_db().db_path, db_copy)
+        conn = work_report_import.sqlite3.connect(db_copy)
+        before = conn.execute("SELECT COUNT(*) FROM work_reports").fetchone()[0]
+        rss_before = peak_rss_mb()
+
+        def _progress(stats):
+            if stats["chunks"] % 20 == 0:
+                print(f"  … {stats['rows']:,} 行, 入库 {stats['inserted']:,}, 峰值内存 {peak_rss_mb():.0f}MB")
+
+        importer = work_report_import.WorkReportImporter(conn, _progress)
+        result = importer.run(iter_excel_chunks(xlsx, chunk_size, work_report_import.normalize_header))
+        after = conn.execute("SELECT COUNT(*) FROM work_reports").fetchone()[0]
+
+        print(f"🚀 块大小 {chunk_size:,}: {result['rows']:,} 行 / {result['seconds']}s = {result['rows_per_sec']:,} 行/秒")
+        print(f"  入库 {result['inserted']:,}（表内 {before} → {after}），同文件内重复 {result['skipped']:,}，未通过 {result['failed']:,}")
+        print(f"  错误示例: {result['errors'][:2]}")
+        print(f"  峰值内存 {peak_rss_mb():.0f}MB（导入前 {rss_before:.0f}MB）")
+
+        again = work_report_import.WorkReportImporter(conn).run(
+            iter_excel_chunks(xlsx, chunk_size, work_report_import.normalize_header)
+        )
+        total = conn.execute("SELECT COUNT(*) FROM work_reports").fetchone()[0]
+        conn.close()
+        print(f"🔁 重复导入: {again['seconds']}s, 新增 {again['inserted']:,}, 跳过 {again['skipped']:,}, 表内 {after} → {total}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else work_report_import.IMPORT_CHUNK_SIZE
+    main(rows, chunk_size)
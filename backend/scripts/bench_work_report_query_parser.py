@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+报工对话式查询解析吞吐对比（每秒解析条数）：
+- 原内联解析：每次调用 re.search 传字符串模式、停用词逐个 replace
+- 新解析器（不缓存）：预编译正则 + Aho-Corasick 名称词典
+- 新解析器（缓存命中）：重复查询直接取 LRU
+名称使用固定列表，不依赖数据库
+用法: python scripts/bench_work_report_query_parser.py [轮数]
+"""
+
+import sys
+import os
+import re
+import time
+from datetime import date, timedelta
+from typing import Callable, List
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.nlp.work_report_query_parser import WorkReportQueryParser
+
+NAMES = {
+    "employee": ["张三", "李四", "王五", "赵六", "钱七"] + [f"员工{i:03d}" for i in range(200)],
+    "project": ["ERP系统开发", "数据分析平台", "移动应用开发", "AI智能助手", "用户管理系统"],
+    "department": ["技术部", "产品部", "运营部"],
+}
+
+QUERIES = [
+    "查询AI智能助手项目的报工情况",
+    "查询王五9月的报工",
+    "查询张三上周的报工",
+    "帮我查询一下ERP系统开发项目本月报工",
+    "技术部今年的报工",
+    "查询订单SO20250901相关报工",
+    "李四2025-08报工情况",
+    "你好",
+    "查询员工123这个月的报工",
+    "请查询数据分析平台上个月的报工",
+]
+
+
+def legacy_parse(text: str) -> dict:
+    """原 ai_query 内联解析逻辑（不含日志输出）"""
+    employee_name = project_name = keyword = start_date = end_date = None
+    m = re.search(r"([A-Za-z]{2,})项目", text)
+    if m:
+        project_name = m.group(1)
+    else:
+        m = re.search(r"([一-龥]{2,})项目", text)
+        if m:
+            project_name = m.group(1)
+        else:
+            m = re.search(r"项目([一-龥A-Za-z0-9_\-]+)", text)
+            if m:
+                project_name = m.group(1)
+    m = re.search(r"查询\s*([一-龥A-Za-z]{1,6})\s*的?\s*报工", text)
+    if m:
+        employee_name = m.group(1)
+        if employee_name.endswith('的'):
+            employee_name = employee_name[:-1]
+    m = re.findall(r"(订单\S+|物料\S+|工序\S+)", text)
+    if m:
+        keyword = " ".join(m)
+    else:
+        tmp = text
+        for s in ["查询", "报工", "情况", "的", "一下", "下", "请", "帮我", "项目"]:
+            tmp = tmp.replace(s, "")
+        if employee_name:
+            tmp = tmp.replace(employee_name, "")
+        if project_name:
+            tmp = tmp.replace(project_name, "")
+        keyword = tmp.strip() or None
+
+    def _last_day_of_month(some_day: date) -> date:
+        return (some_day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+    today = date.today()
+    if re.search(r"上周", text):
+        end_date = today - timedelta(days=today.weekday() + 1)
+        start_date = end_date - timedelta(days=6)
+    elif re.search(r"本周|这周", text):
+        start_date = today - timedelta(days=today.weekday())
+        end_date = start_date + timedelta(days=6)
+    elif re.search(r"上月|上个月", text):
+        start_date = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+        end_date = _last_day_of_month(start_date)
+    elif re.search(r"本月|这个月", text):
+        start_date = today.replace(day=1)
+        end_date = _last_day_of_month(start_date)
+    elif re.search(r"今年", text):
+        start_date, end_date = date(today.year, 1, 1), date(today.year, 12, 31)
+    else:
+        m = re.search(r"(20\d{2})-(0?[1-9]|1[0-2])", text)
+        if m:
+            start_date = date(int(m.group(1)), int(m.group(2)), 1)
+            end_date = _last_day_of_month(start_date)
+        else:
+            m = re.search(r"(\d{1,2})月", text)
+            if m:
+                start_date = date(today.year, int(m.group(1)), 1)
+                end_date = _last_day_of_month(start_date)
+    if not start_date and not end_date:
+        end_date, start_date = today, today - timedelta(days=90)
+    smalltalk = any(
+        re.search(p, text.strip(), re.IGNORECASE)
+        for p in [r"^你好$", r"^在吗$", r"^嗨$", r"^hello$", r"^hi$", r"帮助", r"说明", r"怎么用", r"示例", r"功能"]
+    )
+    return {"employee_name": employee_name, "project_name": project_name, "keyword": keyword,
+            "start_date": start_date, "end_date": end_date, "smalltalk": smalltalk}
+
+
+def measure(label: str, fn: Callable[[str], object], queries: List[str], rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for q in queries:
+            fn(q)
+    elapsed = time.perf_counter() - started
+    qps = rounds * len(queries) / elapsed
+    print(f"  {label:<20} {qps:>12,.0f} 条/秒")
+    return qps
+
+
+def main(rounds: int) -> None:
+    cold = WorkReportQueryParser(lambda: NAMES, cache_size=0)
+    warm = WorkReportQueryParser(lambda: NAMES)
+    cold.name_index()
+    for q in QUERIES:
+        warm.parse(q)
+
+    print(f"🚀 {len(QUERIES)} 条查询 × {rounds} 轮，名称 {sum(len(v) for v in NAMES.values())} 个")
+    base = measure("原内联解析", legacy_parse, QUERIES, rounds)
+    new = measure("新解析器（不缓存）", cold.parse, QUERIES, rounds)
+    cached = measure("新解析器（缓存命中）", warm.parse, QUERIES, rounds)
+    print(f"  不缓存 {new / base:.2f}x，缓存命中 {cached / base:.2f}x")
+
+    print("解析结果对比（原 → 新）:")
+    for q in QUERIES:
+        old = legacy_parse(q)
+        parsed = cold.parse(q)
+        print(f"  «{q}»  员工 {old['employee_name']}→{parsed.employee_name}  项目 {old['project_name']}→{parsed.project_name}"
+              f"  部门 -→{parsed.department_name}  关键词 {old['keyword']}→{parsed.keyword}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地 LLM 桩服务（仅依赖标准库），用于压测 LLM 传输层
+- POST /chat                      LLMClient 网关格式，返回 {"content": ...}
+- POST /chat/completions、/v1/chat/completions  OpenAI 兼容格式；请求体 stream=true 时按 SSE 分片返回
+- GET  /stats                     连接数、请求数、最大并发
+- POST /reset                     清零统计
+提示词中含“未来N个月”时返回 N 个预测值的 JSON，便于端到端验证预测接口
+--latency-ms 为首个分片前的延迟，--token-ms 为每个分片（4 字符）的生成间隔（非流式回复同样按分片数计入耗时），
+--reply-chars 将普通回复补齐到指定长度
+用法: python scripts/fake_llm_server.py [--port 8099] [--latency-ms 200] [--token-ms 0] [--reply-chars 0]
+                                       [--fail-rate 0.0] [--fail-status 503]
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeLLMServer:
+    """基于 asyncio 的最小 HTTP/1.1 服务，支持 keep-alive"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8099, latency_ms: float = 200,
+                 jitter_ms: float = 0, fail_rate: float = 0.0, fail_status: int = 503,
+                 token_ms: float = 0, reply_chars: int = 0) -> None:
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.token_ms = token_ms
+        self.reply_chars = reply_chars
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.reset()
+
+    def reset(self) -> None:
+        self.connections_total = 0
+        self.connections_active = 0
+        self.requests_total = 0
+        self.requests_active = 0
+        self.max_concurrent_requests = 0
+        self.failures = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections_total": self.connections_total,
+            "connections_active": self.connections_active,
+            "requests_total": self.requests_total,
+            "max_concurrent_requests": self.max_concurrent_requests,
+            "failures": self.failures,
+        }
+
+    # ---- HTTP ----
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        method, path, version = line.decode("latin-1").strip().split(" ", 2)
+        headers: Dict[str, str] = {}
+        while True:
+            raw = await reader.readline()
+            if raw in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = raw.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", "0") or 0)
+        body = await reader.readexactly(length) if length else b""
+        if version == "HTTP/1.0":
+            headers.setdefault("connection", "close")
+        return method, path, headers, body
+
+    @staticmethod
+    def _response(status: int, payload: Any, keep_alive: bool) -> bytes:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        reason = {200: "OK", 404: "Not Found", 429: "Too Many Requests", 500: "Internal Server Error",
+                  503: "Service Unavailable"}.get(status, "Error")
+        head = (
+            f"HTTP/1.1 {status} {reason}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        return head.encode("latin-1") + body
+
+    def _completion_text(self, prompt: str) -> str:
+        m = re.search(r"未来(\d+)个月", prompt)
+        if m:
+            values = [round(random.uniform(90, 110), 2) for _ in range(int(m.group(1)))]
+            return json.dumps({"predictions": values, "confidence": 0.8, "methodology": "fake-llm"}, ensure_ascii=False)
+        text = f"fake reply ({len(prompt)} chars)"
+        if len(text) < self.reply_chars:
+            filler = "。这是本地桩服务生成的说明文本"
+            text = (text + filler * (self.reply_chars // len(filler) + 1))[:self.reply_chars]
+        return text
+
+    def _begin_request(self) -> float:
+        self.requests_total += 1
+        self.requests_active += 1
+        self.max_concurrent_requests = max(self.max_concurrent_requests, self.requests_active)
+        return (self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000.0
+
+    def _inject_failure(self) -> bool:
+        if self.fail_rate and random.random() < self.fail_rate:
+            self.failures += 1
+            return True
+        return False
+
+    async def _handle_api(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        if method == "GET" and path == "/stats":
+            return 200, self.stats()
+        if method == "POST" and path == "/reset":
+            self.reset()
+            return 200, {"ok": True}
+        if method != "POST" or path not in ("/chat", "/chat/completions", "/v1/chat/completions"):
+            return 404, {"error": "not found"}
+
+        delay = self._begin_request()
+        try:
+            await asyncio.sleep(delay)
+            if self._inject_failure():
+                return self.fail_status, {"error": "injected failure"}
+            payload = json.loads(body or b"{}")
+            prompt = "\n".join(str(m.get("content", "")) for m in payload.get("messages", []))
+            text = self._completion_text(prompt)
+            if self.token_ms:
+                # 非流式同样需要生成完整回复
+                await asyncio.sleep((len(text) + 3) // 4 * self.token_ms / 1000.0)
+            if path == "/chat":
+                return 200, {"content": text}
+            return 200, {
+                "id": f"fake-{self.requests_total}",
+                "object": "chat.completion",
+                "model": payload.get("model", "fake"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            }
+        finally:
+            self.requests_active -= 1
+
+    async def _stream_completion(self, writer: asyncio.StreamWriter, body: bytes, keep_alive: bool) -> None:
+        """OpenAI 兼容 SSE：首个分片前等待 latency，其后每 token_ms 输出一段（chunked 编码，可复用连接）"""
+        delay = self._begin_request()
+        try:
+            await asyncio.sleep(delay)
+            if self._inject_failure():
+                writer.write(self._response(self.fail_status, {"error": "injected failure"}, keep_alive))
+                await writer.drain()
+                return
+            payload = json.loads(body or b"{}")
+            prompt = "\n".join(str(m.get("content", "")) for m in payload.get("messages", []))
+            text = self._completion_text(prompt)
+            writer.write((
+                "HTTP/1.1 200 OK\r\n"
+                "Content-Type: text/event-stream; charset=utf-8\r\n"
+                "Cache-Control: no-cache\r\n"
+                "Transfer-Encoding: chunked\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+            ).encode("latin-1"))
+            pieces = [text[i:i + 4] for i in range(0, len(text), 4)]
+            for i, piece in enumerate(pieces):
+                if i:
+                    await asyncio.sleep(self.token_ms / 1000.0)
+                chunk = {
+                    "id": f"fake-{self.requests_total}", "object": "chat.completion.chunk",
+                    "model": payload.get("model", "fake"),
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                }
+                self._write_chunk(writer, f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+                await writer.drain()
+            self._write_chunk(writer, "data: [DONE]\n\n")
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            self.requests_active -= 1
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, text: str) -> None:
+        data = text.encode("utf-8")
+        writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+
+    @staticmethod
+    def _wants_stream(method: str, path: str, body: bytes) -> bool:
+        if method != "POST" or path not in ("/chat/completions", "/v1/chat/completions") or b'"stream"' not in body:
+            return False
+        try:
+            return bool(json.loads(body).get("stream"))
+        except ValueError:
+            return False
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections_total += 1
+        self.connections_active += 1
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                if self._wants_stream(method, path, body):
+                    await self._stream_completion(writer, body, keep_alive)
+                else:
+                    status, payload = await self._handle_api(method, path, body)
+                    writer.write(self._response(status, payload, keep_alive))
+                    await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.connections_active -= 1
+            writer.close()
+
+    # ---- 启停 ----
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, backlog=1024)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_in_thread(self) -> "FakeLLMServer":
+        """在后台线程的独立事件循环中运行，供基准脚本使用"""
+        started = threading.Event()
+
+        def _run() -> None:
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=_run, name="fake-llm-server", daemon=True).start()
+        started.wait(5)
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            time.sleep(0.05)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地 LLM 桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--token-ms", type=float, default=0)
+    parser.add_argument("--reply-chars", type=int, default=0)
+    args = parser.parse_args()
+    server = FakeLLMServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.fail_rate, args.fail_status,
+                           args.token_ms, args.reply_chars)
+    print(f"🤖 fake LLM server: {server.base_url} (latency={args.latency_ms}ms, token={args.token_ms}ms, "
+          f"fail_rate={args.fail_rate})")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,71 @@
+"""LLM 响应缓存：按 key 淘汰与并发访问"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.db.sqlite_db import SQLiteDatabase
+from app.utils.llm.response_cache import LLMResponseCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    db = SQLiteDatabase(str(tmp_path / "llm_cache.db"))
+    yield LLMResponseCache(db.conn, max_entries=100, ttl_seconds=3600)
+    db.close()
+
+
+def _store(cache, prompt, answer):
+    cache.store("chat", "m", 0.0, prompt, {"answer": answer}, prompt_tokens=10, completion_tokens=5,
+                semantic_text=prompt)
+
+
+def _lookup(cache, prompt):
+    return cache.lookup("chat", "m", 0.0, prompt, semantic=True, semantic_text=prompt)
+
+
+def test_evict_removes_only_expired_keys(cache):
+    _store(cache, "查询王五9月报工", "warm")
+    _store(cache, "查询张三9月报工明细", "stale")
+    assert _lookup(cache, "查询王五9月报工！") == {"answer": "warm"}  # 相似命中，加载 bucket 索引
+
+    stale_key = cache.make_key(cache.make_bucket("chat", "m", 0.0), "查询张三9月报工明细")
+    cache.conn.execute("UPDATE llm_response_cache SET expires_at = ? WHERE cache_key = ?", (time.time() - 1, stale_key))
+    cache.conn.commit()
+
+    assert cache.evict() == 1
+    assert len(cache.memory) == 1
+    (index,) = cache._buckets.values()
+    assert len(index["keys"]) == 1 and stale_key not in index["keys"]
+    assert _lookup(cache, "查询王五9月报工") == {"answer": "warm"}
+    assert _lookup(cache, "查询张三9月报工明细") is None
+
+
+def test_evict_trims_least_recently_used(cache):
+    cache.max_entries = 2
+    for i, prompt in enumerate(["第一个问题", "第二个问题", "第三个问题"]):
+        _store(cache, prompt, i)
+        time.sleep(0.01)
+
+    assert cache.evict() == 1
+    assert _lookup(cache, "第一个问题") is None
+    assert _lookup(cache, "第三个问题") == {"answer": 2}
+
+
+def test_concurrent_lookup_and_store_keep_metrics_consistent(cache):
+    prompts = [f"物料{i % 20}的报价是多少" for i in range(400)]
+
+    def _work(i):
+        if i % 4 == 0:
+            _store(cache, prompts[i], i)
+        return _lookup(cache, prompts[i])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(_work, range(len(prompts))))
+
+    stats = cache.stats()
+    hits = sum(r is not None for r in results)
+    assert stats["exact_hits"] + stats["semantic_hits"] == hits
+    assert stats["misses"] == len(prompts) - hits
+    assert stats["stores"] == len(prompts) // 4
@@ -0,0 +1,121 @@
+"""物料检索索引：后台重建与物料增删改接口对索引的同步"""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1 import pricing
+from app.db.sqlite_db import SQLiteDatabase
+from app.repository import pricing_repo
+from app.repository.pricing_repo import PricingRepository
+from app.schemas.pricing import MaterialData
+from app.utils.pricing.material_index import MaterialIndexCache, reset_material_index
+
+_MATERIALS_SQL = """
+    CREATE TABLE materials (
+        id TEXT PRIMARY KEY, material_code TEXT NOT NULL, material_name TEXT NOT NULL, specification TEXT,
+        quantity INTEGER, unit TEXT, complexity TEXT, process_requirements TEXT, created_at TEXT, updated_at TEXT
+    )
+"""
+
+
+def _loader(names):
+    def _load():
+        for i, name in enumerate(names):
+            yield f"m{i}", name, {"material_name": name}
+    return _load
+
+
+def test_stale_index_is_rebuilt_in_background():
+    version = [1]
+    cache = MaterialIndexCache(ttl_seconds=3600, version_source=lambda: version[0])
+    first = cache.get(_loader(["钛合金螺栓"]))
+    assert cache.builds == 1
+
+    started, release, calls = threading.Event(), threading.Event(), []
+
+    def _slow_load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        yield from _loader(["钛合金法兰"])()
+
+    version[0] = 2
+    cache._checked_at = float("-inf")
+    # 过期后立即返回旧索引，重建只由一个后台线程进行
+    assert cache.get(_slow_load) is first
+    assert started.wait(5)
+    assert cache.get(_slow_load) is first
+    assert cache.stats()["rebuilding"]
+    release.set()
+    cache.join(5)
+
+    assert len(calls) == 1
+    rebuilt = cache.get(_slow_load)
+    assert rebuilt is not first
+    assert [doc for doc, _ in rebuilt.search(keyword="法兰")] == ["钛合金法兰"]
+    assert cache.stats()["version"] == 2
+
+
+def test_rebuild_is_discarded_when_local_write_happens_meanwhile():
+    cache = MaterialIndexCache(ttl_seconds=0)
+    first = cache.get(_loader(["钛合金螺栓"]))
+
+    def _load_with_write():
+        # 构建期间本进程写入：新索引可能漏掉该写入，不应替换已增量更新的旧索引
+        first.add("m9", "钛合金垫片", material_name="钛合金垫片")
+        cache.note_write(None)
+        yield from _loader(["钛合金螺栓"])()
+
+    assert cache.get(_load_with_write) is first
+    cache.join(5)
+
+    assert cache.builds == 1
+    assert "钛合金垫片" in [doc for doc, _ in cache.get(_loader([])).search(keyword="垫片")]
+    cache.join(5)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    db = SQLiteDatabase(str(tmp_path / "materials.db"))
+    db.conn.execute(_MATERIALS_SQL)
+    monkeypatch.setattr(pricing_repo, "get_db", lambda: db)
+    reset_material_index()
+    app = FastAPI()
+    app.include_router(pricing.router, prefix="/api/pricing")
+    yield TestClient(app)
+    reset_material_index()
+    db.close()
+
+
+def _search(keyword):
+    return [m.material_name for m in asyncio.run(PricingRepository().search_materials(keyword=keyword))]
+
+
+def test_update_and_delete_material_refresh_index(client):
+    material = asyncio.run(PricingRepository().create_material(MaterialData(
+        material_code="TI-1", material_name="钛合金螺栓", specification="M8×30",
+        quantity=1, unit="个", complexity="简单", process_requirements=["车削"],
+    )))
+    assert _search("钛合金") == ["钛合金螺栓"]
+
+    body = material.model_dump(mode="json", exclude={"id"})
+    body["material_name"] = "钛合金法兰"
+    r = client.put(f"/api/pricing/pricing/materials/{material.id}", json=body)
+    assert r.status_code == 200
+    assert _search("钛合金") == ["钛合金法兰"]
+
+    assert client.delete(f"/api/pricing/pricing/materials/{material.id}").status_code == 200
+    assert _search("钛合金") == []
+
+
+def test_update_and_delete_unknown_material_return_404(client):
+    body = {
+        "material_code": "X", "material_name": "不存在", "specification": "-", "quantity": 1, "unit": "个",
+        "complexity": "简单", "process_requirements": [],
+    }
+    assert client.put("/api/pricing/pricing/materials/nope", json=body).status_code == 404
+    assert client.delete("/api/pricing/pricing/materials/nope").status_code == 404
@@ -0,0 +1,54 @@
+"""报工分块导入：Excel 数值日期单元格的解析"""
+
+from datetime import datetime
+
+from openpyxl import Workbook
+
+from app.repository import work_report_import
+from app.repository.work_report_import import ImportErrors, coerce_chunk, normalize_header
+from app.utils.parsers.excel_stream import iter_excel_chunks
+
+
+class _StubEntityCache:
+    def known_ids(self, kind):
+        return {"E1", "P1", "D1"}
+
+    def name_map(self, kind):
+        return {}
+
+
+def _coerce_workbook(tmp_path, monkeypatch, dates):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["员工ID", "项目ID", "部门ID", "报工日期", "工时", "工作内容"])
+    for i, value in enumerate(dates):
+        ws.append(["E1", "P1", "D1", value, 8, f"装配{i}"])
+    path = tmp_path / "reports.xlsx"
+    wb.save(path)
+
+    monkeypatch.setattr(work_report_import, "get_entity_cache", lambda: _StubEntityCache())
+    errors = ImportErrors()
+    rows = [row for chunk in iter_excel_chunks(str(path), 100, normalize_header) for row in coerce_chunk(chunk, errors)]
+    return rows, errors
+
+
+def test_numeric_date_cell_is_excel_serial(tmp_path, monkeypatch):
+    rows, errors = _coerce_workbook(tmp_path, monkeypatch, [45900, 45901.5])
+
+    assert errors.count == 0
+    assert [row[4] for row in rows] == ["2025-08-31", "2025-09-01"]
+
+
+def test_mixed_date_cells(tmp_path, monkeypatch):
+    rows, errors = _coerce_workbook(tmp_path, monkeypatch, [datetime(2025, 9, 3), "2025-09-04", 45900])
+
+    assert errors.count == 0
+    assert [row[4] for row in rows] == ["2025-09-03", "2025-09-04", "2025-08-31"]
+
+
+def test_out_of_range_serial_is_row_error(tmp_path, monkeypatch):
+    rows, errors = _coerce_workbook(tmp_path, monkeypatch, [45900, 0, 99999999])
+
+    assert [row[4] for row in rows] == ["2025-08-31"]
+    assert errors.count == 2
+    assert [(e["row"], e["column"]) for e in errors.items] == [(3, "report_date"), (4, "report_date")]
@@ -64,4 +64,49 @@ apiClient.interceptors.response.use(
   }
 )
 
+// SSE 流式 POST（对话式查询 ?stream=true）：按到达顺序回调 (event, data)
+export const postEventStream = async (
+  url: string,
+  body: unknown,
+  onEvent: (event: string, data: any) => void
+): Promise<void> => {
+  const headers: Record<string, string> = { 'Content-Type': 'application/json', Accept: 'text/event-stream' }
+  const token = localStorage.getItem('token')
+  if (token) {
+    headers.Authorization = `Bearer ${token}`
+  }
+  const resp = await fetch(`${getApiBaseUrl()}${url}`, { method: 'POST', headers, body: JSON.stringify(body) })
+  if (!resp.ok || !resp.body) {
+    const text = await resp.text().catch(() => '')
+    let detail = text
+    try {
+      detail = JSON.parse(text).detail || text
+    } catch {
+      // 非JSON错误体，原样返回
+    }
+    throw new Error(detail || `HTTP ${resp.status}`)
+  }
+  const reader = resp.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    let sep = buffer.indexOf('\n\n')
+    while (sep >= 0) {
+      const block = buffer.slice(0, sep)
+      buffer = buffer.slice(sep + 2)
+      let event = 'message'
+      const data: string[] = []
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim()
+        else if (line.startsWith('data:')) data.push(line.slice(5).trim())
+      }
+      if (data.length) onEvent(event, JSON.parse(data.join('\n')))
+      sep = buffer.indexOf('\n\n')
+    }
+  }
+}
+
 export default apiClient